@@ -1,14 +1,20 @@
 """
 Authentication utilities for API key validation.
 """
+import hashlib
+import hmac
 import logging
+import os
 import secrets
+import threading
+import time
 import bcrypt
+from collections import OrderedDict
 from datetime import datetime
 from typing import Optional
 from uuid import UUID
 from fastapi import Header, HTTPException, Depends, Request
-from sqlmodel import Session, select
+from sqlmodel import Session, func, select
 from db import get_session
 from models import APIKey, User
 
@@ -20,6 +26,152 @@ import sys
 sys.stderr.write("[AUTH MODULE] auth.py module loaded (stderr)!\n")
 sys.stderr.flush()
 
+# HMAC secret for API key lookup digests. Must be identical on every worker.
+# To rotate it, set api_keys.lookup_hash = NULL: keys then take the legacy
+# bcrypt path once and are re-backfilled with the new digest.
+_DEFAULT_LOOKUP_SECRET = "llmobserve-api-key-lookup"
+API_KEY_LOOKUP_SECRET = os.getenv("API_KEY_LOOKUP_SECRET", _DEFAULT_LOOKUP_SECRET).encode("utf-8")
+if not os.getenv("API_KEY_LOOKUP_SECRET") and os.getenv("ENV", "").lower() == "production":
+    logger.warning(
+        "[AUTH] API_KEY_LOOKUP_SECRET is not set; API key lookup digests use the built-in "
+        "default secret. Set it (and NULL api_keys.lookup_hash so keys re-backfill) in production."
+    )
+
+# Optional second factor: also bcrypt-verify keys found by lookup_hash
+API_KEY_BCRYPT_VERIFY = os.getenv("API_KEY_BCRYPT_VERIFY", "false").lower() == "true"
+
+# Verified-key cache (shared by /events and /caps/check)
+API_KEY_CACHE_TTL = int(os.getenv("API_KEY_CACHE_TTL", "300"))  # 5 minutes
+API_KEY_CACHE_MAX_SIZE = int(os.getenv("API_KEY_CACHE_MAX_SIZE", "10000"))
+
+# Shared secret for operator-only endpoints (e.g. /migrations/rebuild-*).
+# Unset disables those endpoints.
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+ADMIN_TOKEN_HEADER = "X-LLMObserve-Admin-Token"
+
+# Rejected-key cache: invalid keys skip the DB (and legacy bcrypt scan) for this long
+API_KEY_NEGATIVE_CACHE_TTL = int(os.getenv("API_KEY_NEGATIVE_CACHE_TTL", "60"))
+
+# How long a "no legacy keys left" count is trusted before re-checking
+API_KEY_LEGACY_COUNT_TTL = int(os.getenv("API_KEY_LEGACY_COUNT_TTL", "300"))
+
+
+class APIKeyCache:
+    """
+    Bounded, TTL'd LRU of verified API keys: {lookup_hash: (user_id, expires_at)}.
+    
+    Keyed by lookup hash so plaintext keys are never held in memory.
+    Revocation invalidates the local entry; other workers expire within TTL.
+    """
+    
+    def __init__(self, max_size: int = API_KEY_CACHE_MAX_SIZE, ttl_seconds: int = API_KEY_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, lookup_hash: str) -> Optional[UUID]:
+        with self._lock:
+            entry = self._entries.get(lookup_hash)
+            if entry is None:
+                return None
+            user_id, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[lookup_hash]
+                return None
+            self._entries.move_to_end(lookup_hash)
+            return user_id
+    
+    def set(self, lookup_hash: str, user_id: UUID) -> None:
+        with self._lock:
+            self._entries[lookup_hash] = (user_id, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(lookup_hash)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, lookup_hash: Optional[str]) -> None:
+        if not lookup_hash:
+            return
+        with self._lock:
+            self._entries.pop(lookup_hash, None)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RejectedKeyCache:
+    """
+    Bounded, short-TTL set of rejected API keys: {lookup_hash: expires_at}.
+    
+    Repeated garbage keys skip the DB lookup (and the legacy bcrypt scan)
+    until the entry expires.
+    """
+    
+    def __init__(self, max_size: int = API_KEY_CACHE_MAX_SIZE, ttl_seconds: int = API_KEY_NEGATIVE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __contains__(self, lookup_hash: str) -> bool:
+        with self._lock:
+            expires_at = self._entries.get(lookup_hash)
+            if expires_at is None:
+                return False
+            if time.monotonic() >= expires_at:
+                del self._entries[lookup_hash]
+                return False
+            return True
+    
+    def add(self, lookup_hash: str) -> None:
+        with self._lock:
+            self._entries[lookup_hash] = time.monotonic() + self.ttl_seconds
+            self._entries.move_to_end(lookup_hash)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+api_key_cache = APIKeyCache()
+invalid_key_cache = RejectedKeyCache()
+
+# (legacy key count, expires_at) - lets resolve_api_key skip the bcrypt scan
+_legacy_key_count: Optional[tuple] = None
+_legacy_key_count_lock = threading.Lock()
+
+
+def _legacy_keys_remaining(session: Session) -> int:
+    """Non-revoked keys without a lookup_hash (cached for API_KEY_LEGACY_COUNT_TTL)."""
+    global _legacy_key_count
+    with _legacy_key_count_lock:
+        if _legacy_key_count and time.monotonic() < _legacy_key_count[1]:
+            return _legacy_key_count[0]
+    count = session.exec(
+        select(func.count()).select_from(APIKey).where(
+            APIKey.lookup_hash.is_(None),
+            APIKey.revoked_at.is_(None),
+        )
+    ).one()
+    with _legacy_key_count_lock:
+        _legacy_key_count = (int(count or 0), time.monotonic() + API_KEY_LEGACY_COUNT_TTL)
+    return int(count or 0)
+
+
+def _forget_legacy_key_count() -> None:
+    global _legacy_key_count
+    with _legacy_key_count_lock:
+        _legacy_key_count = None
+
 
 def generate_api_key() -> str:
     """
@@ -31,7 +183,7 @@ def generate_api_key() -> str:
 
 
 def hash_api_key(api_key: str) -> str:
-    """Hash an API key using bcrypt."""
+    """Hash an API key using bcrypt (stored as key_hash; optional second factor)."""
     return bcrypt.hashpw(api_key.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
 
@@ -43,6 +195,16 @@ def verify_api_key_hash(api_key: str, key_hash: str) -> bool:
         return False
 
 
+def compute_lookup_hash(api_key: str) -> str:
+    """
+    Deterministic keyed digest of an API key (HMAC-SHA256, hex).
+    
+    Stored in APIKey.lookup_hash under a unique index so a presented key
+    resolves with one indexed query instead of a bcrypt scan.
+    """
+    return hmac.new(API_KEY_LOOKUP_SECRET, api_key.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
 def get_key_prefix(api_key: str, length: int = 12) -> str:
     """
     Get displayable prefix of API key.
@@ -51,6 +213,92 @@ def get_key_prefix(api_key: str, length: int = 12) -> str:
     return api_key[:length] + "..." if len(api_key) > length else api_key
 
 
+def resolve_api_key(session: Session, api_key: str) -> Optional[APIKey]:
+    """
+    Resolve a plaintext API key to its non-revoked APIKey record.
+    
+    One indexed lookup on lookup_hash. Keys created before lookup_hash existed
+    are found with a bcrypt scan over the (shrinking) set of legacy rows and
+    backfilled on first use, so every key converges to the O(1) path; once
+    none are left the scan is skipped.
+    """
+    lookup_hash = compute_lookup_hash(api_key)
+    matched_key = session.exec(
+        select(APIKey).where(
+            APIKey.lookup_hash == lookup_hash,
+            APIKey.revoked_at.is_(None),
+        )
+    ).first()
+    
+    if matched_key:
+        if API_KEY_BCRYPT_VERIFY and not verify_api_key_hash(api_key, matched_key.key_hash):
+            logger.warning(f"[AUTH] bcrypt second factor failed for key {matched_key.key_prefix}")
+            return None
+        return matched_key
+    
+    # Legacy keys (no lookup_hash yet) - bcrypt scan, then backfill
+    if _legacy_keys_remaining(session) == 0:
+        return None
+    legacy_keys = session.exec(
+        select(APIKey).where(
+            APIKey.lookup_hash.is_(None),
+            APIKey.revoked_at.is_(None),
+        )
+    ).all()
+    for key in legacy_keys:
+        if verify_api_key_hash(api_key, key.key_hash):
+            key.lookup_hash = lookup_hash
+            session.add(key)
+            logger.info(f"[AUTH] Backfilled lookup_hash for legacy key {key.key_prefix}")
+            _forget_legacy_key_count()
+            return key
+    
+    return None
+
+
+def authenticate_api_key(session: Session, api_key: str) -> User:
+    """
+    Validate an API key and return its user, using the shared verified-key cache.
+    
+    Shared by get_current_user (/events and other API-key routes) and
+    /caps/check. Raises 401 for unknown, revoked or orphaned keys.
+    """
+    lookup_hash = compute_lookup_hash(api_key)
+    
+    cached_user_id = api_key_cache.get(lookup_hash)
+    if cached_user_id:
+        user = session.get(User, cached_user_id)
+        if user:
+            return user
+        # User deleted - drop the entry and re-validate
+        api_key_cache.invalidate(lookup_hash)
+    
+    # Recently rejected - don't hit the DB (or bcrypt) again for the same garbage key
+    matched_key = None if lookup_hash in invalid_key_cache else resolve_api_key(session, api_key)
+    if not matched_key:
+        invalid_key_cache.add(lookup_hash)
+        raise HTTPException(
+            status_code=401,
+            detail="API_KEY_AUTH_FAILED: Invalid or revoked API key",
+        )
+    
+    # last_used_at is refreshed on cache misses only (at most once per TTL per worker)
+    matched_key.last_used_at = datetime.utcnow()
+    session.add(matched_key)
+    session.commit()
+    
+    user = session.get(User, matched_key.user_id)
+    if not user:
+        logger.error(f"[AUTH] User not found for ID: {matched_key.user_id}")
+        raise HTTPException(
+            status_code=401,
+            detail="User not found",
+        )
+    
+    api_key_cache.set(lookup_hash, matched_key.user_id)
+    return user
+
+
 async def get_current_user(
     request: Request,
     authorization: Optional[str] = Header(None),
@@ -64,14 +312,6 @@ async def get_current_user(
         def protected_route(user: User = Depends(get_current_user)):
             return {"user_id": user.id}
     """
-    import sys
-    sys.stderr.write("=" * 80 + "\n")
-    sys.stderr.write("[AUTH FUNC] ===== get_current_user FUNCTION CALLED! =====\n")
-    sys.stderr.write(f"[AUTH FUNC] authorization header: {authorization}\n")
-    sys.stderr.write("=" * 80 + "\n")
-    sys.stderr.flush()
-    print("[AUTH FUNC] get_current_user FUNCTION CALLED!", flush=True)
-    print(f"[AUTH FUNC] authorization={authorization}", flush=True)
     if not authorization:
         raise HTTPException(
             status_code=401,
@@ -90,46 +330,10 @@ async def get_current_user(
     
     token = parts[1]
     
-    # Log to stderr and logger (AUTH_VERSION_20250108_v2)
-    import sys
-    sys.stderr.write(f"[AUTH v2] ========== AUTH VERSION 20250108_v2 ==========\n")
-    sys.stderr.write(f"[AUTH v2] Token extracted: {token[:40]}...\n")
-    sys.stderr.write(f"[AUTH v2] Token length: {len(token)}\n")
-    sys.stderr.write(f"[AUTH v2] Token repr first 20: {repr(token[:20])}\n")
-    sys.stderr.write(f"[AUTH v2] Starts with llmo_sk_: {token.startswith('llmo_sk_')}\n")
-    sys.stderr.flush()
-    logger.error(f"[AUTH v2] Token received: {token[:30]}...")
-    logger.error(f"[AUTH v2] Starts with llmo_sk_: {token.startswith('llmo_sk_')}")
-    
     # Check if it's an API key (starts with llmo_sk_)
     if token.startswith("llmo_sk_"):
-        sys.stderr.write("[AUTH] ✅ Detected API key - entering API key validation branch\n")
-        sys.stderr.flush()
-        logger.error(f"[AUTH] Detected API key, validating...")
-        print(f"[AUTH DEBUG] Validating API key...", flush=True)
-        logger.info(f"[Auth] Validating API key: {token[:20]}...")
-        # Validate API key
         try:
-            logger.error(f"[AUTH] Executing database query...")
-            statement = select(APIKey).where(APIKey.revoked_at.is_(None))
-            api_keys = session.exec(statement).all()
-            logger.error(f"[AUTH] Found {len(api_keys)} non-revoked API keys in database")
-            
-            matched_key = None
-            logger.error(f"[AUTH] Checking {len(api_keys)} keys...")
-            for i, key in enumerate(api_keys):
-                logger.error(f"[AUTH] Checking key {i+1}/{len(api_keys)}: {key.key_prefix}")
-                if verify_api_key_hash(token, key.key_hash):
-                    matched_key = key
-                    logger.error(f"[AUTH] ✅ API key MATCHED! User ID: {key.user_id}")
-                    break
-            
-            if not matched_key:
-                logger.error(f"[AUTH] ❌ API key NOT found in database after checking {len(api_keys)} keys")
-                raise HTTPException(
-                    status_code=401,
-                    detail="API_KEY_AUTH_FAILED: Invalid or revoked API key",
-                )
+            return authenticate_api_key(session, token)
         except HTTPException:
             raise
         except Exception as e:
@@ -138,35 +342,11 @@ async def get_current_user(
                 status_code=401,
                 detail=f"API_KEY_AUTH_ERROR: {str(e)}",
             )
-        
-        # Update last_used_at
-        logger.error(f"[AUTH] ✅ Updating last_used_at for matched key...")
-        matched_key.last_used_at = datetime.utcnow()
-        session.add(matched_key)
-        session.commit()
-        
-        # Get user
-        logger.error(f"[AUTH] ✅ Getting user from database...")
-        user = session.get(User, matched_key.user_id)
-        if not user:
-            logger.error(f"[AUTH] ❌ User not found for ID: {matched_key.user_id}")
-            raise HTTPException(
-                status_code=401,
-                detail="User not found",
-            )
-        logger.error(f"[AUTH] ✅✅✅ SUCCESS! Returning user: {user.email}")
-        return user
     
     else:
         # Assume it's a Clerk JWT
-        import sys
-        sys.stderr.write("[AUTH] ⚠️ Token does NOT start with llmo_sk_ - falling back to Clerk Auth\n")
-        sys.stderr.write(f"[AUTH] Token was: {token[:50]}...\n")
-        sys.stderr.flush()
         # Import locally to avoid circular import
         from clerk_auth import get_current_clerk_user
-        sys.stderr.write("[AUTH] Calling get_current_clerk_user...\n")
-        sys.stderr.flush()
         return await get_current_clerk_user(request, session)
 
 
@@ -199,3 +379,16 @@ async def get_current_user_id(
     # Get user - let HTTPException propagate (don't fail-open!)
     user = await get_current_user(request, authorization, session)
     return user.id
+
+
+def require_admin_token(x_llmobserve_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    FastAPI dependency for operator-only endpoints.
+
+    Requires the X-LLMObserve-Admin-Token header to match ADMIN_API_TOKEN;
+    fails closed (403) when no token is configured.
+    """
+    if not ADMIN_API_TOKEN or not x_llmobserve_admin_token or not secrets.compare_digest(
+        x_llmobserve_admin_token, ADMIN_API_TOKEN
+    ):
+        raise HTTPException(status_code=403, detail="Admin token required")
@@ -16,6 +16,73 @@ from email_service import send_alert_email
 logger = logging.getLogger(__name__)
 
 
+# Minimum time between alerts for one cap (avoids spam)
+ALERT_COOLDOWN = timedelta(minutes=60)
+
+ALERT_TYPES = ("threshold_reached", "cap_exceeded")
+
+
+def cap_alert_type(cap: SpendingCap, current_spend: float) -> Optional[str]:
+    """'cap_exceeded', 'threshold_reached' or None for a cap's current spend."""
+    if current_spend >= cap.limit_amount:
+        return "cap_exceeded"
+    percentage = (current_spend / cap.limit_amount * 100) if cap.limit_amount > 0 else 0
+    if percentage >= (cap.alert_threshold * 100):
+        return "threshold_reached"
+    return None
+
+
+def in_alert_cooldown(cap: SpendingCap, now: Optional[datetime] = None) -> bool:
+    """True if the cap alerted less than ALERT_COOLDOWN ago."""
+    if not cap.last_alerted_at:
+        return False
+    return (now or datetime.utcnow()) - cap.last_alerted_at < ALERT_COOLDOWN
+
+
+def alert_email_for(cap: SpendingCap, user: Optional[User]) -> str:
+    """The cap's alert email, falling back to its owner's address ('' if neither)."""
+    return (cap.alert_email or "").strip() or (user.email if user else "")
+
+
+def new_cap_alert(
+    cap: SpendingCap,
+    current_spend: float,
+    period_start: datetime,
+    period_end: datetime,
+    alert_type: str,
+) -> Alert:
+    """Alert record for a cap crossing a threshold (not yet added to a session)."""
+    percentage = (current_spend / cap.limit_amount * 100) if cap.limit_amount > 0 else 0
+    return Alert(
+        user_id=cap.user_id,
+        cap_id=cap.id,
+        alert_type=alert_type,
+        current_spend=current_spend,
+        cap_limit=cap.limit_amount,
+        percentage=percentage,
+        target_type=cap.cap_type,
+        target_name=cap.target_name or "global",
+        period_start=period_start,
+        period_end=period_end,
+    )
+
+
+async def send_cap_alert_email(cap: SpendingCap, alert: Alert, to_email: str) -> bool:
+    """Email an alert. Returns True if it was sent."""
+    if not to_email:
+        return False
+    return await send_alert_email(
+        to_email=to_email,
+        alert_type=alert.alert_type,
+        target_type=cap.cap_type,
+        target_name=cap.target_name or "all services",
+        current_spend=alert.current_spend,
+        cap_limit=cap.limit_amount,
+        percentage=alert.percentage,
+        period=cap.period,
+    )
+
+
 async def maybe_send_cap_alert(
     session: Session,
     cap: SpendingCap,
@@ -31,25 +98,22 @@ async def maybe_send_cap_alert(
     Returns True if an email was sent, False otherwise.
     """
     # Guard invalid alert types
-    if alert_type not in ("threshold_reached", "cap_exceeded"):
+    if alert_type not in ALERT_TYPES:
         logger.warning(f"[CapAlerts] Invalid alert_type={alert_type} for cap {cap.id}")
         return False
 
     # Resolve user and email target
     if user is None:
         user = session.get(User, cap.user_id)
-    to_email = (cap.alert_email or "").strip() or (user.email if user else "")
+    to_email = alert_email_for(cap, user)
 
     if not to_email:
         logger.warning(f"[CapAlerts] No alert email available for cap {cap.id}")
 
     # Cooldown to avoid spam
-    cooldown_minutes = 60
-    if cap.last_alerted_at:
-        time_since_alert = datetime.utcnow() - cap.last_alerted_at
-        if time_since_alert < timedelta(minutes=cooldown_minutes):
-            logger.debug(f"[CapAlerts] Skipping alert for cap {cap.id} (cooldown)")
-            return False
+    if in_alert_cooldown(cap):
+        logger.debug(f"[CapAlerts] Skipping alert for cap {cap.id} (cooldown)")
+        return False
 
     # Avoid duplicate alerts in the same period
     existing_alert = session.exec(
@@ -65,37 +129,13 @@ async def maybe_send_cap_alert(
         logger.debug(f"[CapAlerts] Alert already exists for cap {cap.id} in current period")
         return False
 
-    percentage = (current_spend / cap.limit_amount * 100) if cap.limit_amount > 0 else 0
-
     # Create alert record
-    alert = Alert(
-        user_id=cap.user_id,
-        cap_id=cap.id,
-        alert_type=alert_type,
-        current_spend=current_spend,
-        cap_limit=cap.limit_amount,
-        percentage=percentage,
-        target_type=cap.cap_type,
-        target_name=cap.target_name or "global",
-        period_start=period_start,
-        period_end=period_end,
-    )
+    alert = new_cap_alert(cap, current_spend, period_start, period_end, alert_type)
 
     session.add(alert)
     session.flush()
 
-    email_sent = False
-    if to_email:
-        email_sent = await send_alert_email(
-            to_email=to_email,
-            alert_type=alert_type,
-            target_type=cap.cap_type,
-            target_name=cap.target_name or "all services",
-            current_spend=current_spend,
-            cap_limit=cap.limit_amount,
-            percentage=percentage,
-            period=cap.period,
-        )
+    email_sent = await send_cap_alert_email(cap, alert, to_email)
 
     alert.email_sent = email_sent
     if email_sent:
@@ -107,7 +147,7 @@ async def maybe_send_cap_alert(
 
     logger.info(
         f"[CapAlerts] Alert triggered for cap {cap.id}: {alert_type} "
-        f"({current_spend:.2f}/{cap.limit_amount:.2f} = {percentage:.1f}%) "
+        f"({current_spend:.2f}/{cap.limit_amount:.2f} = {alert.percentage:.1f}%) "
         f"email_sent={email_sent}"
     )
 
@@ -2,57 +2,231 @@
 Background service to monitor spending caps and trigger alerts.
 
 Runs periodically to check all enabled caps and send email alerts when thresholds are reached.
+
+Each cycle evaluates every cap as one batch rather than cap by cap:
+
+    load      enabled caps                              1 query
+    spend     counter rows for all caps                 1 query per CAP_MONITOR_SPEND_CHUNK caps
+    alerts    owners + existing alerts for the caps     2 queries, then one commit
+    email     alert emails, CAP_MONITOR_EMAIL_CONCURRENCY at a time
+    record    email_sent for the alerts that went out   1 update
+
+Alert rows (and cap.last_alerted_at) are committed before any email is sent,
+so a crash mid-send cannot re-alert the same cap and period next cycle.
+Cycle timings are kept in cap_monitor_stats() (GET /caps/monitor-stats, admin token required).
 """
 import asyncio
 import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
+from sqlalchemy import update
 from sqlmodel import Session, select
 
-from models import SpendingCap, User
+from models import Alert, SpendingCap, User
 from db import SessionLocal
-from cap_alerts import maybe_send_cap_alert
+from cap_alerts import (
+    alert_email_for,
+    cap_alert_type,
+    in_alert_cooldown,
+    new_cap_alert,
+    send_cap_alert_email,
+)
+from spend_counters import period_bounds, prune_spend_counters, read_spend_for_caps
 
 logger = logging.getLogger(__name__)
 
-# Import cap calculation functions
-from routers.caps import get_period_dates, calculate_current_spend
+# Alert emails in flight at once (SMTP/SES/SendGrid calls)
+CAP_MONITOR_EMAIL_CONCURRENCY = int(os.getenv("CAP_MONITOR_EMAIL_CONCURRENCY", "10"))
+# Caps per spend / user / alert lookup query
+CAP_MONITOR_SPEND_CHUNK = int(os.getenv("CAP_MONITOR_SPEND_CHUNK", "500"))
+
+# (cap, alert, email address) for alerts created this cycle
+PendingAlert = Tuple[SpendingCap, Alert, str]
+
+_stats: Dict[str, Any] = {
+    "cycles": 0,
+    "errors": 0,
+    "last_cycle_started_at": None,
+    "last_cycle_duration_ms": None,
+    "last_cycle_phases_ms": {},
+    "caps_checked": 0,
+    "alerts_created": 0,
+    "emails_sent": 0,
+    "email_failures": 0,
+    "check_interval_seconds": None,
+}
+
+
+def cap_monitor_stats() -> Dict[str, Any]:
+    """Counters and timings for the most recent cap check cycle."""
+    stats = dict(_stats)
+    stats["last_cycle_phases_ms"] = dict(_stats["last_cycle_phases_ms"])
+    return stats
+
+
+def _chunks(items: List[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def evaluate_caps(
+    session: Session,
+    now: Optional[datetime] = None,
+    phases: Optional[Dict[str, float]] = None,
+) -> Tuple[int, List[PendingAlert]]:
+    """
+    Create alert records for every enabled cap over its threshold.
+
+    Applies the same rules as cap_alerts.maybe_send_cap_alert (threshold,
+    cooldown, one alert per cap, period and type) to all caps at once and
+    commits the new alerts. Returns (caps checked, alerts to email).
+    """
+    now = now or datetime.utcnow()
+    phases = phases if phases is not None else {}
+    started = time.perf_counter()
+
+    caps = session.exec(
+        select(SpendingCap).where(SpendingCap.enabled == True)
+    ).all()
+    phases["load"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    spend_by_cap = read_spend_for_caps(session, caps, at=now, chunk_size=CAP_MONITOR_SPEND_CHUNK)
+    phases["spend"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    candidates = []
+    for cap in caps:
+        current_spend = spend_by_cap.get(cap.id, 0.0)
+        alert_type = cap_alert_type(cap, current_spend)
+        if alert_type is None:
+            continue
+        if in_alert_cooldown(cap, now):
+            logger.debug(f"[CapMonitor] Skipping alert for cap {cap.id} (cooldown)")
+            continue
+        period_start, period_end = period_bounds(cap.period, now)
+        candidates.append((cap, current_spend, alert_type, period_start, period_end))
+
+    pending: List[PendingAlert] = []
+    if candidates:
+        user_ids = list({cap.user_id for cap, *_ in candidates})
+        users = {}
+        for chunk in _chunks(user_ids, CAP_MONITOR_SPEND_CHUNK):
+            users.update((user.id, user) for user in session.exec(select(User).where(User.id.in_(chunk))).all())
 
+        cap_ids = [cap.id for cap, *_ in candidates]
+        earliest = min(period_start for *_, period_start, _ in candidates)
+        existing = set()
+        for chunk in _chunks(cap_ids, CAP_MONITOR_SPEND_CHUNK):
+            existing.update(
+                tuple(row) for row in session.exec(
+                    select(Alert.cap_id, Alert.period_start, Alert.alert_type).where(
+                        Alert.cap_id.in_(chunk),
+                        Alert.period_start >= earliest,
+                    )
+                ).all()
+            )
 
-async def check_all_caps():
-    """Check all enabled spending caps and trigger alerts if needed."""
+        for cap, current_spend, alert_type, period_start, period_end in candidates:
+            if (cap.id, period_start, alert_type) in existing:
+                logger.debug(f"[CapMonitor] Alert already exists for cap {cap.id} in current period")
+                continue
+            to_email = alert_email_for(cap, users.get(cap.user_id))
+            if not to_email:
+                logger.warning(f"[CapMonitor] No alert email available for cap {cap.id}")
+            alert = new_cap_alert(cap, current_spend, period_start, period_end, alert_type)
+            session.add(alert)
+            cap.last_alerted_at = now
+            session.add(cap)
+            pending.append((cap, alert, to_email))
+
+        session.commit()
+    phases["alerts"] = (time.perf_counter() - started) * 1000
+
+    return len(caps), pending
+
+
+async def send_alert_emails(pending: List[PendingAlert], concurrency: int = CAP_MONITOR_EMAIL_CONCURRENCY) -> List[bool]:
+    """Send alert emails concurrently, at most `concurrency` at a time. Returns sent flags in order."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def send(cap: SpendingCap, alert: Alert, to_email: str) -> bool:
+        async with semaphore:
+            try:
+                email_sent = await send_cap_alert_email(cap, alert, to_email)
+            except Exception as e:
+                logger.error(f"[CapMonitor] Error sending alert email for cap {cap.id}: {e}")
+                email_sent = False
+        logger.info(
+            f"[CapMonitor] Alert triggered for cap {cap.id}: {alert.alert_type} "
+            f"({alert.current_spend:.2f}/{cap.limit_amount:.2f} = {alert.percentage:.1f}%) "
+            f"email_sent={email_sent}"
+        )
+        return email_sent
+
+    return list(await asyncio.gather(*(send(*item) for item in pending)))
+
+
+def record_sent_emails(session: Session, alerts: List[Alert], sent_at: Optional[datetime] = None) -> None:
+    """Mark alerts whose email went out (one UPDATE per chunk). Does not commit."""
+    sent_at = sent_at or datetime.utcnow()
+    alert_ids = [alert.id for alert in alerts]
+    for chunk in _chunks(alert_ids, CAP_MONITOR_SPEND_CHUNK):
+        session.execute(
+            update(Alert).where(Alert.id.in_(chunk)).values(email_sent=True, email_sent_at=sent_at)
+        )
+
+
+async def check_all_caps() -> Dict[str, Any]:
+    """Check all enabled spending caps and trigger alerts if needed. Returns the cycle's stats."""
     logger.info("[CapMonitor] Starting cap check cycle...")
-    
+    cycle_start = time.perf_counter()
+    _stats["last_cycle_started_at"] = datetime.utcnow().isoformat()
+    phases: Dict[str, float] = {}
+    caps_checked, emails_sent, email_failures, pending = 0, 0, 0, []
+
     session = None
     try:
         session = SessionLocal()
-        
-        # Get all enabled caps
-        caps = session.exec(
-            select(SpendingCap).where(SpendingCap.enabled == True)
-        ).all()
-        
-        logger.info(f"[CapMonitor] Checking {len(caps)} enabled caps")
-        
-        for cap in caps:
-            try:
-                await check_single_cap(session, cap)
-                session.commit()  # Commit after each successful cap check
-            except Exception as e:
-                logger.error(f"[CapMonitor] Error checking cap {cap.id}: {e}")
-                # Rollback and get a fresh session to continue
+        # Alerts are read again after the commit, from other tasks; keep them loaded
+        session.expire_on_commit = False
+
+        # Sync DB work runs off the event loop so the API stays responsive
+        caps_checked, pending = await asyncio.to_thread(evaluate_caps, session, None, phases)
+        logger.info(f"[CapMonitor] Checked {caps_checked} enabled caps, {len(pending)} new alerts")
+
+        if pending:
+            started = time.perf_counter()
+            results = await send_alert_emails(pending)
+            phases["email"] = (time.perf_counter() - started) * 1000
+
+            sent = [alert for (_, alert, _), email_sent in zip(pending, results) if email_sent]
+            emails_sent = len(sent)
+            email_failures = sum(1 for (_, _, to_email), email_sent in zip(pending, results) if to_email and not email_sent)
+            if sent:
                 try:
+                    record_sent_emails(session, sent)
+                    session.commit()
+                except Exception as e:
+                    logger.error(f"[CapMonitor] Error recording sent alert emails: {e}")
                     session.rollback()
-                except Exception:
-                    pass
-                # Close and recreate session to clear invalid state
-                try:
-                    session.close()
-                except Exception:
-                    pass
-                session = SessionLocal()
-        
+
+        # Drop counter buckets no cap period can reach any more
+        try:
+            pruned = prune_spend_counters(session)
+            session.commit()
+            if pruned:
+                logger.info(f"[CapMonitor] Pruned {pruned} stale spend counters")
+        except Exception as e:
+            logger.error(f"[CapMonitor] Error pruning spend counters: {e}")
+            session.rollback()
+
         logger.info("[CapMonitor] Cap check cycle complete")
     except Exception as e:
+        _stats["errors"] += 1
         logger.error(f"[CapMonitor] Error in cap check cycle: {e}")
         if session:
             try:
@@ -66,70 +240,43 @@ async def check_all_caps():
             except Exception:
                 pass
 
-
-async def check_single_cap(session: Session, cap: SpendingCap):
-    """Check a single spending cap and trigger alert if needed."""
-    # Calculate period dates
-    period_start, period_end = get_period_dates(cap.period)
-    
-    # Look up user to get clerk_user_id for proper data isolation
-    user = session.get(User, cap.user_id)
-    clerk_user_id = user.clerk_user_id if user else None
-    
-    # Calculate current spend with clerk_user_id for proper filtering
-    current_spend = calculate_current_spend(
-        session,
-        cap.user_id,
-        cap.cap_type,
-        cap.target_name,
-        period_start,
-        period_end,
-        clerk_user_id=clerk_user_id,
-        sub_scope=getattr(cap, 'sub_scope', None),
-        sub_target=getattr(cap, 'sub_target', None),
-    )
-    
-    # Determine if alert should be triggered
-    should_alert = False
-    alert_type = None
-    
-    if current_spend >= cap.limit_amount:
-        alert_type = "cap_exceeded"
-        should_alert = True
-    elif percentage >= (cap.alert_threshold * 100):
-        alert_type = "threshold_reached"
-        should_alert = True
-    
-    if not should_alert:
-        # No alert needed
-        return
-    
-    await maybe_send_cap_alert(
-        session=session,
-        cap=cap,
-        current_spend=current_spend,
-        period_start=period_start,
-        period_end=period_end,
-        alert_type=alert_type,
-        user=user,
+    duration_ms = (time.perf_counter() - cycle_start) * 1000
+    _stats["cycles"] += 1
+    _stats["last_cycle_duration_ms"] = round(duration_ms, 1)
+    _stats["last_cycle_phases_ms"] = {name: round(ms, 1) for name, ms in phases.items()}
+    _stats["caps_checked"] = caps_checked
+    _stats["alerts_created"] = len(pending)
+    _stats["emails_sent"] = emails_sent
+    _stats["email_failures"] = email_failures
+    logger.info(
+        f"[CapMonitor] Cycle took {duration_ms:.0f}ms "
+        f"({', '.join(f'{name} {ms:.0f}ms' for name, ms in phases.items())}): "
+        f"{caps_checked} caps, {len(pending)} alerts, {emails_sent} emails sent"
     )
+    return cap_monitor_stats()
 
 
 async def run_cap_monitor(check_interval_seconds: int = 300):
     """
     Run the cap monitor service continuously.
-    
+
     Args:
         check_interval_seconds: How often to check caps (default: 5 minutes)
     """
     logger.info(f"[CapMonitor] Starting service (check interval: {check_interval_seconds}s)")
-    
+    _stats["check_interval_seconds"] = check_interval_seconds
+
     while True:
         try:
-            await check_all_caps()
+            stats = await check_all_caps()
+            if (stats["last_cycle_duration_ms"] or 0) > check_interval_seconds * 1000:
+                logger.warning(
+                    f"[CapMonitor] Cycle took {stats['last_cycle_duration_ms'] / 1000:.1f}s, "
+                    f"longer than the {check_interval_seconds}s check interval"
+                )
         except Exception as e:
             logger.error(f"[CapMonitor] Unexpected error: {e}", exc_info=True)
-        
+
         # Wait before next check
         await asyncio.sleep(check_interval_seconds)
 
@@ -138,4 +285,3 @@ if __name__ == "__main__":
     # For standalone testing
     logging.basicConfig(level=logging.INFO)
     asyncio.run(check_all_caps())
-
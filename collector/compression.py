@@ -0,0 +1,84 @@
+"""
+Request body decompression for ingest routes.
+
+The SDK gzip- or zstd-compresses event batches above a size threshold and
+sets Content-Encoding. Routers opt in with route_class=DecompressingRoute;
+the body is inflated before FastAPI parses it, so handlers are unchanged.
+
+Inflated bodies are capped (MAX_DECOMPRESSED_BODY_BYTES, default 50 MB) so
+a small compressed payload cannot expand without bound.
+"""
+import os
+import zlib
+from typing import Callable
+
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+
+try:
+    import zstandard
+except ImportError:  # Optional: only needed if clients send zstd
+    zstandard = None
+
+MAX_DECOMPRESSED_BODY_BYTES = int(os.getenv("MAX_DECOMPRESSED_BODY_BYTES", str(50 * 1024 * 1024)))
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Decompressed body exceeds {MAX_DECOMPRESSED_BODY_BYTES} bytes",
+    )
+
+
+def _gunzip(body: bytes) -> bytes:
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = inflater.decompress(body, MAX_DECOMPRESSED_BODY_BYTES + 1)
+    except zlib.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid gzip body: {e}")
+    if len(data) > MAX_DECOMPRESSED_BODY_BYTES:
+        raise _too_large()
+    return data
+
+
+def _unzstd(body: bytes) -> bytes:
+    if zstandard is None:
+        raise HTTPException(status_code=415, detail="zstd request bodies are not supported by this server")
+    reader = zstandard.ZstdDecompressor().stream_reader(body)
+    try:
+        data = reader.read(MAX_DECOMPRESSED_BODY_BYTES + 1)
+    except zstandard.ZstdError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid zstd body: {e}")
+    if len(data) > MAX_DECOMPRESSED_BODY_BYTES:
+        raise _too_large()
+    return data
+
+
+_DECODERS = {"gzip": _gunzip, "zstd": _unzstd}
+
+
+class DecompressingRequest(Request):
+    """Request whose body() honours Content-Encoding: gzip | zstd."""
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            body = await super().body()
+            encoding = self.headers.get("content-encoding", "identity").strip().lower()
+            if encoding not in ("", "identity"):
+                decoder = _DECODERS.get(encoding)
+                if decoder is None:
+                    raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {encoding}")
+                body = decoder(body)
+            self._body = body
+        return self._body
+
+
+class DecompressingRoute(APIRoute):
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def custom_route_handler(request: Request) -> Response:
+            request = DecompressingRequest(request.scope, request.receive)
+            return await original_route_handler(request)
+
+        return custom_route_handler
@@ -2,6 +2,7 @@
 Database setup and session management.
 """
 import os
+from sqlalchemy import text
 from sqlmodel import create_engine, SQLModel, Session
 from typing import Generator
 from dotenv import load_dotenv
@@ -86,6 +87,37 @@ def run_migrations():
                     conn.execute(text("ALTER TABLE spending_caps ADD COLUMN sub_target VARCHAR NULL"))
                     conn.commit()
                     print("[Migration] Added sub_target column to spending_caps")
+                
+                # Check and add lookup_hash column to api_keys (O(1) API key auth)
+                result = conn.execute(text("""
+                    SELECT column_name FROM information_schema.columns 
+                    WHERE table_name = 'api_keys' AND column_name = 'lookup_hash'
+                """))
+                if not result.fetchone():
+                    conn.execute(text("ALTER TABLE api_keys ADD COLUMN lookup_hash VARCHAR NULL"))
+                    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_api_keys_lookup_hash ON api_keys(lookup_hash)"))
+                    conn.commit()
+                    print("[Migration] Added lookup_hash column to api_keys")
+                
+                # Check and add pricing_version column to trace_events (reproducible costs)
+                result = conn.execute(text("""
+                    SELECT column_name FROM information_schema.columns 
+                    WHERE table_name = 'trace_events' AND column_name = 'pricing_version'
+                """))
+                if not result.fetchone():
+                    conn.execute(text("ALTER TABLE trace_events ADD COLUMN pricing_version INTEGER NULL"))
+                    conn.commit()
+                    print("[Migration] Added pricing_version column to trace_events")
+                
+                # Unique span_id index backs INSERT ... ON CONFLICT DO NOTHING in bulk ingest
+                try:
+                    conn.execute(text(
+                        "CREATE UNIQUE INDEX IF NOT EXISTS ix_trace_events_span_id ON trace_events(span_id)"
+                    ))
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    print(f"[Migration] Could not create unique span_id index (dedupe existing rows first): {e}")
                     
             print("[Migration] PostgreSQL migrations complete")
         except Exception as e:
@@ -143,11 +175,63 @@ def run_migrations():
             conn.commit()
             print("[Migration] Added stream_cancelled column to trace_events table")
         
+        # Check if pricing_version column exists
+        if "pricing_version" not in columns:
+            cursor.execute("ALTER TABLE trace_events ADD COLUMN pricing_version INTEGER NULL")
+            conn.commit()
+            print("[Migration] Added pricing_version column to trace_events table")
+        
+        # Check if lookup_hash column exists on api_keys
+        cursor.execute("PRAGMA table_info(api_keys)")
+        api_key_columns = [col[1] for col in cursor.fetchall()]
+        if api_key_columns and "lookup_hash" not in api_key_columns:
+            cursor.execute("ALTER TABLE api_keys ADD COLUMN lookup_hash TEXT NULL")
+            cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_api_keys_lookup_hash ON api_keys(lookup_hash)")
+            conn.commit()
+            print("[Migration] Added lookup_hash column to api_keys table")
+        
+        # Unique span_id index backs INSERT ... ON CONFLICT DO NOTHING in bulk ingest
+        try:
+            cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_trace_events_span_id ON trace_events(span_id)")
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"[Migration] Could not create unique span_id index (dedupe existing rows first): {e}")
+        
         conn.close()
     except Exception as e:
         print(f"[Migration] SQLite migrations failed (table may not exist yet): {e}")
 
 
+# Advisory lock guarding the tables derived from trace_events
+# (spend_counters, usage_rollups, run_summaries)
+DERIVED_TABLES_LOCK_KEY = 0x4C4C4D4F
+
+
+def lock_derived_tables(session: Session, exclusive: bool = False) -> None:
+    """
+    Serialize rebuilds of the derived tables with ingest, until the session's
+    transaction ends.
+
+    Ingest takes the lock shared, so batches still run concurrently with
+    each other. A rebuild takes it exclusive before reading trace_events. It
+    waits for in-flight batches to commit, and new batches wait for the
+    rebuild. No increment can land between its read and its
+    delete-and-replace and be wiped.
+
+    PostgreSQL: transaction-level advisory lock. SQLite: a rebuild opens its
+    transaction with BEGIN IMMEDIATE, taking the single writer lock up front
+    (ingest needs nothing extra, its first insert takes the same lock).
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        function = "pg_advisory_xact_lock" if exclusive else "pg_advisory_xact_lock_shared"
+        session.execute(text(f"SELECT {function}(:key)"), {"key": DERIVED_TABLES_LOCK_KEY})
+    elif dialect == "sqlite" and exclusive:
+        driver_connection = session.connection().connection.driver_connection
+        if not driver_connection.in_transaction:
+            driver_connection.execute("BEGIN IMMEDIATE")
+
+
 def get_session() -> Generator[Session, None, None]:
     """Dependency for FastAPI routes to get a database session."""
     with Session(engine) as session:
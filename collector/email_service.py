@@ -3,6 +3,7 @@ Email notification service for alerts.
 
 Supports SendGrid, AWS SES, and SMTP.
 """
+import asyncio
 import os
 import logging
 from typing import Optional
@@ -244,21 +245,9 @@ async def _send_via_sendgrid(to_email: str, subject: str, body: str) -> bool:
 
 
 async def _send_via_ses(to_email: str, subject: str, body: str) -> bool:
-    """Send email via AWS SES."""
+    """Send email via AWS SES (boto3 blocks, so it runs in a worker thread)."""
     try:
-        import boto3
-        
-        client = boto3.client("ses", region_name=AWS_SES_REGION)
-        
-        response = client.send_email(
-            Source=FROM_EMAIL,
-            Destination={"ToAddresses": [to_email]},
-            Message={
-                "Subject": {"Data": subject},
-                "Body": {"Html": {"Data": body}},
-            },
-        )
-        
+        response = await asyncio.to_thread(_ses_send, to_email, subject, body)
         logger.info(f"Sent alert email via SES to {to_email}, message_id: {response['MessageId']}")
         return True
     except Exception as e:
@@ -266,36 +255,53 @@ async def _send_via_ses(to_email: str, subject: str, body: str) -> bool:
         return False
 
 
+def _ses_send(to_email: str, subject: str, body: str) -> dict:
+    import boto3
+    
+    client = boto3.client("ses", region_name=AWS_SES_REGION)
+    
+    return client.send_email(
+        Source=FROM_EMAIL,
+        Destination={"ToAddresses": [to_email]},
+        Message={
+            "Subject": {"Data": subject},
+            "Body": {"Html": {"Data": body}},
+        },
+    )
+
+
 async def _send_via_smtp(to_email: str, subject: str, body: str) -> bool:
-    """Send email via SMTP."""
+    """Send email via SMTP (smtplib blocks, so it runs in a worker thread)."""
     if not SMTP_USERNAME or not SMTP_PASSWORD:
         logger.warning("SMTP credentials not set, skipping email send (dev mode)")
         logger.info(f"Would send email to {to_email}: {subject}")
         return True  # Return True in dev mode for testing
     
     try:
-        import smtplib
-        from email.mime.multipart import MIMEMultipart
-        from email.mime.text import MIMEText
-        
-        msg = MIMEMultipart("alternative")
-        msg["Subject"] = subject
-        msg["From"] = FROM_EMAIL
-        msg["To"] = to_email
-        
-        # Add HTML body
-        html_part = MIMEText(body, "html")
-        msg.attach(html_part)
-        
-        # Connect and send
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.send_message(msg)
-        
+        await asyncio.to_thread(_smtp_send, to_email, subject, body)
         logger.info(f"Sent alert email via SMTP to {to_email}")
         return True
     except Exception as e:
         logger.error(f"SMTP error: {e}")
         return False
 
+
+def _smtp_send(to_email: str, subject: str, body: str) -> None:
+    import smtplib
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"] = FROM_EMAIL
+    msg["To"] = to_email
+    
+    # Add HTML body
+    html_part = MIMEText(body, "html")
+    msg.attach(html_part)
+    
+    # Connect and send
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
+        server.starttls()
+        server.login(SMTP_USERNAME, SMTP_PASSWORD)
+        server.send_message(msg)
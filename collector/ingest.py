@@ -0,0 +1,223 @@
+"""
+Bulk ingest engine for trace events.
+
+Turns a batch of TraceEventCreate payloads into rows and writes them with a
+single set-based statement instead of one ORM object (and one idempotency
+query) per event.
+
+- Tenant is resolved once per request, not once per event
+- Duplicates are found with one `span_id IN (...)` query per batch
+- Rows are written with a Core bulk INSERT (executemany / insertmanyvalues)
+- On PostgreSQL and SQLite the INSERT uses `ON CONFLICT DO NOTHING`, so two
+  workers racing on the same span_id never fail the whole batch
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+from uuid import UUID, uuid4
+
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from models import TraceEvent, TraceEventCreate, User
+from pricing import current_pricing
+
+logger = logging.getLogger(__name__)
+
+# SQLite caps bound parameters per statement (999 on older builds), so the
+# span_id lookup is chunked. Postgres has no practical limit but the same
+# chunk size keeps statements small enough for the planner.
+SPAN_LOOKUP_CHUNK_SIZE = 900
+
+
+@dataclass
+class IngestResult:
+    """Counts returned to the SDK (same contract as the per-event path)."""
+    created: int = 0
+    skipped: int = 0
+    filtered: int = 0
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def resolve_tenant_id(session: Session, user_id: Optional[UUID]) -> Optional[str]:
+    """
+    Resolve the tenant_id for a request.
+
+    Dashboard filters by Clerk user ID, so tenant_id must match clerk_user_id.
+    Falls back to the user_id string when the user has no Clerk ID, and
+    returns None for unauthenticated ingestion (caller decides the default).
+    """
+    if not user_id:
+        return None
+    user = session.get(User, user_id)
+    if user and user.clerk_user_id:
+        return user.clerk_user_id
+    return str(user_id)
+
+
+def _status_code(event_data: TraceEventCreate) -> Optional[int]:
+    if event_data.event_metadata and isinstance(event_data.event_metadata, dict):
+        return event_data.event_metadata.get("http_status")
+    return None
+
+
+def _apply_server_costs(events: List[TraceEventCreate], discount_multiplier: float) -> None:
+    """
+    Recompute cost server-side when token data is present (authoritative).
+    The whole batch is priced with one pricing snapshot, and each event
+    records that snapshot's version.
+    """
+    priced = [e for e in events if e.input_tokens > 0 or e.output_tokens > 0]
+    if not priced:
+        return
+
+    snapshot = current_pricing()
+    base_costs = snapshot.engine.compute_costs(
+        {
+            "provider": e.provider,
+            "model": e.model,
+            "input_tokens": e.input_tokens,
+            "output_tokens": e.output_tokens,
+        }
+        for e in priced
+    )
+    for event_data, base_cost in zip(priced, base_costs):
+        event_data.cost_usd = base_cost * discount_multiplier
+        event_data.pricing_version = snapshot.version
+
+        if base_cost <= 0 and event_data.cost_usd == 0.0:
+            logger.warning(
+                f"[ingest] Server-side cost calculation returned $0 for "
+                f"{event_data.provider}/{event_data.model} "
+                f"({event_data.input_tokens} input + {event_data.output_tokens} output tokens)"
+            )
+
+
+def build_rows(
+    events: Iterable[TraceEventCreate],
+    user_id: Optional[UUID],
+    tenant_id: Optional[str],
+    discount_multiplier: float = 1.0,
+) -> IngestResult:
+    """
+    Filter, price and convert a batch into insertable row dicts.
+
+    Rate-limited (429) and server-error (5xx) events are dropped and counted
+    as filtered. Duplicate span_ids inside the batch are counted as skipped,
+    matching the old behaviour where autoflush made earlier events visible
+    to later idempotency checks. Events without a span_id get a fresh one,
+    since an empty key would collide with every other empty one on the
+    unique index.
+    """
+    result = IngestResult()
+    seen_span_ids: Set[str] = set()
+    accepted: List[TraceEventCreate] = []
+    now = datetime.utcnow()
+
+    for event_data in events:
+        status_code = _status_code(event_data)
+        if status_code == 429:
+            result.filtered += 1
+            continue
+        if status_code and 500 <= status_code < 600:
+            result.filtered += 1
+            continue
+
+        if not event_data.span_id:
+            event_data.span_id = str(uuid4())
+        elif event_data.span_id in seen_span_ids:
+            result.skipped += 1
+            continue
+        seen_span_ids.add(event_data.span_id)
+        accepted.append(event_data)
+
+    _apply_server_costs(accepted, discount_multiplier)
+
+    for event_data in accepted:
+        row = event_data.model_dump()
+        if user_id:
+            row["tenant_id"] = tenant_id or str(user_id)
+            row["user_id"] = user_id
+        else:
+            row["tenant_id"] = row.get("tenant_id") or "default_tenant"
+            row["user_id"] = None
+        row["created_at"] = now
+        result.rows.append(row)
+
+    return result
+
+
+def find_existing_span_ids(session: Session, span_ids: List[str]) -> Set[str]:
+    """Return the subset of span_ids already stored (one query per chunk)."""
+    existing: Set[str] = set()
+    for start in range(0, len(span_ids), SPAN_LOOKUP_CHUNK_SIZE):
+        chunk = span_ids[start:start + SPAN_LOOKUP_CHUNK_SIZE]
+        statement = select(TraceEvent.span_id).where(TraceEvent.span_id.in_(chunk))
+        existing.update(session.exec(statement).all())
+    return existing
+
+
+def _insert_statement(session: Session):
+    """Dialect-specific INSERT ... ON CONFLICT DO NOTHING (plain INSERT elsewhere)."""
+    table = TraceEvent.__table__
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(table).on_conflict_do_nothing().returning(table.c.id)
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(table).on_conflict_do_nothing().returning(table.c.id)
+    return insert(table)
+
+
+def write_rows(session: Session, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Bulk insert rows and return the ones that were actually written.
+
+    Does not commit - the caller owns the transaction so that follow-up
+    writes (counters, rollups) land atomically with the events.
+    """
+    if not rows:
+        return []
+
+    statement = _insert_statement(session)
+    result = session.execute(statement, rows)
+    if not result.returns_rows:
+        return rows
+    inserted_ids = set(result.scalars().all())
+    if len(inserted_ids) == len(rows):
+        return rows
+    return [row for row in rows if row["id"] in inserted_ids]
+
+
+def ingest_batch(
+    session: Session,
+    events: List[TraceEventCreate],
+    user_id: Optional[UUID],
+    discount_multiplier: float = 1.0,
+) -> IngestResult:
+    """
+    Ingest a batch of events with set-based idempotency.
+
+    Returns an IngestResult with the same created/skipped/filtered counts
+    the per-event path produced. `result.rows` holds the rows that were
+    inserted, for callers that maintain derived tables.
+    """
+    tenant_id = resolve_tenant_id(session, user_id)
+    result = build_rows(events, user_id, tenant_id, discount_multiplier)
+
+    span_ids = [row["span_id"] for row in result.rows]
+    if span_ids:
+        existing = find_existing_span_ids(session, span_ids)
+        if existing:
+            before = len(result.rows)
+            result.rows = [row for row in result.rows if row["span_id"] not in existing]
+            result.skipped += before - len(result.rows)
+
+    written = write_rows(session, result.rows)
+    # Rows lost to ON CONFLICT were inserted by a concurrent request
+    result.skipped += len(result.rows) - len(written)
+    result.created = len(written)
+    result.rows = written
+    return result
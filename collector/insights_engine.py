@@ -0,0 +1,203 @@
+"""
+Insight detectors behind /insights/daily.
+
+Each detector reads one grouped aggregate and does the rest in memory, so a
+page load costs three queries however many sections, models or endpoints
+the tenant has (the per-section loops this replaces ran 4-6 queries per
+section plus one per provider/endpoint):
+
+    section x period (today / previous 7 days)   section_spike, token_bloat
+    section x model (last 24h)                   model_inefficiency
+    provider x endpoint x run (last 24h)         retry_loop
+
+Periods rather than single days are grouped on purpose: a run that spans
+midnight must count once towards "runs in the previous 7 days", which
+per-day distinct counts cannot be summed into.
+
+Thresholds and messages are unchanged from the per-section implementation.
+"""
+import heapq
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import case
+from sqlmodel import Session, and_, func, select
+
+from models import TraceEvent
+
+SPIKE_RATIO = 2.0           # Today's cost per run vs the 7-day average
+TOKEN_BLOAT_RATIO = 1.5     # Today's average input tokens vs the 7-day average
+MODEL_COST_RATIO = 2.0      # Most vs least expensive model per token in a section
+RETRY_P95_CALLS = 3         # Calls to one endpoint per run (p95)
+
+TODAY, PAST = 1, 0
+
+
+class SectionPeriod:
+    """Aggregates for one section over one period (today or the previous 7 days)."""
+    __slots__ = ("cost", "runs", "input_tokens", "input_events")
+
+    def __init__(self, cost: float = 0.0, runs: int = 0, input_tokens: int = 0, input_events: int = 0):
+        self.cost = cost
+        self.runs = runs
+        self.input_tokens = input_tokens
+        self.input_events = input_events
+
+    @property
+    def cost_per_run(self) -> float:
+        return self.cost / (self.runs or 1)
+
+    @property
+    def avg_input_tokens(self) -> float:
+        return self.input_tokens / self.input_events if self.input_events else 0.0
+
+
+def section_periods(
+    session: Session, user_filter, today_start: datetime
+) -> Dict[str, Dict[int, SectionPeriod]]:
+    """{section: {TODAY | PAST: SectionPeriod}} for the last 7 days plus today (one query)."""
+    period = case((TraceEvent.created_at >= today_start, TODAY), else_=PAST)
+    has_input = TraceEvent.input_tokens > 0
+    statement = (
+        select(
+            TraceEvent.section,
+            period,
+            func.sum(TraceEvent.cost_usd),
+            func.count(func.distinct(TraceEvent.run_id)),
+            func.sum(case((has_input, TraceEvent.input_tokens), else_=0)),
+            func.count(case((has_input, 1))),
+        )
+        .where(and_(user_filter, TraceEvent.created_at >= today_start - timedelta(days=7)))
+        .group_by(TraceEvent.section, period)
+    )
+    sections: Dict[str, Dict[int, SectionPeriod]] = defaultdict(dict)
+    for section, bucket, cost, runs, input_tokens, input_events in session.exec(statement).all():
+        sections[section][int(bucket)] = SectionPeriod(cost or 0.0, runs or 0, input_tokens or 0, input_events or 0)
+    return sections
+
+
+def section_spike_insights(sections: Dict[str, Dict[int, SectionPeriod]]) -> List[Dict[str, Any]]:
+    """Sections whose cost per run today is > 2x their 7-day average."""
+    insights = []
+    for section in sorted(sections):
+        periods = sections[section]
+        if PAST not in periods or TODAY not in periods:
+            continue
+        past_avg = periods[PAST].cost_per_run
+        today_avg = periods[TODAY].cost_per_run
+        if past_avg > 0 and today_avg > SPIKE_RATIO * past_avg:
+            delta = today_avg / past_avg
+            insights.append({
+                "type": "section_spike",
+                "section": section,
+                "delta": round(delta, 2),
+                "message": f"Section '{section}' cost up {delta:.1f}× vs 7-day avg (check for increased calls or token usage)."
+            })
+    return insights
+
+
+def token_bloat_insights(sections: Dict[str, Dict[int, SectionPeriod]]) -> List[Dict[str, Any]]:
+    """Sections whose average input tokens today are > 1.5x their 7-day average."""
+    insights = []
+    for section in sorted(sections):
+        periods = sections[section]
+        if PAST not in periods or TODAY not in periods:
+            continue
+        past_avg = periods[PAST].avg_input_tokens
+        today_avg = periods[TODAY].avg_input_tokens
+        if past_avg > 0 and today_avg > TOKEN_BLOAT_RATIO * past_avg:
+            delta = today_avg / past_avg
+            insights.append({
+                "type": "token_bloat",
+                "section": section,
+                "delta": round(delta, 2),
+                "message": f"Section '{section}' input tokens up {delta:.1f}× vs 7-day avg (check prompt size or context length)."
+            })
+    return insights
+
+
+def model_inefficiency_insights(session: Session, user_filter, since: datetime) -> List[Dict[str, Any]]:
+    """Sections mixing models where one costs > 2x per token what another does (one query)."""
+    total_tokens = TraceEvent.input_tokens + TraceEvent.output_tokens
+    statement = (
+        select(
+            TraceEvent.section,
+            TraceEvent.model,
+            func.sum(TraceEvent.cost_usd),
+            func.sum(total_tokens),
+        )
+        .where(and_(
+            user_filter,
+            TraceEvent.created_at >= since,
+            TraceEvent.model.isnot(None),
+            total_tokens > 0
+        ))
+        .group_by(TraceEvent.section, TraceEvent.model)
+    )
+    by_section: Dict[str, List[Tuple[float, str]]] = defaultdict(list)
+    for section, model, cost, tokens in session.exec(statement).all():
+        by_section[section].append(((cost or 0.0) / tokens if tokens else 0.0, model))
+
+    insights = []
+    for section in sorted(by_section):
+        models = by_section[section]
+        if len(models) < 2:
+            continue
+        cheapest = min(models)
+        most_expensive = max(models)
+        if most_expensive[0] > MODEL_COST_RATIO * cheapest[0]:
+            insights.append({
+                "type": "model_inefficiency",
+                "section": section,
+                "expensive_model": most_expensive[1],
+                "cheaper_alternative": cheapest[1],
+                "message": f"Section '{section}' uses {most_expensive[1]} (expensive). Consider {cheapest[1]} for cost savings."
+            })
+    return insights
+
+
+def retry_loop_insights(session: Session, user_filter, since: datetime) -> List[Dict[str, Any]]:
+    """Provider endpoints called > 3x per run at the p95 (one query)."""
+    statement = (
+        select(
+            TraceEvent.provider,
+            TraceEvent.endpoint,
+            func.count(TraceEvent.id),
+        )
+        .where(and_(user_filter, TraceEvent.created_at >= since))
+        .group_by(TraceEvent.provider, TraceEvent.endpoint, TraceEvent.run_id)
+    )
+    calls_per_run: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+    for provider, endpoint, calls in session.exec(statement).all():
+        calls_per_run[(provider, endpoint)].append(calls)
+
+    insights = []
+    for provider, endpoint in sorted(calls_per_run):
+        counts = calls_per_run[(provider, endpoint)]
+        # p95 = the value 5% of the way down the runs sorted by call count
+        rank = max(0, int(len(counts) * 0.05))
+        p95_value = heapq.nlargest(rank + 1, counts)[-1]
+        if p95_value > RETRY_P95_CALLS:
+            insights.append({
+                "type": "retry_loop",
+                "provider": provider,
+                "endpoint": endpoint,
+                "p95_calls": p95_value,
+                "message": f"{provider}.{endpoint} called {p95_value}× per run (p95). Possible retry loop or inefficient logic."
+            })
+    return insights
+
+
+def daily_insights(session: Session, user_filter, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Every detector's insights, in the order the dashboard shows them."""
+    now = now or datetime.utcnow()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    yesterday = now - timedelta(hours=24)
+
+    sections = section_periods(session, user_filter, today_start)
+    insights = section_spike_insights(sections)
+    insights.extend(model_inefficiency_insights(session, user_filter, yesterday))
+    insights.extend(token_bloat_insights(sections))
+    insights.extend(retry_loop_insights(session, user_filter, yesterday))
+    return insights
@@ -181,7 +181,9 @@ async def general_exception_handler(request: Request, exc: Exception):
 
 # Background task for cap monitoring
 cap_monitor_task = None
+backfill_task = None
 db_keepalive_task = None
+pricing_version_task = None
 
 async def db_keepalive_loop():
     """Periodically ping the database to keep connections warm."""
@@ -202,6 +204,39 @@ async def db_keepalive_loop():
         except Exception as e:
             logger.warning(f"[DB Keepalive] Ping failed: {e}")
 
+async def pricing_version_loop():
+    """Reload this worker's pricing snapshot when the registry version changes."""
+    from pricing import PRICING_VERSION_POLL_SECONDS, reload_pricing_if_changed
+    
+    while True:
+        try:
+            await asyncio.sleep(PRICING_VERSION_POLL_SECONDS)
+            await asyncio.to_thread(reload_pricing_if_changed)
+        except asyncio.CancelledError:
+            break
+        except Exception as e:
+            logger.warning(f"[Pricing] Version check failed: {e}")
+
+def backfill_derived_tables():
+    """Fill empty spend counters / usage rollups / run summaries from existing events (first deploy)."""
+    from db import SessionLocal
+    from rollups import backfill_usage_rollups_if_empty
+    from run_summaries import backfill_run_summaries_if_empty
+    from spend_counters import backfill_spend_counters_if_empty
+    from stats_cache import stats_cache
+    
+    for name, backfill in (("spend counters", backfill_spend_counters_if_empty),
+                           ("usage rollups", backfill_usage_rollups_if_empty),
+                           ("run summaries", backfill_run_summaries_if_empty)):
+        try:
+            with SessionLocal() as session:
+                stats = backfill(session)
+            if stats:
+                logger.info(f"[Backfill] Built {name} from existing events: {stats}")
+                stats_cache.clear()
+        except Exception as e:
+            logger.error(f"[Backfill] Failed to backfill {name}: {e}", exc_info=True)
+
 # Initialize database on startup
 @app.on_event("startup")
 async def on_startup():
@@ -231,6 +266,11 @@ async def on_startup():
     except Exception as e:
         logger.warning(f"Database warm-up failed: {e}")
     
+    # Backfill empty counters/rollups/summaries without holding up startup
+    # (ingest waits on the derived-tables lock while a rebuild runs)
+    global backfill_task
+    backfill_task = asyncio.create_task(asyncio.to_thread(backfill_derived_tables))
+    
     # Start cap monitor in background
     try:
         global cap_monitor_task
@@ -247,13 +287,21 @@ async def on_startup():
     except Exception as e:
         logger.error(f"Failed to start db keepalive: {e}", exc_info=True)
     
+    # Start pricing version watcher in background
+    try:
+        global pricing_version_task
+        pricing_version_task = asyncio.create_task(pricing_version_loop())
+        logger.info("Started pricing version watcher")
+    except Exception as e:
+        logger.error(f"Failed to start pricing version watcher: {e}", exc_info=True)
+    
     total_startup = (time.time() - startup_start) * 1000
     logger.info(f"Startup complete in {total_startup:.0f}ms")
 
 @app.on_event("shutdown")
 async def on_shutdown():
     """Cleanup background services."""
-    global cap_monitor_task, db_keepalive_task
+    global cap_monitor_task, db_keepalive_task, pricing_version_task
     
     if cap_monitor_task:
         cap_monitor_task.cancel()
@@ -270,6 +318,13 @@ async def on_shutdown():
         except asyncio.CancelledError:
             pass
         logger.info("Stopped database keepalive background service")
+    
+    if pricing_version_task:
+        pricing_version_task.cancel()
+        try:
+            await pricing_version_task
+        except asyncio.CancelledError:
+            pass
 
 
 # Debug endpoint to decode JWT
@@ -4,6 +4,7 @@ SQLModel schema for trace events, users, and API keys.
 from datetime import datetime
 from typing import Optional
 from uuid import UUID, uuid4
+from sqlalchemy import text
 from sqlmodel import SQLModel, Field, Index, Column, JSON
 
 
@@ -62,6 +63,7 @@ class APIKey(SQLModel, table=True):
     id: Optional[UUID] = Field(default_factory=uuid4, primary_key=True)
     user_id: UUID = Field(foreign_key="users.id", index=True, description="Owner user ID")
     key_hash: str = Field(unique=True, index=True, description="bcrypt hash of the full API key")
+    lookup_hash: Optional[str] = Field(default=None, unique=True, index=True, description="HMAC-SHA256 of the full API key (O(1) auth lookup)")
     key_prefix: str = Field(description="Displayable prefix (e.g., llmo_sk_abc...)")
     name: str = Field(description="User-friendly name")
     created_at: datetime = Field(default_factory=datetime.utcnow, description="Creation time")
@@ -231,6 +233,92 @@ class AlertResponse(SQLModel):
     created_at: datetime
 
 
+class SpendCounter(SQLModel, table=True):
+    """
+    Materialized spend per (user, cap scope, period bucket).
+    
+    Incremented in the same transaction as event ingestion so /caps/check and
+    the cap monitor read O(#caps) rows instead of summing trace_events.
+    Empty string (not NULL) marks an unused target/sub-scope so the composite
+    primary key can back INSERT ... ON CONFLICT DO UPDATE.
+    """
+    __tablename__ = "spend_counters"
+    
+    user_id: UUID = Field(foreign_key="users.id", primary_key=True, description="Owner user ID")
+    period: str = Field(primary_key=True, description="Period: 'daily', 'weekly', 'monthly'")
+    period_start: datetime = Field(primary_key=True, description="Start of the period bucket (UTC)")
+    scope: str = Field(primary_key=True, description="Scope: 'global', 'provider', 'model', 'agent', 'customer'")
+    target: str = Field(default="", primary_key=True, description="Scope target (provider, model, section or customer_id)")
+    sub_scope: str = Field(default="", primary_key=True, description="Customer sub-scope: 'provider', 'model' or ''")
+    sub_target: str = Field(default="", primary_key=True, description="Customer sub-scope target")
+    spend_usd: float = Field(default=0.0, description="Summed cost_usd in the bucket")
+    event_count: int = Field(default=0, description="Number of events in the bucket")
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class UsageRollup(SQLModel, table=True):
+    """
+    Pre-aggregated usage per (hour or day bucket, tenant, dimensions).
+    
+    Incremented in the same transaction as event ingestion so stats and
+    dashboard endpoints read closed buckets from here and only scan raw
+    trace_events for the current, still-open hour.
+    Empty string (not NULL) marks a missing dimension so the composite
+    primary key can back INSERT ... ON CONFLICT DO UPDATE.
+    """
+    __tablename__ = "usage_rollups"
+    
+    granularity: str = Field(primary_key=True, description="Bucket size: 'hour' or 'day'")
+    bucket_start: datetime = Field(primary_key=True, description="Start of the bucket (UTC)")
+    tenant_id: str = Field(primary_key=True, description="Tenant identifier (as on trace_events)")
+    user_id: str = Field(default="", primary_key=True, description="Owner user ID as string, '' if none")
+    customer_id: str = Field(default="", primary_key=True, description="End-customer ID, '' if none")
+    provider: str = Field(default="", primary_key=True)
+    model: str = Field(default="", primary_key=True)
+    section: str = Field(default="", primary_key=True)
+    voice_platform: str = Field(default="", primary_key=True)
+    voice_segment_type: str = Field(default="", primary_key=True)
+    cost_usd: float = Field(default=0.0, description="Summed cost_usd")
+    call_count: int = Field(default=0, description="Number of events")
+    input_tokens: int = Field(default=0)
+    output_tokens: int = Field(default=0)
+    cached_tokens: int = Field(default=0)
+    latency_ms_sum: float = Field(default=0.0, description="Summed latency (avg = latency_ms_sum / call_count)")
+    audio_seconds: float = Field(default=0.0, description="Summed audio_duration_seconds")
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("idx_usage_rollups_tenant_bucket", "tenant_id", "granularity", "bucket_start"),
+        Index("idx_usage_rollups_user_bucket", "user_id", "granularity", "bucket_start"),
+    )
+
+
+class RunSummary(SQLModel, table=True):
+    """
+    Per-run totals for the runs list, keyed by run and owner.
+    
+    Upserted in the same transaction as event ingestion so /runs/latest
+    pages by keyset on (owner, started_at, run_id) with the cursor in WHERE,
+    instead of grouping every one of the tenant's events per page.
+    The owner is resolved once per event, as for spend counters: the event's
+    user_id, else the user whose clerk_user_id is the event's tenant_id. A
+    run therefore has exactly one row per owner, and a page never splits it.
+    """
+    __tablename__ = "run_summaries"
+    
+    run_id: str = Field(primary_key=True)
+    user_id: str = Field(primary_key=True, description="Resolved owner user ID (as string)")
+    started_at: datetime = Field(description="created_at of the run's earliest event")
+    last_event_at: datetime = Field(description="created_at of the run's latest event")
+    total_cost: float = Field(default=0.0, description="Summed cost_usd")
+    call_count: int = Field(default=0, description="Number of events")
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("idx_run_summaries_user_started", "user_id", text("started_at DESC"), text("run_id DESC")),
+    )
+
+
 class PricingSettings(SQLModel, table=True):
     """
     User-specific pricing settings for providers with tiered/plan-based pricing.
@@ -287,7 +375,7 @@ class TraceEvent(SQLModel, table=True):
     
     # Grouping and hierarchy
     run_id: str = Field(index=True, description="Groups all calls in one user request")
-    span_id: str = Field(description="Unique span identifier (future-proof for subtree)")
+    span_id: str = Field(unique=True, index=True, description="Unique span identifier (idempotency key for ingestion)")
     parent_span_id: Optional[str] = Field(default=None, description="Parent span (NULL for MVP flat structure)")
     
     # Labels and categorization
@@ -309,6 +397,7 @@ class TraceEvent(SQLModel, table=True):
     output_tokens: int = Field(default=0, description="Output/completion tokens")
     cached_tokens: int = Field(default=0, description="Cached input tokens (OpenAI prompt caching)")
     cost_usd: float = Field(default=0.0, description="Cost in USD")
+    pricing_version: Optional[int] = Field(default=None, description="Pricing registry version cost_usd was computed with (NULL if unknown)")
     latency_ms: float = Field(default=0.0, description="Latency in milliseconds")
     
     # Status
@@ -335,6 +424,7 @@ class TraceEvent(SQLModel, table=True):
         # Create composite indexes
         indexes = [
             Index("idx_run_id", "run_id"),
+            Index("idx_run_created", "run_id", "created_at"),
             Index("idx_section", "section"),
             Index("idx_section_path", "section_path"),
             Index("idx_provider_model", "provider", "model"),
@@ -376,6 +466,19 @@ class Pricing(SQLModel, table=True):
         ]
 
 
+class PricingVersion(SQLModel, table=True):
+    """
+    Version of the pricing registry (single row, id=1).
+    Bumped whenever pricing changes; workers and proxies poll it and reload
+    their compiled pricing when it moves.
+    """
+    __tablename__ = "pricing_version"
+    
+    id: int = Field(default=1, primary_key=True)
+    version: int = Field(default=0, description="Monotonically increasing registry version")
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class ProviderTier(SQLModel, table=True):
     """User/tenant provider tier configuration."""
     __tablename__ = "provider_tiers"
@@ -415,6 +518,7 @@ class TraceEventCreate(SQLModel):
     output_tokens: int = 0
     cached_tokens: int = 0
     cost_usd: float = 0.0
+    pricing_version: Optional[int] = None  # Pricing registry version the sender priced with (proxy)
     latency_ms: float = 0.0
     status: str = "ok"
     is_streaming: bool = False
@@ -1,54 +1,126 @@
 """
 Pricing utilities for computing costs from usage data.
 Loads pricing from Supabase database (falls back to JSON file if DB unavailable).
+Costs are computed by the pricing engine shared with the SDK and proxy,
+compiled once per loaded registry. The collector imports its own copy
+(pricing_engine.py, vendored from sdk/python/llmobserve/) so deploys rooted
+at collector/ work; `python scripts/sync_pricing_engine.py --check` fails the
+repo-root builds and the collector tests when the copies differ.
+
+The registry is versioned: the pricing_version row is bumped on every
+change, and each worker keeps an immutable PricingSnapshot (version,
+registry, compiled engine). reload_pricing_if_changed() - run periodically by
+the app - compares the stored version with the loaded one and swaps in a new
+snapshot in a single assignment, so every worker converges within
+PRICING_VERSION_POLL_SECONDS of a change instead of only the one that served
+/pricing/refresh.
 """
 import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, List, Optional
+from sqlalchemy import update
 from sqlmodel import Session, select
+import pricing_engine
 from db import SessionLocal
-from models import Pricing
+from models import Pricing, PricingVersion
+
+logger = logging.getLogger(__name__)
 
 # Load pricing registry
 PRICING_FILE = Path(__file__).parent / "pricing" / "registry.json"
 
-# Cache for pricing registry (loaded from DB)
-_PRICING_CACHE: Optional[Dict[str, Any]] = None
+# How often each worker checks pricing_version for changes
+PRICING_VERSION_POLL_SECONDS = float(os.getenv("PRICING_VERSION_POLL_SECONDS", "10"))
 
 
-def load_pricing_registry() -> Dict[str, Any]:
+class PricingSnapshot:
+    """An immutable, compiled pricing registry at one version."""
+    __slots__ = ("version", "registry", "engine", "loaded_at")
+
+    def __init__(self, version: Optional[int], registry: Dict[str, Any]):
+        self.version = version  # None when loaded without a version (JSON fallback)
+        self.registry = registry
+        self.engine = pricing_engine.PricingEngine(registry)
+        self.loaded_at = time.time()
+
+
+_SNAPSHOT: Optional[PricingSnapshot] = None
+_RELOAD_LOCK = threading.Lock()
+_ENGINE = None  # PricingEngine for an explicitly passed registry
+
+
+def get_pricing_version(session: Optional[Session] = None) -> Optional[int]:
+    """Current registry version from the database (None if unavailable)."""
+    own_session = session is None
+    session = session or SessionLocal()
+    try:
+        version = session.exec(select(PricingVersion.version).where(PricingVersion.id == 1)).first()
+        return version or 0
+    except Exception as e:
+        session.rollback()
+        logger.debug(f"[Pricing] Could not read pricing version: {e}")
+        return None
+    finally:
+        if own_session:
+            session.close()
+
+
+def bump_pricing_version(session: Session) -> int:
     """
-    Load pricing registry from Supabase database.
-    Falls back to JSON file if database is unavailable.
+    Increment the registry version (the caller commits).
+    Call in the same transaction as any change to the pricing table.
     """
-    global _PRICING_CACHE
-    
-    # Return cached version if available
-    if _PRICING_CACHE is not None:
-        return _PRICING_CACHE
+    result = session.execute(
+        update(PricingVersion)
+        .where(PricingVersion.id == 1)
+        .values(version=PricingVersion.version + 1, updated_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        session.add(PricingVersion(id=1, version=1))
+        session.flush()
+    return session.exec(select(PricingVersion.version).where(PricingVersion.id == 1)).one()
+
+
+def _load_registry_from_db(session: Session) -> Dict[str, Any]:
+    statement = select(Pricing).where(Pricing.is_active == True)
+    pricing_entries = session.exec(statement).all()
     
+    registry = {}
+    for entry in pricing_entries:
+        # Build key: "provider:model" or "provider"
+        if entry.model:
+            key = f"{entry.provider}:{entry.model}"
+        else:
+            key = entry.provider
+        
+        # Convert pricing_data dict to JSON-compatible format
+        registry[key] = entry.pricing_data
+    return registry
+
+
+def _build_snapshot() -> PricingSnapshot:
+    """
+    Load and compile the registry with the version it corresponds to.
+    The version is read before and after the rows; if it moved in between
+    the load is retried, so a snapshot never pairs old rows with a new
+    version or the other way round.
+    """
     try:
-        # Try to load from database
         session = SessionLocal()
         try:
-            statement = select(Pricing).where(Pricing.is_active == True)
-            pricing_entries = session.exec(statement).all()
-            
-            registry = {}
-            for entry in pricing_entries:
-                # Build key: "provider:model" or "provider"
-                if entry.model:
-                    key = f"{entry.provider}:{entry.model}"
-                else:
-                    key = entry.provider
-                
-                # Convert pricing_data dict to JSON-compatible format
-                registry[key] = entry.pricing_data
-            
-            _PRICING_CACHE = registry
-            print(f"[Pricing] Loaded {len(registry)} pricing entries from database")
-            return registry
-            
+            for _ in range(3):
+                version = get_pricing_version(session)
+                registry = _load_registry_from_db(session)
+                session.rollback()  # Fresh reads (ends the implicit transaction)
+                if get_pricing_version(session) == version:
+                    break
+            print(f"[Pricing] Loaded {len(registry)} pricing entries from database (version {version})")
+            return PricingSnapshot(version, registry)
         finally:
             session.close()
             
@@ -57,12 +129,67 @@ def load_pricing_registry() -> Dict[str, Any]:
         print(f"[Pricing] Database unavailable, falling back to JSON file: {e}")
         try:
             with open(PRICING_FILE, "r") as f:
-                registry = json.load(f)
-                _PRICING_CACHE = registry
-                return registry
+                return PricingSnapshot(None, json.load(f))
         except FileNotFoundError:
             print(f"[Pricing] JSON file not found, returning empty registry")
-            return {}
+            return PricingSnapshot(None, {})
+
+
+def current_pricing() -> PricingSnapshot:
+    """The snapshot this worker prices with (loaded on first use)."""
+    global _SNAPSHOT
+    snapshot = _SNAPSHOT
+    if snapshot is None:
+        with _RELOAD_LOCK:
+            snapshot = _SNAPSHOT
+            if snapshot is None:
+                snapshot = _SNAPSHOT = _build_snapshot()
+    return snapshot
+
+
+def reload_pricing_if_changed() -> bool:
+    """
+    Swap in a new snapshot if the stored version differs from the loaded one.
+    Cheap when nothing changed (one primary-key read). Returns True on reload.
+    """
+    global _SNAPSHOT
+    version = get_pricing_version()
+    if version is None:
+        return False  # Database unreachable - keep pricing with what we have
+    snapshot = _SNAPSHOT
+    if snapshot is not None and snapshot.version == version:
+        return False
+    with _RELOAD_LOCK:
+        if _SNAPSHOT is not snapshot:
+            return True  # Another thread reloaded meanwhile
+        new_snapshot = _build_snapshot()
+        _SNAPSHOT = new_snapshot
+    logger.info(
+        f"[Pricing] Reloaded pricing: version {snapshot.version if snapshot else None} -> {new_snapshot.version}"
+    )
+    return True
+
+
+def publish_pricing_change() -> PricingSnapshot:
+    """Bump the registry version (all workers and proxies reload) and reload here now."""
+    global _SNAPSHOT
+    try:
+        with SessionLocal() as session:
+            bump_pricing_version(session)
+            session.commit()
+    except Exception as e:
+        logger.warning(f"[Pricing] Could not bump pricing version, reloading this worker only: {e}")
+    with _RELOAD_LOCK:
+        _SNAPSHOT = _build_snapshot()
+    return _SNAPSHOT
+
+
+def load_pricing_registry() -> Dict[str, Any]:
+    """
+    Load pricing registry from Supabase database.
+    Falls back to JSON file if database is unavailable.
+    """
+    return current_pricing().registry
 
 
 def save_pricing_registry(registry: Dict[str, Any]) -> None:
@@ -74,84 +201,34 @@ def save_pricing_registry(registry: Dict[str, Any]) -> None:
     with open(PRICING_FILE, "w") as f:
         json.dump(registry, f, indent=2)
     
-    # Clear cache so next load picks up changes
-    global _PRICING_CACHE
-    _PRICING_CACHE = None
+    # New version so every worker picks up the change
+    publish_pricing_change()
 
 
 def clear_pricing_cache():
-    """Clear pricing cache to force reload from database."""
-    global _PRICING_CACHE
-    _PRICING_CACHE = None
+    """Drop this worker's snapshot to force a reload on next use."""
+    global _SNAPSHOT
+    _SNAPSHOT = None
 
 
-def normalize_provider(provider: str) -> str:
-    """Normalize provider name for pricing lookup."""
-    provider = provider.lower().strip()
-    
-    # Provider name mappings
-    mappings = {
-        "meta-llama": "meta",
-        "mistralai": "mistral",
-        "nousresearch": "nous",
-        "perplexity": "perplexity",
-        "togethercomputer": "together",
-        "01-ai": "yi",
-        "databricks": "databricks",
-        "amazon": "amazon",
-        "tiiuae": "tiiuae",
-        "cognitivecomputations": "cognitive",
-    }
-    
-    return mappings.get(provider, provider)
+def get_pricing_engine(registry: Optional[Dict[str, Any]] = None):
+    """
+    Compiled engine for a registry (the current snapshot's by default).
 
+    For an explicit registry the engine is rebuilt only when the registry
+    object changes.
+    """
+    global _ENGINE
+    if registry is None:
+        return current_pricing().engine
+    engine = _ENGINE
+    if engine is None or engine.registry is not registry:
+        engine = _ENGINE = pricing_engine.PricingEngine(registry)
+    return engine
 
-def normalize_model(model: str) -> str:
-    """Normalize model name for pricing lookup."""
-    import re
-    model = model.lower().strip()
-    
-    # Remove date suffixes (e.g., -20240307)
-    model = re.sub(r'-\d{8}$', '', model)
-    
-    # NOTE: Don't remove -v1/-v2 suffixes globally as some models like
-    # Amazon Nova use them as part of the actual model name (nova-pro-v1)
-    # These are handled by trying exact match first in compute_cost()
-    
-    # Normalize common model name patterns
-    normalizations = {
-        # Llama variants
-        r'llama-3\.1-(\d+)b-instruct': r'llama-3.1-\1b',
-        r'llama-3\.2-(\d+)b-instruct': r'llama-3.2-\1b',
-        r'llama-3-(\d+)b-instruct': r'llama-3-\1b',
-        # Mistral variants  
-        r'mistral-(\d+)b-instruct.*': r'mistral-\1b',
-        r'mixtral-8x(\d+)b-instruct.*': r'mixtral-8x\1b',
-        # DeepSeek
-        r'deepseek-chat.*': 'deepseek-chat',
-        r'deepseek-coder.*': 'deepseek-coder',
-        r'deepseek-r1.*': 'deepseek-r1',
-        # Qwen
-        r'qwen-2\.5-(\d+)b-instruct': r'qwen-2.5-\1b',
-        r'qwen-2-(\d+)b-instruct': r'qwen-2-\1b',
-        # Claude
-        r'claude-3\.5-sonnet.*': 'claude-3.5-sonnet',
-        r'claude-3-5-sonnet.*': 'claude-3.5-sonnet',
-        r'claude-3-haiku.*': 'claude-3-haiku',
-        r'claude-3-5-haiku.*': 'claude-3.5-haiku',
-        r'claude-3\.5-haiku.*': 'claude-3.5-haiku',
-        # Gemini
-        r'gemini-flash-1\.5.*': 'gemini-1.5-flash',
-        r'gemini-pro-1\.5.*': 'gemini-1.5-pro',
-        r'gemini-2\.0-flash.*': 'gemini-2.0-flash',
-    }
-    
-    for pattern, replacement in normalizations.items():
-        normalized = re.sub(pattern, replacement, model)
-        if normalized != model:
-            return normalized
-    
-    return model
+
+normalize_provider = pricing_engine.normalize_provider
+normalize_model = pricing_engine.normalize_model
 
 
 def compute_cost(
@@ -174,114 +251,21 @@ def compute_cost(
     Returns:
         Cost in USD
     """
-    if registry is None:
-        registry = load_pricing_registry()
-    
-    # Store originals for fallback attempts
-    original_provider = provider.lower().strip()
-    original_model = model.lower().strip() if model else None
-    
-    # Normalize provider and model names
-    normalized_provider = normalize_provider(original_provider)
-    normalized_model = normalize_model(original_model) if original_model else None
-    
-    # Build key with fallback for model name variations
-    pricing = {}
-    if original_model:
-        # 1. Try exact match with original names first
-        key = f"{original_provider}:{original_model}"
-        pricing = registry.get(key, {})
-        
-        # 2. Try with normalized provider but original model
-        if not pricing:
-            key = f"{normalized_provider}:{original_model}"
-            pricing = registry.get(key, {})
-        
-        # 3. Try with original provider but normalized model
-        if not pricing:
-            key = f"{original_provider}:{normalized_model}"
-            pricing = registry.get(key, {})
-        
-        # 4. Try fully normalized
-        if not pricing:
-            key = f"{normalized_provider}:{normalized_model}"
-            pricing = registry.get(key, {})
-        
-        # 5. If still not found, try matching by model family (progressively shorter names)
-        if not pricing and original_model and "-" in original_model:
-            parts = original_model.split("-")
-            if len(parts) >= 3:
-                for i in range(len(parts) - 1, 2, -1):  # Start from full name minus 1, go down
-                    test_model = "-".join(parts[:i])
-                    # Try with both providers
-                    for prov in [original_provider, normalized_provider]:
-                        test_key = f"{prov}:{test_model}"
-                        if test_key in registry:
-                            pricing = registry[test_key]
-                            break
-                    if pricing:
-                        break
-    else:
-        # No model, try provider-level pricing
-        key = f"{original_provider}"
-        pricing = registry.get(key, {})
-        if not pricing:
-            key = f"{normalized_provider}"
-            pricing = registry.get(key, {})
-    
-    # Check for per_call pricing
-    if "per_call" in pricing:
-        return pricing["per_call"]
-    
-    # Check for per_million pricing (Pinecone read/write units)
-    if "per_million" in pricing:
-        # Use standard pricing by default (not enterprise)
-        return pricing["per_million"] / 1_000_000  # Convert to per-call cost
-    
-    # Check for per_million_tokens pricing (Pinecone embedding models)
-    if "per_million_tokens" in pricing:
-        total_tokens = input_tokens + output_tokens
-        return (pricing["per_million_tokens"] / 1_000_000) * total_tokens
-    
-    # Check for per_1k_requests pricing (Pinecone reranking)
-    if "per_1k_requests" in pricing:
-        return pricing["per_1k_requests"] / 1000  # Convert to per-request cost
-    
-    # Check for per_gb pricing (Pinecone storage operations)
-    if "per_gb" in pricing:
-        return pricing["per_gb"]
-    
-    # Check for per_gb_month pricing (Pinecone storage)
-    if "per_gb_month" in pricing:
-        return pricing["per_gb_month"]
-    
-    # Check for per_minute pricing (audio)
-    if "per_minute" in pricing:
-        return pricing["per_minute"]
-    
-    # Check for per_character pricing (TTS)
-    if "per_character" in pricing:
-        return pricing["per_character"]
-    
-    # Check for per_second pricing (Sora)
-    if "per_second" in pricing:
-        return pricing["per_second"]
-    
-    # Check for per_session pricing (Code Interpreter)
-    if "per_session" in pricing:
-        return pricing["per_session"]
-    
-    # Check for per_gb_day pricing (File Search Storage)
-    if "per_gb_day" in pricing:
-        return pricing["per_gb_day"]
-    
-    # Check for per_1k_calls pricing (Tools)
-    if "per_1k_calls" in pricing:
-        return pricing["per_1k_calls"] / 1000
+    return get_pricing_engine(registry).cost(provider, model, input_tokens, output_tokens)
+
+
+def compute_costs(
+    batch: Iterable[Dict[str, Any]],
+    registry: Optional[Dict[str, Any]] = None
+) -> List[float]:
+    """
+    Compute costs for many operations at once (ingest, recalculation).
     
-    # Token-based pricing (default)
-    input_cost = pricing.get("input", 0.0) * input_tokens
-    output_cost = pricing.get("output", 0.0) * output_tokens
+    Args:
+        batch: Dicts with provider, model, input_tokens, output_tokens
+        registry: Optional pricing registry (loads from file if not provided)
     
-    return input_cost + output_cost
-
+    Returns:
+        Cost in USD per item, in order
+    """
+    return get_pricing_engine(registry).compute_costs(batch)
@@ -0,0 +1,466 @@
+"""
+Hourly and daily usage rollups for the stats and dashboard endpoints.
+
+Ingest adds each batch to per-(bucket, tenant, customer, provider, model,
+section, voice platform/segment) rollup rows in the same transaction as the
+events. Stats queries then cover a time window with:
+
+    daily rollups    for whole days inside the window
+    hourly rollups   for whole hours at either edge
+    trace_events     only for the partial hour at each edge (incl. the
+                     current, still-open hour)
+
+so dashboard latency for a 30-day window depends on the number of distinct
+dimension values, not on the number of events.
+
+The collector backfills an empty rollup table from existing events on
+startup (backfill_usage_rollups_if_empty), and recalculate_costs.py
+rebuilds the days whose costs it changed. To rebuild by hand (after bulk
+edits or deletes):
+
+    python rollups.py                       # all history
+    POST /migrations/rebuild-usage-rollups  (X-LLMObserve-Admin-Token)
+"""
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, delete, func, insert, or_
+from sqlmodel import Session, select
+
+from db import lock_derived_tables
+from models import TraceEvent, UsageRollup
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_GRANULARITIES = ("hour", "day")
+
+# Dimensions stored on rollups (same column names as trace_events)
+ROLLUP_DIMENSIONS = ("customer_id", "provider", "model", "section", "voice_platform", "voice_segment_type")
+
+# Summed metrics, in the order they are selected
+ROLLUP_METRICS = ("cost_usd", "call_count", "input_tokens", "output_tokens", "cached_tokens", "latency_ms_sum", "audio_seconds")
+_INTEGER_METRICS = ("call_count", "input_tokens", "output_tokens", "cached_tokens")
+
+_KEY_COLUMNS = ("granularity", "bucket_start", "tenant_id", "user_id") + ROLLUP_DIMENSIONS
+
+# Rebuild scans trace_events in windows of this many days
+REBUILD_CHUNK_DAYS = 7
+
+RollupKey = Tuple[Any, ...]
+
+
+def floor_bucket(at: datetime, granularity: str) -> datetime:
+    """Start of the hour/day bucket containing `at`."""
+    if granularity == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return at.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Invalid granularity: {granularity}")
+
+
+def ceil_bucket(at: datetime, granularity: str) -> datetime:
+    """Start of the first bucket at or after `at`."""
+    start = floor_bucket(at, granularity)
+    if start == at:
+        return start
+    return start + (timedelta(hours=1) if granularity == "hour" else timedelta(days=1))
+
+
+# =============================================================================
+# Ingest
+# =============================================================================
+
+def _row_key(granularity: str, bucket_start: datetime, row: Dict[str, Any]) -> RollupKey:
+    user_id = row.get("user_id")
+    return (
+        granularity,
+        bucket_start,
+        row.get("tenant_id") or "default_tenant",
+        str(user_id) if user_id else "",
+    ) + tuple(row.get(dim) or "" for dim in ROLLUP_DIMENSIONS)
+
+
+def _accumulate(deltas: Dict[RollupKey, List[float]], key: RollupKey, metrics: Sequence[float]) -> None:
+    delta = deltas[key]
+    for i, value in enumerate(metrics):
+        delta[i] += value
+
+
+def _event_metrics(row: Dict[str, Any]) -> Tuple[float, ...]:
+    return (
+        float(row.get("cost_usd") or 0.0),
+        1,
+        int(row.get("input_tokens") or 0),
+        int(row.get("output_tokens") or 0),
+        int(row.get("cached_tokens") or 0),
+        float(row.get("latency_ms") or 0.0),
+        float(row.get("audio_duration_seconds") or 0.0),
+    )
+
+
+def _new_deltas() -> Dict[RollupKey, List[float]]:
+    return defaultdict(lambda: [0.0] * len(ROLLUP_METRICS))
+
+
+def _upsert_statement(session: Session, increment: bool):
+    """INSERT ... ON CONFLICT on the rollup key, adding to (or replacing) the sums."""
+    table = UsageRollup.__table__
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(table)
+
+    statement = dialect_insert(table)
+    values = {"updated_at": statement.excluded.updated_at}
+    for metric in ROLLUP_METRICS:
+        if increment:
+            values[metric] = table.c[metric] + statement.excluded[metric]
+        else:
+            values[metric] = statement.excluded[metric]
+    return statement.on_conflict_do_update(index_elements=list(_KEY_COLUMNS), set_=values)
+
+
+def _write_rollups(session: Session, deltas: Dict[RollupKey, List[float]], increment: bool) -> int:
+    if not deltas:
+        return 0
+    now = datetime.utcnow()
+    # Sorted keys give concurrent ingest transactions a consistent lock order (no deadlocks)
+    rows = []
+    for key, metrics in sorted(deltas.items(), key=lambda item: tuple(str(part) for part in item[0])):
+        row = dict(zip(_KEY_COLUMNS, key), updated_at=now)
+        for name, value in zip(ROLLUP_METRICS, metrics):
+            row[name] = int(value) if name in _INTEGER_METRICS else value
+        rows.append(row)
+    session.execute(_upsert_statement(session, increment), rows)
+    return len(rows)
+
+
+def apply_rollup_deltas(session: Session, rows: Iterable[Dict[str, Any]]) -> int:
+    """
+    Add freshly ingested event rows to the hourly and daily rollups.
+
+    Call inside the ingest transaction (before commit). Returns the number
+    of rollup rows touched.
+    """
+    deltas = _new_deltas()
+    for row in rows:
+        created_at = row.get("created_at") or datetime.utcnow()
+        metrics = _event_metrics(row)
+        for granularity in ROLLUP_GRANULARITIES:
+            _accumulate(deltas, _row_key(granularity, floor_bucket(created_at, granularity), row), metrics)
+    return _write_rollups(session, deltas, increment=True)
+
+
+# =============================================================================
+# Queries
+# =============================================================================
+
+@dataclass
+class UsageFilter:
+    """
+    Dimension filters applied identically to rollups and raw events.
+
+    Rollups store a missing dimension as '' and raw events as NULL; both are
+    treated as "not set".
+    """
+    equals: Dict[str, str] = field(default_factory=dict)
+    is_null: Sequence[str] = ()
+    not_null: Sequence[str] = ()
+    not_in: Dict[str, Sequence[str]] = field(default_factory=dict)
+    any_of: Sequence["UsageFilter"] = ()  # OR of sub-filters
+
+    def conditions(self, table) -> List[Any]:
+        rollup = table is UsageRollup
+        conditions = []
+        for dim, value in self.equals.items():
+            conditions.append(getattr(table, dim) == value)
+        for dim in self.is_null:
+            column = getattr(table, dim)
+            conditions.append(column == "" if rollup else or_(column.is_(None), column == ""))
+        for dim in self.not_null:
+            column = getattr(table, dim)
+            conditions.append(column != "" if rollup else and_(column.isnot(None), column != ""))
+        for dim, values in self.not_in.items():
+            conditions.append(getattr(table, dim).notin_(list(values)))
+        if self.any_of:
+            conditions.append(or_(*[and_(*sub.conditions(table)) for sub in self.any_of]))
+        return conditions
+
+
+def customer_filter(customer_id: Optional[str], **kwargs) -> UsageFilter:
+    """Customer page (one customer) vs. dashboard (only non-customer events)."""
+    usage_filter = UsageFilter(**kwargs)
+    if customer_id:
+        usage_filter.equals = {**usage_filter.equals, "customer_id": customer_id}
+    else:
+        usage_filter.is_null = tuple(usage_filter.is_null) + ("customer_id",)
+    return usage_filter
+
+
+def plan_window(
+    since: datetime,
+    until: Optional[datetime] = None,
+    use_days: bool = True,
+) -> Tuple[List[Tuple[str, datetime, datetime]], List[Tuple[datetime, Optional[datetime]]]]:
+    """
+    Split [since, until) into rollup ranges and raw-event ranges.
+
+    Returns (rollup_ranges, raw_ranges): rollup_ranges are
+    (granularity, start, end) over whole buckets; raw_ranges never cross an
+    hour boundary. until=None means "now, including events still arriving".
+    """
+    now = datetime.utcnow()
+    open_end = until is None
+    until = until or now
+    rollup_ranges: List[Tuple[str, datetime, datetime]] = []
+    raw_ranges: List[Tuple[datetime, Optional[datetime]]] = []
+    if since >= until:
+        if open_end:
+            raw_ranges.append((since, None))
+        return rollup_ranges, raw_ranges
+
+    def plan_hours(start: datetime, end: datetime, end_is_open: bool) -> None:
+        hour_start = ceil_bucket(start, "hour")
+        hour_end = floor_bucket(end, "hour")
+        if hour_start < hour_end:
+            if start < hour_start:
+                raw_ranges.append((start, hour_start))
+            rollup_ranges.append(("hour", hour_start, hour_end))
+            if hour_end < end or end_is_open:
+                raw_ranges.append((hour_end, None if end_is_open else end))
+        elif hour_start == hour_end:
+            # Two partial hours around one boundary
+            if start < hour_start:
+                raw_ranges.append((start, hour_start))
+            if hour_start < end or end_is_open:
+                raw_ranges.append((hour_start, None if end_is_open else end))
+        else:
+            raw_ranges.append((start, None if end_is_open else end))
+
+    day_start = ceil_bucket(since, "day")
+    day_end = floor_bucket(until, "day")
+    if use_days and day_start < day_end:
+        if since < day_start:
+            plan_hours(since, day_start, False)
+        rollup_ranges.append(("day", day_start, day_end))
+        if day_end < until or open_end:
+            plan_hours(day_end, until, open_end)
+    else:
+        plan_hours(since, until, open_end)
+    return rollup_ranges, raw_ranges
+
+
+def owner_conditions(table, user_id, clerk_user_id: Optional[str]):
+    """Same isolation rule as the raw stats queries: tenant_id == Clerk ID OR user_id == user."""
+    user_value = str(user_id) if table is UsageRollup else user_id
+    if clerk_user_id:
+        return or_(table.tenant_id == clerk_user_id, table.user_id == user_value)
+    if table is UsageRollup:
+        return and_(table.user_id == user_value, table.user_id != "")
+    return and_(table.user_id == user_value, table.user_id.isnot(None))
+
+
+def _raw_metric_columns():
+    return (
+        func.sum(TraceEvent.cost_usd),
+        func.count(TraceEvent.id),
+        func.sum(TraceEvent.input_tokens),
+        func.sum(TraceEvent.output_tokens),
+        func.sum(TraceEvent.cached_tokens),
+        func.sum(TraceEvent.latency_ms),
+        func.sum(TraceEvent.audio_duration_seconds),
+    )
+
+
+def _rollup_metric_columns():
+    return tuple(func.sum(getattr(UsageRollup, metric)) for metric in ROLLUP_METRICS)
+
+
+def query_usage(
+    session: Session,
+    user_id,
+    clerk_user_id: Optional[str],
+    since: datetime,
+    until: Optional[datetime] = None,
+    dims: Sequence[str] = (),
+    usage_filter: Optional[UsageFilter] = None,
+    time_grain: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Aggregate usage over [since, until) grouped by `dims` (and optionally by
+    hour/day bucket when time_grain is set).
+
+    Returns one dict per group with the dimension values (None for missing),
+    "bucket" (datetime, when time_grain is set) and the summed metrics:
+    cost_usd, call_count, input_tokens, output_tokens, cached_tokens,
+    latency_ms_sum, audio_seconds.
+    """
+    usage_filter = usage_filter or UsageFilter()
+    rollup_ranges, raw_ranges = plan_window(since, until, use_days=time_grain != "hour")
+    totals: Dict[Tuple[Any, ...], List[float]] = _new_deltas()
+
+    if rollup_ranges:
+        dim_columns = [getattr(UsageRollup, dim) for dim in dims]
+        group_columns = list(dim_columns)
+        if time_grain:
+            group_columns.append(UsageRollup.bucket_start)
+        statement = select(*group_columns, *_rollup_metric_columns()).where(
+            owner_conditions(UsageRollup, user_id, clerk_user_id),
+            or_(*[
+                and_(
+                    UsageRollup.granularity == granularity,
+                    UsageRollup.bucket_start >= start,
+                    UsageRollup.bucket_start < end,
+                )
+                for granularity, start, end in rollup_ranges
+            ]),
+            *usage_filter.conditions(UsageRollup),
+        )
+        if group_columns:
+            statement = statement.group_by(*group_columns)
+        for row in session.exec(statement).all():
+            key = tuple(value or None for value in row[:len(dims)])
+            if time_grain:
+                key += (floor_bucket(row[len(dims)], time_grain),)
+            _accumulate(totals, key, [value or 0 for value in row[len(group_columns):]])
+
+    for start, end in raw_ranges:
+        dim_columns = [getattr(TraceEvent, dim) for dim in dims]
+        conditions = [
+            owner_conditions(TraceEvent, user_id, clerk_user_id),
+            TraceEvent.created_at >= start,
+            *usage_filter.conditions(TraceEvent),
+        ]
+        if end is not None:
+            conditions.append(TraceEvent.created_at < end)
+        statement = select(*dim_columns, *_raw_metric_columns()).where(*conditions)
+        if dim_columns:
+            statement = statement.group_by(*dim_columns)
+        # Raw ranges never cross an hour boundary, so the bucket is fixed per range
+        bucket = floor_bucket(start, time_grain) if time_grain else None
+        for row in session.exec(statement).all():
+            metrics = [value or 0 for value in row[len(dims):]]
+            if not metrics[1]:
+                continue  # Aggregate without GROUP BY returns one all-NULL row
+            key = tuple(value or None for value in row[:len(dims)])
+            if time_grain:
+                key += (bucket,)
+            _accumulate(totals, key, metrics)
+
+    results = []
+    for key, metrics in totals.items():
+        entry = dict(zip(dims, key))
+        if time_grain:
+            entry["bucket"] = key[len(dims)]
+        entry.update(zip(ROLLUP_METRICS, metrics))
+        for name in _INTEGER_METRICS:
+            entry[name] = int(entry[name])
+        results.append(entry)
+    results.sort(key=lambda entry: entry["cost_usd"], reverse=True)
+    return results
+
+
+# =============================================================================
+# Rebuild
+# =============================================================================
+
+def _hour_expression(session: Session):
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return func.date_trunc("hour", TraceEvent.created_at)
+    return func.strftime("%Y-%m-%d %H:00:00", TraceEvent.created_at)
+
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    return datetime.strptime(str(value)[:19], "%Y-%m-%d %H:%M:%S")
+
+
+def rebuild_usage_rollups(session: Session, since: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Recompute rollups from trace_events, from `since` (rounded down to a
+    day; default: the oldest event) up to now.
+
+    One GROUP BY per REBUILD_CHUNK_DAYS window; daily rows are derived from
+    the hourly ones. Existing rollups in the rebuilt range are replaced.
+    Holds the derived-tables lock until the caller commits (ingest waits).
+    Does not commit.
+    """
+    lock_derived_tables(session, exclusive=True)
+    stats = {"events": 0, "rollups": 0}
+    if since is None:
+        since = session.exec(select(func.min(TraceEvent.created_at))).one()
+        if since is None:
+            return stats
+        since = _as_datetime(since)
+    start = floor_bucket(since, "day")
+    now = datetime.utcnow()
+
+    session.execute(delete(UsageRollup).where(UsageRollup.bucket_start >= start))
+
+    hour = _hour_expression(session)
+    dim_columns = [getattr(TraceEvent, dim) for dim in ROLLUP_DIMENSIONS]
+    while start <= now:
+        end = start + timedelta(days=REBUILD_CHUNK_DAYS)
+        statement = select(
+            hour,
+            TraceEvent.tenant_id,
+            TraceEvent.user_id,
+            *dim_columns,
+            *_raw_metric_columns(),
+        ).where(
+            TraceEvent.created_at >= start,
+            TraceEvent.created_at < end,
+        ).group_by(hour, TraceEvent.tenant_id, TraceEvent.user_id, *dim_columns)
+
+        deltas = _new_deltas()
+        for row in session.exec(statement).all():
+            bucket = _as_datetime(row[0])
+            event = {"tenant_id": row[1], "user_id": row[2]}
+            event.update(zip(ROLLUP_DIMENSIONS, row[3:3 + len(ROLLUP_DIMENSIONS)]))
+            metrics = [value or 0 for value in row[3 + len(ROLLUP_DIMENSIONS):]]
+            stats["events"] += int(metrics[1])
+            _accumulate(deltas, _row_key("hour", bucket, event), metrics)
+            _accumulate(deltas, _row_key("day", floor_bucket(bucket, "day"), event), metrics)
+
+        stats["rollups"] += _write_rollups(session, deltas, increment=False)
+        start = end
+
+    logger.info(f"[Rollups] Rebuilt {stats['rollups']} rollup rows from {stats['events']} events")
+    return stats
+
+
+def backfill_usage_rollups_if_empty(session: Session) -> Optional[Dict[str, int]]:
+    """
+    Rebuild all history when the rollup table is empty (first deploy,
+    fresh restore) - otherwise stats show no past usage. Commits; returns
+    the rebuild stats, or None if rollups already exist.
+    """
+    # Checked under the lock, so workers starting together rebuild only once
+    lock_derived_tables(session, exclusive=True)
+    if session.exec(select(UsageRollup.bucket_start).limit(1)).first() is not None:
+        return None
+    stats = rebuild_usage_rollups(session)
+    if not stats["rollups"]:
+        return None
+    session.commit()
+    return stats
+
+
+if __name__ == "__main__":
+    # Backfill rollups from existing events
+    from db import SessionLocal, init_db
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    with SessionLocal() as rebuild_session:
+        result = rebuild_usage_rollups(rebuild_session)
+        rebuild_session.commit()
+    print(f"[Rollups] Rebuild complete: {result}")
@@ -17,8 +17,10 @@ from models import (
 from auth import (
     generate_api_key,
     hash_api_key,
+    compute_lookup_hash,
     get_key_prefix,
     get_current_user,
+    api_key_cache,
 )
 
 router = APIRouter(prefix="/api-keys", tags=["API Keys"])
@@ -44,6 +46,7 @@ async def create_api_key(
     db_key = APIKey(
         user_id=user.id,
         key_hash=key_hash,
+        lookup_hash=compute_lookup_hash(api_key),
         key_prefix=key_prefix,
         name=key_data.name,
     )
@@ -122,5 +125,8 @@ async def revoke_api_key(
     session.add(key)
     session.commit()
     
+    # Stop serving the key from this worker's cache (others expire within TTL)
+    api_key_cache.invalidate(key.lookup_hash)
+    
     return {"message": "API key revoked successfully"}
 
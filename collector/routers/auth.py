@@ -6,7 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
 from db import get_session
 from models import User, APIKey, APIKeyCreate, APIKeyResponse, APIKeyListItem
-from auth import generate_api_key, hash_api_key, get_key_prefix, get_current_user, get_current_user_id
+from auth import api_key_cache, generate_api_key, hash_api_key, compute_lookup_hash, get_key_prefix, get_current_user, get_current_user_id
 from uuid import UUID
 
 router = APIRouter(prefix="/api-keys", tags=["api-keys"])
@@ -33,6 +33,7 @@ async def create_api_key(
     api_key = APIKey(
         user_id=user_id,
         key_hash=key_hash,
+        lookup_hash=compute_lookup_hash(api_key_plain),
         name=key_data.name,
         key_prefix=get_key_prefix(api_key_plain)
     )
@@ -109,6 +110,9 @@ async def revoke_api_key(
     session.add(api_key)
     session.commit()
     
+    # Stop serving the key from this worker's cache (others expire within TTL)
+    api_key_cache.invalidate(api_key.lookup_hash)
+    
     return {"message": "API key revoked successfully"}
 
 
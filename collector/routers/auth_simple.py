@@ -9,7 +9,7 @@ from fastapi import APIRouter, Depends, HTTPException, Header
 from sqlmodel import Session, select
 from db import get_session
 from models import User, UserSignup, UserLogin, UserResponse, APIKey, APIKeyResponse
-from auth import hash_api_key, generate_api_key, get_key_prefix
+from auth import api_key_cache, hash_api_key, compute_lookup_hash, generate_api_key, get_key_prefix
 import bcrypt
 import jwt
 
@@ -116,6 +116,7 @@ def signup(
     api_key_record = APIKey(
         user_id=user.id,
         key_hash=hash_api_key(api_key),
+        lookup_hash=compute_lookup_hash(api_key),
         key_prefix=get_key_prefix(api_key),
         name="Default API Key",
         created_at=datetime.utcnow()
@@ -231,6 +232,7 @@ async def create_api_key(
     api_key_record = APIKey(
         user_id=user.id,
         key_hash=hash_api_key(api_key),
+        lookup_hash=compute_lookup_hash(api_key),
         key_prefix=get_key_prefix(api_key),
         name=name,
         created_at=datetime.utcnow()
@@ -265,5 +267,8 @@ async def revoke_api_key(
     session.add(api_key)
     session.commit()
     
+    # Stop serving the key from this worker's cache (others expire within TTL)
+    api_key_cache.invalidate(api_key.lookup_hash)
+    
     return {"status": "success", "message": "API key revoked"}
 
@@ -4,7 +4,7 @@ Spending Caps API Router
 Endpoints for managing spending caps and viewing alerts.
 """
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List, Optional
 from uuid import UUID
 
@@ -24,7 +24,9 @@ from models import (
 from db import get_session
 from clerk_auth import get_current_clerk_user
 from auth import get_current_user as auth_get_current_user  # Explicit import for API key auth
+from auth import authenticate_api_key, require_admin_token, API_KEY_CACHE_TTL
 from cap_alerts import maybe_send_cap_alert
+from spend_counters import period_bounds, read_cap_spend
 
 # Verify import worked
 import sys
@@ -35,54 +37,13 @@ sys.stderr.flush()
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/caps", tags=["caps"])
 
-# =====================================================================
-# API KEY CACHE - Avoid expensive bcrypt checks on every request
-# Cache validated API keys for 5 minutes
-# =====================================================================
-import time
-_api_key_cache: dict = {}  # {token: (user_id, expires_at)}
-API_KEY_CACHE_TTL = 300  # 5 minutes
-
-def get_cached_user_id(token: str) -> Optional[UUID]:
-    """Get user_id from cache if token is cached and not expired."""
-    if token in _api_key_cache:
-        user_id, expires_at = _api_key_cache[token]
-        if time.time() < expires_at:
-            return user_id
-        else:
-            del _api_key_cache[token]
-    return None
-
-def cache_api_key(token: str, user_id: UUID):
-    """Cache a validated API key."""
-    _api_key_cache[token] = (user_id, time.time() + API_KEY_CACHE_TTL)
-
 # Debug: Print when module loads to verify deployment
 print("[CAPS MODULE] caps.py module loaded - API key auth enabled!", flush=True)
 
 
 def get_period_dates(period: str) -> tuple[datetime, datetime]:
     """Calculate start and end dates for a period."""
-    now = datetime.utcnow()
-    
-    if period == "daily":
-        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        end = start + timedelta(days=1)
-    elif period == "weekly":
-        start = now - timedelta(days=now.weekday())
-        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
-        end = start + timedelta(days=7)
-    elif period == "monthly":
-        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        # Next month
-        if now.month == 12:
-            end = start.replace(year=start.year + 1, month=1)
-        else:
-            end = start.replace(month=start.month + 1)
-    else:
-        raise ValueError(f"Invalid period: {period}")
-    
-    return start, end
+    return period_bounds(period)
 
 
 def calculate_current_spend(
@@ -316,20 +277,8 @@ async def check_caps(
     Supports both API keys (llmo_sk_*) and Clerk JWTs for authentication.
     API keys NEVER expire - they only stop working if manually revoked.
     """
-    import sys
-    import bcrypt
-    from models import APIKey
-    
-    sys.stderr.write("[CHECK_CAPS] ========== /caps/check ENDPOINT v20250108 ==========\n")
-    sys.stderr.flush()
-    
-    # Return version marker for verification
-    debug_version = "caps-check-v20250108"
-    
     # Get authorization header
     authorization = request.headers.get("Authorization")
-    sys.stderr.write(f"[CHECK_CAPS] Authorization header: {authorization[:50] if authorization else 'None'}...\n")
-    sys.stderr.flush()
     
     if not authorization:
         raise HTTPException(status_code=401, detail="Missing Authorization header")
@@ -343,92 +292,16 @@ async def check_caps(
     user = None
     
     # === API KEY AUTHENTICATION (tokens starting with llmo_sk_) ===
-    # API keys NEVER expire - they work forever until manually revoked
+    # API keys NEVER expire - they work forever until manually revoked.
+    # One indexed lookup_hash query, then served from the shared verified-key cache.
     if token.startswith("llmo_sk_"):
-        sys.stderr.write(f"[CHECK_CAPS] Detected API key (llmo_sk_*)\n")
-        sys.stderr.flush()
-        
-        # CHECK CACHE FIRST - avoid expensive bcrypt on every request
-        cached_user_id = get_cached_user_id(token)
-        if cached_user_id:
-            sys.stderr.write(f"[CHECK_CAPS] ✅ API key found in CACHE (fast path)\n")
-            sys.stderr.flush()
-            user = session.get(User, cached_user_id)
-            if user:
-                # Skip to cap checking logic below
-                pass
-            else:
-                # User deleted? Clear cache and re-validate
-                cached_user_id = None
-        
-        if not cached_user_id:
-            # SLOW PATH: Validate with bcrypt (first time only)
-            sys.stderr.write(f"[CHECK_CAPS] Cache miss - validating with bcrypt (slow)\n")
-            sys.stderr.flush()
-            
-            key_prefix = token[:12] + "..."
-            statement = select(APIKey).where(
-                and_(
-                    APIKey.key_prefix == key_prefix,
-                    APIKey.revoked_at.is_(None)
-                )
-            )
-            api_keys = session.exec(statement).all()
-            sys.stderr.write(f"[CHECK_CAPS] Found {len(api_keys)} keys matching prefix\n")
-            sys.stderr.flush()
-            
-            matched_key = None
-            for key in api_keys:
-                try:
-                    if bcrypt.checkpw(token.encode('utf-8'), key.key_hash.encode('utf-8')):
-                        matched_key = key
-                        sys.stderr.write(f"[CHECK_CAPS] ✅ API key MATCHED!\n")
-                        sys.stderr.flush()
-                        break
-                except Exception as hash_err:
-                    continue
-            
-            # FALLBACK: Check all keys if prefix lookup failed
-            if not matched_key:
-                sys.stderr.write(f"[CHECK_CAPS] Prefix miss, trying full scan\n")
-                sys.stderr.flush()
-                fallback_stmt = select(APIKey).where(APIKey.revoked_at.is_(None))
-                all_keys = session.exec(fallback_stmt).all()
-                for key in all_keys:
-                    try:
-                        if bcrypt.checkpw(token.encode('utf-8'), key.key_hash.encode('utf-8')):
-                            matched_key = key
-                            break
-                    except:
-                        continue
-            
-            if not matched_key:
-                sys.stderr.write(f"[CHECK_CAPS] ❌ API key NOT found\n")
-                sys.stderr.flush()
-                raise HTTPException(status_code=401, detail="Invalid API key")
-            
-            # CACHE the validated key for future requests
-            cache_api_key(token, matched_key.user_id)
-            sys.stderr.write(f"[CHECK_CAPS] Cached API key for 5 minutes\n")
-            sys.stderr.flush()
-            
-            # Update last_used_at
-            from datetime import datetime as dt
-            matched_key.last_used_at = dt.utcnow()
-            session.add(matched_key)
-            session.commit()
-            
-            user = session.get(User, matched_key.user_id)
-            if not user:
-                raise HTTPException(status_code=401, detail="User not found")
-        
-        sys.stderr.write(f"[CHECK_CAPS] ✅ Auth complete for user: {user.email if user else 'unknown'}\n")
-        sys.stderr.flush()
+        try:
+            user = authenticate_api_key(session, token)
+        except HTTPException:
+            raise HTTPException(status_code=401, detail="Invalid API key")
     
     # === CLERK JWT AUTHENTICATION (for browser/dashboard calls) ===
     else:
-        sys.stderr.write(f"[CHECK_CAPS] Token doesn't start with llmo_sk_ - trying Clerk auth\n")
-        sys.stderr.flush()
         # Fall back to Clerk auth for non-API-key tokens
         try:
             user = await get_current_clerk_user(request, session)
@@ -439,10 +312,6 @@ async def check_caps(
                 detail=f"Authentication failed. Use an API key (llmo_sk_*) or valid Clerk session."
             )
     
-    print(f"[CHECK_CAPS] check_caps function CALLED! user={user.email if user else None}", flush=True)
-    sys.stderr.write(f"[CHECK_CAPS] User authenticated: {user.email if user else None}\n")
-    sys.stderr.flush()
-    
     # Get all active hard_block caps for this user
     caps = session.exec(
         select(SpendingCap).where(
@@ -458,15 +327,17 @@ async def check_caps(
         return {
             "allowed": True,
             "exceeded_caps": [],
+            "caps": [],
             "message": "No active hard caps"
         }
     
     exceeded_caps = []
+    applicable_caps = []
+    # Spend vs limit for every applicable cap, so the SDK can decide how long
+    # a cached "allowed" decision stays safe (budget-headroom mode)
+    cap_status = []
     
     for cap in caps:
-        # Calculate period dates
-        period_start, period_end = get_period_dates(cap.period)
-        
         # Check if this cap applies to the current request context
         applies = False
         cap_sub_scope = getattr(cap, 'sub_scope', None)
@@ -492,16 +363,23 @@ async def check_caps(
         elif cap.cap_type == "agent" and agent and cap.target_name == agent:
             applies = True
         
-        if not applies:
-            continue
-        
-        # Calculate current spend for this cap
-        current_spend = calculate_current_spend(
-            session, user.id, cap.cap_type, cap.target_name, period_start, period_end,
-            clerk_user_id=user.clerk_user_id,
-            sub_scope=cap_sub_scope,
-            sub_target=cap_sub_target,
-        )
+        if applies:
+            applicable_caps.append(cap)
+    
+    # Current spend for every applicable cap from the spend counters (one query)
+    spend_by_cap = read_cap_spend(session, user.id, applicable_caps)
+    
+    for cap in applicable_caps:
+        period_start, period_end = get_period_dates(cap.period)
+        current_spend = spend_by_cap.get(cap.id, 0.0)
+        cap_status.append({
+            "cap_id": str(cap.id),
+            "cap_type": cap.cap_type,
+            "target_name": cap.target_name,
+            "limit": cap.limit_amount,
+            "current": current_spend,
+            "period": cap.period,
+        })
         
         # Check if exceeded
         if current_spend >= cap.limit_amount:
@@ -538,6 +416,7 @@ async def check_caps(
     return {
         "allowed": len(exceeded_caps) == 0,
         "exceeded_caps": exceeded_caps,
+        "caps": cap_status,
         "message": f"{len(exceeded_caps)} hard cap(s) exceeded" if exceeded_caps else "All caps OK"
     }
 
@@ -557,6 +436,13 @@ async def trigger_cap_check():
         raise HTTPException(status_code=500, detail=f"Cap check failed: {str(e)}")
 
 
+@router.get("/monitor-stats", dependencies=[Depends(require_admin_token)])
+async def get_cap_monitor_stats():
+    """Duration, phase timings and counts for the most recent cap check cycle."""
+    from cap_monitor import cap_monitor_stats
+    return cap_monitor_stats()
+
+
 @router.post("/test-email")
 async def test_email(
     email: str = Query(..., description="Email address to send test to"),
@@ -10,7 +10,7 @@ from typing import List, Optional
 from models import User, APIKey, APIKeyListItem, APIKeyResponse
 from db import get_session
 from clerk_auth import get_current_clerk_user
-from auth import generate_api_key, hash_api_key, get_key_prefix
+from auth import generate_api_key, hash_api_key, compute_lookup_hash, get_key_prefix, api_key_cache
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -73,6 +73,7 @@ async def create_api_key(
     api_key_record = APIKey(
         user_id=current_user.id,
         key_hash=key_hash,
+        lookup_hash=compute_lookup_hash(api_key),
         key_prefix=get_key_prefix(api_key),
         name=request.name,
         # project_id=request.project_id
@@ -115,6 +116,9 @@ async def revoke_api_key(
     session.add(api_key)
     session.commit()
     
+    # Stop serving the key from this worker's cache (others expire within TTL)
+    api_key_cache.invalidate(api_key.lookup_hash)
+    
     logger.info(f"[Clerk API Keys] Revoked API key {api_key.key_prefix}... for user {current_user.email}")
     
     return {"status": "revoked", "key_id": key_id}
@@ -11,7 +11,7 @@ from typing import Optional
 
 from models import User, APIKey, Organization, OrganizationMembership
 from db import get_session
-from auth import generate_api_key
+from auth import generate_api_key, hash_api_key, compute_lookup_hash
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/webhooks/clerk", tags=["webhooks"])
@@ -107,7 +107,8 @@ async def handle_user_created(data: dict, session: Session):
         api_key = generate_api_key()
         api_key_record = APIKey(
             user_id=user.id,
-            key_hash=api_key,  # Will be hashed by model
+            key_hash=hash_api_key(api_key),
+            lookup_hash=compute_lookup_hash(api_key),
             key_prefix=api_key[:12],
             name="Default API Key"
         )
@@ -2,11 +2,12 @@
 Events router - handles ingestion of trace events.
 
 FEATURES:
-- Batch ingestion with idempotency
+- Batch ingestion with set-based idempotency (see ingest.py)
 - Automatic cost calculation with batch API discounts
 - Clock skew detection
 - Rate limit event filtering
 - Failed request filtering (5xx errors)
+- gzip/zstd request bodies (Content-Encoding, see compression.py)
 """
 from typing import List, Optional
 from uuid import UUID
@@ -14,13 +15,18 @@ import time
 import logging
 from fastapi import APIRouter, Depends, Header, HTTPException
 from sqlmodel import Session
-from models import TraceEvent, TraceEventCreate
-from db import get_session
-from pricing import compute_cost
+from models import TraceEventCreate
+from db import get_session, lock_derived_tables
+from ingest import ingest_batch
+from spend_counters import apply_spend_deltas
+from rollups import apply_rollup_deltas
+from run_summaries import apply_run_deltas
+from stats_cache import invalidate_for_rows
 from auth import get_current_user_id
+from compression import DecompressingRoute
 
 logger = logging.getLogger(__name__)
-router = APIRouter(prefix="/events", tags=["events"])
+router = APIRouter(prefix="/events", tags=["events"], route_class=DecompressingRoute)
 
 
 @router.post("/", status_code=201)
@@ -51,10 +57,6 @@ def ingest_events(
     - X-LLMObserve-Discount: Discount multiplier (e.g., "0.5" for 50% off)
     """
     try:
-        created_count = 0
-        skipped_count = 0
-        filtered_count = 0
-        
         # Validate timestamp for clock skew
         if x_llmobserve_timestamp:
             try:
@@ -82,94 +84,26 @@ def ingest_events(
             except ValueError:
                 logger.error(f"[events] Invalid discount header: {x_llmobserve_discount}")
         
-        # Process each event
-        for event_data in events:
-            # Extract status_code from event_metadata if available
-            status_code = None
-            if event_data.event_metadata and isinstance(event_data.event_metadata, dict):
-                status_code = event_data.event_metadata.get("http_status")
-            
-            # Filter out rate limit events (429)
-            if status_code == 429:
-                filtered_count += 1
-                logger.debug(f"[events] Filtered rate limit event (429)")
-                continue
-            
-            # Filter out server errors (5xx) - these typically aren't charged
-            if status_code and 500 <= status_code < 600:
-                filtered_count += 1
-                logger.debug(f"[events] Filtered server error ({status_code})")
-                continue
-            
-            # Idempotency check: skip if event with same span_id already exists
-            if event_data.span_id:
-                from sqlmodel import select
-                statement = select(TraceEvent).where(TraceEvent.span_id == event_data.span_id)
-                existing = session.exec(statement).first()
-                
-                if existing:
-                    skipped_count += 1
-                    continue  # Skip duplicate event (likely retry)
-            
-            # CRITICAL: Always compute cost server-side if we have token data
-            # This ensures costs are accurate and never $0 for valid API calls
-            # Server-side calculation is authoritative (handles model name variations, pricing updates, etc.)
-            if event_data.input_tokens > 0 or event_data.output_tokens > 0:
-                # Always recalculate server-side for accuracy (handles model name normalization, pricing updates)
-                base_cost = compute_cost(
-                    provider=event_data.provider,
-                    model=event_data.model,
-                    input_tokens=event_data.input_tokens,
-                    output_tokens=event_data.output_tokens
-                )
-                
-                # Apply batch API discount
-                event_data.cost_usd = base_cost * discount_multiplier
-                
-                if base_cost > 0:
-                    logger.info(
-                        f"[events] Computed cost server-side: "
-                        f"{event_data.provider}/{event_data.model}: "
-                        f"${base_cost:.6f} → ${event_data.cost_usd:.6f}"
-                    )
-                elif event_data.cost_usd == 0.0:
-                    # Log warning if server-side calculation also returns 0 (might indicate missing pricing)
-                    logger.warning(
-                        f"[events] Server-side cost calculation returned $0 for "
-                        f"{event_data.provider}/{event_data.model} "
-                        f"({event_data.input_tokens} input + {event_data.output_tokens} output tokens)"
-                    )
-            
-            # Create TraceEvent from TraceEventCreate
-            event_dict = event_data.model_dump()
-            
-            # Handle tenant_id: CRITICAL for dashboard filtering
-            # Dashboard filters by Clerk user ID, so tenant_id must match clerk_user_id
-            if user_id:
-                # Look up User to get clerk_user_id for tenant_id
-                from models import User
-                user = session.get(User, user_id)
-                if user and user.clerk_user_id:
-                    # Use Clerk user ID as tenant_id so dashboard can filter correctly
-                    event_dict["tenant_id"] = user.clerk_user_id
-                else:
-                    # Fallback: use user_id as string if no clerk_user_id
-                    event_dict["tenant_id"] = str(user_id)
-                event_dict["user_id"] = user_id
-            elif not event_dict.get("tenant_id"):
-                event_dict["tenant_id"] = "default_tenant"
-            
-            try:
-                event = TraceEvent(**event_dict)
-                session.add(event)
-                created_count += 1
-            except Exception as e:
-                logger.error(f"[events] Failed to create event: {e}")
-                logger.error(f"[events] Event dict: {event_dict}")
-                import traceback
-                logger.error(f"[events] Traceback: {traceback.format_exc()}")
-                # Continue processing other events
-                continue
+        # A rebuild of the derived tables waits for this batch (and vice versa)
+        lock_derived_tables(session)
+        
+        # Filter, dedupe (one span_id query per batch) and bulk insert
+        result = ingest_batch(
+            session,
+            events,
+            user_id=user_id,
+            discount_multiplier=discount_multiplier,
+        )
+        created_count = result.created
+        skipped_count = result.skipped
+        filtered_count = result.filtered
+        
+        # Keep cap spend counters in step with the events (same transaction)
+        apply_spend_deltas(session, result.rows)
+        # ...and the hourly/daily stats rollups
+        apply_rollup_deltas(session, result.rows)
+        # ...and the per-run summaries behind /runs/latest
+        apply_run_deltas(session, result.rows)
         
         # Commit all events at once
         try:
@@ -181,6 +115,9 @@ def ingest_events(
             session.rollback()
             raise
         
+        # Only the tenants in this batch see fresh dashboards; other cached stats stay warm
+        invalidate_for_rows(result.rows)
+        
         logger.info(
             f"[events] Ingested {created_count} events, "
             f"skipped {skipped_count} duplicates, "
@@ -4,6 +4,7 @@ Migration router for database schema updates.
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import text, inspect
 from db import get_session, engine, IS_POSTGRESQL
+from auth import require_admin_token
 from sqlmodel import Session
 import logging
 
@@ -289,6 +290,65 @@ def migrate_performance_indexes(session: Session = Depends(get_session)):
         raise HTTPException(status_code=500, detail=f"Migration failed: {str(e)}")
 
 
+@router.post("/rebuild-spend-counters", dependencies=[Depends(require_admin_token)])
+def rebuild_spend_counters_endpoint(session: Session = Depends(get_session)):
+    """
+    Rebuild cap spend counters from existing trace_events.
+    Empty counters are backfilled on startup; run this after bulk edits
+    or deletes. Safe to run multiple times (replaces current-period counters).
+    Requires X-LLMObserve-Admin-Token (ADMIN_API_TOKEN).
+    """
+    try:
+        from spend_counters import rebuild_spend_counters
+        stats = rebuild_spend_counters(session)
+        session.commit()
+        return {"status": "success", "message": "Spend counters rebuilt", "details": stats}
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Spend counter rebuild failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Rebuild failed: {str(e)}")
+
+
+@router.post("/rebuild-usage-rollups", dependencies=[Depends(require_admin_token)])
+def rebuild_usage_rollups_endpoint(session: Session = Depends(get_session)):
+    """
+    Rebuild hourly/daily stats rollups from existing trace_events.
+    Empty rollups are backfilled on startup; run this after bulk edits
+    or deletes. Safe to run multiple times (replaces rebuilt buckets).
+    Requires X-LLMObserve-Admin-Token (ADMIN_API_TOKEN).
+    """
+    try:
+        from rollups import rebuild_usage_rollups
+        from stats_cache import stats_cache
+        stats = rebuild_usage_rollups(session)
+        session.commit()
+        stats_cache.clear()
+        return {"status": "success", "message": "Usage rollups rebuilt", "details": stats}
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Usage rollup rebuild failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Rebuild failed: {str(e)}")
+
+
+@router.post("/rebuild-run-summaries", dependencies=[Depends(require_admin_token)])
+def rebuild_run_summaries_endpoint(session: Session = Depends(get_session)):
+    """
+    Rebuild the per-run summaries behind /runs/latest from trace_events.
+    Empty summaries are backfilled on startup; run this after bulk edits
+    or deletes. Safe to run multiple times (replaces all summaries).
+    Requires X-LLMObserve-Admin-Token (ADMIN_API_TOKEN).
+    """
+    try:
+        from run_summaries import rebuild_run_summaries
+        stats = rebuild_run_summaries(session)
+        session.commit()
+        return {"status": "success", "message": "Run summaries rebuilt", "details": stats}
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Run summary rebuild failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Rebuild failed: {str(e)}")
+
+
 @router.post("/fix-clerk-user-id")
 def fix_clerk_user_id(
     old_clerk_id: str,
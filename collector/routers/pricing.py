@@ -2,44 +2,73 @@
 Pricing router - manage pricing registry.
 """
 from typing import Dict, Any
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Response
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
-from pricing import load_pricing_registry, save_pricing_registry, clear_pricing_cache
+from auth import require_admin_token
+from pricing import (
+    current_pricing,
+    get_pricing_version,
+    publish_pricing_change,
+    save_pricing_registry,
+)
 
 router = APIRouter(prefix="/pricing", tags=["pricing"])
 
 
 @router.get("/")
-def get_pricing() -> Dict[str, Any]:
-    """Get current pricing registry."""
-    return load_pricing_registry()
+def get_pricing(response: Response) -> Dict[str, Any]:
+    """
+    Get current pricing registry.
+    The X-Pricing-Version header carries the registry version it belongs to.
+    Served from this worker's snapshot; pricing_version_loop and the write
+    endpoints keep it current.
+    """
+    snapshot = current_pricing()
+    if snapshot.version is not None:
+        response.headers["X-Pricing-Version"] = str(snapshot.version)
+    return snapshot.registry
+
+
+@router.get("/version")
+def get_pricing_registry_version() -> Dict[str, Any]:
+    """
+    Current pricing registry version (cheap; polled by proxies).
+    Fetch GET /pricing/ when it differs from the version you hold.
+    """
+    snapshot = current_pricing()
+    version = get_pricing_version()
+    return {
+        "version": version if version is not None else snapshot.version,
+        "loaded_version": snapshot.version,
+        "entries": len(snapshot.registry),
+    }
 
 
-@router.put("/")
+@router.put("/", dependencies=[Depends(require_admin_token)])
 def update_pricing(registry: Dict[str, Any]) -> Dict[str, str]:
     """
     Update pricing registry.
-    
+
     Accepts full registry JSON to replace existing pricing.
+    Operator-only: requires the X-LLMObserve-Admin-Token header.
     """
     save_pricing_registry(registry)
     return {"status": "success", "message": "Pricing registry updated"}
 
 
-@router.post("/refresh")
+@router.post("/refresh", dependencies=[Depends(require_admin_token)])
 def refresh_pricing() -> Dict[str, Any]:
     """
-    Clear pricing cache to force reload from database.
+    Publish a new pricing version so every worker and proxy reloads.
     Call this after adding new pricing entries to the database.
+    Operator-only: requires the X-LLMObserve-Admin-Token header.
     """
-    clear_pricing_cache()
-    # Force reload
-    registry = load_pricing_registry()
+    snapshot = publish_pricing_change()
     return {
-        "status": "success", 
+        "status": "success",
         "message": "Pricing cache refreshed",
-        "entries_loaded": len(registry)
+        "entries_loaded": len(snapshot.registry),
+        "version": snapshot.version,
     }
-
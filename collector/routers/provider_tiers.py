@@ -1,17 +1,82 @@
 """
 API routes for managing provider tier configurations.
 Allows users to specify which tier/plan they're on for each provider.
+
+The proxy caches tiers in memory. It preloads them from GET /all and is told
+about changes through its /internal/tier-invalidate endpoint:
+    PROXY_URLS            Comma-separated proxy base URLs to notify on changes
+    PROXY_INTERNAL_TOKEN  Shared secret for /all and the proxy notifications
+                          (must match the proxy's LLMOBSERVE_PROXY_INTERNAL_TOKEN)
 """
+import logging
+import os
+import secrets
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request
+from typing import Dict, List, Optional
 from sqlmodel import Session, select
 from db import get_session
 from models import ProviderTier
 from clerk_auth import get_optional_clerk_user
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/provider-tiers", tags=["provider-tiers"])
 
+PROXY_URLS = [u.strip().rstrip("/") for u in os.getenv("PROXY_URLS", "").split(",") if u.strip()]
+PROXY_INTERNAL_TOKEN = os.getenv("PROXY_INTERNAL_TOKEN", "")
+INTERNAL_TOKEN_HEADER = "X-LLMObserve-Internal-Token"
+
+
+async def notify_proxies(tenant_id: str) -> None:
+    """Tell each proxy to drop its cached tiers for a tenant (best effort)."""
+    # Proxies reject invalidations without the shared token; their TTL picks the change up
+    if not PROXY_URLS or not PROXY_INTERNAL_TOKEN:
+        return
+    import httpx
+
+    headers = {INTERNAL_TOKEN_HEADER: PROXY_INTERNAL_TOKEN}
+    async with httpx.AsyncClient(timeout=5.0) as client:
+        for proxy_url in PROXY_URLS:
+            try:
+                resp = await client.post(
+                    f"{proxy_url}/internal/tier-invalidate",
+                    json={"tenant_id": tenant_id},
+                    headers=headers,
+                )
+                if resp.status_code != 200:
+                    logger.warning(f"[Provider Tiers] Proxy {proxy_url} invalidation returned {resp.status_code}")
+            except Exception as e:
+                # The proxy's TTL still picks the change up eventually
+                logger.warning(f"[Provider Tiers] Failed to notify proxy {proxy_url}: {e}")
+
+
+@router.get("/all")
+async def get_all_provider_tiers(
+    x_llmobserve_internal_token: Optional[str] = Header(None),
+    session: Session = Depends(get_session)
+) -> Dict[str, Dict[str, str]]:
+    """
+    Every tenant's active tiers as {tenant_id: {provider: tier}}.
+    Used by the proxy to warm its tier cache; requires PROXY_INTERNAL_TOKEN.
+    """
+    if not PROXY_INTERNAL_TOKEN or not x_llmobserve_internal_token or not secrets.compare_digest(
+        x_llmobserve_internal_token, PROXY_INTERNAL_TOKEN
+    ):
+        raise HTTPException(status_code=403, detail="Internal token required")
+
+    rows = session.exec(
+        select(ProviderTier.tenant_id, ProviderTier.provider, ProviderTier.tier).where(
+            ProviderTier.is_active == True,
+            ProviderTier.tenant_id != None
+        )
+    ).all()
+
+    tiers: Dict[str, Dict[str, str]] = {}
+    for tenant_id, provider, tier in rows:
+        tiers.setdefault(tenant_id, {})[provider] = tier
+    return tiers
+
 
 @router.get("/")
 async def get_provider_tiers(
@@ -54,6 +119,7 @@ async def get_provider_tiers(
 async def create_or_update_provider_tier(
     provider: str,
     tier: str,
+    background_tasks: BackgroundTasks,
     plan_name: Optional[str] = None,
     tenant_id: Optional[str] = Query(None, description="Tenant ID"),
     request: Request = None,
@@ -85,6 +151,7 @@ async def create_or_update_provider_tier(
         session.add(existing)
         session.commit()
         session.refresh(existing)
+        background_tasks.add_task(notify_proxies, tenant_id)
         
         return {
             "id": str(existing.id),
@@ -110,6 +177,7 @@ async def create_or_update_provider_tier(
         session.add(new_tier)
         session.commit()
         session.refresh(new_tier)
+        background_tasks.add_task(notify_proxies, tenant_id)
         
         return {
             "id": str(new_tier.id),
@@ -125,6 +193,7 @@ async def create_or_update_provider_tier(
 @router.delete("/{provider}")
 async def delete_provider_tier(
     provider: str,
+    background_tasks: BackgroundTasks,
     tenant_id: Optional[str] = Query(None, description="Tenant ID"),
     request: Request = None,
     session: Session = Depends(get_session)
@@ -153,6 +222,7 @@ async def delete_provider_tier(
     existing.updated_at = datetime.utcnow()
     session.add(existing)
     session.commit()
+    background_tasks.add_task(notify_proxies, tenant_id)
     
     return {"message": "Provider tier deactivated"}
 
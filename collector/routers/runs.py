@@ -3,12 +3,14 @@ Runs router - provides run-level aggregations and details.
 """
 import time
 import logging
-from typing import List, Dict, Any, Optional
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select, func, text, and_, or_
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlmodel import Session, select, func, and_, or_
 from models import TraceEvent
-from db import get_session, IS_POSTGRESQL
+from db import get_session
+from run_summaries import latest_run_summaries, run_sections
 from auth import get_current_user_id
 from clerk_auth import get_current_clerk_user
 
@@ -38,9 +40,23 @@ def extract_top_level_section(section_path: str) -> str:
     return first_segment
 
 
+def encode_run_cursor(started_at: datetime, run_id: str) -> str:
+    """Keyset cursor for /runs/latest: '<started_at ISO>|<run_id>'."""
+    return f"{started_at.isoformat()}|{run_id}"
+
+
+def decode_run_cursor(cursor: str) -> Tuple[datetime, str]:
+    started_at, sep, run_id = cursor.partition("|")
+    if not sep or not run_id:
+        raise ValueError("cursor must be '<started_at>|<run_id>'")
+    return datetime.fromisoformat(started_at), run_id
+
+
 @router.get("/latest")
 async def get_latest_runs(
-    limit: int = 50,
+    response: Response,
+    limit: int = Query(50, ge=1, le=1000),
+    before: Optional[str] = Query(None, description="Cursor of the last run on the previous page"),
     tenant_id: Optional[str] = Query(None, description="Tenant identifier for multi-tenant isolation"),
     session: Session = Depends(get_session),
     current_user = Depends(get_current_clerk_user)  # Require Clerk authentication
@@ -50,117 +66,64 @@ async def get_latest_runs(
     
     Requires Clerk authentication. Returns only runs belonging to the authenticated user.
     
+    Runs are ordered by (started_at, run_id) descending. Each run carries a
+    `cursor`; pass the last one as `before` to fetch the next page (also sent
+    as the X-Next-Cursor header when the page is full). Pages are read from
+    run_summaries by keyset (cursor in WHERE, on an index), and only the
+    page's runs are joined back to their events for sections, so deep pages
+    cost the same as the first.
+    
     Returns: List of runs with total_cost, call_count, sections, etc.
     """
     start_time = time.time()
     user_id = current_user.id
     clerk_user_id = current_user.clerk_user_id  # Use Clerk user ID for tenant filtering
     print(f"[runs/latest] START user={str(user_id)[:8]}... clerk_user_id={clerk_user_id} limit={limit}", flush=True)
-    # Group by run_id and aggregate
-    # Use string_agg for PostgreSQL, group_concat for SQLite
-    if IS_POSTGRESQL:
-        sections_agg = func.string_agg(func.distinct(TraceEvent.section), text("','"))
-    else:
-        sections_agg = func.group_concat(func.distinct(TraceEvent.section))
-    
-    statement = select(
-        TraceEvent.run_id,
-        func.min(TraceEvent.created_at).label("started_at"),
-        func.sum(TraceEvent.cost_usd).label("total_cost"),
-        func.count(TraceEvent.id).label("call_count"),
-        sections_agg.label("sections")
-    ).group_by(TraceEvent.run_id)
-    
-    # CRITICAL: Filter by tenant_id (Clerk user ID) OR user_id to ensure data isolation
-    # - tenant_id: Set when events created via API key (matches API key owner's clerk_user_id)
-    # - user_id: Fallback for events created through other means
+
+    # CRITICAL: Only the user's events, attributed as for run_summaries (data isolation)
+    # - user_id: Set when events are created via API key
+    # - tenant_id == Clerk user ID: Events ingested without a user reference
     if clerk_user_id:
-        statement = statement.where(
-            or_(
-                TraceEvent.tenant_id == clerk_user_id,
-                TraceEvent.user_id == user_id
-            )
-        )
-    elif user_id:
-        statement = statement.where(
-            and_(
-                TraceEvent.user_id == user_id,
-                TraceEvent.user_id.isnot(None)  # Exclude NULL user_id events
-            )
+        owner_filter = or_(
+            TraceEvent.user_id == user_id,
+            and_(TraceEvent.user_id.is_(None), TraceEvent.tenant_id == clerk_user_id)
         )
-    
-    statement = statement.order_by(func.min(TraceEvent.created_at).desc()).limit(limit)
-    
-    query_start = time.time()
-    results = session.exec(statement).all()
-    query_time = (time.time() - query_start) * 1000
-    print(f"[runs/latest] QUERY took {query_time:.0f}ms, rows={len(results)}", flush=True)
-    
+    else:
+        owner_filter = TraceEvent.user_id == user_id
+
+    cursor = None
+    if before:
+        try:
+            cursor = decode_run_cursor(before)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+
+    page = latest_run_summaries(session, user_id, limit, before=cursor)
+    details = run_sections(session, [run.run_id for run in page], owner_filter)
+    query_time = (time.time() - start_time) * 1000
+    print(f"[runs/latest] QUERY took {query_time:.0f}ms, rows={len(page)}", flush=True)
+
     runs = []
-    for result in results:
-        # Get top-level section from section_path (e.g., "agent:research_assistant")
-        section_path_statement = (
-            select(TraceEvent.section_path)
-            .where(TraceEvent.run_id == result.run_id)
-            .where(TraceEvent.section_path.isnot(None))
+    for run in page:
+        detail = details.get(run.run_id, {})
+        top_section = (
+            extract_top_level_section(detail.get("first_section_path"))
+            or detail.get("first_section")
+            or "unknown"
         )
-        # Apply same tenant/user filter using clerk_user_id
-        if clerk_user_id:
-            section_path_statement = section_path_statement.where(
-                or_(
-                    TraceEvent.tenant_id == clerk_user_id,
-                    TraceEvent.user_id == user_id
-                )
-            )
-        elif user_id:
-            section_path_statement = section_path_statement.where(
-                and_(
-                    TraceEvent.user_id == user_id,
-                    TraceEvent.user_id.isnot(None)  # Exclude NULL user_id events
-                )
-            )
-        section_path_statement = section_path_statement.limit(1)
-        section_path_result = session.exec(section_path_statement).first()
-        
-        # Extract top-level section
-        top_section = None
-        if section_path_result:
-            top_section = extract_top_level_section(section_path_result)
-        
-        # Fallback to section field if no section_path
-        if not top_section:
-            section_statement = (
-                select(TraceEvent.section)
-                .where(TraceEvent.run_id == result.run_id)
-            )
-            # Apply same tenant/user filter using clerk_user_id
-            if clerk_user_id:
-                section_statement = section_statement.where(
-                    or_(
-                        TraceEvent.tenant_id == clerk_user_id,
-                        TraceEvent.user_id == user_id
-                    )
-                )
-            elif user_id:
-                section_statement = section_statement.where(
-                    and_(
-                        TraceEvent.user_id == user_id,
-                        TraceEvent.user_id.isnot(None)  # Exclude NULL user_id events
-                    )
-                )
-            section_statement = section_statement.limit(1)
-            section_result = session.exec(section_statement).first()
-            top_section = section_result if section_result else "unknown"
-        
         runs.append({
-            "run_id": result.run_id,
-            "started_at": result.started_at.isoformat(),
-            "total_cost": result.total_cost,  # Don't round - let frontend format it
-            "call_count": result.call_count,
-            "sections": result.sections.split(",") if result.sections else [],
-            "top_section": top_section
+            "run_id": run.run_id,
+            "started_at": run.started_at.isoformat(),
+            "total_cost": run.total_cost,  # Don't round - let frontend format it
+            "call_count": run.call_count,
+            "sections": detail.get("sections", []),
+            "top_section": top_section,
+            "cursor": encode_run_cursor(run.started_at, run.run_id),
         })
-    
+
+    if len(runs) == limit:
+        response.headers["X-Next-Cursor"] = runs[-1]["cursor"]
+
     return runs
 
 
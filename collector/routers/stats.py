@@ -3,60 +3,48 @@ Stats router - provides aggregated statistics.
 """
 import logging
 import time
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional
 from uuid import UUID
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, Query, Header, HTTPException
 from sqlmodel import Session, select, func, and_, or_
 from sqlalchemy import case, or_
 from models import TraceEvent, User
-from db import get_session, IS_POSTGRESQL
-from auth import get_current_user_id
+from db import get_session
+from rollups import query_usage, customer_filter, owner_conditions
+from stats_cache import stats_cache, reader_scopes, make_key as make_generation_key
+from auth import get_current_user_id, require_admin_token
 from clerk_auth import get_current_clerk_user
 
 logger = logging.getLogger(__name__)
 
 # =============================================================================
 # SERVER-SIDE RESPONSE CACHE
-# Caches identical queries to avoid repeated slow DB calls
+# Caches identical queries to avoid repeated slow DB calls. Backend (in-process
+# LRU or host-wide SQLite) and TTL are configured in stats_cache.py; ingest
+# invalidates only the tenants it wrote to.
 # =============================================================================
-_response_cache: Dict[str, Tuple[Any, float]] = {}
-_cache_ttl_seconds = 300  # Cache for 5 minutes - Railway DB is very slow, need longer cache
 
 def get_cached_response(cache_key: str) -> Optional[Any]:
     """Get cached response if it exists and is not expired."""
-    if cache_key in _response_cache:
-        data, timestamp = _response_cache[cache_key]
-        if time.time() - timestamp < _cache_ttl_seconds:
-            logger.debug(f"[CACHE HIT] {cache_key}")
-            return data
-        else:
-            # Expired - remove from cache
-            del _response_cache[cache_key]
-    return None
+    data = stats_cache.get(cache_key)
+    if data is not None:
+        logger.debug(f"[CACHE HIT] {cache_key}")
+    return data
 
 def set_cached_response(cache_key: str, data: Any) -> None:
     """Store response in cache."""
-    _response_cache[cache_key] = (data, time.time())
-    # Limit cache size to prevent memory issues
-    if len(_response_cache) > 1000:
-        # Remove oldest entries
-        sorted_keys = sorted(_response_cache.keys(), 
-                            key=lambda k: _response_cache[k][1])
-        for old_key in sorted_keys[:100]:
-            del _response_cache[old_key]
+    stats_cache.set(cache_key, data)
 
-def make_cache_key(endpoint: str, user_id: str, **params) -> str:
-    """Create a unique cache key for a query."""
+def make_cache_key(endpoint: str, user_id: str, clerk_user_id: Optional[str] = None, **params) -> str:
+    """Create a unique cache key for a query (includes the tenant generations)."""
     param_str = "&".join(f"{k}={v}" for k, v in sorted(params.items()) if v is not None)
-    return f"{endpoint}:{user_id}:{param_str}"
+    scopes = reader_scopes(user_id, clerk_user_id, params.get("tenant_id"))
+    return make_generation_key(f"{endpoint}:{user_id}:{param_str}", scopes)
 
 def clear_stats_cache():
     """Clear all cached stats responses."""
-    global _response_cache
-    count = len(_response_cache)
-    _response_cache = {}
-    return count
+    return stats_cache.clear()
 
 router = APIRouter(prefix="/stats", tags=["stats"])
 
@@ -66,6 +54,11 @@ async def clear_cache():
     count = clear_stats_cache()
     return {"status": "success", "message": f"Cleared {count} cached responses"}
 
+@router.get("/cache-stats", dependencies=[Depends(require_admin_token)])
+async def cache_stats():
+    """Stats response cache metrics: backend, size, hits/misses, evictions, invalidations."""
+    return stats_cache.stats()
+
 @router.get("/debug-user-data")
 async def debug_user_data(
     clerk_id: str = Query(None, description="Clerk user ID to check (optional if token provided)"),
@@ -303,7 +296,7 @@ async def get_costs_by_provider(
     print(f"[by-provider] START user={str(user_id)[:8]}... clerk_user_id={clerk_user_id} hours={hours}", flush=True)
     
     # Check server-side cache first
-    cache_key = make_cache_key("by-provider", str(user_id), hours=hours, tenant_id=tenant_id, customer_id=customer_id)
+    cache_key = make_cache_key("by-provider", str(user_id), clerk_user_id, hours=hours, tenant_id=tenant_id, customer_id=customer_id)
     cached = get_cached_response(cache_key)
     if cached is not None:
         print(f"[by-provider] CACHE HIT in {(time.time()-start_time)*1000:.0f}ms", flush=True)
@@ -312,57 +305,27 @@ async def get_costs_by_provider(
     # Calculate time window
     cutoff = datetime.utcnow() - timedelta(hours=hours)
     
-    # Get provider aggregations
-    statement = select(
-        TraceEvent.provider,
-        func.sum(TraceEvent.cost_usd).label("total_cost"),
-        func.count(TraceEvent.id).label("call_count")
-    ).where(TraceEvent.created_at >= cutoff)
-    
-    # CRITICAL: Filter by tenant_id (Clerk user ID) OR user_id to ensure data isolation
-    # - tenant_id: Set when events created via API key (matches API key owner's clerk_user_id)
-    # - user_id: Fallback for events created through other means
-    if clerk_user_id:
-        statement = statement.where(
-            or_(
-                TraceEvent.tenant_id == clerk_user_id,
-                TraceEvent.user_id == user_id
-            )
-        )
-    elif user_id:
-        statement = statement.where(
-            and_(
-                TraceEvent.user_id == user_id,
-                TraceEvent.user_id.isnot(None)
-            )
-        )
-    
-    # Filter by customer_id if provided, otherwise exclude customer data
-    if customer_id:
-        statement = statement.where(TraceEvent.customer_id == customer_id)
-    else:
-        # Dashboard: exclude customer-specific events
-        statement = statement.where(TraceEvent.customer_id.is_(None))
-    
-    # Exclude "internal" provider
-    statement = statement.where(TraceEvent.provider != "internal")
-    
-    statement = statement.group_by(TraceEvent.provider).order_by(func.sum(TraceEvent.cost_usd).desc())
-    
+    # Provider aggregations: closed hours/days from usage rollups, open hour from raw events.
+    # Same isolation as before: tenant_id (Clerk user ID) OR user_id.
+    # Dashboard (no customer_id) only shows non-customer events; "internal" is excluded.
     query_start = time.time()
-    results = session.exec(statement).all()
+    results = query_usage(
+        session, user_id, clerk_user_id, cutoff,
+        dims=("provider",),
+        usage_filter=customer_filter(customer_id, not_in={"provider": ["internal"]}),
+    )
     query_time = (time.time() - query_start) * 1000
     print(f"[by-provider] QUERY took {query_time:.0f}ms, rows={len(results)}", flush=True)
     
     # Calculate total for percentages (only non-internal providers)
-    total_cost = sum(r.total_cost or 0 for r in results)
+    total_cost = sum(r["cost_usd"] for r in results)
     
     providers = [
         {
-            "provider": r.provider,
-            "total_cost": r.total_cost,  # Don't round - let frontend format it
-            "call_count": r.call_count,
-            "percentage": round((r.total_cost / total_cost * 100) if total_cost > 0 else 0, 2)
+            "provider": r["provider"],
+            "total_cost": r["cost_usd"],  # Don't round - let frontend format it
+            "call_count": r["call_count"],
+            "percentage": round((r["cost_usd"] / total_cost * 100) if total_cost > 0 else 0, 2)
         }
         for r in results
     ]
@@ -394,74 +357,35 @@ async def get_costs_by_model(
     clerk_user_id = current_user.clerk_user_id  # Use Clerk user ID for tenant filtering
     
     # Check server-side cache first
-    cache_key = make_cache_key("by-model", str(user_id), hours=hours, tenant_id=tenant_id, customer_id=customer_id)
+    cache_key = make_cache_key("by-model", str(user_id), clerk_user_id, hours=hours, tenant_id=tenant_id, customer_id=customer_id)
     cached = get_cached_response(cache_key)
     if cached is not None:
         return cached
     
     cutoff = datetime.utcnow() - timedelta(hours=hours)
     
-    # Get model aggregations
-    statement = select(
-        TraceEvent.model,
-        TraceEvent.provider,
-        func.sum(TraceEvent.cost_usd).label("total_cost"),
-        func.count(TraceEvent.id).label("call_count"),
-        func.sum(TraceEvent.input_tokens).label("input_tokens"),
-        func.sum(TraceEvent.output_tokens).label("output_tokens"),
-        func.avg(TraceEvent.latency_ms).label("avg_latency")
-    ).where(TraceEvent.created_at >= cutoff)
-    
-    # CRITICAL: Filter by tenant_id (Clerk user ID) OR user_id to ensure data isolation
-    # - tenant_id: Set when events created via API key (matches API key owner's clerk_user_id)
-    # - user_id: Fallback for events created through other means
-    if clerk_user_id:
-        statement = statement.where(
-            or_(
-                TraceEvent.tenant_id == clerk_user_id,
-                TraceEvent.user_id == user_id
-            )
-        )
-    elif user_id:
-        statement = statement.where(
-            and_(
-                TraceEvent.user_id == user_id,
-                TraceEvent.user_id.isnot(None)
-            )
-        )
-    
-    # Filter by customer_id if provided, otherwise exclude customer data
-    if customer_id:
-        statement = statement.where(TraceEvent.customer_id == customer_id)
-    else:
-        # Dashboard: exclude customer-specific events
-        statement = statement.where(TraceEvent.customer_id.is_(None))
-    
-    # Exclude internal/unknown and require model
-    statement = statement.where(
-        and_(
-            TraceEvent.provider != "internal",
-            TraceEvent.model.isnot(None)
-        )
+    # Model aggregations from usage rollups (+ raw events for the open hour).
+    # Same tenant/user isolation and customer handling as /by-provider;
+    # excludes "internal" and events without a model.
+    results = query_usage(
+        session, user_id, clerk_user_id, cutoff,
+        dims=("model", "provider"),
+        usage_filter=customer_filter(customer_id, not_null=("model",), not_in={"provider": ["internal"]}),
     )
     
-    statement = statement.group_by(TraceEvent.model, TraceEvent.provider).order_by(func.sum(TraceEvent.cost_usd).desc())
-    
-    results = session.exec(statement).all()
-    
     # Calculate total for percentages
-    total_cost = sum(r.total_cost or 0 for r in results)
+    total_cost = sum(r["cost_usd"] for r in results)
     
     models = [
         {
-            "model": r.model or "unknown",
-            "provider": r.provider,
-            "total_cost": r.total_cost or 0,
-            "call_count": r.call_count,
-            "input_tokens": r.input_tokens or 0,
-            "output_tokens": r.output_tokens or 0,
-            "avg_latency": round(r.avg_latency or 0, 2),
-            "percentage": round((r.total_cost / total_cost * 100) if total_cost > 0 else 0, 2)
+            "model": r["model"] or "unknown",
+            "provider": r["provider"],
+            "total_cost": r["cost_usd"],
+            "call_count": r["call_count"],
+            "input_tokens": r["input_tokens"],
+            "output_tokens": r["output_tokens"],
+            "avg_latency": round(r["latency_ms_sum"] / r["call_count"] if r["call_count"] else 0, 2),
+            "percentage": round((r["cost_usd"] / total_cost * 100) if total_cost > 0 else 0, 2)
         }
         for r in results
     ]
@@ -486,64 +410,33 @@ async def get_daily_costs(
     clerk_user_id = current_user.clerk_user_id  # Use Clerk user ID for tenant filtering
     
     # Check server-side cache first
-    cache_key = make_cache_key("daily", str(user_id), days=days, tenant_id=tenant_id)
+    cache_key = make_cache_key("daily", str(user_id), clerk_user_id, days=days, tenant_id=tenant_id)
     cached = get_cached_response(cache_key)
     if cached is not None:
         return cached
     
     cutoff = datetime.utcnow() - timedelta(days=days)
     
-    # Get daily aggregations with provider breakdown
-    statement = select(
-        func.date(TraceEvent.created_at).label("date"),
-        TraceEvent.provider,
-        func.sum(TraceEvent.cost_usd).label("total_cost"),
-        func.count(TraceEvent.id).label("call_count")
-    ).where(TraceEvent.created_at >= cutoff)
-    
-    # CRITICAL: Filter by tenant_id (Clerk user ID) OR user_id to ensure data isolation
-    # - tenant_id: Set when events created via API key (matches API key owner's clerk_user_id)
-    # - user_id: Fallback for events created through other means
-    if clerk_user_id:
-        statement = statement.where(
-            or_(
-                TraceEvent.tenant_id == clerk_user_id,
-                TraceEvent.user_id == user_id
-            )
-        )
-    elif user_id:
-        statement = statement.where(
-            and_(
-                TraceEvent.user_id == user_id,
-                TraceEvent.user_id.isnot(None)
-            )
-        )
-    
-    # Exclude internal and customer-specific events (dashboard shows only non-customer data)
-    statement = statement.where(
-        and_(
-            TraceEvent.provider != "internal",
-            TraceEvent.customer_id.is_(None)  # Only show non-customer data in dashboard
-        )
+    # Daily aggregations with provider breakdown, from daily/hourly rollups
+    # (+ raw events for the open hour). Same tenant/user isolation as above;
+    # excludes "internal" and customer-specific events (dashboard view).
+    results = query_usage(
+        session, user_id, clerk_user_id, cutoff,
+        dims=("provider",),
+        usage_filter=customer_filter(None, not_in={"provider": ["internal"]}),
+        time_grain="day",
     )
     
-    statement = statement.group_by(
-        func.date(TraceEvent.created_at),
-        TraceEvent.provider
-    ).order_by(func.date(TraceEvent.created_at))
-    
-    results = session.exec(statement).all()
-    
     # Group by date
     daily_data = {}
     for r in results:
-        date_str = str(r.date)
+        date_str = str(r["bucket"].date())
         if date_str not in daily_data:
             daily_data[date_str] = {"date": date_str, "total": 0, "providers": {}}
-        daily_data[date_str]["total"] += r.total_cost or 0
-        daily_data[date_str]["providers"][r.provider] = {
-            "cost": r.total_cost or 0,
-            "calls": r.call_count
+        daily_data[date_str]["total"] += r["cost_usd"]
+        daily_data[date_str]["providers"][r["provider"]] = {
+            "cost": r["cost_usd"],
+            "calls": r["call_count"]
         }
     
     # Fill in missing days with zeros
@@ -583,7 +476,7 @@ async def get_cost_timeseries(
     clerk_user_id = current_user.clerk_user_id  # Use Clerk user ID for tenant filtering
     
     # Check server-side cache first
-    cache_key = make_cache_key("timeseries", str(user_id), hours=hours, tenant_id=tenant_id, customer_id=customer_id)
+    cache_key = make_cache_key("timeseries", str(user_id), clerk_user_id, hours=hours, tenant_id=tenant_id, customer_id=customer_id)
     cached = get_cached_response(cache_key)
     if cached is not None:
         return cached
@@ -627,71 +520,31 @@ async def get_cost_timeseries(
             bucket_label = dt.strftime(f"%H:{minute_bucket:02d}")
         return bucket_key, bucket_label
 
-    # Build base filters
-    base_filters = [TraceEvent.created_at >= cutoff]
-    
-    # CRITICAL: Filter by tenant_id (Clerk user ID) OR user_id to ensure data isolation
-    # - tenant_id: Set when events created via API key (matches API key owner's clerk_user_id)
-    # - user_id: Fallback for events created through other means
-    if clerk_user_id:
-        base_filters.append(
-            or_(
-                TraceEvent.tenant_id == clerk_user_id,
-                TraceEvent.user_id == user_id
-            )
-        )
-    elif user_id:
-        base_filters.append(
-            and_(
-                TraceEvent.user_id == user_id,
-                TraceEvent.user_id.isnot(None)
-            )
+    # Same isolation as the other stats queries (tenant_id OR user_id); dashboard
+    # (no customer_id) excludes customer-specific events; "internal" is excluded.
+    usage_filter = customer_filter(customer_id, not_in={"provider": ["internal"]})
+    
+    # Hourly and longer buckets: usage rollups (+ raw events for the open hour).
+    # 15-minute buckets are finer than the rollups, so short windows (<= 6h)
+    # still read raw events.
+    use_rollups = bucket_minutes >= 60
+    if use_rollups:
+        results = query_usage(
+            session, user_id, clerk_user_id, cutoff,
+            dims=("provider",),
+            usage_filter=usage_filter,
+            time_grain="day" if bucket_minutes >= 1440 else "hour",
         )
-    
-    # Filter by customer_id if provided, otherwise exclude customer data
-    if customer_id:
-        base_filters.append(TraceEvent.customer_id == customer_id)
     else:
-        # Dashboard: exclude customer-specific events
-        base_filters.append(TraceEvent.customer_id.is_(None))
-    
-    # Exclude internal provider
-    base_filters.append(TraceEvent.provider != "internal")
-
-    # PostgreSQL: aggregate in DB to avoid loading raw events
-    use_db_aggregation = IS_POSTGRESQL
-    if IS_POSTGRESQL:
-        bucket_seconds = bucket_minutes * 60
-        bucket_ts = func.to_timestamp(
-            func.floor(func.extract('epoch', TraceEvent.created_at) / bucket_seconds) * bucket_seconds
-        ).label("bucket_ts")
-
-        statement = select(
-            bucket_ts,
-            TraceEvent.provider,
-            func.sum(TraceEvent.cost_usd).label("total_cost"),
-            func.count(TraceEvent.id).label("call_count")
-        ).where(and_(*base_filters)).group_by(bucket_ts, TraceEvent.provider).order_by(bucket_ts)
-
-        results = session.exec(statement).all()
-        if not results:
-            # If aggregation returned nothing but there are matching events, fall back to raw scan.
-            # This avoids an empty chart if the DB aggregation behaves unexpectedly.
-            event_count = session.exec(
-                select(func.count(TraceEvent.id)).where(and_(*base_filters))
-            ).one()
-            if event_count and event_count > 0:
-                use_db_aggregation = False
-    else:
-        # SQLite fallback: query raw events and bucket in Python
-        use_db_aggregation = False
-
-    if not use_db_aggregation:
         statement = select(
             TraceEvent.created_at,
             TraceEvent.provider,
             TraceEvent.cost_usd
-        ).where(and_(*base_filters)).order_by(TraceEvent.created_at)
+        ).where(
+            TraceEvent.created_at >= cutoff,
+            owner_conditions(TraceEvent, user_id, clerk_user_id),
+            *usage_filter.conditions(TraceEvent),
+        ).order_by(TraceEvent.created_at)
         results = session.exec(statement).all()
     
     # Create time buckets
@@ -712,17 +565,11 @@ async def get_cost_timeseries(
     
     # Aggregate events into buckets
     for event in results:
-        if use_db_aggregation:
-            bucket_time = getattr(event, "bucket_ts", None)
-            provider = getattr(event, "provider", None)
-            cost = getattr(event, "total_cost", None)
-            calls = getattr(event, "call_count", None)
-            # Tuple fallback for drivers that return plain tuples
-            if bucket_time is None and isinstance(event, (tuple, list)) and len(event) >= 4:
-                bucket_time, provider, cost, calls = event[0], event[1], event[2], event[3]
-            provider = provider or "unknown"
-            cost = cost or 0
-            calls = calls or 0
+        if use_rollups:
+            bucket_time = event["bucket"]
+            provider = event["provider"] or "unknown"
+            cost = event["cost_usd"]
+            calls = event["call_count"]
         else:
             bucket_time = event.created_at
             provider = event.provider or "unknown"
@@ -766,7 +613,7 @@ async def get_costs_by_section(
     clerk_user_id = current_user.clerk_user_id  # Use Clerk user ID for tenant filtering
     
     # Check server-side cache first
-    cache_key = make_cache_key("by-section", str(user_id), hours=hours, tenant_id=tenant_id, customer_id=customer_id)
+    cache_key = make_cache_key("by-section", str(user_id), clerk_user_id, hours=hours, tenant_id=tenant_id, customer_id=customer_id)
     cached = get_cached_response(cache_key)
     if cached is not None:
         return cached
@@ -1120,6 +967,7 @@ async def get_costs_by_customer(
         cache_key = make_cache_key(
             "by-customer",
             str(user_id),
+            clerk_user_id,
             hours=hours,
             tenant_id=effective_tenant_id
         )
@@ -1401,7 +1249,7 @@ async def get_dashboard_all(
     clerk_user_id = current_user.clerk_user_id  # Use Clerk user ID for tenant filtering
     
     # Check cache first
-    cache_key = make_cache_key("dashboard-all", str(user_id), hours=hours, days=days, customer_id=customer_id or "")
+    cache_key = make_cache_key("dashboard-all", str(user_id), clerk_user_id, hours=hours, days=days, customer_id=customer_id or "")
     cached = get_cached_response(cache_key)
     if cached is not None:
         print(f"[dashboard-all] CACHE HIT in {(time.time()-start_time)*1000:.0f}ms", flush=True)
@@ -1415,141 +1263,65 @@ async def get_dashboard_all(
     # Run all queries (they share the same session/connection)
     query_start = time.time()
     
-    # 1. Provider stats
-    # CRITICAL: Filter by tenant_id OR user_id to match both API key events and direct events
-    provider_conditions = [
-        TraceEvent.created_at >= cutoff_hours,
-        TraceEvent.provider != "internal"
-    ]
-    
-    # Filter by customer_id if specified, otherwise exclude customer-specific events
-    if customer_id:
-        provider_conditions.append(TraceEvent.customer_id == customer_id)
-    else:
-        provider_conditions.append(TraceEvent.customer_id.is_(None))
-    # Filter by tenant_id (Clerk user ID) OR user_id - ensures we catch all events
-    # - tenant_id: Set when events created via API key (matches API key owner's clerk_user_id)
-    # - user_id: Fallback for events created through other means
-    if clerk_user_id:
-        provider_conditions.append(
-            or_(
-                TraceEvent.tenant_id == clerk_user_id,
-                TraceEvent.user_id == user_id
-            )
-        )
-    else:
-        provider_conditions.append(TraceEvent.user_id == user_id)
-    
-    provider_stmt = select(
-        TraceEvent.provider,
-        func.sum(TraceEvent.cost_usd).label("total_cost"),
-        func.count(TraceEvent.id).label("call_count")
-    ).where(and_(*provider_conditions)).group_by(TraceEvent.provider).order_by(func.sum(TraceEvent.cost_usd).desc())
+    # All three aggregates read closed hours/days from usage rollups and only
+    # the open hour from raw events. Filtered by tenant_id (Clerk user ID) OR
+    # user_id, and by customer_id if specified (otherwise customer-specific
+    # events are excluded).
     
-    provider_results = session.exec(provider_stmt).all()
-    provider_total = sum(r.total_cost or 0 for r in provider_results)
+    # 1. Provider stats (excluding "internal")
+    provider_results = query_usage(
+        session, user_id, clerk_user_id, cutoff_hours,
+        dims=("provider",),
+        usage_filter=customer_filter(customer_id, not_in={"provider": ["internal"]}),
+    )
+    provider_total = sum(r["cost_usd"] for r in provider_results)
     
     print(f"[dashboard-all] QUERY RESULT: Found {len(provider_results)} providers, total_cost={provider_total}", flush=True)
     
     providers = [
         {
-            "provider": r.provider,
-            "total_cost": r.total_cost or 0,
-            "call_count": r.call_count,
-            "percentage": round((r.total_cost or 0) / provider_total * 100, 1) if provider_total > 0 else 0
+            "provider": r["provider"],
+            "total_cost": r["cost_usd"],
+            "call_count": r["call_count"],
+            "percentage": round(r["cost_usd"] / provider_total * 100, 1) if provider_total > 0 else 0
         }
         for r in provider_results
     ]
     
     # 2. Model stats
-    # CRITICAL: Filter by tenant_id OR user_id to match both API key events and direct events
-    model_conditions = [
-        TraceEvent.created_at >= cutoff_hours,
-        TraceEvent.model.isnot(None)
-    ]
-    # Filter by customer_id if specified, otherwise exclude customer-specific events
-    if customer_id:
-        model_conditions.append(TraceEvent.customer_id == customer_id)
-    else:
-        model_conditions.append(TraceEvent.customer_id.is_(None))
-    # Same user filtering as provider query
-    if clerk_user_id:
-        model_conditions.append(
-            or_(
-                TraceEvent.tenant_id == clerk_user_id,
-                TraceEvent.user_id == user_id
-            )
-        )
-    else:
-        model_conditions.append(TraceEvent.user_id == user_id)
-    
-    model_stmt = select(
-        TraceEvent.provider,
-        TraceEvent.model,
-        func.sum(TraceEvent.cost_usd).label("total_cost"),
-        func.count(TraceEvent.id).label("call_count"),
-        func.sum(TraceEvent.input_tokens).label("input_tokens"),
-        func.sum(TraceEvent.output_tokens).label("output_tokens"),
-        func.avg(TraceEvent.latency_ms).label("avg_latency")
-    ).where(and_(*model_conditions)).group_by(TraceEvent.provider, TraceEvent.model).order_by(func.sum(TraceEvent.cost_usd).desc())
-    
-    model_results = session.exec(model_stmt).all()
+    model_results = query_usage(
+        session, user_id, clerk_user_id, cutoff_hours,
+        dims=("provider", "model"),
+        usage_filter=customer_filter(customer_id, not_null=("model",)),
+    )
     
     models = [
         {
-            "provider": r.provider,
-            "model": r.model,
-            "total_cost": r.total_cost or 0,
-            "call_count": r.call_count,
-            "input_tokens": r.input_tokens or 0,
-            "output_tokens": r.output_tokens or 0,
-            "avg_latency": round(r.avg_latency or 0, 2)
+            "provider": r["provider"],
+            "model": r["model"],
+            "total_cost": r["cost_usd"],
+            "call_count": r["call_count"],
+            "input_tokens": r["input_tokens"],
+            "output_tokens": r["output_tokens"],
+            "avg_latency": round(r["latency_ms_sum"] / r["call_count"] if r["call_count"] else 0, 2)
         }
         for r in model_results
     ]
     
     # 3. Daily aggregates (for the chart)
-    from db import IS_POSTGRESQL
-    if IS_POSTGRESQL:
-        date_trunc = func.date_trunc('day', TraceEvent.created_at)
-    else:
-        date_trunc = func.date(TraceEvent.created_at)
-    
-    # 3. Daily aggregates - filter by tenant_id OR user_id to match both API key events and direct events
-    daily_conditions = [
-        TraceEvent.created_at >= cutoff_days
-    ]
-    # Filter by customer_id if specified, otherwise exclude customer-specific events
-    if customer_id:
-        daily_conditions.append(TraceEvent.customer_id == customer_id)
-    else:
-        daily_conditions.append(TraceEvent.customer_id.is_(None))
-    # Same user filtering as other queries
-    if clerk_user_id:
-        daily_conditions.append(
-            or_(
-                TraceEvent.tenant_id == clerk_user_id,
-                TraceEvent.user_id == user_id
-            )
-        )
-    else:
-        daily_conditions.append(TraceEvent.user_id == user_id)
-    
-    daily_stmt = select(
-        date_trunc.label("date"),
-        func.sum(TraceEvent.cost_usd).label("total_cost"),
-        func.count(TraceEvent.id).label("call_count")
-    ).where(and_(*daily_conditions)).group_by(date_trunc).order_by(date_trunc)
-    
-    daily_results = session.exec(daily_stmt).all()
+    daily_results = query_usage(
+        session, user_id, clerk_user_id, cutoff_days,
+        usage_filter=customer_filter(customer_id),
+        time_grain="day",
+    )
     
     daily = [
         {
-            "date": str(r.date)[:10] if r.date else None,
-            "total_cost": r.total_cost or 0,
-            "call_count": r.call_count
+            "date": str(r["bucket"])[:10],
+            "total_cost": r["cost_usd"],
+            "call_count": r["call_count"]
         }
-        for r in daily_results
+        for r in sorted(daily_results, key=lambda r: r["bucket"])
     ]
     
     query_time = (time.time() - query_start) * 1000
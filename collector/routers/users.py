@@ -6,7 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, Header
 from sqlmodel import Session, select
 from db import get_session
 from models import User, APIKey
-from auth import generate_api_key, hash_api_key, get_key_prefix
+from auth import generate_api_key, hash_api_key, compute_lookup_hash, get_key_prefix
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -60,6 +60,7 @@ async def clerk_webhook(
         first_key = APIKey(
             user_id=user.id,
             key_hash=key_hash,
+            lookup_hash=compute_lookup_hash(api_key),
             key_prefix=key_prefix,
             name="Default API Key",
         )
@@ -180,6 +181,7 @@ async def sync_user_from_clerk(
     first_key = APIKey(
         user_id=user.id,
         key_hash=key_hash,
+        lookup_hash=compute_lookup_hash(api_key),
         key_prefix=key_prefix,
         name="Default API Key",
     )
@@ -12,6 +12,7 @@ from sqlmodel import Session, select, func, and_, or_
 from sqlalchemy import case, distinct
 from models import TraceEvent
 from db import get_session
+from rollups import query_usage, UsageFilter
 from auth import get_current_user_id
 from clerk_auth import get_current_clerk_user
 
@@ -295,41 +296,33 @@ async def get_voice_costs_by_segment(
     Shows where the money goes in your voice pipeline.
     """
     user_id = current_user.id
-    user_filter = build_user_filter(current_user, user_id)
     cutoff = datetime.utcnow() - timedelta(hours=hours)
     
-    statement = select(
-        TraceEvent.voice_segment_type,
-        func.sum(TraceEvent.cost_usd).label("total_cost"),
-        func.sum(TraceEvent.audio_duration_seconds).label("total_duration"),
-        func.count(TraceEvent.id).label("event_count"),
-        func.avg(TraceEvent.latency_ms).label("avg_latency"),
-    ).where(
-        and_(
-            TraceEvent.created_at >= cutoff,
-            user_filter,
-            TraceEvent.voice_segment_type.isnot(None),
-            TraceEvent.voice_segment_type != "call_summary",  # Exclude summaries
-        )
-    ).group_by(TraceEvent.voice_segment_type).order_by(func.sum(TraceEvent.cost_usd).desc())
-    
-    results = session.exec(statement).all()
+    # Sums only, so this reads usage rollups (+ raw events for the open hour)
+    results = query_usage(
+        session, user_id, current_user.clerk_user_id, cutoff,
+        dims=("voice_segment_type",),
+        usage_filter=UsageFilter(
+            not_null=("voice_segment_type",),
+            not_in={"voice_segment_type": ["call_summary"]},  # Exclude summaries
+        ),
+    )
     
-    total_cost = sum(r.total_cost or 0 for r in results)
+    total_cost = sum(r["cost_usd"] for r in results)
     
     segments = []
     for r in results:
-        duration_minutes = (r.total_duration or 0) / 60.0
-        cost_per_minute = (r.total_cost / duration_minutes) if duration_minutes > 0 else 0
+        duration_minutes = r["audio_seconds"] / 60.0
+        cost_per_minute = (r["cost_usd"] / duration_minutes) if duration_minutes > 0 else 0
         
         segments.append({
-            "segment_type": r.voice_segment_type,
-            "total_cost": round(r.total_cost or 0.0, 6),
-            "total_duration_seconds": round(r.total_duration or 0.0, 2),
-            "event_count": r.event_count,
-            "avg_latency_ms": round(r.avg_latency or 0.0, 2),
+            "segment_type": r["voice_segment_type"],
+            "total_cost": round(r["cost_usd"], 6),
+            "total_duration_seconds": round(r["audio_seconds"], 2),
+            "event_count": r["call_count"],
+            "avg_latency_ms": round(r["latency_ms_sum"] / r["call_count"] if r["call_count"] else 0.0, 2),
             "cost_per_minute": round(cost_per_minute, 4),
-            "percentage": round((r.total_cost / total_cost * 100) if total_cost > 0 else 0, 2),
+            "percentage": round((r["cost_usd"] / total_cost * 100) if total_cost > 0 else 0, 2),
         })
     
     return segments
@@ -561,26 +554,14 @@ async def get_alternative_costs(
     alternative costs - not just per-minute estimates.
     """
     user_id = current_user.id
-    user_filter = build_user_filter(current_user, user_id)
     cutoff = datetime.utcnow() - timedelta(hours=hours)
     
-    # Get aggregated usage by segment type
-    statement = select(
-        TraceEvent.voice_segment_type,
-        func.sum(TraceEvent.input_tokens).label("total_input_tokens"),
-        func.sum(TraceEvent.output_tokens).label("total_output_tokens"),
-        func.sum(TraceEvent.audio_duration_seconds).label("total_duration"),
-        func.sum(TraceEvent.cost_usd).label("actual_cost"),
-        func.count(TraceEvent.id).label("event_count"),
-    ).where(
-        and_(
-            TraceEvent.created_at >= cutoff,
-            user_filter,
-            TraceEvent.voice_segment_type.isnot(None),
-        )
-    ).group_by(TraceEvent.voice_segment_type)
-    
-    results = session.exec(statement).all()
+    # Get aggregated usage by segment type (usage rollups + raw events for the open hour)
+    results = query_usage(
+        session, user_id, current_user.clerk_user_id, cutoff,
+        dims=("voice_segment_type",),
+        usage_filter=UsageFilter(not_null=("voice_segment_type",)),
+    )
     
     # Build usage summary
     usage = {
@@ -590,18 +571,18 @@ async def get_alternative_costs(
     }
     
     for r in results:
-        seg_type = r.voice_segment_type
+        seg_type = r["voice_segment_type"]
         if seg_type == "stt":
-            usage["stt"]["duration_minutes"] = (r.total_duration or 0) / 60.0
-            usage["stt"]["actual_cost"] = r.actual_cost or 0
+            usage["stt"]["duration_minutes"] = r["audio_seconds"] / 60.0
+            usage["stt"]["actual_cost"] = r["cost_usd"]
         elif seg_type == "llm":
-            usage["llm"]["input_tokens"] = r.total_input_tokens or 0
-            usage["llm"]["output_tokens"] = r.total_output_tokens or 0
-            usage["llm"]["actual_cost"] = r.actual_cost or 0
+            usage["llm"]["input_tokens"] = r["input_tokens"]
+            usage["llm"]["output_tokens"] = r["output_tokens"]
+            usage["llm"]["actual_cost"] = r["cost_usd"]
         elif seg_type == "tts":
             # TTS characters are stored in input_tokens field
-            usage["tts"]["characters"] = r.total_input_tokens or 0
-            usage["tts"]["actual_cost"] = r.actual_cost or 0
+            usage["tts"]["characters"] = r["input_tokens"]
+            usage["tts"]["actual_cost"] = r["cost_usd"]
     
     # Calculate alternative costs for each segment
     alternatives = {
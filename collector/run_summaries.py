@@ -0,0 +1,289 @@
+"""
+Per-run summaries for the runs list (/runs/latest).
+
+Ingest upserts one row per (run, owner) in the same transaction as the
+events: earliest/latest event time, summed cost and event count. The owner
+is resolved per event with the spend counters' rule - the event's user_id,
+else the user whose clerk_user_id is its tenant_id - so each run has one
+row per owner and is never split across pages. Events neither rule
+attributes to a user are not listed.
+
+The runs list then pages with a real keyset - the cursor predicate sits in
+WHERE on run_summaries and walks the (owner, started_at DESC, run_id DESC)
+index - so a deep page costs the same as the first. Only the runs on the
+page are joined back to trace_events (for their sections).
+
+The collector backfills an empty summary table from existing events on
+startup (backfill_run_summaries_if_empty). To rebuild by hand (after bulk
+edits or deletes):
+
+    python run_summaries.py
+    POST /migrations/rebuild-run-summaries  (X-LLMObserve-Admin-Token)
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, insert, or_
+from sqlmodel import Session, select
+
+from db import lock_derived_tables
+from models import RunSummary, TraceEvent, User
+
+logger = logging.getLogger(__name__)
+
+_KEY_COLUMNS = ("run_id", "user_id")
+
+# (run_id, owner user ID)
+RunKey = Tuple[str, str]
+
+
+# =============================================================================
+# Ingest
+# =============================================================================
+
+def _clerk_owners(session: Session, tenant_ids: Iterable[str]) -> Dict[str, str]:
+    """{clerk_user_id: user ID} for the tenant IDs that belong to a user."""
+    tenant_ids = [tenant_id for tenant_id in set(tenant_ids) if tenant_id]
+    if not tenant_ids:
+        return {}
+    return {
+        clerk_id: str(user_id)
+        for user_id, clerk_id in session.exec(
+            select(User.id, User.clerk_user_id).where(User.clerk_user_id.in_(tenant_ids))
+        ).all()
+    }
+
+
+def _owner(user_id: Any, tenant_id: Optional[str], clerk_owners: Dict[str, str]) -> Optional[str]:
+    if user_id:
+        return str(user_id)
+    return clerk_owners.get(tenant_id)
+
+
+def _upsert_statement(session: Session, increment: bool):
+    """INSERT ... ON CONFLICT on the run key, merging (or replacing) the totals."""
+    table = RunSummary.__table__
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        earliest, latest = func.least, func.greatest
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        # Two-argument min()/max() are scalar functions in SQLite
+        earliest, latest = func.min, func.max
+    else:
+        return insert(table)
+
+    statement = dialect_insert(table)
+    if increment:
+        values = {
+            "started_at": earliest(table.c.started_at, statement.excluded.started_at),
+            "last_event_at": latest(table.c.last_event_at, statement.excluded.last_event_at),
+            "total_cost": table.c.total_cost + statement.excluded.total_cost,
+            "call_count": table.c.call_count + statement.excluded.call_count,
+            "updated_at": statement.excluded.updated_at,
+        }
+    else:
+        values = {
+            name: statement.excluded[name]
+            for name in ("started_at", "last_event_at", "total_cost", "call_count", "updated_at")
+        }
+    return statement.on_conflict_do_update(index_elements=list(_KEY_COLUMNS), set_=values)
+
+
+def _write_summaries(session: Session, summaries: Dict[RunKey, List[Any]], increment: bool) -> int:
+    if not summaries:
+        return 0
+    now = datetime.utcnow()
+    # Sorted keys give concurrent ingest transactions a consistent lock order (no deadlocks)
+    rows = [
+        dict(
+            zip(_KEY_COLUMNS, key),
+            started_at=started_at,
+            last_event_at=last_event_at,
+            total_cost=total_cost,
+            call_count=int(call_count),
+            updated_at=now,
+        )
+        for key, (started_at, last_event_at, total_cost, call_count) in sorted(summaries.items())
+    ]
+    session.execute(_upsert_statement(session, increment), rows)
+    return len(rows)
+
+
+def apply_run_deltas(session: Session, rows: Iterable[Dict[str, Any]]) -> int:
+    """
+    Add freshly ingested event rows to their runs' summaries.
+
+    Call inside the ingest transaction (before commit). Returns the number
+    of summary rows touched.
+    """
+    rows = [row for row in rows if row.get("run_id")]
+    # Only rows ingested without a user need the tenant -> user lookup
+    clerk_owners = _clerk_owners(session, (row.get("tenant_id") for row in rows if not row.get("user_id")))
+
+    summaries: Dict[RunKey, List[Any]] = {}
+    for row in rows:
+        owner = _owner(row.get("user_id"), row.get("tenant_id"), clerk_owners)
+        if owner is None:
+            continue
+        created_at = row.get("created_at") or datetime.utcnow()
+        key = (row["run_id"], owner)
+        summary = summaries.get(key)
+        if summary is None:
+            summaries[key] = [created_at, created_at, float(row.get("cost_usd") or 0.0), 1]
+        else:
+            summary[0] = min(summary[0], created_at)
+            summary[1] = max(summary[1], created_at)
+            summary[2] += float(row.get("cost_usd") or 0.0)
+            summary[3] += 1
+    return _write_summaries(session, summaries, increment=True)
+
+
+# =============================================================================
+# Queries
+# =============================================================================
+
+def latest_run_summaries(
+    session: Session,
+    user_id,
+    limit: int,
+    before: Optional[Tuple[datetime, str]] = None,
+) -> List[RunSummary]:
+    """
+    One page of the user's runs, newest first, strictly after `before`
+    ((started_at, run_id) of the previous page's last run).
+
+    A single keyset scan of the owner index: each run is one row, so the
+    page holds whole runs and no run appears on two pages.
+    """
+    statement = select(RunSummary).where(RunSummary.user_id == str(user_id))
+    if before:
+        started_at, run_id = before
+        statement = statement.where(
+            or_(
+                RunSummary.started_at < started_at,
+                and_(RunSummary.started_at == started_at, RunSummary.run_id < run_id),
+            )
+        )
+    statement = statement.order_by(RunSummary.started_at.desc(), RunSummary.run_id.desc()).limit(limit)
+    return list(session.exec(statement).all())
+
+
+def run_sections(session: Session, run_ids: List[str], owner_filter) -> Dict[str, Dict[str, Any]]:
+    """
+    {run_id: {"sections": [...], "first_section": ..., "first_section_path": ...}}
+    for a page of runs, from one grouped query over just those runs' events.
+    """
+    if not run_ids:
+        return {}
+    statement = (
+        select(
+            TraceEvent.run_id,
+            TraceEvent.section,
+            TraceEvent.section_path,
+            func.min(TraceEvent.created_at),
+        )
+        .where(TraceEvent.run_id.in_(run_ids), owner_filter)
+        .group_by(TraceEvent.run_id, TraceEvent.section, TraceEvent.section_path)
+    )
+    groups: Dict[str, List[Tuple[Any, ...]]] = defaultdict(list)
+    for run_id, section, section_path, first_at in session.exec(statement).all():
+        groups[run_id].append((first_at, section or "", section_path or "", section, section_path))
+
+    details = {}
+    for run_id, rows in groups.items():
+        rows.sort()
+        with_path = [row for row in rows if row[4] is not None]
+        details[run_id] = {
+            "sections": sorted({row[3] for row in rows if row[3] is not None}),
+            "first_section": rows[0][3],
+            "first_section_path": with_path[0][4] if with_path else None,
+        }
+    return details
+
+
+# =============================================================================
+# Rebuild
+# =============================================================================
+
+def rebuild_run_summaries(session: Session) -> Dict[str, int]:
+    """
+    Recompute every run summary from trace_events (one GROUP BY).
+    Existing summaries are replaced. Holds the derived-tables lock until
+    the caller commits (ingest waits). Does not commit.
+    """
+    lock_derived_tables(session, exclusive=True)
+    clerk_owners = {
+        clerk_id: str(user_id)
+        for user_id, clerk_id in session.exec(
+            select(User.id, User.clerk_user_id).where(User.clerk_user_id.is_not(None))
+        ).all()
+    }
+    statement = select(
+        TraceEvent.run_id,
+        TraceEvent.tenant_id,
+        TraceEvent.user_id,
+        func.min(TraceEvent.created_at),
+        func.max(TraceEvent.created_at),
+        func.sum(TraceEvent.cost_usd),
+        func.count(TraceEvent.id),
+    ).where(TraceEvent.run_id.isnot(None)).group_by(TraceEvent.run_id, TraceEvent.tenant_id, TraceEvent.user_id)
+
+    # Several (tenant_id, user_id) groups can resolve to the same owner
+    summaries: Dict[RunKey, List[Any]] = {}
+    events = 0
+    for run_id, tenant_id, user_id, started_at, last_event_at, total_cost, call_count in session.exec(statement).all():
+        owner = _owner(user_id, tenant_id, clerk_owners)
+        if owner is None:
+            continue
+        summary = summaries.get((run_id, owner))
+        if summary is None:
+            summaries[(run_id, owner)] = [started_at, last_event_at, float(total_cost or 0.0), int(call_count)]
+        else:
+            summary[0] = min(summary[0], started_at)
+            summary[1] = max(summary[1], last_event_at)
+            summary[2] += float(total_cost or 0.0)
+            summary[3] += int(call_count)
+        events += int(call_count)
+
+    session.execute(delete(RunSummary))
+    written = 0
+    keys = list(summaries)
+    for start in range(0, len(keys), 5000):
+        chunk = {key: summaries[key] for key in keys[start:start + 5000]}
+        written += _write_summaries(session, chunk, increment=False)
+
+    logger.info(f"[RunSummaries] Rebuilt {written} run summaries from {events} events")
+    return {"events": events, "runs": written}
+
+
+def backfill_run_summaries_if_empty(session: Session) -> Optional[Dict[str, int]]:
+    """
+    Rebuild when the summary table is empty (first deploy, fresh restore) -
+    otherwise the runs list shows nothing. Commits; returns the rebuild
+    stats, or None if summaries already exist.
+    """
+    # Checked under the lock, so workers starting together rebuild only once
+    lock_derived_tables(session, exclusive=True)
+    if session.exec(select(RunSummary.run_id).limit(1)).first() is not None:
+        return None
+    stats = rebuild_run_summaries(session)
+    if not stats["runs"]:
+        return None
+    session.commit()
+    return stats
+
+
+if __name__ == "__main__":
+    # Backfill run summaries from existing events
+    from db import SessionLocal, init_db
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    with SessionLocal() as rebuild_session:
+        result = rebuild_run_summaries(rebuild_session)
+        rebuild_session.commit()
+    print(f"[RunSummaries] Rebuild complete: {result}")
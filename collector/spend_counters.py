@@ -0,0 +1,427 @@
+"""
+Incremental spend counters for spending caps.
+
+Ingest adds each batch's cost to per-(user, scope, period bucket) counters in
+the same transaction as the events. /caps/check and the cap monitor then read
+one counter row per cap instead of running SUM(cost_usd) over trace_events
+(the monitor reads every enabled cap's counter in one query per chunk).
+
+Counters are maintained for every dimension a cap can target, so creating a
+new cap needs no backfill:
+
+    global                     all spend
+    provider / model / agent   provider, model, section
+    customer                   customer_id
+    customer + provider|model  customer_id narrowed by provider or model
+
+The collector backfills an empty counter table from existing events on
+startup (backfill_spend_counters_if_empty), and recalculate_costs.py
+rebuilds the counters after changing costs. To rebuild by hand (after bulk
+edits or deletes):
+
+    python spend_counters.py            # all users, current periods
+    POST /migrations/rebuild-spend-counters   (X-LLMObserve-Admin-Token)
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, func, insert, tuple_
+from sqlmodel import Session, select
+
+from db import lock_derived_tables
+from models import SpendCounter, TraceEvent, User
+
+logger = logging.getLogger(__name__)
+
+SPEND_COUNTER_PERIODS = ("daily", "weekly", "monthly")
+
+# Counter buckets older than this are never read by caps (longest period is a month)
+SPEND_COUNTER_RETENTION_DAYS = 62
+
+# (scope, target, sub_scope, sub_target)
+CounterScope = Tuple[str, str, str, str]
+# (user_id, period, period_start) + CounterScope
+CounterKey = Tuple[UUID, str, datetime, str, str, str, str]
+
+_KEY_COLUMNS = ("user_id", "period", "period_start", "scope", "target", "sub_scope", "sub_target")
+
+
+def period_bounds(period: str, at: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """Start and end of the period bucket containing `at` (defaults to now, UTC)."""
+    now = at or datetime.utcnow()
+
+    if period == "daily":
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        end = start + timedelta(days=1)
+    elif period == "weekly":
+        start = now - timedelta(days=now.weekday())
+        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        end = start + timedelta(days=7)
+    elif period == "monthly":
+        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        # Next month
+        if now.month == 12:
+            end = start.replace(year=start.year + 1, month=1)
+        else:
+            end = start.replace(month=start.month + 1)
+    else:
+        raise ValueError(f"Invalid period: {period}")
+
+    return start, end
+
+
+def cap_counter_scope(
+    cap_type: str,
+    target_name: Optional[str],
+    sub_scope: Optional[str] = None,
+    sub_target: Optional[str] = None,
+) -> CounterScope:
+    """
+    Map a cap definition to the counter scope that holds its spend.
+
+    Mirrors the filters in routers.caps.calculate_current_spend: a non-global
+    cap without a target, or a customer sub-scope without a sub-target,
+    falls back to the broader scope.
+    """
+    if cap_type in ("provider", "model", "agent") and target_name:
+        return (cap_type, target_name, "", "")
+    if cap_type == "customer" and target_name:
+        if sub_scope in ("provider", "model") and sub_target:
+            return ("customer", target_name, sub_scope, sub_target)
+        return ("customer", target_name, "", "")
+    return ("global", "", "", "")
+
+
+def event_counter_scopes(
+    provider: Optional[str],
+    model: Optional[str],
+    section: Optional[str],
+    customer_id: Optional[str],
+) -> List[CounterScope]:
+    """Every counter scope a single event contributes to."""
+    scopes: List[CounterScope] = [("global", "", "", "")]
+    if provider:
+        scopes.append(("provider", provider, "", ""))
+    if model:
+        scopes.append(("model", model, "", ""))
+    if section:
+        scopes.append(("agent", section, "", ""))
+    if customer_id:
+        scopes.append(("customer", customer_id, "", ""))
+        if provider:
+            scopes.append(("customer", customer_id, "provider", provider))
+        if model:
+            scopes.append(("customer", customer_id, "model", model))
+    return scopes
+
+
+def _accumulate(
+    deltas: Dict[CounterKey, List[float]],
+    user_id: UUID,
+    at: datetime,
+    provider: Optional[str],
+    model: Optional[str],
+    section: Optional[str],
+    customer_id: Optional[str],
+    spend: float,
+    count: int,
+    periods: Iterable[str] = SPEND_COUNTER_PERIODS,
+) -> None:
+    scopes = event_counter_scopes(provider, model, section, customer_id)
+    for period in periods:
+        period_start, _ = period_bounds(period, at)
+        for scope in scopes:
+            delta = deltas[(user_id, period, period_start) + scope]
+            delta[0] += spend
+            delta[1] += count
+
+
+def _upsert_statement(session: Session, increment: bool):
+    """INSERT ... ON CONFLICT on the counter key, adding to (or replacing) the totals."""
+    table = SpendCounter.__table__
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(table)
+
+    statement = dialect_insert(table)
+    if increment:
+        values = {
+            "spend_usd": table.c.spend_usd + statement.excluded.spend_usd,
+            "event_count": table.c.event_count + statement.excluded.event_count,
+            "updated_at": statement.excluded.updated_at,
+        }
+    else:
+        values = {
+            "spend_usd": statement.excluded.spend_usd,
+            "event_count": statement.excluded.event_count,
+            "updated_at": statement.excluded.updated_at,
+        }
+    return statement.on_conflict_do_update(index_elements=list(_KEY_COLUMNS), set_=values)
+
+
+def _write_counters(session: Session, deltas: Dict[CounterKey, List[float]], increment: bool) -> int:
+    if not deltas:
+        return 0
+    now = datetime.utcnow()
+    # Sorted keys give concurrent ingest transactions a consistent lock order (no deadlocks)
+    rows = [
+        dict(zip(_KEY_COLUMNS, key), spend_usd=spend, event_count=int(count), updated_at=now)
+        for key, (spend, count) in sorted(deltas.items(), key=lambda item: tuple(str(part) for part in item[0]))
+    ]
+    session.execute(_upsert_statement(session, increment), rows)
+    return len(rows)
+
+
+def apply_spend_deltas(session: Session, rows: Iterable[Dict[str, Any]]) -> int:
+    """
+    Add freshly ingested event rows to the spend counters.
+
+    Call inside the ingest transaction (before commit). Rows without a
+    user_id cannot be matched to a cap owner and are ignored. Returns the
+    number of counter rows touched.
+    """
+    deltas: Dict[CounterKey, List[float]] = defaultdict(lambda: [0.0, 0])
+    for row in rows:
+        user_id = row.get("user_id")
+        if not user_id:
+            continue
+        _accumulate(
+            deltas,
+            user_id,
+            row.get("created_at") or datetime.utcnow(),
+            row.get("provider"),
+            row.get("model"),
+            row.get("section"),
+            row.get("customer_id"),
+            float(row.get("cost_usd") or 0.0),
+            1,
+        )
+    return _write_counters(session, deltas, increment=True)
+
+
+def _cap_counter_key(cap: Any, at: Optional[datetime] = None) -> Tuple[str, datetime, str, str, str, str]:
+    """(period, period_start) + counter scope holding a cap's current-period spend."""
+    period_start, _ = period_bounds(cap.period, at)
+    scope = cap_counter_scope(
+        cap.cap_type,
+        cap.target_name,
+        getattr(cap, "sub_scope", None),
+        getattr(cap, "sub_target", None),
+    )
+    return (cap.period, period_start) + scope
+
+
+def read_cap_spend(
+    session: Session,
+    user_id: UUID,
+    caps: Iterable[Any],
+    at: Optional[datetime] = None,
+) -> Dict[Any, float]:
+    """
+    Current-period spend for each cap, read from counters in one query.
+
+    `caps` are SpendingCap rows (or anything with the same attributes).
+    Returns {cap.id: spend}.
+    """
+    caps = list(caps)
+    if not caps:
+        return {}
+
+    keys_by_cap = {cap.id: _cap_counter_key(cap, at) for cap in caps}
+
+    key_columns = tuple_(
+        SpendCounter.period,
+        SpendCounter.period_start,
+        SpendCounter.scope,
+        SpendCounter.target,
+        SpendCounter.sub_scope,
+        SpendCounter.sub_target,
+    )
+    statement = select(
+        SpendCounter.period,
+        SpendCounter.period_start,
+        SpendCounter.scope,
+        SpendCounter.target,
+        SpendCounter.sub_scope,
+        SpendCounter.sub_target,
+        SpendCounter.spend_usd,
+    ).where(
+        SpendCounter.user_id == user_id,
+        key_columns.in_(list(set(keys_by_cap.values()))),
+    )
+    spend_by_key = {tuple(row[:6]): float(row[6] or 0.0) for row in session.exec(statement).all()}
+    return {cap_id: spend_by_key.get(key, 0.0) for cap_id, key in keys_by_cap.items()}
+
+
+def read_spend_for_caps(
+    session: Session,
+    caps: Iterable[Any],
+    at: Optional[datetime] = None,
+    chunk_size: int = 500,
+) -> Dict[Any, float]:
+    """
+    Current-period spend for caps of any number of users.
+
+    Like read_cap_spend, but keyed on each cap's user_id so the cap monitor
+    can read every enabled cap in one query per `chunk_size` distinct
+    counter keys. Returns {cap.id: spend}.
+    """
+    keys_by_cap = {cap.id: (cap.user_id,) + _cap_counter_key(cap, at) for cap in caps}
+    if not keys_by_cap:
+        return {}
+
+    key_columns = tuple_(
+        SpendCounter.user_id,
+        SpendCounter.period,
+        SpendCounter.period_start,
+        SpendCounter.scope,
+        SpendCounter.target,
+        SpendCounter.sub_scope,
+        SpendCounter.sub_target,
+    )
+    keys = list(set(keys_by_cap.values()))
+    spend_by_key: Dict[CounterKey, float] = {}
+    for start in range(0, len(keys), chunk_size):
+        statement = select(
+            SpendCounter.user_id,
+            SpendCounter.period,
+            SpendCounter.period_start,
+            SpendCounter.scope,
+            SpendCounter.target,
+            SpendCounter.sub_scope,
+            SpendCounter.sub_target,
+            SpendCounter.spend_usd,
+        ).where(key_columns.in_(keys[start:start + chunk_size]))
+        for row in session.exec(statement).all():
+            spend_by_key[tuple(row[:7])] = float(row[7] or 0.0)
+    return {cap_id: spend_by_key.get(key, 0.0) for cap_id, key in keys_by_cap.items()}
+
+
+def prune_spend_counters(session: Session, before: Optional[datetime] = None) -> int:
+    """Delete counter buckets that no cap period can reach any more."""
+    cutoff = before or (datetime.utcnow() - timedelta(days=SPEND_COUNTER_RETENTION_DAYS))
+    result = session.execute(delete(SpendCounter).where(SpendCounter.period_start < cutoff))
+    return result.rowcount or 0
+
+
+def rebuild_spend_counters(
+    session: Session,
+    user_id: Optional[UUID] = None,
+    at: Optional[datetime] = None,
+) -> Dict[str, int]:
+    """
+    Recompute current-period counters from trace_events.
+
+    One GROUP BY over the monthly window per period; events are attributed
+    to users by user_id, or by tenant_id == users.clerk_user_id for events
+    ingested without a user reference (same rule as calculate_current_spend).
+    Existing counters for the rebuilt buckets are replaced, not added to.
+    Holds the derived-tables lock until the caller commits (ingest waits).
+    Does not commit.
+    """
+    lock_derived_tables(session, exclusive=True)
+    clerk_to_user = {
+        clerk_id: uid
+        for uid, clerk_id in session.exec(
+            select(User.id, User.clerk_user_id).where(User.clerk_user_id.is_not(None))
+        ).all()
+    }
+
+    stats = {"events": 0, "counters": 0}
+    if user_id:
+        user = session.get(User, user_id)
+        owner_filter = TraceEvent.user_id == user_id
+        if user and user.clerk_user_id:
+            owner_filter = (TraceEvent.user_id == user_id) | (TraceEvent.tenant_id == user.clerk_user_id)
+
+    for period in SPEND_COUNTER_PERIODS:
+        period_start, period_end = period_bounds(period, at)
+        statement = select(
+            TraceEvent.user_id,
+            TraceEvent.tenant_id,
+            TraceEvent.provider,
+            TraceEvent.model,
+            TraceEvent.section,
+            TraceEvent.customer_id,
+            func.sum(TraceEvent.cost_usd),
+            func.count(),
+        ).where(
+            TraceEvent.created_at >= period_start,
+            TraceEvent.created_at < period_end,
+        ).group_by(
+            TraceEvent.user_id,
+            TraceEvent.tenant_id,
+            TraceEvent.provider,
+            TraceEvent.model,
+            TraceEvent.section,
+            TraceEvent.customer_id,
+        )
+        if user_id:
+            statement = statement.where(owner_filter)
+
+        deltas: Dict[CounterKey, List[float]] = defaultdict(lambda: [0.0, 0])
+        for event_user_id, tenant_id, provider, model, section, customer_id, spend, count in session.exec(statement).all():
+            owner = event_user_id or clerk_to_user.get(tenant_id)
+            if not owner or (user_id and owner != user_id):
+                continue
+            if period == "monthly":
+                stats["events"] += int(count)
+            _accumulate(
+                deltas, owner, period_start, provider, model, section, customer_id,
+                float(spend or 0.0), int(count), periods=(period,),
+            )
+
+        clear = delete(SpendCounter).where(
+            SpendCounter.period == period,
+            SpendCounter.period_start == period_start,
+        )
+        if user_id:
+            clear = clear.where(SpendCounter.user_id == user_id)
+        session.execute(clear)
+        stats["counters"] += _write_counters(session, deltas, increment=False)
+
+    stats["pruned"] = prune_spend_counters(session)
+    logger.info(
+        f"[SpendCounters] Rebuilt {stats['counters']} counters from {stats['events']} events "
+        f"(pruned {stats['pruned']} stale buckets)"
+    )
+    return stats
+
+
+def backfill_spend_counters_if_empty(session: Session) -> Optional[Dict[str, int]]:
+    """
+    Rebuild counters when the table is empty (first deploy, fresh restore).
+
+    Until then /caps/check would read $0 for every cap. Commits; returns the
+    rebuild stats, or None if counters already exist.
+    """
+    # Checked under the lock, so workers starting together rebuild only once
+    lock_derived_tables(session, exclusive=True)
+    if session.exec(select(SpendCounter.user_id).limit(1)).first() is not None:
+        return None
+    if session.exec(select(TraceEvent.id).limit(1)).first() is None:
+        return None
+    stats = rebuild_spend_counters(session)
+    session.commit()
+    return stats
+
+
+if __name__ == "__main__":
+    # Backfill counters from existing events
+    import sys
+    from db import SessionLocal, init_db
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    target_user = UUID(sys.argv[1]) if len(sys.argv) > 1 else None
+    with SessionLocal() as rebuild_session:
+        result = rebuild_spend_counters(rebuild_session, user_id=target_user)
+        rebuild_session.commit()
+    print(f"[SpendCounters] Rebuild complete: {result}")
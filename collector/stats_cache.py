@@ -0,0 +1,337 @@
+"""
+Response cache for the stats/dashboard endpoints.
+
+Entries are keyed by endpoint + parameters + the current *generation* of
+every tenant scope the response covers (the user's ID, their Clerk tenant
+ID, an explicit tenant_id). Ingest bumps the generation of each scope it
+wrote to, so the next read for that tenant builds a new key and misses,
+while every other tenant keeps hitting. Orphaned entries age out through
+the LRU / TTL; nothing has to enumerate them.
+
+Backends (STATS_CACHE_BACKEND):
+    memory   Per-process LRU with O(1) get/set/evict (default). Generations
+             are per-process too, so with several uvicorn workers another
+             worker's ingest only becomes visible after the TTL.
+    sqlite   One SQLite file shared by all workers on the host (WAL mode).
+             Entries and generations are shared, so ingest on any worker
+             invalidates the tenant everywhere.
+
+Environment:
+    STATS_CACHE_BACKEND   memory | sqlite (default memory)
+    STATS_CACHE_PATH      SQLite file (default: <tmp>/llmobserve-stats-cache.db)
+    STATS_CACHE_TTL       Seconds an entry is served (default 300)
+    STATS_CACHE_MAX_SIZE  Max entries before eviction (default 1000)
+"""
+import abc
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+logger = logging.getLogger(__name__)
+
+STATS_CACHE_BACKEND = os.getenv("STATS_CACHE_BACKEND", "memory").lower()
+STATS_CACHE_PATH = os.getenv(
+    "STATS_CACHE_PATH", os.path.join(tempfile.gettempdir(), "llmobserve-stats-cache.db")
+)
+STATS_CACHE_TTL = int(os.getenv("STATS_CACHE_TTL", "300"))  # 5 minutes
+STATS_CACHE_MAX_SIZE = int(os.getenv("STATS_CACHE_MAX_SIZE", "1000"))
+
+
+class CacheBackend(abc.ABC):
+    """Interface for stats cache storage. Values are JSON-compatible."""
+
+    name = "base"
+
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "sets": 0, "evictions": 0, "invalidations": 0}
+        self._counter_lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._counter_lock:
+            self.counters[name] += amount
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value for `key`, or None on a miss or expired entry."""
+
+    @abc.abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        """Store `value` for the backend's TTL."""
+
+    @abc.abstractmethod
+    def clear(self) -> int:
+        """Drop every entry. Returns how many there were."""
+
+    @abc.abstractmethod
+    def generations(self, scopes: Sequence[str]) -> Tuple[int, ...]:
+        """Current generation of each scope (0 if never bumped)."""
+
+    @abc.abstractmethod
+    def bump(self, scopes: Iterable[str]) -> None:
+        """Invalidate every entry that covers any of `scopes`."""
+
+    @abc.abstractmethod
+    def size(self) -> int:
+        """Number of stored entries (expired ones included until evicted)."""
+
+    def stats(self) -> Dict[str, Any]:
+        with self._counter_lock:
+            counters = dict(self.counters)
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "backend": self.name,
+            "entries": self.size(),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+            **counters,
+        }
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process LRU: {key: (value, expires_at)} in access order."""
+
+    name = "memory"
+
+    def __init__(self, max_size: int = STATS_CACHE_MAX_SIZE, ttl_seconds: int = STATS_CACHE_TTL):
+        super().__init__(max_size, ttl_seconds)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return value
+                del self._entries[key]
+                self.counters["expired"] += 1
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            self.counters["sets"] += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            return count
+
+    def generations(self, scopes: Sequence[str]) -> Tuple[int, ...]:
+        return tuple(self._generations.get(scope, 0) for scope in scopes)
+
+    def bump(self, scopes: Iterable[str]) -> None:
+        with self._lock:
+            for scope in scopes:
+                self._generations[scope] = self._generations.get(scope, 0) + 1
+                self.counters["invalidations"] += 1
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Host-wide cache in a SQLite file, shared by all worker processes.
+
+    Eviction is oldest-write-first over an index on expires_at, run every
+    EVICT_EVERY sets rather than on each write so reads never take the
+    write lock. Hit/miss counters and the eviction countdown are per
+    process (the countdown is shared by this process's threads, under
+    self._lock).
+    """
+
+    name = "sqlite"
+    EVICT_EVERY = 50
+
+    def __init__(self, path: str = STATS_CACHE_PATH, max_size: int = STATS_CACHE_MAX_SIZE, ttl_seconds: int = STATS_CACHE_TTL):
+        super().__init__(max_size, ttl_seconds)
+        self.path = path
+        self._local = threading.local()
+        self._sets_since_evict = 0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stats_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_stats_cache_expires ON stats_cache(expires_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stats_cache_generations ("
+                " scope TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            row = self._connect().execute(
+                "SELECT value, expires_at FROM stats_cache WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"[stats-cache] read failed: {e}")
+            row = None
+        if row is not None:
+            value, expires_at = row
+            if time.time() < expires_at:
+                self._count("hits")
+                return json.loads(value)
+            self._count("expired")
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO stats_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                # Store what FastAPI would serialize (datetimes, UUIDs -> str)
+                (key, json.dumps(jsonable_encoder(value)), time.time() + self.ttl_seconds),
+            )
+            self._count("sets")
+            with self._lock:
+                self._sets_since_evict += 1
+                evict = self._sets_since_evict >= self.EVICT_EVERY
+                if evict:
+                    self._sets_since_evict = 0
+            if evict:
+                self._evict(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"[stats-cache] write failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM stats_cache WHERE expires_at <= ?", (time.time(),))
+        expired = conn.execute("SELECT changes()").fetchone()[0]
+        excess = self.size() - self.max_size
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM stats_cache WHERE key IN "
+                "(SELECT key FROM stats_cache ORDER BY expires_at LIMIT ?)",
+                (excess,),
+            )
+        self._count("expired", expired)
+        self._count("evictions", max(0, excess))
+
+    def clear(self) -> int:
+        conn = self._connect()
+        count = self.size()
+        conn.execute("DELETE FROM stats_cache")
+        return count
+
+    def generations(self, scopes: Sequence[str]) -> Tuple[int, ...]:
+        if not scopes:
+            return ()
+        try:
+            placeholders = ",".join("?" * len(scopes))
+            rows = self._connect().execute(
+                f"SELECT scope, generation FROM stats_cache_generations WHERE scope IN ({placeholders})",
+                list(scopes),
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"[stats-cache] generation read failed: {e}")
+            # Unknown generation - use a key nobody else will build
+            return (-int(time.time() * 1000),) * len(scopes)
+        current = dict(rows)
+        return tuple(current.get(scope, 0) for scope in scopes)
+
+    def bump(self, scopes: Iterable[str]) -> None:
+        scopes = sorted(set(scopes))
+        if not scopes:
+            return
+        try:
+            self._connect().executemany(
+                "INSERT INTO stats_cache_generations (scope, generation) VALUES (?, 1) "
+                "ON CONFLICT(scope) DO UPDATE SET generation = generation + 1",
+                [(scope,) for scope in scopes],
+            )
+            self._count("invalidations", len(scopes))
+        except sqlite3.Error as e:
+            logger.error(f"[stats-cache] failed to invalidate {len(scopes)} scope(s): {e}")
+
+    def size(self) -> int:
+        try:
+            return self._connect().execute("SELECT COUNT(*) FROM stats_cache").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+
+def _create_backend() -> CacheBackend:
+    if STATS_CACHE_BACKEND == "sqlite":
+        try:
+            return SQLiteCacheBackend()
+        except sqlite3.Error as e:
+            logger.error(f"[stats-cache] cannot open {STATS_CACHE_PATH} ({e}), using in-memory cache")
+    elif STATS_CACHE_BACKEND != "memory":
+        logger.warning(f"[stats-cache] unknown STATS_CACHE_BACKEND={STATS_CACHE_BACKEND!r}, using in-memory cache")
+    return MemoryCacheBackend()
+
+
+stats_cache: CacheBackend = _create_backend()
+
+
+# =============================================================================
+# Scopes
+# =============================================================================
+
+def user_scope(user_id: Any) -> str:
+    return f"user:{user_id}"
+
+
+def tenant_scope(tenant_id: str) -> str:
+    return f"tenant:{tenant_id}"
+
+
+def reader_scopes(user_id: Any, clerk_user_id: Optional[str] = None, tenant_id: Optional[str] = None) -> Tuple[str, ...]:
+    """Scopes whose events can appear in a response for this user."""
+    scopes = [user_scope(user_id)]
+    for tenant in (clerk_user_id, tenant_id):
+        if tenant and tenant_scope(tenant) not in scopes:
+            scopes.append(tenant_scope(tenant))
+    return tuple(scopes)
+
+
+def invalidate_for_rows(rows: Iterable[Dict[str, Any]]) -> None:
+    """Bump the scopes touched by freshly committed event rows."""
+    scopes = set()
+    for row in rows:
+        if row.get("user_id"):
+            scopes.add(user_scope(row["user_id"]))
+        if row.get("tenant_id"):
+            scopes.add(tenant_scope(row["tenant_id"]))
+    if scopes:
+        stats_cache.bump(scopes)
+
+
+def make_key(base_key: str, scopes: Sequence[str]) -> str:
+    """Append the scopes' current generations to a cache key."""
+    generations = stats_cache.generations(scopes)
+    return f"{base_key}@{'.'.join(str(g) for g in generations)}"
+
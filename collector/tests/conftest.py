@@ -0,0 +1,33 @@
+"""
+Collector test setup: a throwaway SQLite database and a fresh schema per test.
+
+db.py builds its engine at import time, so DATABASE_URL is set before any
+collector module is imported.
+
+Run from the collector directory:
+    pip install -e ".[dev]"
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+_tmpdir = tempfile.mkdtemp(prefix="llmobserve-collector-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'test.db')}"
+
+# Collector modules import each other flat (from db import ...)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import models  # noqa: E402,F401
+from db import engine  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+
+@pytest.fixture
+def session():
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db_session:
+        yield db_session
@@ -0,0 +1,61 @@
+"""
+Revoking an API key stops it authenticating at once on this worker, even
+while it sits in the verified-key cache; rejected keys are remembered
+briefly so repeats skip the DB lookup.
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import auth
+from auth import api_key_cache, authenticate_api_key, compute_lookup_hash, hash_api_key, invalid_key_cache
+from models import APIKey, User
+from routers import api_keys, auth as auth_router, auth_simple
+
+
+def _revoke_calls(user):
+    return {
+        "api_keys": lambda session, key: api_keys.revoke_api_key(key_id=key.id, session=session, user=user),
+        "auth": lambda session, key: auth_router.revoke_api_key(key_id=key.id, session=session, user_id=user.id),
+        "auth_simple": lambda session, key: auth_simple.revoke_api_key(key_id=key.id, session=session, user=user),
+    }
+
+
+@pytest.mark.parametrize("route", ["api_keys", "auth", "auth_simple"])
+def test_revoked_key_is_dropped_from_cache(session, route):
+    user = User(email=f"{route}@example.com")
+    session.add(user)
+    session.commit()
+    raw_key = f"llmo_sk_{route}_revoke_test"
+    key = APIKey(
+        user_id=user.id,
+        name=route,
+        key_hash=hash_api_key(raw_key),
+        key_prefix=raw_key[:12],
+        lookup_hash=compute_lookup_hash(raw_key),
+    )
+    session.add(key)
+    session.commit()
+
+    assert authenticate_api_key(session, raw_key).id == user.id
+    assert api_key_cache.get(key.lookup_hash) is not None
+
+    asyncio.run(_revoke_calls(user)[route](session, key))
+
+    with pytest.raises(HTTPException):
+        authenticate_api_key(session, raw_key)
+
+
+def test_rejected_key_skips_lookup_until_cleared(session, monkeypatch):
+    invalid_key_cache.clear()
+    lookups = []
+    monkeypatch.setattr(auth, "resolve_api_key", lambda session, api_key: lookups.append(api_key))
+
+    for _ in range(3):
+        with pytest.raises(HTTPException):
+            authenticate_api_key(session, "llmo_sk_garbage")
+
+    assert lookups == ["llmo_sk_garbage"]
+    assert compute_lookup_hash("llmo_sk_garbage") in invalid_key_cache
+    invalid_key_cache.clear()
@@ -0,0 +1,66 @@
+"""
+Rebuilds of the derived tables vs. concurrent ingest: a batch committed
+while a rebuild runs must not be wiped by the rebuild's delete-and-replace.
+"""
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from sqlmodel import Session, select
+
+from db import engine, lock_derived_tables
+from models import RunSummary, TraceEvent, User
+import run_summaries
+from run_summaries import apply_run_deltas, rebuild_run_summaries
+
+run_summaries_delete = run_summaries.delete
+
+
+def _event(run_id, user_id):
+    event_id = str(uuid.uuid4())
+    return {
+        "id": event_id, "span_id": event_id, "run_id": run_id, "span_type": "llm",
+        "provider": "openai", "endpoint": "chat", "section": "default",
+        "tenant_id": "default_tenant", "user_id": user_id,
+        "created_at": datetime.utcnow(), "cost_usd": 1.0,
+    }
+
+
+def _ingest(rows):
+    """The POST /events transaction: lock shared, insert, apply deltas, commit."""
+    with Session(engine) as session:
+        lock_derived_tables(session)
+        session.add_all(TraceEvent(**row) for row in rows)
+        session.flush()
+        apply_run_deltas(session, rows)
+        session.commit()
+
+
+def test_ingest_during_rebuild_is_not_lost(session, monkeypatch):
+    user = User(email="lock@example.com")
+    session.add(user)
+    session.commit()
+    user_id = user.id
+    _ingest([_event("run1", user_id) for _ in range(3)])
+
+    # Start a batch between the rebuild's read of trace_events and its delete
+    ingested = threading.Event()
+    worker = threading.Thread(target=lambda: (_ingest([_event("run1", user_id)]), ingested.set()))
+
+    def delete_after_concurrent_ingest(table):
+        worker.start()
+        time.sleep(0.3)
+        return run_summaries_delete(table)
+
+    monkeypatch.setattr(run_summaries, "delete", delete_after_concurrent_ingest)
+    with Session(engine) as rebuild_session:
+        rebuild_run_summaries(rebuild_session)
+        assert not ingested.is_set()  # Waiting for the rebuild
+        rebuild_session.commit()
+
+    worker.join(timeout=10)
+    assert ingested.is_set()
+    session.expire_all()
+    summary = session.exec(select(RunSummary).where(RunSummary.run_id == "run1")).one()
+    assert summary.call_count == 4
@@ -0,0 +1,44 @@
+"""
+Bulk ingest: idempotency on span_id without collapsing events that have none.
+"""
+import uuid
+
+from sqlmodel import select
+
+from ingest import ingest_batch
+from models import TraceEvent, TraceEventCreate
+
+
+def _event(span_id):
+    return TraceEventCreate(
+        id=str(uuid.uuid4()),
+        run_id="run-1",
+        span_id=span_id,
+        section="agent:planner",
+        span_type="llm",
+        provider="openai",
+        endpoint="chat",
+    )
+
+
+def test_duplicate_span_ids_are_skipped(session):
+    first = ingest_batch(session, [_event("span-a"), _event("span-a")], user_id=None)
+    session.commit()
+    second = ingest_batch(session, [_event("span-a")], user_id=None)
+    session.commit()
+
+    assert (first.created, first.skipped) == (1, 1)
+    assert (second.created, second.skipped) == (0, 1)
+
+
+def test_empty_span_ids_are_not_deduped(session):
+    first = ingest_batch(session, [_event(""), _event("")], user_id=None)
+    session.commit()
+    second = ingest_batch(session, [_event("")], user_id=None)
+    session.commit()
+
+    assert (first.created, first.skipped) == (2, 0)
+    assert (second.created, second.skipped) == (1, 0)
+    span_ids = session.exec(select(TraceEvent.span_id)).all()
+    assert len(span_ids) == 3
+    assert all(span_ids)
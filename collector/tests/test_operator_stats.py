@@ -0,0 +1,39 @@
+"""
+Service-wide operator metrics (GET /stats/cache-stats, GET /caps/monitor-stats)
+are admin-only.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import auth
+import routers.caps as caps_router
+import routers.stats as stats_router
+
+ADMIN_TOKEN = "test-admin-token"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(auth, "ADMIN_API_TOKEN", ADMIN_TOKEN)
+    app = FastAPI()
+    app.include_router(stats_router.router)
+    app.include_router(caps_router.router)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("path", ["/stats/cache-stats", "/caps/monitor-stats"])
+@pytest.mark.parametrize("token", [None, "wrong-token"])
+def test_operator_stats_require_admin_token(client, path, token):
+    headers = {"X-LLMObserve-Admin-Token": token} if token else {}
+
+    response = client.get(path, headers=headers)
+
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("path", ["/stats/cache-stats", "/caps/monitor-stats"])
+def test_operator_stats_with_admin_token(client, path):
+    response = client.get(path, headers={"X-LLMObserve-Admin-Token": ADMIN_TOKEN})
+
+    assert response.status_code == 200, response.text
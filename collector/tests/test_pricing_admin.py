@@ -0,0 +1,38 @@
+"""
+Pricing writes (PUT /pricing/, POST /pricing/refresh) are operator-only.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import auth
+import routers.pricing as pricing_router
+
+ADMIN_TOKEN = "test-admin-token"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(auth, "ADMIN_API_TOKEN", ADMIN_TOKEN)
+    app = FastAPI()
+    app.include_router(pricing_router.router)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("method, path", [("put", "/pricing/"), ("post", "/pricing/refresh")])
+@pytest.mark.parametrize("token", [None, "wrong-token"])
+def test_pricing_writes_require_admin_token(client, monkeypatch, method, path, token):
+    monkeypatch.setattr(pricing_router, "save_pricing_registry", lambda registry: pytest.fail("saved"))
+    monkeypatch.setattr(pricing_router, "publish_pricing_change", lambda: pytest.fail("published"))
+    headers = {"X-LLMObserve-Admin-Token": token} if token else {}
+
+    response = client.request(method, path, json={}, headers=headers)
+
+    assert response.status_code == 403
+
+
+def test_refresh_with_admin_token_publishes(session, client):
+    response = client.post("/pricing/refresh", headers={"X-LLMObserve-Admin-Token": ADMIN_TOKEN})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "success"
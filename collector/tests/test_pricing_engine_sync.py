@@ -0,0 +1,18 @@
+"""
+collector/pricing_engine.py must stay identical to the SDK's pricing engine
+(run scripts/sync_pricing_engine.py after editing the SDK copy).
+"""
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+SDK_ENGINE = ROOT / "sdk" / "python" / "llmobserve" / "pricing_engine.py"
+COLLECTOR_ENGINE = ROOT / "collector" / "pricing_engine.py"
+
+
+@pytest.mark.skipif(not SDK_ENGINE.exists(), reason="SDK not in this checkout")
+def test_collector_pricing_engine_matches_sdk():
+    assert COLLECTOR_ENGINE.read_bytes() == SDK_ENGINE.read_bytes(), (
+        "collector/pricing_engine.py differs from the SDK's - run python scripts/sync_pricing_engine.py"
+    )
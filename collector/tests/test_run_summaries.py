@@ -0,0 +1,160 @@
+"""
+/runs/latest over run_summaries: keyset pages hold whole runs with the same
+totals as grouping the user's events directly.
+"""
+import random
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from clerk_auth import get_current_clerk_user
+from db import get_session
+from models import RunSummary, TraceEvent, User
+from routers.runs import router
+from run_summaries import apply_run_deltas, rebuild_run_summaries
+
+CLERK_ID = "user_clerk_runs"
+
+
+def _event(run_id, created_at, cost, user_id=None, tenant_id=CLERK_ID, section="agent:planner"):
+    event_id = str(uuid.uuid4())
+    return {
+        "id": event_id,
+        "span_id": event_id,
+        "run_id": run_id,
+        "span_type": "llm",
+        "provider": "openai",
+        "endpoint": "chat",
+        "section": section,
+        "section_path": f"{section}/tool:search",
+        "tenant_id": tenant_id,
+        "user_id": user_id,
+        "created_at": created_at,
+        "cost_usd": cost,
+    }
+
+
+def _ingest(session, rows, batch_size=25):
+    """Insert events and update summaries batch by batch, like POST /events."""
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        session.add_all(TraceEvent(**row) for row in batch)
+        session.flush()
+        apply_run_deltas(session, batch)
+        session.commit()
+
+
+def _seed(session, runs=62):
+    """
+    Runs whose events are split between API-key rows (user_id set) and
+    legacy rows (user_id NULL, tenant_id = the user's Clerk ID), plus
+    another user's run and an event no user owns.
+    """
+    user = User(clerk_user_id=CLERK_ID, email="runs@example.com")
+    other = User(clerk_user_id="user_clerk_other", email="other@example.com")
+    session.add_all([user, other])
+    session.commit()
+
+    rng = random.Random(3)
+    base = datetime(2026, 1, 1)
+    rows = []
+    for number in range(runs):
+        started = base + timedelta(minutes=number // 4)  # Ties on started_at
+        for k in range(rng.randint(1, 10)):
+            legacy = rng.random() < 0.5
+            rows.append(_event(
+                f"run{number:03d}",
+                started + timedelta(seconds=rng.randint(0, 600)),
+                round(rng.uniform(0.01, 1.0), 4),
+                user_id=None if legacy else user.id,
+                section=f"agent:a{k % 3}",
+            ))
+    rows.append(_event("run_other", base, 1.0, user_id=other.id, tenant_id="user_clerk_other"))
+    rows.append(_event("run_unowned", base, 1.0, tenant_id="default_tenant"))
+    rng.shuffle(rows)
+    _ingest(session, rows)
+    return user, rows
+
+
+def _expected(rows, user):
+    """Per-run totals straight from the user's events."""
+    runs = defaultdict(lambda: {"calls": 0, "cost": 0.0, "started_at": None})
+    for row in rows:
+        if row["user_id"] != user.id and not (row["user_id"] is None and row["tenant_id"] == CLERK_ID):
+            continue
+        run = runs[row["run_id"]]
+        run["calls"] += 1
+        run["cost"] += row["cost_usd"]
+        run["started_at"] = min(filter(None, [run["started_at"], row["created_at"]]))
+    return runs
+
+
+def _client(session, user):
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_current_clerk_user] = lambda: user
+    app.dependency_overrides[get_session] = lambda: session
+    return TestClient(app)
+
+
+def _all_pages(client, limit):
+    runs, cursor = [], None
+    while True:
+        params = {"limit": limit}
+        if cursor:
+            params["before"] = cursor
+        response = client.get("/runs/latest", params=params)
+        assert response.status_code == 200, response.text
+        runs.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return runs
+
+
+def test_pages_hold_whole_runs_split_across_owner_keys(session):
+    user, rows = _seed(session)
+    expected = _expected(rows, user)
+
+    runs = _all_pages(_client(session, user), limit=7)
+
+    run_ids = [run["run_id"] for run in runs]
+    assert len(run_ids) == len(set(run_ids)) == len(expected)
+    assert set(run_ids) == set(expected)
+    ordered = sorted(expected, key=lambda run_id: (expected[run_id]["started_at"], run_id), reverse=True)
+    assert run_ids == ordered
+    for run in runs:
+        assert run["call_count"] == expected[run["run_id"]]["calls"], run["run_id"]
+        assert abs(run["total_cost"] - expected[run["run_id"]]["cost"]) < 1e-9, run["run_id"]
+
+
+def test_paging_matches_one_page(session):
+    user, _ = _seed(session, runs=30)
+    client = _client(session, user)
+
+    assert _all_pages(client, limit=4) == _all_pages(client, limit=1000)
+
+
+def test_rebuild_matches_incremental_ingest(session):
+    _seed(session, runs=30)
+
+    def summaries():
+        return sorted(
+            (summary.run_id, summary.user_id, summary.started_at, summary.last_event_at,
+             round(summary.total_cost, 9), summary.call_count)
+            for summary in session.exec(select(RunSummary)).all()
+        )
+
+    incremental = summaries()
+    rebuild_run_summaries(session)
+    session.commit()
+    assert summaries() == incremental
+
+
+def test_invalid_cursor_is_rejected(session):
+    user, _ = _seed(session, runs=3)
+    response = _client(session, user).get("/runs/latest", params={"before": "not-a-cursor"})
+    assert response.status_code == 400
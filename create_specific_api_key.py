@@ -15,7 +15,7 @@ os.chdir(str(collector_path))
 
 from sqlmodel import Session, create_engine
 from models import User, APIKey
-from auth import hash_api_key, get_key_prefix
+from auth import hash_api_key, compute_lookup_hash, get_key_prefix
 from datetime import datetime
 from uuid import uuid4
 
@@ -55,6 +55,7 @@ with Session(engine) as session:
         id=uuid4(),
         user_id=user.id,
         key_hash=key_hash,
+        lookup_hash=compute_lookup_hash(SPECIFIC_KEY),
         key_prefix=key_prefix,
         name="Test API Key (from error logs)",
         created_at=datetime.utcnow()
@@ -17,7 +17,7 @@ os.chdir(str(collector_path))
 
 from sqlmodel import Session, select, create_engine
 from models import User, APIKey
-from auth import generate_api_key, hash_api_key, get_key_prefix
+from auth import generate_api_key, hash_api_key, compute_lookup_hash, get_key_prefix
 from datetime import datetime
 from uuid import uuid4
 
@@ -60,6 +60,7 @@ def create_test_user_and_key():
             id=uuid4(),
             user_id=user.id,
             key_hash=key_hash,
+            lookup_hash=compute_lookup_hash(api_key),
             key_prefix=key_prefix,
             name="Test API Key",
             created_at=datetime.utcnow()
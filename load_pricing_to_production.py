@@ -18,6 +18,7 @@ sys.path.insert(0, str(Path(__file__).parent / "collector"))
 
 from db import SessionLocal, init_db
 from models import Pricing
+from pricing import bump_pricing_version
 from sqlmodel import select
 
 # Load pricing registry
@@ -135,10 +136,13 @@ def main():
                 if inserted <= 5:  # Show first 5 inserts
                     print(f"   ✅ Inserted {provider}:{model or 'N/A'}")
         
+        # New registry version so running collectors and proxies reload
+        version = bump_pricing_version(session)
+        
         # Commit all changes
         session.commit()
         
-        print(f"\n✅ Migration complete!")
+        print(f"\n✅ Migration complete! (pricing version {version})")
         print(f"   Inserted: {inserted}")
         print(f"   Updated: {updated}")
         print(f"   Total processed: {len(registry)}")
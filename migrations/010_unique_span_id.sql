@@ -0,0 +1,13 @@
+-- Migration: Unique span_id for set-based ingestion
+-- Bulk ingest (collector/ingest.py) dedupes each batch with one span_id IN (...)
+-- query and writes with INSERT ... ON CONFLICT DO NOTHING. The unique index
+-- makes concurrent retries of the same batch safe across workers.
+
+-- Remove duplicate spans left over from the per-event ingest path (keep one row)
+DELETE FROM trace_events a
+USING trace_events b
+WHERE a.span_id = b.span_id
+  AND a.ctid > b.ctid;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_trace_events_span_id
+  ON trace_events(span_id);
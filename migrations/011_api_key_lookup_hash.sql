@@ -0,0 +1,12 @@
+-- Migration: O(1) API key authentication
+-- Adds a deterministic HMAC-SHA256 digest of each API key so a presented key
+-- resolves with one indexed lookup instead of a bcrypt scan over all keys.
+-- Existing keys are backfilled lazily by the collector on first use
+-- (auth.resolve_api_key), since the plaintext key is only known at request time.
+
+ALTER TABLE api_keys ADD COLUMN IF NOT EXISTS lookup_hash VARCHAR NULL;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_api_keys_lookup_hash
+  ON api_keys(lookup_hash);
+
+COMMENT ON COLUMN api_keys.lookup_hash IS 'HMAC-SHA256 of the full API key (keyed by API_KEY_LOOKUP_SECRET)';
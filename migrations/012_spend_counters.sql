@@ -0,0 +1,23 @@
+-- Migration: Incremental spend counters for spending caps
+-- /caps/check and the cap monitor read one row per cap from spend_counters
+-- instead of summing trace_events. The collector also creates this table on
+-- startup (SQLModel create_all); this file is for manual/Postgres-first setups.
+
+CREATE TABLE IF NOT EXISTS spend_counters (
+    user_id UUID NOT NULL REFERENCES users(id),
+    period VARCHAR NOT NULL,
+    period_start TIMESTAMP NOT NULL,
+    scope VARCHAR NOT NULL,
+    target VARCHAR NOT NULL DEFAULT '',
+    sub_scope VARCHAR NOT NULL DEFAULT '',
+    sub_target VARCHAR NOT NULL DEFAULT '',
+    spend_usd DOUBLE PRECISION NOT NULL DEFAULT 0,
+    event_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, period, period_start, scope, target, sub_scope, sub_target)
+);
+
+-- After creating the table, backfill current periods from existing events:
+--   POST /migrations/rebuild-spend-counters
+-- or from the collector directory:
+--   python spend_counters.py
@@ -0,0 +1,36 @@
+-- Migration: Hourly and daily usage rollups for stats/dashboard endpoints
+-- Stats queries read closed buckets from usage_rollups and only scan
+-- trace_events for the partial hour at each edge of the window. The
+-- collector also creates this table on startup (SQLModel create_all); this
+-- file is for manual/Postgres-first setups.
+
+CREATE TABLE IF NOT EXISTS usage_rollups (
+    granularity VARCHAR NOT NULL,
+    bucket_start TIMESTAMP NOT NULL,
+    tenant_id VARCHAR NOT NULL,
+    user_id VARCHAR NOT NULL DEFAULT '',
+    customer_id VARCHAR NOT NULL DEFAULT '',
+    provider VARCHAR NOT NULL DEFAULT '',
+    model VARCHAR NOT NULL DEFAULT '',
+    section VARCHAR NOT NULL DEFAULT '',
+    voice_platform VARCHAR NOT NULL DEFAULT '',
+    voice_segment_type VARCHAR NOT NULL DEFAULT '',
+    cost_usd DOUBLE PRECISION NOT NULL DEFAULT 0,
+    call_count INTEGER NOT NULL DEFAULT 0,
+    input_tokens BIGINT NOT NULL DEFAULT 0,
+    output_tokens BIGINT NOT NULL DEFAULT 0,
+    cached_tokens BIGINT NOT NULL DEFAULT 0,
+    latency_ms_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    audio_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (granularity, bucket_start, tenant_id, user_id, customer_id,
+                 provider, model, section, voice_platform, voice_segment_type)
+);
+
+CREATE INDEX IF NOT EXISTS idx_usage_rollups_tenant_bucket ON usage_rollups (tenant_id, granularity, bucket_start);
+CREATE INDEX IF NOT EXISTS idx_usage_rollups_user_bucket ON usage_rollups (user_id, granularity, bucket_start);
+
+-- After creating the table, backfill from existing events:
+--   POST /migrations/rebuild-usage-rollups
+-- or from the collector directory:
+--   python rollups.py
@@ -0,0 +1,9 @@
+-- Migration: (run_id, created_at) index for /runs/latest
+-- The runs page picks each run's top section from its earliest event in the
+-- same statement as the run aggregation (DISTINCT ON on Postgres). This index
+-- lets that lookup read the first event per run directly.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_run_created
+  ON trace_events(run_id, created_at);
+
+ANALYZE trace_events;
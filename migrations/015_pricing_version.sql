@@ -0,0 +1,33 @@
+-- Migration: Versioned pricing registry
+-- Every collector worker and proxy polls pricing_version and swaps in a
+-- freshly compiled pricing snapshot when the version moves; events record
+-- the version their cost was computed with. The collector creates the table
+-- and adds the column on startup (create_all / run_migrations); this file is
+-- for manual/Postgres-first setups and also installs the trigger below.
+
+CREATE TABLE IF NOT EXISTS pricing_version (
+    id INTEGER PRIMARY KEY DEFAULT 1,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO pricing_version (id, version, updated_at)
+VALUES (1, 1, NOW())
+ON CONFLICT (id) DO NOTHING;
+
+ALTER TABLE trace_events ADD COLUMN IF NOT EXISTS pricing_version INTEGER NULL;
+
+-- Bump the version on any change to the pricing table, including edits made
+-- directly in SQL or the Supabase dashboard (the collector's own writes bump
+-- it too, so this is belt and braces)
+CREATE OR REPLACE FUNCTION bump_pricing_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE pricing_version SET version = version + 1, updated_at = NOW() WHERE id = 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS pricing_version_bump ON pricing;
+CREATE TRIGGER pricing_version_bump
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON pricing
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_pricing_version();
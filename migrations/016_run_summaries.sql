@@ -0,0 +1,29 @@
+-- Migration: Per-run summaries for /runs/latest
+-- Ingest upserts one row per (run, owner) with the run's first/last event
+-- time, summed cost and event count. The owner is the event's user_id, else
+-- the user whose clerk_user_id is the event's tenant_id (as for spend
+-- counters), so a run is never split across owner keys. /runs/latest
+-- pages by keyset on (owner, started_at DESC, run_id DESC) with the cursor
+-- in WHERE, so deep pages no longer group all of a tenant's events. The collector also
+-- creates this table on startup (SQLModel create_all) and backfills it when
+-- empty; this file is for manual/Postgres-first setups.
+
+CREATE TABLE IF NOT EXISTS run_summaries (
+    run_id VARCHAR NOT NULL,
+    user_id VARCHAR NOT NULL,
+    started_at TIMESTAMP NOT NULL,
+    last_event_at TIMESTAMP NOT NULL,
+    total_cost DOUBLE PRECISION NOT NULL DEFAULT 0,
+    call_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (run_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_run_summaries_user_started
+  ON run_summaries (user_id, started_at DESC, run_id DESC);
+
+-- After creating the table, backfill from existing events (or restart the
+-- collector, which does this when the table is empty):
+--   POST /migrations/rebuild-run-summaries
+-- or from the collector directory:
+--   python run_summaries.py
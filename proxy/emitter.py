@@ -0,0 +1,394 @@
+"""
+Batched, non-blocking event emission from the proxy to the collector.
+
+Proxied responses never wait on collector I/O or disk: emit() only enqueues
+(or, when the queue is full, appends to a bounded in-memory overflow list).
+A single background task drains the queue, POSTs batches to /events/ (by
+size or after a short interval), retries transient failures with
+exponential backoff, and appends batches it cannot deliver - plus any
+overflow - to an on-disk JSONL journal segment in a worker thread.
+Segments are replayed in batches once the collector is reachable again -
+the collector dedupes on span_id, so replays are idempotent.
+
+Journal state (segment sizes, file and byte counts) is only touched by the
+background task, so the disk is never listed or stat'ed per event.
+
+Environment:
+    LLMOBSERVE_PROXY_EMIT_BATCH_SIZE    Events per POST (default 100)
+    LLMOBSERVE_PROXY_EMIT_INTERVAL_MS   Max time an event waits for a batch (default 500)
+    LLMOBSERVE_PROXY_EMIT_QUEUE_SIZE    In-memory queue bound; the overflow list holds as many
+                                        again before events are dropped (default 10000)
+    LLMOBSERVE_PROXY_EMIT_RETRIES       Retries per batch before journaling (default 3)
+    LLMOBSERVE_PROXY_JOURNAL_DIR        Journal directory (default: <tmp>/llmobserve-proxy-journal)
+    LLMOBSERVE_PROXY_JOURNAL_MAX_MB     Oldest journal segments are dropped past this size (default 100)
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from upstream import env_int, upstream_pool
+
+logger = logging.getLogger("llmobserve.proxy")
+
+# 4xx responses that are still worth retrying (other 4xx mean a bad payload)
+RETRYABLE_CLIENT_ERRORS = {408, 425, 429}
+MAX_BACKOFF_SECONDS = 30.0
+
+# A journal segment is sealed (and becomes replayable) past this size
+JOURNAL_SEGMENT_MAX_BYTES = 4 * 1024 * 1024
+
+
+class EventEmitter:
+    """In-process async emit queue with batching, retry and an on-disk journal."""
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        flush_interval_ms: Optional[int] = None,
+        max_queue_size: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        journal_dir: Optional[str] = None,
+        journal_max_mb: Optional[int] = None,
+    ):
+        self.batch_size = batch_size or env_int("LLMOBSERVE_PROXY_EMIT_BATCH_SIZE", 100)
+        self.flush_interval = (flush_interval_ms or env_int("LLMOBSERVE_PROXY_EMIT_INTERVAL_MS", 500)) / 1000.0
+        self.max_queue_size = max_queue_size or env_int("LLMOBSERVE_PROXY_EMIT_QUEUE_SIZE", 10000)
+        self.max_retries = max_retries if max_retries is not None else env_int("LLMOBSERVE_PROXY_EMIT_RETRIES", 3)
+        self.journal_dir = journal_dir or os.getenv(
+            "LLMOBSERVE_PROXY_JOURNAL_DIR",
+            os.path.join(tempfile.gettempdir(), "llmobserve-proxy-journal"),
+        )
+        self.journal_max_bytes = (journal_max_mb or env_int("LLMOBSERVE_PROXY_JOURNAL_MAX_MB", 100)) * 1024 * 1024
+
+        self.collector_url: Optional[str] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._next_replay = 0.0
+        # Overflow from emit() when the queue is full; flushed to the journal by the sender
+        self._overflow: List[dict] = []
+        # {segment path: [bytes, events]}, oldest first; only the sender task touches these
+        self._segments: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._journal_bytes = 0
+        self._active_segment: Optional[str] = None
+
+        self.counters = {
+            "enqueued": 0,
+            "sent": 0,
+            "batches_sent": 0,
+            "retries": 0,
+            "rejected": 0,
+            "journaled": 0,
+            "replayed": 0,
+            "journal_dropped": 0,
+            "overflow_dropped": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self, collector_url: str) -> None:
+        """Start the background sender (call from the app's startup event)."""
+        self.collector_url = collector_url
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._stopping = False
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self._load_segments()
+        if self._segments:
+            logger.info(f"[proxy] {len(self._segments)} journal segment(s) pending replay")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Drain the queue (shutdown). Anything not delivered in time is journaled."""
+        if self._task is None:
+            return
+        self._stopping = True
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            logger.warning("[proxy] Event drain timed out, journaling the rest")
+        except Exception as e:
+            logger.error(f"[proxy] Event sender failed during shutdown: {e}")
+        self._task = None
+
+        # A cancelled write may still be running in its thread - start a fresh segment
+        self._active_segment = None
+        leftover, self._overflow = self._overflow, []
+        while not self._queue.empty():
+            leftover.append(self._queue.get_nowait())
+        if leftover:
+            await self._spill(leftover)
+
+    def emit(self, event: dict) -> None:
+        """Queue an event for delivery. Never blocks on collector I/O."""
+        if self._queue is None or not self.collector_url:
+            logger.warning("[proxy] Collector URL not set, skipping event emission")
+            return
+        self.counters["enqueued"] += 1
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Sender is behind (collector slow or down) - it journals the
+            # overflow; past that, drop rather than grow without bound
+            if len(self._overflow) < self.max_queue_size:
+                self._overflow.append(event)
+            else:
+                self.counters["overflow_dropped"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "overflow": len(self._overflow),
+            "journal_files": len(self._segments),
+            "journal_bytes": self._journal_bytes,
+            **self.counters,
+        }
+
+    # ------------------------------------------------------------------
+    # Sender
+    # ------------------------------------------------------------------
+
+    async def _run(self) -> None:
+        while not (self._stopping and self._queue.empty()):
+            try:
+                if self._overflow:
+                    overflow, self._overflow = self._overflow, []
+                    await self._spill(overflow)
+                batch = await self._collect_batch()
+                if batch:
+                    await self._deliver(batch)
+                elif self._segments and not self._stopping:
+                    await self._replay_journal()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[proxy] Event sender error: {e}")
+
+    async def _collect_batch(self) -> List[dict]:
+        """Up to batch_size events, waiting at most flush_interval after the first."""
+        loop = asyncio.get_running_loop()
+        if self._stopping:
+            first_wait = 0.0
+        else:
+            first_wait = self.flush_interval
+        try:
+            if first_wait:
+                first = await asyncio.wait_for(self._queue.get(), timeout=first_wait)
+            else:
+                first = self._queue.get_nowait()
+        except (asyncio.TimeoutError, asyncio.QueueEmpty):
+            return []
+
+        batch = [first]
+        deadline = loop.time() + (0.0 if self._stopping else self.flush_interval)
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _post(self, batch: List[dict]) -> str:
+        """POST one batch. Returns 'ok', 'rejected' (permanent) or 'retry'."""
+        try:
+            client = upstream_pool.client_for(self.collector_url)
+            response = await client.post(f"{self.collector_url}/events/", json=batch, timeout=10.0)
+        except Exception as e:
+            logger.warning(f"[proxy] Failed to emit {len(batch)} event(s): {e}")
+            return "retry"
+
+        if response.status_code in (200, 201):
+            return "ok"
+        error_detail = response.text[:500] if response.text else "No error message"
+        if 400 <= response.status_code < 500 and response.status_code not in RETRYABLE_CLIENT_ERRORS:
+            logger.error(f"[proxy] Collector rejected {len(batch)} event(s): {response.status_code}")
+            logger.error(f"[proxy] Error detail: {error_detail}")
+            return "rejected"
+        logger.warning(f"[proxy] Collector returned {response.status_code} for {len(batch)} event(s)")
+        return "retry"
+
+    async def _deliver(self, batch: List[dict]) -> None:
+        attempts = 1 if self._stopping else self.max_retries + 1
+        for attempt in range(attempts):
+            result = await self._post(batch)
+            if result == "ok":
+                self.counters["sent"] += len(batch)
+                self.counters["batches_sent"] += 1
+                return
+            if result == "rejected":
+                self.counters["rejected"] += len(batch)
+                return
+            if attempt + 1 < attempts:
+                self.counters["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt))
+
+        await self._spill(batch)
+        # Collector looks down - don't hammer it with replays right away
+        self._next_replay = time.monotonic() + MAX_BACKOFF_SECONDS
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(MAX_BACKOFF_SECONDS, 0.5 * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    # ------------------------------------------------------------------
+    # Journal (segments are only read/written from the sender task)
+    # ------------------------------------------------------------------
+
+    def _load_segments(self) -> None:
+        """Index existing segments at startup (oldest first)."""
+        self._segments.clear()
+        self._journal_bytes = 0
+        self._active_segment = None
+        try:
+            names = sorted(n for n in os.listdir(self.journal_dir) if n.endswith(".jsonl"))
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self.journal_dir, name)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            # Event count unknown until replay; only used for drop accounting
+            self._segments[path] = [size, 0]
+            self._journal_bytes += size
+
+    @staticmethod
+    def _append_events(path: str, events: List[dict]) -> int:
+        """Append events as JSON lines (worker thread). Returns bytes written."""
+        data = "".join(json.dumps(event, default=str) + "\n" for event in events).encode("utf-8")
+        with open(path, "ab") as f:
+            f.write(data)
+        return len(data)
+
+    async def _spill(self, events: List[dict]) -> None:
+        """Append events to the active journal segment, opening a new one as needed."""
+        if not events:
+            return
+        path = self._active_segment
+        if path is None:
+            name = f"events-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.jsonl"
+            path = os.path.join(self.journal_dir, name)
+        try:
+            written = await asyncio.to_thread(self._append_events, path, events)
+        except Exception as e:
+            logger.error(f"[proxy] Failed to journal {len(events)} event(s), dropping: {e}")
+            self._active_segment = None
+            return
+
+        segment = self._segments.setdefault(path, [0, 0])
+        segment[0] += written
+        segment[1] += len(events)
+        self._journal_bytes += written
+        self.counters["journaled"] += len(events)
+        self._active_segment = path if segment[0] < JOURNAL_SEGMENT_MAX_BYTES else None
+        await self._enforce_journal_limit()
+
+    async def _remove_segment(self, path: str) -> None:
+        size, _ = self._segments.pop(path, (0, 0))
+        self._journal_bytes = max(0, self._journal_bytes - size)
+        if self._active_segment == path:
+            self._active_segment = None
+        try:
+            await asyncio.to_thread(os.remove, path)
+        except FileNotFoundError:
+            pass
+
+    async def _enforce_journal_limit(self) -> None:
+        while self._journal_bytes > self.journal_max_bytes and self._segments:
+            path, (_, events) = next(iter(self._segments.items()))
+            await self._remove_segment(path)
+            self.counters["journal_dropped"] += events
+            logger.warning(f"[proxy] Event journal over limit, dropped {os.path.basename(path)}")
+
+    @staticmethod
+    def _read_segment(path: str) -> List[dict]:
+        """Events in a segment (worker thread). A torn last line from a crash is skipped."""
+        events = []
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"[proxy] Skipping corrupt line in journal {os.path.basename(path)}")
+        return events
+
+    @staticmethod
+    def _rewrite_segment(path: str, events: List[dict]) -> int:
+        """Replace a segment with its unsent events (temp file + rename). Returns bytes."""
+        tmp_path = path + ".tmp"
+        data = "".join(json.dumps(event, default=str) + "\n" for event in events).encode("utf-8")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return len(data)
+
+    async def _keep_unsent(self, path: str, events: List[dict]) -> None:
+        """Shrink a partly replayed segment to the events not yet delivered."""
+        try:
+            written = await asyncio.to_thread(self._rewrite_segment, path, events)
+        except OSError as e:
+            # Leave it whole; the collector dedupes whatever is re-sent
+            logger.warning(f"[proxy] Failed to rewrite journal {os.path.basename(path)}: {e}")
+            return
+        segment = self._segments.get(path)
+        if segment is not None:
+            self._journal_bytes += written - segment[0]
+            segment[0], segment[1] = written, len(events)
+
+    async def _replay_journal(self) -> None:
+        """Re-send journaled events oldest first, batch_size per POST, until one fails."""
+        if time.monotonic() < self._next_replay:
+            return
+        # Seal the segment being appended to, so every segment replayed is complete
+        self._active_segment = None
+        for path in list(self._segments):
+            if self._stopping or not self._queue.empty():
+                return  # Live traffic first
+            try:
+                events = await asyncio.to_thread(self._read_segment, path)
+            except OSError as e:
+                logger.error(f"[proxy] Unreadable journal file {os.path.basename(path)}, removing: {e}")
+                events = []
+
+            sent = 0
+            while sent < len(events):
+                if sent and (self._stopping or not self._queue.empty()):
+                    await self._keep_unsent(path, events[sent:])
+                    return
+                batch = events[sent:sent + self.batch_size]
+                result = await self._post(batch)
+                if result == "retry":
+                    if sent:
+                        await self._keep_unsent(path, events[sent:])
+                    self._next_replay = time.monotonic() + MAX_BACKOFF_SECONDS
+                    return
+                if result == "ok":
+                    self.counters["replayed"] += len(batch)
+                else:
+                    self.counters["rejected"] += len(batch)
+                sent += len(batch)
+
+            await self._remove_segment(path)
+
+
+event_emitter = EventEmitter()
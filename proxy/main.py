@@ -11,10 +11,16 @@ import time
 import uuid
 import logging
 import json
-from typing import Optional
+import asyncio
+import hmac
+from typing import Any, Dict, Optional
 
 from providers import detect_provider, extract_endpoint, parse_usage
-from pricing import calculate_cost
+from pricing import calculate_cost, current_pricing_version, watch_pricing_version
+from streaming import SSEUsageParser, is_event_stream
+from upstream import upstream_pool
+from emitter import event_emitter
+from tier_cache import INTERNAL_TOKEN, INTERNAL_TOKEN_HEADER, tier_cache
 from graphql_parser import (
     is_graphql_request,
     parse_graphql_request,
@@ -46,35 +52,224 @@ def set_collector_url(url: str):
     COLLECTOR_URL = url
 
 
-async def emit_event(event: dict):
-    """Emit event to collector."""
-    if not COLLECTOR_URL:
-        logger.warning("[proxy] Collector URL not set, skipping event emission")
-        return
-    
+def emit_event(event: dict):
+    """Queue event for the collector (batched and sent in the background)."""
+    event_emitter.emit(event)
+
+
+# Stream finalizers run detached from the request; keep references so they aren't GC'd
+_background_tasks = set()
+_active_streams = 0
+_pricing_watch_task = None
+
+LLM_PROVIDERS = ["openai", "anthropic", "google", "cohere", "mistral", "groq", "openrouter"]
+
+# Hop-by-hop and encoding headers that must not be copied from upstream
+SKIPPED_RESPONSE_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection", "keep-alive"}
+
+
+def spawn_background(coro) -> None:
+    """Run a coroutine without awaiting it (survives client disconnects)."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def build_event(
+    context: Dict[str, str],
+    provider: str,
+    endpoint: str,
+    span_type: str,
+    usage: Dict[str, Any],
+    cost_usd: float,
+    latency_ms: float,
+    status_code: int,
+    event_metadata: Dict[str, Any],
+    is_streaming: bool = False,
+    stream_cancelled: bool = False,
+    pricing_version: Optional[int] = None,
+) -> dict:
+    """Build the collector event for a completed upstream call."""
+    return {
+        "id": str(uuid.uuid4()),
+        "run_id": context["run_id"],
+        "span_id": context["span_id"],
+        "parent_span_id": context["parent_span_id"] or None,
+        "section": context["section"],
+        "section_path": context["section_path"],
+        "span_type": span_type,
+        "provider": provider,
+        "endpoint": endpoint,
+        "model": usage.get("model"),
+        "cost_usd": cost_usd,
+        "pricing_version": pricing_version,
+        "latency_ms": latency_ms,
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+        "cached_tokens": usage.get("cached_tokens", 0),
+        "status": "ok" if status_code < 400 else "error",
+        "tenant_id": context["tenant_id"],
+        "customer_id": context["customer_id"] or None,
+        "event_metadata": event_metadata,
+        "is_streaming": is_streaming,
+        "stream_cancelled": stream_cancelled,
+    }
+
+
+def clean_response_headers(response: httpx.Response) -> Dict[str, str]:
+    """Copy upstream headers minus compression, length and connection headers."""
+    return {
+        key: value for key, value in response.headers.items()
+        if key.lower() not in SKIPPED_RESPONSE_HEADERS
+    }
+
+
+async def finish_stream(
+    response: httpx.Response,
+    parser: SSEUsageParser,
+    context: Dict[str, str],
+    provider: str,
+    endpoint: str,
+    request_json: Optional[dict],
+    start_time: float,
+    first_chunk_time: Optional[float],
+    cancelled: bool,
+) -> None:
+    """Close the upstream stream, then cost and emit the event from the parsed frames."""
+    latency_ms = (time.time() - start_time) * 1000
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{COLLECTOR_URL}/events/",
-                json=[event],
-                timeout=5.0
-            )
-            if response.status_code != 201:
-                error_detail = response.text[:500] if response.text else "No error message"
-                logger.error(f"[proxy] Failed to emit event: {response.status_code}")
-                logger.error(f"[proxy] Error detail: {error_detail}")
-                logger.error(f"[proxy] Event that failed: provider={event.get('provider')}, model={event.get('model')}, section={event.get('section')}")
-                logger.error(f"[proxy] Event keys: {list(event.keys())}")
+        # Returns the connection to the shared pool
+        await response.aclose()
     except Exception as e:
-        logger.error(f"[proxy] Failed to emit event: {e}")
-        import traceback
-        logger.error(f"[proxy] Traceback: {traceback.format_exc()}")
+        logger.debug(f"[proxy] Error closing upstream stream: {e}")
+
+    try:
+        usage = parse_usage(provider, parser.close(), request_json)
+        cost_usd = calculate_cost(provider, usage, endpoint, context["tenant_id"])
+        pricing_version = current_pricing_version()
+        event_metadata = {
+            "http_status": response.status_code,
+            "provider": provider,
+            "stream_frames": parser.frame_count,
+        }
+        if first_chunk_time is not None:
+            event_metadata["time_to_first_byte_ms"] = (first_chunk_time - start_time) * 1000
+        if cancelled:
+            logger.info(f"[proxy] Client disconnected mid-stream ({provider}/{usage.get('model')}), recording partial usage")
+
+        emit_event(build_event(
+            context, provider, endpoint,
+            "llm_call" if provider in LLM_PROVIDERS else "api_call",
+            usage, cost_usd, latency_ms, response.status_code, event_metadata,
+            is_streaming=True, stream_cancelled=cancelled, pricing_version=pricing_version,
+        ))
+    except Exception as e:
+        logger.error(f"[proxy] Failed to record streamed response: {e}")
+
+
+class UpstreamStreamingResponse(StreamingResponse):
+    """StreamingResponse that runs `on_close` however the response ends."""
+
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self._on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # Covers clients that disconnect before the body generator starts,
+            # when the generator's own finally never runs
+            self._on_close()
+
+
+def stream_upstream(
+    response: httpx.Response,
+    context: Dict[str, str],
+    provider: str,
+    endpoint: str,
+    request_json: Optional[dict],
+    start_time: float,
+) -> StreamingResponse:
+    """
+    Forward an SSE response chunk by chunk while parsing usage frames.
+
+    The cost event is emitted once the stream ends - normally, on upstream
+    error, or when the client disconnects early (stream_cancelled=True) -
+    and the upstream response is always closed, exactly once.
+    """
+    parser = SSEUsageParser()
+    completed = False
+    finished = False
+    first_chunk_time = None
+
+    def finish() -> None:
+        nonlocal finished
+        if finished:
+            return
+        finished = True
+        # Awaiting here could be cancelled with the request, so finish detached
+        spawn_background(finish_stream(
+            response, parser, context, provider, endpoint,
+            request_json, start_time, first_chunk_time, cancelled=not completed,
+        ))
+
+    async def relay():
+        global _active_streams
+        nonlocal completed, first_chunk_time
+        _active_streams += 1
+        try:
+            async for chunk in response.aiter_bytes():
+                if first_chunk_time is None:
+                    first_chunk_time = time.time()
+                parser.feed(chunk)
+                yield chunk
+            completed = True
+        finally:
+            _active_streams -= 1
+            # Runs on completion, upstream errors and client disconnects alike
+            finish()
+
+    return UpstreamStreamingResponse(
+        relay(),
+        on_close=finish,
+        status_code=response.status_code,
+        headers=clean_response_headers(response),
+        media_type=response.headers.get("content-type", "text/event-stream"),
+    )
 
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
-    return {"status": "ok", "service": "llmobserve-proxy"}
+    """Health check endpoint (includes upstream connection pool stats)."""
+    return {
+        "status": "ok",
+        "service": "llmobserve-proxy",
+        "active_streams": _active_streams,
+        "connection_pools": upstream_pool.stats(),
+        "event_emitter": event_emitter.stats(),
+        "tier_cache": tier_cache.stats(),
+        "pricing_version": current_pricing_version(),
+    }
+
+
+@app.post("/internal/tier-invalidate")
+async def invalidate_tenant_tiers(request: Request):
+    """
+    Called by the collector when a tenant's provider tiers change.
+    Body: {"tenant_id": "..."}; omit tenant_id to drop every cached tenant.
+    Requires LLMOBSERVE_PROXY_INTERNAL_TOKEN; disabled (403) when it is unset.
+    """
+    token = request.headers.get(INTERNAL_TOKEN_HEADER, "")
+    if not INTERNAL_TOKEN or not token or not hmac.compare_digest(token.encode(), INTERNAL_TOKEN.encode()):
+        return JSONResponse(status_code=403, content={"error": "Internal token required"})
+    try:
+        body = await request.json()
+    except Exception:
+        body = {}
+    tenant_id = body.get("tenant_id") if isinstance(body, dict) else None
+    tier_cache.invalidate(tenant_id)
+    return {"status": "ok", "tenant_id": tenant_id}
 
 
 @app.post("/proxy")
@@ -97,6 +292,15 @@ async def proxy_request(request: Request) -> Response:
     section_path = request.headers.get("X-LLMObserve-Section-Path", "default")
     customer_id = request.headers.get("X-LLMObserve-Customer-ID", "")
     tenant_id = request.headers.get("X-LLMObserve-Tenant-ID", "default_tenant")
+    context = {
+        "run_id": run_id,
+        "span_id": span_id,
+        "parent_span_id": parent_span_id,
+        "section": section,
+        "section_path": section_path,
+        "customer_id": customer_id,
+        "tenant_id": tenant_id,
+    }
     target_url = request.headers.get("X-LLMObserve-Target-URL")
     
     if not target_url:
@@ -135,39 +339,42 @@ async def proxy_request(request: Request) -> Response:
     start_time = time.time()
     
     try:
-        # Create httpx client with decompression disabled
-        # We'll handle decompression manually to avoid issues
-        async with httpx.AsyncClient(
-            timeout=120.0,
-            # Disable automatic decompression - we'll handle it manually
-        ) as client:
-            # Copy headers (remove LLMObserve headers)
-            forward_headers = {
-                k: v for k, v in request.headers.items()
-                if not k.startswith("X-LLMObserve") and k.lower() not in ["host", "content-length"]
-            }
-            
-            # CRITICAL: Remove Accept-Encoding to prevent upstream compression
-            forward_headers.pop("Accept-Encoding", None)
-            forward_headers.pop("accept-encoding", None)
-            # Request no compression
-            forward_headers["Accept-Encoding"] = "identity"
-            
-            # Forward request - httpx will auto-decompress if Content-Encoding is present
-            response = await client.request(
-                method=request.method,
-                url=target_url,
-                headers=forward_headers,
-                content=request_body,
-                follow_redirects=True
-            )
-            
-            # Read response content - httpx automatically decompresses if Content-Encoding header present
-            # After reading, content is ALWAYS decompressed (even if upstream sent compressed)
+        # Shared keep-alive pool for this upstream (no TCP/TLS setup per call)
+        client = upstream_pool.client_for(target_url)
+        
+        # Copy headers (remove LLMObserve headers)
+        forward_headers = {
+            k: v for k, v in request.headers.items()
+            if not k.startswith("X-LLMObserve") and k.lower() not in ["host", "content-length"]
+        }
+        
+        # CRITICAL: Remove Accept-Encoding to prevent upstream compression
+        forward_headers.pop("Accept-Encoding", None)
+        forward_headers.pop("accept-encoding", None)
+        # Request no compression
+        forward_headers["Accept-Encoding"] = "identity"
+        
+        upstream_request = client.build_request(
+            method=request.method,
+            url=target_url,
+            headers=forward_headers,
+            content=request_body,
+        )
+        response = await client.send(upstream_request, stream=True, follow_redirects=True)
+        
+        # Upstream is opened in streaming mode so SSE responses can be passed
+        # through as they arrive; the relay releases the connection when done
+        if is_event_stream(response.headers.get("content-type")):
+            return stream_upstream(response, context, provider, endpoint, request_json, start_time)
+        
+        # Read response content - httpx automatically decompresses if Content-Encoding header present
+        # After reading, content is ALWAYS decompressed (even if upstream sent compressed)
+        # Closing here returns the pooled connection even if the body read fails
+        # mid-way; nothing below touches the stream again
+        try:
             response_content = await response.aread()
-            
-            # CRITICAL: httpx has already decompressed the content
-            # We MUST remove Content-Encoding header so client-side httpx doesn't try to decompress again
+        finally:
+            await response.aclose()
         
         latency_ms = (time.time() - start_time) * 1000
         
@@ -188,11 +395,12 @@ async def proxy_request(request: Request) -> Response:
         
         # Calculate cost (pass endpoint and tenant_id for tier-specific pricing)
         cost_usd = calculate_cost(provider, usage, endpoint, tenant_id)
+        pricing_version = current_pricing_version()
         
         # Determine span type
         if is_graphql:
             span_type = "graphql_call"
-        elif provider in ["openai", "anthropic", "google", "cohere", "mistral", "groq", "openrouter"]:
+        elif provider in LLM_PROVIDERS:
             span_type = "llm_call"
         else:
             span_type = "api_call"
@@ -215,59 +423,21 @@ async def proxy_request(request: Request) -> Response:
             })
         
         # Emit event to collector
-        event = {
-            "id": str(uuid.uuid4()),
-            "run_id": run_id,
-            "span_id": span_id,
-            "parent_span_id": parent_span_id if parent_span_id else None,
-            "section": section,
-            "section_path": section_path,
-            "span_type": span_type,
-            "provider": provider,
-            "endpoint": endpoint,
-            "model": usage.get("model"),
-            "cost_usd": cost_usd,
-            "latency_ms": latency_ms,
-            "input_tokens": usage.get("input_tokens", 0),
-            "output_tokens": usage.get("output_tokens", 0),
-            "cached_tokens": usage.get("cached_tokens", 0),
-            "status": "ok" if response.status_code < 400 else "error",
-            "tenant_id": tenant_id,
-            "customer_id": customer_id if customer_id else None,
-            "event_metadata": event_metadata,
-            "is_streaming": False,  # Add required fields
-            "stream_cancelled": False,
-        }
+        event = build_event(
+            context, provider, endpoint, span_type, usage, cost_usd,
+            latency_ms, response.status_code, event_metadata,
+            pricing_version=pricing_version,
+        )
         
         # Emit event (non-blocking)
-        await emit_event(event)
+        emit_event(event)
         
         # Return response to SDK
         # Build clean response headers - NO compression indicators
-        response_headers = {}
-        content_type = "application/json"
-        
-        for key, value in response.headers.items():
-            key_lower = key.lower()
-            
-            # NEVER include compression headers
-            if key_lower in ["content-encoding", "transfer-encoding"]:
-                continue
-            
-            # Skip length - we'll set it
-            if key_lower == "content-length":
-                continue
-            
-            # Skip connection headers
-            if key_lower in ["connection", "keep-alive"]:
-                continue
-            
-            # Save content type
-            if key_lower == "content-type":
-                content_type = value
-            
-            # Forward all other headers
-            response_headers[key] = value
+        # CRITICAL: httpx has already decompressed the content, so client-side
+        # httpx must not see Content-Encoding and try to decompress again
+        response_headers = clean_response_headers(response)
+        content_type = response.headers.get("content-type", "application/json")
         
         # Set Content-Length to actual decompressed size
         response_headers["Content-Length"] = str(len(response_content))
@@ -330,7 +500,7 @@ async def proxy_request(request: Request) -> Response:
             "event_metadata": error_metadata,
         }
         
-        await emit_event(error_event)
+        emit_event(error_event)
         
         # Return error
         return JSONResponse(
@@ -345,9 +515,30 @@ async def startup():
     import os
     collector_url = os.getenv("LLMOBSERVE_COLLECTOR_URL", "http://localhost:8000")
     set_collector_url(collector_url)
+    event_emitter.start(collector_url)
+    tier_cache.start(collector_url)
+    await tier_cache.preload()
+    global _pricing_watch_task
+    _pricing_watch_task = asyncio.create_task(watch_pricing_version(collector_url))
     logger.info(f"[proxy] Started with collector URL: {collector_url}")
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    """Let in-flight streams queue their events, drain the emitter, then close upstream pools."""
+    if _background_tasks:
+        await asyncio.wait(list(_background_tasks), timeout=5.0)
+    if _pricing_watch_task:
+        _pricing_watch_task.cancel()
+        try:
+            await _pricing_watch_task
+        except asyncio.CancelledError:
+            pass
+    await event_emitter.stop()
+    await tier_cache.stop()
+    await upstream_pool.aclose()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=9000)
@@ -1,14 +1,62 @@
 """
 Cost calculation for proxy.
 
-Uses the same pricing registry as the collector.
+Uses the same pricing registry as the collector. The registry is versioned:
+watch_pricing_version() polls the collector's /pricing/version and swaps in
+a freshly compiled engine when it moves, and events carry the version their
+cost was computed with.
+
+Environment:
+    LLMOBSERVE_PROXY_PRICING_POLL_S   Seconds between pricing version checks (default 10)
 """
+import asyncio
+import importlib.util
 import json
 import os
+import sys
 from typing import Dict, Any, Optional
 
+from tier_cache import tier_cache
+from upstream import upstream_pool
+
+try:
+    PRICING_POLL_SECONDS = float(os.getenv("LLMOBSERVE_PROXY_PRICING_POLL_S", "10"))
+except ValueError:
+    PRICING_POLL_SECONDS = 10.0
+
+
+def _load_pricing_engine():
+    """Load the SDK's pricing engine (stdlib-only) by file path."""
+    path = os.getenv("LLMOBSERVE_PROXY_PRICING_ENGINE") or os.path.join(
+        os.path.dirname(__file__), "..", "sdk", "python", "llmobserve", "pricing_engine.py"
+    )
+    spec = importlib.util.spec_from_file_location("pricing_engine", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["pricing_engine"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+pricing_engine = _load_pricing_engine()
+
 # Load pricing registry
 PRICING_REGISTRY = {}
+PRICING_ENGINE = pricing_engine.PricingEngine(PRICING_REGISTRY)
+PRICING_VERSION: Optional[int] = None  # Collector registry version (None for the JSON fallback)
+
+
+def _install_registry(registry: Dict[str, Any], version: Optional[int], engine=None) -> None:
+    """Swap in a registry (registry, compiled engine and version change together)."""
+    global PRICING_REGISTRY, PRICING_ENGINE, PRICING_VERSION
+    engine = engine or pricing_engine.PricingEngine(registry)
+    PRICING_REGISTRY, PRICING_ENGINE, PRICING_VERSION = registry, engine, version
+
+
+def _response_version(response) -> Optional[int]:
+    try:
+        return int(response.headers["X-Pricing-Version"])
+    except (KeyError, ValueError):
+        return None
 
 
 def load_pricing_registry():
@@ -16,16 +64,15 @@ def load_pricing_registry():
     Load pricing registry from collector API (which reads from Supabase).
     Falls back to JSON file if API unavailable.
     """
-    global PRICING_REGISTRY
-    
     # Try to load from collector API (which reads from Supabase)
     collector_url = os.getenv("COLLECTOR_URL", "http://localhost:8000")
     try:
         import httpx
         response = httpx.get(f"{collector_url}/pricing/", timeout=5.0)
         if response.status_code == 200:
-            PRICING_REGISTRY = response.json()
-            print(f"[Proxy Pricing] Loaded {len(PRICING_REGISTRY)} pricing entries from collector API")
+            _install_registry(response.json(), _response_version(response))
+            print(f"[Proxy Pricing] Loaded {len(PRICING_REGISTRY)} pricing entries from collector API "
+                  f"(version {PRICING_VERSION})")
             return
     except Exception as e:
         print(f"[Proxy Pricing] Failed to load from API, trying JSON file: {e}")
@@ -41,42 +88,66 @@ def load_pricing_registry():
     
     try:
         with open(registry_path, "r") as f:
-            PRICING_REGISTRY = json.load(f)
+            _install_registry(json.load(f), None)
             print(f"[Proxy Pricing] Loaded {len(PRICING_REGISTRY)} pricing entries from JSON file")
     except FileNotFoundError:
         print(f"[Proxy Pricing] JSON file not found, using empty registry")
-        PRICING_REGISTRY = {}
+        _install_registry({}, None)
 
 
 # Load on module import
 load_pricing_registry()
 
 
+def current_pricing_version() -> Optional[int]:
+    """Version of the registry calculate_cost is using right now."""
+    return PRICING_VERSION
+
+
+async def refresh_pricing_if_changed(collector_url: str) -> bool:
+    """
+    Reload pricing from the collector if its registry version moved.
+    One small request when nothing changed. Returns True on reload.
+    """
+    client = upstream_pool.client_for(collector_url)
+    response = await client.get(f"{collector_url}/pricing/version", timeout=5.0)
+    response.raise_for_status()
+    version = response.json().get("version")
+    if version is None or version == PRICING_VERSION:
+        return False
+
+    response = await client.get(f"{collector_url}/pricing/", timeout=10.0)
+    response.raise_for_status()
+    registry = response.json()
+    new_version = _response_version(response)
+    # Compile off the event loop; the swap itself happens back on the loop
+    engine = await asyncio.to_thread(pricing_engine.PricingEngine, registry)
+    previous = PRICING_VERSION
+    _install_registry(registry, new_version, engine)
+    print(f"[Proxy Pricing] Reloaded {len(registry)} pricing entries: version {previous} -> {new_version}")
+    return True
+
+
+async def watch_pricing_version(collector_url: str, interval: Optional[float] = None) -> None:
+    """Background task: follow the collector's pricing version (run from startup)."""
+    interval = interval or PRICING_POLL_SECONDS
+    while True:
+        try:
+            await refresh_pricing_if_changed(collector_url)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[Proxy Pricing] Pricing version check failed: {e}")
+        await asyncio.sleep(interval)
+
+
 def get_tenant_tier(tenant_id: Optional[str], provider: str) -> Optional[str]:
     """
     Get the tier for a tenant/provider combination.
-    Queries the collector API to get tier configuration.
+    Served from the proxy's tier cache (refreshed from the collector in the
+    background), so pricing never waits on the collector.
     """
-    if not tenant_id or tenant_id == "default_tenant":
-        return None
-    
-    try:
-        import httpx
-        collector_url = os.getenv("COLLECTOR_URL", "http://localhost:8000")
-        response = httpx.get(
-            f"{collector_url}/provider-tiers/?tenant_id={tenant_id}",
-            timeout=2.0
-        )
-        if response.status_code == 200:
-            tiers = response.json()
-            for tier_config in tiers:
-                if tier_config.get("provider") == provider and tier_config.get("is_active"):
-                    return tier_config.get("tier")
-    except Exception:
-        # Fail silently - fall back to default pricing
-        pass
-    
-    return None
+    return tier_cache.get(tenant_id, provider)
 
 
 def calculate_cost(provider: str, usage: Dict[str, Any], endpoint: Optional[str] = None, tenant_id: Optional[str] = None) -> float:
@@ -121,58 +192,18 @@ def calculate_cost(provider: str, usage: Dict[str, Any], endpoint: Optional[str]
     # Get tenant tier if available
     tenant_tier = get_tenant_tier(tenant_id, actual_provider) if tenant_id else None
     
-    # Try pricing lookup in order:
+    # Pricing lookup (memoized by the engine), in order:
     # 1. provider:model:tier (tier-specific model pricing)
-    # 2. provider:model (model pricing)
-    # 3. provider:endpoint:tier (tier-specific endpoint pricing)
-    # 4. provider:endpoint (endpoint pricing)
-    # 5. provider:tier (tier-specific provider pricing)
+    # 2. provider:endpoint:tier (tier-specific endpoint pricing)
+    # 3. provider:tier (tier-specific provider pricing)
+    # 4. provider:model (model pricing, incl. normalized names and model families)
+    # 5. provider:endpoint (endpoint pricing)
     # 6. provider (fallback)
-    
-    pricing_key = None
-    pricing = None
-    
     # Use actual_provider for pricing lookup (not "openrouter")
-    pricing_provider = actual_provider
-    
-    # Try tier-specific pricing first
-    if tenant_tier:
-        if model:
-            pricing_key = f"{pricing_provider}:{model}:{tenant_tier}"
-            if pricing_key in PRICING_REGISTRY:
-                pricing = PRICING_REGISTRY[pricing_key]
-        
-        if not pricing and endpoint:
-            pricing_key = f"{pricing_provider}:{endpoint}:{tenant_tier}"
-            if pricing_key in PRICING_REGISTRY:
-                pricing = PRICING_REGISTRY[pricing_key]
-        
-        if not pricing:
-            pricing_key = f"{pricing_provider}:{tenant_tier}"
-            if pricing_key in PRICING_REGISTRY:
-                pricing = PRICING_REGISTRY[pricing_key]
-    
-    # Fall back to non-tier-specific pricing
-    if not pricing:
-        if model:
-            pricing_key = f"{pricing_provider}:{model}"
-            if pricing_key in PRICING_REGISTRY:
-                pricing = PRICING_REGISTRY[pricing_key]
-        
-        # If no model or model-based pricing not found, try endpoint-based
-        if not pricing and endpoint:
-            pricing_key = f"{pricing_provider}:{endpoint}"
-            if pricing_key in PRICING_REGISTRY:
-                pricing = PRICING_REGISTRY[pricing_key]
-        
-        # Fallback to provider-level pricing
-        if not pricing:
-            pricing_key = pricing_provider
-            if pricing_key in PRICING_REGISTRY:
-                pricing = PRICING_REGISTRY[pricing_key]
-    
-    if not pricing:
+    resolved = PRICING_ENGINE.lookup(actual_provider, model, endpoint, tenant_tier)
+    if resolved is None:
         return 0.0
+    pricing = resolved.entry
     
     # Token-based (LLMs, embeddings)
     input_tokens = usage.get("input_tokens", 0)
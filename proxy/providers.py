@@ -4,119 +4,62 @@ Universal provider detection and response parsing.
 Supports 37+ AI/API providers with automatic cost calculation.
 """
 from typing import Dict, Optional, Any
+import importlib.util
 import json
+import logging
+import os
+import sys
+
+logger = logging.getLogger("llmobserve.proxy")
+
+
+def _load_provider_registry():
+    """
+    Load the SDK's provider routing table (llmobserve/provider_registry.py).
+
+    The module has no llmobserve imports, so it is loaded by file path, the
+    same way pricing.py reads the collector's registry.json.
+    """
+    path = os.getenv("LLMOBSERVE_PROXY_PROVIDER_REGISTRY") or os.path.join(
+        os.path.dirname(__file__), "..", "sdk", "python", "llmobserve", "provider_registry.py"
+    )
+    spec = importlib.util.spec_from_file_location("provider_registry", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["provider_registry"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _load_custom_providers(registry) -> None:
+    """
+    Custom providers from LLMOBSERVE_PROXY_PROVIDERS, a JSON list of rules
+    shaped like PROVIDER_RULES: [{"provider": "...", "hosts": ["..."]}].
+    """
+    raw = os.getenv("LLMOBSERVE_PROXY_PROVIDERS")
+    if not raw:
+        return
+    try:
+        for rule in json.loads(raw):
+            registry.register(rule["provider"], rule["hosts"], rule.get("label_prefix"), rule.get("path_contains"))
+    except (ValueError, KeyError, TypeError) as e:
+        logger.error(f"[Proxy] Invalid LLMOBSERVE_PROXY_PROVIDERS: {e}")
+
+
+provider_registry = _load_provider_registry()
+_load_custom_providers(provider_registry._registry)
 
 
 def detect_provider(url: str) -> str:
     """
-    Detect provider from URL - NOW SUPPORTS 37+ APIS!
+    Detect provider from URL using the shared provider routing table.
     
     Args:
         url: The target API URL
     
     Returns:
-        Provider name (e.g., "openai", "anthropic", "google")
+        Provider name (e.g., "openai", "anthropic", "google"), or "unknown"
     """
-    url_lower = url.lower()
-    
-    # LLM Providers (13)
-    if "api.openai.com" in url_lower:
-        return "openai"
-    elif "api.anthropic.com" in url_lower:
-        return "anthropic"
-    elif "generativelanguage.googleapis.com" in url_lower or "aiplatform.googleapis.com" in url_lower:
-        return "google"
-    elif "api.cohere.ai" in url_lower or "api.cohere.com" in url_lower:
-        return "cohere"
-    elif "api.mistral.ai" in url_lower:
-        return "mistral"
-    elif "api.groq.com" in url_lower:
-        return "groq"
-    elif "api.ai21.com" in url_lower:
-        return "ai21"
-    elif "api-inference.huggingface.co" in url_lower:
-        return "huggingface"
-    elif "api.together.xyz" in url_lower or "together.ai" in url_lower:
-        return "together"
-    elif "api.replicate.com" in url_lower:
-        return "replicate"
-    elif "api.perplexity.ai" in url_lower:
-        return "perplexity"
-    elif "openai.azure.com" in url_lower:
-        return "azure_openai"
-    elif ("bedrock-runtime" in url_lower or "bedrock" in url_lower) and "amazonaws.com" in url_lower:
-        return "aws_bedrock"
-    elif "openrouter.ai" in url_lower:
-        return "openrouter"
-    
-    # Voice AI (7)
-    elif "api.elevenlabs.io" in url_lower:
-        return "elevenlabs"
-    elif "api.assemblyai.com" in url_lower:
-        return "assemblyai"
-    elif "api.deepgram.com" in url_lower:
-        return "deepgram"
-    elif "play.ht" in url_lower or "api.play.ai" in url_lower:
-        return "playht"
-    elif "speech.platform.bing.com" in url_lower or ("cognitiveservices.azure.com" in url_lower and "speech" in url_lower):
-        return "azure_speech"
-    elif "polly" in url_lower and "amazonaws.com" in url_lower:
-        return "aws_polly"
-    elif "transcribe" in url_lower and "amazonaws.com" in url_lower:
-        return "aws_transcribe"
-    
-    # Embeddings
-    elif "api.voyageai.com" in url_lower:
-        return "voyage"
-    
-    # Images/Video (4)
-    elif "api.stability.ai" in url_lower:
-        return "stability"
-    elif "api.runwayml.com" in url_lower:
-        return "runway"
-    elif "rekognition" in url_lower and "amazonaws.com" in url_lower:
-        return "aws_rekognition"
-    
-    # Vector Databases (8)
-    elif "pinecone.io" in url_lower:
-        return "pinecone"
-    elif "weaviate" in url_lower:
-        return "weaviate"
-    elif "qdrant" in url_lower:
-        return "qdrant"
-    elif "milvus" in url_lower or "zilliz" in url_lower:
-        return "milvus"
-    elif "trychroma.com" in url_lower or "chromadb" in url_lower:
-        return "chroma"
-    elif ("mongodb.com" in url_lower or "mongodb.net" in url_lower) and ("vector" in url_lower or "search" in url_lower):
-        return "mongodb"
-    elif "redis" in url_lower and "vector" in url_lower:
-        return "redis"
-    elif ("elastic" in url_lower or "elasticsearch" in url_lower) and "vector" in url_lower:
-        return "elasticsearch"
-    
-    # Search (1)
-    elif "algolia" in url_lower:
-        return "algolia"
-    
-    # Payment Processing (2)
-    elif "api.stripe.com" in url_lower:
-        return "stripe"
-    elif "api.paypal.com" in url_lower or ("paypal.com" in url_lower and "/v1/" in url_lower):
-        return "paypal"
-    
-    # Communication (2)
-    elif "api.twilio.com" in url_lower:
-        return "twilio"
-    elif "api.sendgrid.com" in url_lower:
-        return "sendgrid"
-    
-    # Database/Backend (1)
-    elif "supabase.co" in url_lower:
-        return "supabase"
-    
-    else:
-        return "unknown"
+    return provider_registry.detect_provider(url) or "unknown"
 
 
 def extract_endpoint(url: str, method: str = "POST") -> str:
@@ -0,0 +1,122 @@
+"""
+Incremental usage parsing for streamed (SSE) provider responses.
+
+Streamed completions report usage in individual `data:` frames rather than
+in one JSON body. SSEUsageParser consumes the byte stream chunk by chunk as
+it is forwarded to the client, keeps only the fields needed for costing, and
+folds them into a response-shaped dict that providers.parse_usage accepts:
+
+    OpenAI-compatible  "model" on every chunk, "usage" on the final chunk
+                       (sent when the request sets stream_options.include_usage)
+    Anthropic          message_start carries model + input usage,
+                       message_delta carries the running output_tokens
+    Google             every chunk carries cumulative usageMetadata
+    Cohere             stream-end carries the full response incl. meta
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+# A single SSE line larger than this is not a usage frame - drop it instead of buffering
+MAX_SSE_LINE_BYTES = 1024 * 1024
+
+
+def is_event_stream(content_type: Optional[str]) -> bool:
+    """True if the upstream response is a Server-Sent Events stream."""
+    return bool(content_type) and content_type.split(";")[0].strip().lower() == "text/event-stream"
+
+
+class SSEUsageParser:
+    """Incremental SSE parser that extracts model and usage from `data:` frames."""
+
+    def __init__(self):
+        self._buffer = b""
+        self._data_lines: List[bytes] = []
+        self._discarding = False
+        self.body: Dict[str, Any] = {}
+        self.frame_count = 0
+
+    def feed(self, chunk: bytes) -> None:
+        """Consume the next chunk of the stream (any split point is fine)."""
+        if not chunk:
+            return
+        data = self._buffer + chunk
+        lines = data.split(b"\n")
+        self._buffer = lines.pop()
+
+        for line in lines:
+            if self._discarding:
+                # Tail of an oversized line
+                self._discarding = False
+                continue
+            self._handle_line(line.rstrip(b"\r"))
+
+        if len(self._buffer) > MAX_SSE_LINE_BYTES:
+            self._buffer = b""
+            self._discarding = True
+
+    def close(self) -> Dict[str, Any]:
+        """Flush any trailing frame and return the response-shaped usage body."""
+        if self._buffer and not self._discarding:
+            self._handle_line(self._buffer.rstrip(b"\r"))
+        self._buffer = b""
+        self._dispatch()
+        return self.body
+
+    def _handle_line(self, line: bytes) -> None:
+        if not line:
+            # Blank line terminates an event
+            self._dispatch()
+        elif line.startswith(b"data:"):
+            self._data_lines.append(line[5:].lstrip())
+        # event:, id:, retry: and comments carry nothing we need
+
+    def _dispatch(self) -> None:
+        if not self._data_lines:
+            return
+        payload = b"\n".join(self._data_lines)
+        self._data_lines = []
+        if payload == b"[DONE]":
+            return
+        try:
+            frame = json.loads(payload)
+        except ValueError:
+            return
+        if isinstance(frame, dict):
+            self.frame_count += 1
+            self._merge(frame)
+
+    def _merge(self, frame: Dict[str, Any]) -> None:
+        body = self.body
+        frame_type = frame.get("type")
+
+        # Anthropic
+        if frame_type == "message_start":
+            message = frame.get("message") or {}
+            if message.get("model"):
+                body["model"] = message["model"]
+            body["usage"] = dict(message.get("usage") or {})
+            return
+        if frame_type == "message_delta":
+            body.setdefault("usage", {}).update(frame.get("usage") or {})
+            return
+
+        # Cohere
+        if frame.get("event_type") == "stream-end":
+            response = frame.get("response") or {}
+            if response.get("meta"):
+                body["meta"] = response["meta"]
+            return
+
+        # OpenAI-compatible (OpenAI, Mistral, Groq, OpenRouter, ...)
+        if frame.get("model"):
+            body["model"] = frame["model"]
+        if frame.get("usage"):
+            body["usage"] = frame["usage"]
+        if "cost" in frame:
+            body["cost"] = frame["cost"]
+
+        # Google (cumulative per chunk)
+        if frame.get("usageMetadata"):
+            body["usageMetadata"] = frame["usageMetadata"]
+        if frame.get("modelVersion") and "model" not in body:
+            body["model"] = frame["modelVersion"]
@@ -0,0 +1,209 @@
+"""
+Tenant provider-tier cache for the proxy's cost path.
+
+calculate_cost needs the tenant's tier (e.g. OpenAI "tier-3") to pick the
+right price, and used to fetch it from the collector with a blocking HTTP
+call on every priced request. This cache answers from memory and never waits
+on the collector:
+
+- fresh (younger than TTL):          served as-is
+- stale (older than TTL, within
+  TTL + STALE):                      served, and refreshed in the background
+- expired or never seen:             priced at the default tier this once,
+                                     and fetched in the background
+
+Refreshes go through the shared upstream connection pool, and at most one
+refresh per tenant is in flight at a time. At startup every tenant's tiers
+are preloaded from the collector's /provider-tiers/all, and the collector
+pushes changes to POST /internal/tier-invalidate so an edit takes effect on
+the next request instead of after the TTL.
+
+Environment:
+    LLMOBSERVE_PROXY_TIER_TTL_S         Seconds a tenant's tiers are fresh (default 300)
+    LLMOBSERVE_PROXY_TIER_STALE_S       Extra seconds stale tiers are still served (default 3600)
+    LLMOBSERVE_PROXY_INTERNAL_TOKEN     Shared secret for the collector <-> proxy internal
+                                        endpoints (X-LLMObserve-Internal-Token header);
+                                        without it /internal/tier-invalidate is disabled
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from upstream import env_float, upstream_pool
+
+logger = logging.getLogger("llmobserve.proxy")
+
+DEFAULT_TENANT = "default_tenant"
+INTERNAL_TOKEN_HEADER = "X-LLMObserve-Internal-Token"
+INTERNAL_TOKEN = os.getenv("LLMOBSERVE_PROXY_INTERNAL_TOKEN", "")
+
+
+class TenantTierCache:
+    """tenant_id -> {provider: tier}, with TTL and stale-while-revalidate."""
+
+    def __init__(self, ttl_seconds: Optional[float] = None, stale_seconds: Optional[float] = None):
+        self.ttl = ttl_seconds if ttl_seconds is not None else env_float("LLMOBSERVE_PROXY_TIER_TTL_S", 300.0)
+        self.stale = stale_seconds if stale_seconds is not None else env_float("LLMOBSERVE_PROXY_TIER_STALE_S", 3600.0)
+
+        self.collector_url: Optional[str] = None
+        # tenant_id -> (fetched_at monotonic, {provider: tier})
+        self._entries: Dict[str, tuple] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._generation: Dict[str, int] = {}
+        self.preloaded = False
+
+        self.counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "invalidations": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self, collector_url: str) -> None:
+        self.collector_url = collector_url.rstrip("/")
+
+    async def stop(self) -> None:
+        """Cancel in-flight refreshes (shutdown)."""
+        tasks, self._refreshing = list(self._refreshing.values()), {}
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def preload(self, timeout: float = 5.0) -> bool:
+        """Load every tenant's active tiers in one call. False if the collector didn't serve them."""
+        if not self.collector_url:
+            return False
+        try:
+            client = upstream_pool.client_for(self.collector_url)
+            response = await client.get(
+                f"{self.collector_url}/provider-tiers/all",
+                headers=self._internal_headers(),
+                timeout=timeout,
+            )
+        except Exception as e:
+            logger.warning(f"[proxy] Tier preload failed, tiers will load per tenant: {e}")
+            return False
+        if response.status_code != 200:
+            logger.warning(f"[proxy] Tier preload returned {response.status_code}, tiers will load per tenant")
+            return False
+
+        now = time.monotonic()
+        for tenant_id, tiers in response.json().items():
+            self._entries[tenant_id] = (now, dict(tiers))
+        self.preloaded = True
+        logger.info(f"[proxy] Preloaded provider tiers for {len(self._entries)} tenant(s)")
+        return True
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def get(self, tenant_id: Optional[str], provider: str) -> Optional[str]:
+        """The tenant's tier for a provider, or None (default pricing). Never blocks."""
+        if not tenant_id or tenant_id == DEFAULT_TENANT:
+            return None
+
+        entry = self._entries.get(tenant_id)
+        now = time.monotonic()
+        if entry is not None:
+            age = now - entry[0]
+            if age <= self.ttl:
+                self.counters["hits"] += 1
+                return entry[1].get(provider)
+            if age <= self.ttl + self.stale:
+                self.counters["stale_hits"] += 1
+                self._schedule_refresh(tenant_id)
+                return entry[1].get(provider)
+            del self._entries[tenant_id]
+
+        self.counters["misses"] += 1
+        self._schedule_refresh(tenant_id)
+        return None
+
+    def invalidate(self, tenant_id: Optional[str] = None) -> None:
+        """Drop one tenant (and refetch it now), or everything if tenant_id is None."""
+        self.counters["invalidations"] += 1
+        if tenant_id is None:
+            tenants = list(self._entries)
+            self._entries.clear()
+        else:
+            self._entries.pop(tenant_id, None)
+            tenants = [tenant_id]
+        for tenant in tenants:
+            # A refresh already in flight may carry the old value; bumping the
+            # generation makes it discard its result
+            self._generation[tenant] = self._generation.get(tenant, 0) + 1
+            self._refreshing.pop(tenant, None)
+            self._schedule_refresh(tenant)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tenants": len(self._entries),
+            "refreshing": len(self._refreshing),
+            "preloaded": self.preloaded,
+            "ttl_seconds": self.ttl,
+            "stale_seconds": self.stale,
+            **self.counters,
+        }
+
+    # ------------------------------------------------------------------
+    # Background refresh
+    # ------------------------------------------------------------------
+
+    def _schedule_refresh(self, tenant_id: str) -> None:
+        if tenant_id in self._refreshing or not self.collector_url:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # Called outside the event loop (scripts) - nothing to refresh on
+        task = loop.create_task(self._refresh(tenant_id, self._generation.get(tenant_id, 0)))
+        self._refreshing[tenant_id] = task
+        task.add_done_callback(lambda t, tenant=tenant_id: self._refresh_done(tenant, t))
+
+    def _refresh_done(self, tenant_id: str, task: asyncio.Task) -> None:
+        if self._refreshing.get(tenant_id) is task:
+            del self._refreshing[tenant_id]
+
+    async def _refresh(self, tenant_id: str, generation: int) -> None:
+        self.counters["refreshes"] += 1
+        try:
+            client = upstream_pool.client_for(self.collector_url)
+            response = await client.get(
+                f"{self.collector_url}/provider-tiers/",
+                params={"tenant_id": tenant_id},
+                timeout=2.0,
+            )
+            if response.status_code != 200:
+                raise RuntimeError(f"collector returned {response.status_code}")
+            tiers = {
+                t["provider"]: t["tier"]
+                for t in response.json()
+                if t.get("is_active") and t.get("provider")
+            }
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Keep serving whatever we had; the next stale read retries
+            self.counters["refresh_errors"] += 1
+            logger.debug(f"[proxy] Tier refresh for tenant {tenant_id} failed: {e}")
+            return
+        if self._generation.get(tenant_id, 0) == generation:
+            self._entries[tenant_id] = (time.monotonic(), tiers)
+
+    @staticmethod
+    def _internal_headers() -> Dict[str, str]:
+        return {INTERNAL_TOKEN_HEADER: INTERNAL_TOKEN} if INTERNAL_TOKEN else {}
+
+
+# Shared instance (started by the app's startup event)
+tier_cache = TenantTierCache()
@@ -0,0 +1,151 @@
+"""
+Shared upstream connection pools for the proxy.
+
+One httpx.AsyncClient per upstream origin (scheme, host, port), created on
+first use and reused for the lifetime of the app, so proxied calls and
+collector event posts reuse warm TCP/TLS connections instead of paying a
+handshake per request. Each origin gets its own pool limits, so a burst to
+one provider cannot starve connections to another (or to the collector).
+
+Environment:
+    LLMOBSERVE_PROXY_MAX_CONNECTIONS   Max connections per upstream (default 100)
+    LLMOBSERVE_PROXY_MAX_KEEPALIVE     Idle keep-alive connections per upstream (default 20)
+    LLMOBSERVE_PROXY_KEEPALIVE_EXPIRY  Seconds an idle connection is kept (default 30)
+    LLMOBSERVE_PROXY_TIMEOUT           Upstream request timeout in seconds (default 120)
+    LLMOBSERVE_PROXY_HTTP2             Negotiate HTTP/2 where supported (default false,
+                                       requires the `h2` package)
+"""
+import logging
+import os
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger("llmobserve.proxy")
+
+Origin = Tuple[str, str, Optional[int]]
+
+
+def env_int(name: str, default: int) -> int:
+    """Integer setting from the environment (default if unset or malformed)."""
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    """Float setting from the environment (default if unset or malformed)."""
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class UpstreamPool:
+    """Lazily created, app-lifetime AsyncClients keyed by upstream origin."""
+
+    def __init__(
+        self,
+        max_connections: Optional[int] = None,
+        max_keepalive: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        timeout: Optional[float] = None,
+        http2: Optional[bool] = None,
+    ):
+        self.max_connections = max_connections or env_int("LLMOBSERVE_PROXY_MAX_CONNECTIONS", 100)
+        self.max_keepalive = max_keepalive or env_int("LLMOBSERVE_PROXY_MAX_KEEPALIVE", 20)
+        self.keepalive_expiry = keepalive_expiry or env_float("LLMOBSERVE_PROXY_KEEPALIVE_EXPIRY", 30.0)
+        self.timeout = timeout or env_float("LLMOBSERVE_PROXY_TIMEOUT", 120.0)
+
+        if http2 is None:
+            http2 = os.getenv("LLMOBSERVE_PROXY_HTTP2", "").lower() in ("true", "1", "yes")
+        if http2 and not _http2_available():
+            logger.warning("[proxy] LLMOBSERVE_PROXY_HTTP2 is set but the h2 package is not installed - using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+
+        self._clients: Dict[Origin, httpx.AsyncClient] = {}
+        self._requests: Dict[Origin, int] = {}
+
+    @staticmethod
+    def origin(url: str) -> Origin:
+        parts = urlsplit(url)
+        return (parts.scheme.lower(), (parts.hostname or "").lower(), parts.port)
+
+    def client_for(self, url: str) -> httpx.AsyncClient:
+        """Shared client for the URL's origin (created on first use)."""
+        key = self.origin(url)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                http2=self.http2,
+            )
+            self._clients[key] = client
+            self._requests.setdefault(key, 0)
+            logger.info(f"[proxy] Opened connection pool for {key[0]}://{key[1]}")
+        self._requests[key] += 1
+        return client
+
+    async def aclose(self) -> None:
+        """Close every pool (app shutdown)."""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.debug(f"[proxy] Error closing upstream pool: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-origin request and connection counts for /health."""
+        upstreams = {}
+        for key, client in self._clients.items():
+            scheme, host, port = key
+            name = f"{scheme}://{host}" + (f":{port}" if port else "")
+            entry = {"requests": self._requests.get(key, 0)}
+            entry.update(_connection_counts(client))
+            upstreams[name] = entry
+        return {
+            "http2": self.http2,
+            "limits": {
+                "max_connections": self.max_connections,
+                "max_keepalive": self.max_keepalive,
+                "keepalive_expiry": self.keepalive_expiry,
+            },
+            "upstreams": upstreams,
+        }
+
+
+def _connection_counts(client: httpx.AsyncClient) -> Dict[str, int]:
+    """Open/idle/active connections from the client's httpcore pool (best effort)."""
+    try:
+        connections = list(client._transport._pool.connections)
+    except AttributeError:
+        return {}
+    idle = sum(1 for conn in connections if conn.is_idle())
+    http2 = sum(1 for conn in connections if getattr(conn, "_connection", None) is not None
+                and type(conn._connection).__name__.startswith("AsyncHTTP2"))
+    return {
+        "connections": len(connections),
+        "idle": idle,
+        "active": len(connections) - idle,
+        "http2_connections": http2,
+    }
+
+
+upstream_pool = UpstreamPool()
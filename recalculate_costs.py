@@ -3,6 +3,8 @@
 Recalculate costs for existing events that have cost_usd=0.0.
 
 This fixes events that were stored before pricing data was loaded.
+Spend counters, run summaries and the usage rollups for the affected days
+are rebuilt afterwards so caps, the runs list and stats see the new costs.
 """
 import sys
 import os
@@ -13,7 +15,10 @@ sys.path.insert(0, str(Path(__file__).parent / "collector"))
 
 from db import SessionLocal, init_db
 from models import TraceEvent
-from pricing import compute_cost
+from pricing import current_pricing
+from rollups import rebuild_usage_rollups
+from run_summaries import rebuild_run_summaries
+from spend_counters import rebuild_spend_counters
 from sqlmodel import select
 
 def main():
@@ -57,36 +62,48 @@ def main():
         # Reset statement to get fresh results
         events = session.exec(statement).all()
         
-        for event in events:
-            try:
-                # Recalculate cost
-                new_cost = compute_cost(
-                    provider=event.provider,
-                    model=event.model,
-                    input_tokens=event.input_tokens,
-                    output_tokens=event.output_tokens
-                )
+        # Price the whole batch in one pass (names resolved once per provider/model)
+        snapshot = current_pricing()
+        print(f"💲 Pricing version: {snapshot.version}\n")
+        new_costs = snapshot.engine.compute_costs(
+            {
+                "provider": event.provider,
+                "model": event.model,
+                "input_tokens": event.input_tokens,
+                "output_tokens": event.output_tokens,
+            }
+            for event in events
+        )
+        
+        for event, new_cost in zip(events, new_costs):
+            if new_cost > 0:
+                event.cost_usd = new_cost
+                event.pricing_version = snapshot.version
+                session.add(event)
+                updated += 1
                 
-                if new_cost > 0:
-                    event.cost_usd = new_cost
-                    session.add(event)
-                    updated += 1
-                    
-                    if updated <= 10:  # Show first 10 updates
-                        print(f"   ✅ {event.provider}:{event.model or 'N/A'} - ${new_cost:.8f}")
-                else:
-                    failed += 1
-                    if failed <= 5:
-                        print(f"   ⚠️  {event.provider}:{event.model or 'N/A'} - No pricing found")
-                        
-            except Exception as e:
+                if updated <= 10:  # Show first 10 updates
+                    print(f"   ✅ {event.provider}:{event.model or 'N/A'} - ${new_cost:.8f}")
+            else:
                 failed += 1
                 if failed <= 5:
-                    print(f"   ❌ Error calculating cost for {event.provider}:{event.model}: {e}")
+                    print(f"   ⚠️  {event.provider}:{event.model or 'N/A'} - No pricing found")
+        
+        earliest = min((event.created_at for event, new_cost in zip(events, new_costs) if new_cost > 0), default=None)
         
         # Commit all changes
         session.commit()
         
+        # Derived totals were built from the old costs - rebuild what changed
+        if earliest:
+            counter_stats = rebuild_spend_counters(session)
+            rollup_stats = rebuild_usage_rollups(session, since=earliest)
+            run_stats = rebuild_run_summaries(session)
+            session.commit()
+            print(f"\n🔁 Rebuilt {counter_stats['counters']} spend counters and "
+                  f"{rollup_stats['rollups']} usage rollups since {earliest:%Y-%m-%d}, "
+                  f"{run_stats['runs']} run summaries")
+        
         print(f"\n✅ Recalculation complete!")
         print(f"   Updated: {updated}")
         print(f"   Failed (no pricing): {failed}")
@@ -0,0 +1,120 @@
+"""
+Benchmark call-stack agent auto-detection (llmobserve/agent_detector.py).
+
+context.get_current_section() / get_section_path() run agent detection on
+every tracked HTTP call that has no explicit section. This measures the
+per-call cost of detect_agent_from_stack() + detect_hierarchical_context()
+at several stack depths, against the previous inspect.stack()-based
+implementation (reproduced below as the baseline):
+
+- inspect.stack():  builds FrameInfo (and reads source lines) for *every*
+                    frame, so cost grows with total stack depth
+- frame walker:     follows f_back for at most max_depth frames, with
+                    classifications cached per code object
+
+Usage:
+    python scripts/benchmark_agent_detection.py
+    python scripts/benchmark_agent_detection.py --calls 2000 --depths 20 50 200 500
+"""
+import argparse
+import inspect
+import os
+import re
+import statistics
+import sys
+import time
+
+parser = argparse.ArgumentParser(description="Benchmark agent auto-detection overhead")
+parser.add_argument("--calls", type=int, default=500, help="Calls per depth (default: 500)")
+parser.add_argument("--depths", type=int, nargs="+", default=[20, 50, 200], help="Stack depths (default: 20 50 200)")
+args = parser.parse_args()
+
+# Add SDK to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sdk", "python"))
+
+from llmobserve import agent_detector  # noqa: E402
+from llmobserve.agent_detector import AGENT_PATTERNS, STEP_PATTERNS, TOOL_PATTERNS  # noqa: E402
+
+
+def _legacy_match(name, patterns):
+    return any(re.search(p, name.lower(), re.IGNORECASE) for p in patterns)
+
+
+def _legacy_label(frame):
+    name = frame.f_code.co_name
+    if _legacy_match(name, AGENT_PATTERNS):
+        return f"agent:{name}"
+    if "self" in frame.f_locals and _legacy_match(type(frame.f_locals["self"]).__name__, AGENT_PATTERNS):
+        return "agent:class"
+    if any(config["detect"](frame) for config in agent_detector.KNOWN_FRAMEWORKS.values()):
+        return "agent:framework"
+    if _legacy_match(name, TOOL_PATTERNS):
+        return f"tool:{name}"
+    if _legacy_match(name, STEP_PATTERNS):
+        return f"step:{name}"
+    return None
+
+
+def legacy_detect(max_depth):
+    """The inspect.stack() scan both detectors used to do."""
+    stack = inspect.stack()
+    return [_legacy_label(info.frame) for info in stack[2:max_depth + 2]]
+
+
+def legacy_section():
+    legacy_detect(10)  # detect_agent_from_stack
+    legacy_detect(15)  # detect_hierarchical_context
+
+
+def walker_section():
+    agent_detector.detect_agent_from_stack()
+    agent_detector.detect_hierarchical_context()
+
+
+def run_agent(depth, fn):
+    """Outermost frame is an 'agent', then plain frames down to the LLM call."""
+    return nest(depth - 2, fn)
+
+
+def nest(remaining, fn):
+    if remaining <= 0:
+        return measure_calls(fn)
+    return nest(remaining - 1, fn)
+
+
+def measure_calls(fn):
+    timings = []
+    for _ in range(args.calls):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    return timings
+
+
+def stack_depth():
+    depth, frame = 0, sys._getframe()
+    while frame:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+
+def main():
+    base = stack_depth()
+    print(f"Calls per depth: {args.calls} (detect_agent_from_stack + detect_hierarchical_context)\n")
+    print(f"{'depth':>6} | {'inspect.stack() p50':>20} | {'frame walker p50':>17} | {'speedup':>8}")
+    for depth in args.depths:
+        extra = max(2, depth - base)
+        run_agent(extra, walker_section)  # Warm the code-object cache
+        legacy = run_agent(extra, legacy_section)
+        walker = run_agent(extra, walker_section)
+        legacy_p50 = statistics.median(legacy)
+        walker_p50 = statistics.median(walker)
+        print(
+            f"{depth:>6} | {legacy_p50:>17.1f} us | {walker_p50:>14.1f} us | "
+            f"{legacy_p50 / walker_p50:>7.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Load test the SDK's cap check from asyncio code (llmobserve/caps.py).
+
+Simulates an async service handling N concurrent requests. Each request runs
+a pre-request cap check and then awaits a simulated LLM call. A local stub
+of the collector's GET /caps/check adds network latency. Modes:
+
+- sync check:   check_spending_caps() called inside the coroutine (the old
+                httpx.AsyncClient/aiohttp interceptor path - blocks the loop)
+- async check:  check_spending_caps_async() with caching off, so every request
+                needs a decision (pooled connections + in-flight coalescing)
+- async cached: check_spending_caps_async() with the default decision cache
+
+Reports wall time, throughput, per-request latency, collector round trips
+and the worst event-loop stall observed by a 1 ms ticker.
+
+Usage:
+    python scripts/benchmark_caps_async.py
+    python scripts/benchmark_caps_async.py --concurrency 500 --keys 25 --latency-ms 20
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+parser = argparse.ArgumentParser(description="Load test async SDK cap checks")
+parser.add_argument("--concurrency", type=int, default=500, help="Concurrent requests (default: 500)")
+parser.add_argument("--keys", type=int, default=25, help="Distinct (provider, model, customer) keys (default: 25)")
+parser.add_argument("--latency-ms", type=float, default=10.0, help="Simulated collector latency (default: 10)")
+parser.add_argument("--llm-ms", type=float, default=50.0, help="Simulated LLM call duration (default: 50)")
+args = parser.parse_args()
+
+# Add SDK to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sdk", "python"))
+
+from llmobserve import caps, config  # noqa: E402
+
+CHECK_RESPONSE = json.dumps({
+    "allowed": True,
+    "exceeded_caps": [],
+    "caps": [{"cap_id": "bench", "cap_type": "global", "target_name": None,
+              "limit": 100.0, "current": 12.5, "period": "monthly"}],
+    "message": "All caps OK",
+}).encode()
+
+collector_hits = 0
+collector_lock = threading.Lock()
+
+
+class CapCheckStub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real collector
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def do_GET(self):
+        global collector_hits
+        with collector_lock:
+            collector_hits += 1
+        time.sleep(args.latency_ms / 1000.0)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(CHECK_RESPONSE)))
+        self.end_headers()
+        self.wfile.write(CHECK_RESPONSE)
+
+    def log_message(self, *_):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # Default backlog of 5 drops concurrent connects (1s SYN retry)
+
+
+async def handle_request(i: int, use_async: bool) -> float:
+    start = time.perf_counter()
+    customer_id = f"customer_{i % args.keys}"
+    if use_async:
+        await caps.check_spending_caps_async(provider="openai", model="gpt-4o", customer_id=customer_id)
+    else:
+        caps.check_spending_caps(provider="openai", model="gpt-4o", customer_id=customer_id)
+    await asyncio.sleep(args.llm_ms / 1000.0)  # The LLM call itself
+    return (time.perf_counter() - start) * 1000
+
+
+async def run_load(use_async: bool):
+    max_stall = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal max_stall
+        while not done.is_set():
+            before = time.perf_counter()
+            await asyncio.sleep(0.001)
+            max_stall = max(max_stall, (time.perf_counter() - before) * 1000 - 1.0)
+
+    tick = asyncio.ensure_future(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(handle_request(i, use_async) for i in range(args.concurrency)))
+    wall = time.perf_counter() - start
+    done.set()
+    await tick
+    return wall, sorted(latencies), max_stall
+
+
+def measure(label: str, use_async: bool) -> None:
+    global collector_hits
+    caps.clear_cap_cache()
+    collector_hits = 0
+    wall, latencies, max_stall = asyncio.run(run_load(use_async))
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{label:<14} wall {wall * 1000:8.1f} ms | {args.concurrency / wall:8.0f} req/s | "
+        f"p50 {statistics.median(latencies):8.1f} ms | p99 {p99:8.1f} ms | "
+        f"collector calls {collector_hits:4d} | max loop stall {max_stall:7.1f} ms"
+    )
+
+
+def main():
+    logging.getLogger("llmobserve").setLevel(logging.ERROR)
+    server = StubServer(("127.0.0.1", 0), CapCheckStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    collector_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(
+        f"Concurrency: {args.concurrency} | distinct keys: {args.keys} | "
+        f"collector latency: {args.latency_ms} ms | LLM call: {args.llm_ms} ms\n"
+    )
+    config.configure(collector_url=collector_url, api_key="llmo_sk_benchmark")
+
+    os.environ["LLMOBSERVE_CAPS_CACHE_TTL"] = "0"
+    measure("sync check", use_async=False)
+    measure("async check", use_async=True)
+
+    os.environ.pop("LLMOBSERVE_CAPS_CACHE_TTL")
+    measure("async cached", use_async=True)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark per-call overhead of the SDK's pre-request cap check (llmobserve/caps.py).
+
+Runs a local stub of the collector's GET /caps/check with simulated network
+latency and measures check_spending_caps() latency in three modes:
+
+- caps off:       no API key configured (the check is skipped)
+- caps, no cache: LLMOBSERVE_CAPS_CACHE_TTL=0 (one keep-alive round trip per call)
+- caps, cached:   default TTL (served locally, refreshed in the background)
+
+Usage:
+    python scripts/benchmark_caps_check.py
+    python scripts/benchmark_caps_check.py --calls 2000 --latency-ms 20
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+parser = argparse.ArgumentParser(description="Benchmark SDK cap-check latency")
+parser.add_argument("--calls", type=int, default=500, help="Calls per mode (default: 500)")
+parser.add_argument("--latency-ms", type=float, default=10.0, help="Simulated collector latency (default: 10)")
+args = parser.parse_args()
+
+# Add SDK to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sdk", "python"))
+
+from llmobserve import caps, config  # noqa: E402
+
+CHECK_RESPONSE = json.dumps({
+    "allowed": True,
+    "exceeded_caps": [],
+    "caps": [{"cap_id": "bench", "cap_type": "global", "target_name": None,
+              "limit": 100.0, "current": 12.5, "period": "monthly"}],
+    "message": "All caps OK",
+}).encode()
+
+
+class CapCheckStub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real collector
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def do_GET(self):
+        time.sleep(args.latency_ms / 1000.0)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(CHECK_RESPONSE)))
+        self.end_headers()
+        self.wfile.write(CHECK_RESPONSE)
+
+    def log_message(self, *_):
+        pass
+
+
+def measure(label: str, calls: int) -> None:
+    caps.clear_cap_cache()
+    timings = []
+    for i in range(calls):
+        start = time.perf_counter()
+        caps.check_spending_caps(provider="openai", model="gpt-4o", customer_id=f"customer_{i % 5}")
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(
+        f"{label:<16} mean {statistics.mean(timings):8.3f} ms | "
+        f"p50 {statistics.median(timings):8.3f} ms | p99 {p99:8.3f} ms"
+    )
+
+
+def main():
+    logging.getLogger("llmobserve").setLevel(logging.ERROR)  # Hide "no API key" warnings
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CapCheckStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    collector_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"Simulated collector latency: {args.latency_ms} ms | calls per mode: {args.calls}\n")
+
+    config.configure(collector_url=collector_url, api_key=None)
+    measure("caps off", args.calls)
+
+    config.configure(collector_url=collector_url, api_key="llmo_sk_benchmark")
+    os.environ["LLMOBSERVE_CAPS_CACHE_TTL"] = "0"
+    measure("caps, no cache", args.calls)
+
+    os.environ.pop("LLMOBSERVE_CAPS_CACHE_TTL")
+    measure("caps, cached", args.calls)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
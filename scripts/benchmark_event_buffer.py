@@ -0,0 +1,129 @@
+"""
+Benchmark SDK event buffering throughput (llmobserve/buffer.py).
+
+N producer threads call add_event() concurrently while a flusher drains the
+buffer (the transport is replaced by a no-op, so this measures buffering
+only). Compared against the previous design, reproduced below as the
+baseline: queue.Queue(maxsize) with put_nowait/get_nowait and a drain loop
+that takes one item at a time.
+
+Usage:
+    python scripts/benchmark_event_buffer.py
+    python scripts/benchmark_event_buffer.py --threads 32 --events 20000 --capacity 10000
+"""
+import argparse
+import logging
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+
+parser = argparse.ArgumentParser(description="Benchmark event buffer throughput")
+parser.add_argument("--threads", type=int, default=32, help="Producer threads (default: 32)")
+parser.add_argument("--events", type=int, default=20000, help="Events per thread (default: 20000)")
+parser.add_argument("--capacity", type=int, default=10000, help="Buffer capacity (default: 10000)")
+parser.add_argument("--flush-ms", type=float, default=50.0, help="Flush interval (default: 50)")
+args = parser.parse_args()
+
+# Add SDK to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sdk", "python"))
+
+from llmobserve.buffer import EventBuffer  # noqa: E402
+
+EVENT = {"id": "x", "run_id": "r", "span_id": "s", "provider": "openai", "cost_usd": 0.001}
+
+
+class LegacyQueueBuffer:
+    """The previous buffer: bounded queue.Queue, drop-oldest on Full, one-at-a-time drain."""
+
+    def __init__(self, capacity):
+        self._queue = queue.Queue(maxsize=capacity)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            try:
+                self._queue.get_nowait()
+                self._queue.put_nowait(event)
+                with self._lock:
+                    self.dropped += 1
+            except (queue.Full, queue.Empty):
+                pass
+
+    def drain(self):
+        events = []
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                return events
+
+
+def run(label, buf):
+    drained = 0
+    stop = threading.Event()
+
+    def flush():
+        nonlocal drained
+        drained += len(buf.drain())
+
+    def timer_flusher():
+        while not stop.is_set():
+            stop.wait(args.flush_ms / 1000.0)
+            flush()
+
+    def producer():
+        add = buf.add
+        for _ in range(args.events):
+            add(EVENT)
+
+    if isinstance(buf, EventBuffer):
+        buf.start(flush, args.flush_ms / 1000.0)  # Size- or interval-triggered
+    else:
+        flush_thread = threading.Thread(target=timer_flusher, daemon=True)
+        flush_thread.start()
+    producers = [threading.Thread(target=producer) for _ in range(args.threads)]
+    start = time.perf_counter()
+    for t in producers:
+        t.start()
+    for t in producers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    if isinstance(buf, EventBuffer):
+        buf.stop()
+    else:
+        stop.set()
+        flush_thread.join()
+    drained += len(buf.drain())
+
+    total = args.threads * args.events
+    if isinstance(buf, EventBuffer):
+        stats = buf.stats()
+        lost = stats["dropped_oldest"] + stats["dropped_newest"]
+        extra = f"spilled {stats['spilled']:>7}"
+    else:
+        lost, extra = buf.dropped, ""
+    print(f"{label:<22} {total / elapsed / 1e6:6.2f} M events/s | {elapsed * 1000:8.0f} ms | "
+          f"delivered {drained:>7} | dropped {lost:>7} {extra}")
+
+
+def main():
+    logging.getLogger("llmobserve").setLevel(logging.ERROR)  # Hide drop warnings
+    print(f"{args.threads} threads x {args.events} events, capacity {args.capacity}, "
+          f"flush every {args.flush_ms} ms\n")
+    run("queue.Queue (before)", LegacyQueueBuffer(args.capacity))
+    for policy in ("drop_oldest", "drop_newest", "block"):
+        run(f"deque {policy}", EventBuffer(capacity=args.capacity, batch_size=args.capacity // 2,
+                                             overflow=policy, block_timeout_ms=100))
+    with tempfile.TemporaryDirectory() as spill_dir:
+        run("deque spill", EventBuffer(capacity=args.capacity, batch_size=args.capacity // 2,
+                                       overflow="spill", spill_dir=spill_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Import-time regression check for the llmobserve package.
+
+Runs `python -X importtime -c "import llmobserve"` in fresh interpreters and
+reports the package's cumulative import time (median of --runs). Exits 1 if
+it exceeds --budget-ms, or if the plain import pulls in modules that belong
+off the runtime path (CLI analyzers, framework integrations, requests,
+asyncio). For comparison it also times importing every public name, which
+is what the package cost before it switched to lazy loading.
+
+Usage:
+    python scripts/benchmark_import_time.py
+    python scripts/benchmark_import_time.py --runs 10 --budget-ms 40
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+parser = argparse.ArgumentParser(description="Check llmobserve import time against a budget")
+parser.add_argument("--runs", type=int, default=7, help="Fresh interpreters per measurement (default: 7)")
+parser.add_argument("--budget-ms", type=float, default=40.0, help="Max median import time in ms (default: 40)")
+args = parser.parse_args()
+
+SDK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sdk", "python")
+
+# Must not be loaded by a bare `import llmobserve`
+OFF_RUNTIME_PATH = [
+    "llmobserve.static_analyzer",
+    "llmobserve.multi_language_analyzer",
+    "llmobserve.ai_instrument",
+    "llmobserve.celery_support",
+    "llmobserve.middleware",
+    "llmobserve.grpc_costs",
+    "llmobserve.llm_wrappers",
+    "llmobserve.instrumentation",
+    "requests",
+    "asyncio",
+]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+\d+\s+\|\s+(\d+)\s+\| ( *)(\S+)")
+
+
+def measure(code):
+    """
+    Return (ms, modules imported). ms sums the cumulative time of every
+    top-level import from `llmobserve` onwards, so modules loaded lazily
+    after the package count too. os._exit skips the atexit flush.
+    """
+    env = dict(os.environ, PYTHONPATH=SDK_PATH + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code + "; import os; os._exit(0)"],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    total_us, modules, found = 0, set(), False
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = match.groups()
+        modules.add(name)
+        found = found or name == "llmobserve"
+        if found and not indent:
+            total_us += int(cumulative)
+    if not found:
+        raise RuntimeError(f"llmobserve not found in -X importtime output:\n{result.stderr[-2000:]}")
+    return total_us / 1000.0, modules
+
+
+def median_ms(code):
+    timings, modules = [], set()
+    for _ in range(args.runs):
+        ms, modules = measure(code)
+        timings.append(ms)
+    return statistics.median(timings), modules
+
+
+def main():
+    lazy_ms, modules = median_ms("import llmobserve")
+    eager_ms, _ = median_ms("import llmobserve; [getattr(llmobserve, n) for n in llmobserve.__all__]")
+
+    print(f"import llmobserve, median of {args.runs} fresh interpreters:")
+    print(f"  import llmobserve                     {lazy_ms:7.1f} ms   (budget {args.budget_ms:.0f} ms)")
+    print(f"  + every public name (eager, before)   {eager_ms:7.1f} ms")
+
+    loaded = [name for name in OFF_RUNTIME_PATH if name in modules]
+    failed = False
+    if loaded:
+        print(f"\nFAIL: loaded off the runtime path: {', '.join(loaded)}")
+        failed = True
+    if lazy_ms > args.budget_ms:
+        print(f"\nFAIL: {lazy_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print("\nOK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark streamed-response tracking in llmobserve/openai_patch.py.
+
+Replays a synthetic chat.completions stream of N one-token chunks (32k by
+default, no usage chunk) through the stream wrapper and the consumer
+closes it at the last chunk (a cancel), so tokens must be estimated. Compared
+against the previous wrapper, reproduced below as the baseline:
+
+- before: accumulated_content += delta.content per chunk, then
+          encoding_for_model() + encode() on the caller's thread at close
+- after:  content parts appended to a list, tokenizer cached per model,
+          join + encode on the background estimator thread
+
+Reports the wrapper's overhead while iterating (vs. the bare stream), the
+time the caller is blocked in close(), and for the new wrapper the time
+until the estimated event reaches the buffer.
+
+If tiktoken's BPE files cannot be loaded (offline), both sides use the
+same regex word-piece splitter instead, so only the SDK overhead differs.
+
+Usage:
+    python scripts/benchmark_openai_stream.py
+    python scripts/benchmark_openai_stream.py --tokens 32000 --runs 5
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+parser = argparse.ArgumentParser(description="Benchmark OpenAI streaming token accounting")
+parser.add_argument("--tokens", type=int, default=32000, help="Chunks (tokens) per stream (default: 32000)")
+parser.add_argument("--runs", type=int, default=5, help="Streams per mode (default: 5)")
+args = parser.parse_args()
+
+# Add SDK to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sdk", "python"))
+
+from llmobserve import buffer, config, openai_patch  # noqa: E402
+
+MODEL = "gpt-4o"
+MESSAGES = [{"role": "user", "content": "Write a very long story about a lighthouse keeper."}]
+WORDS = ["the", " light", "house", " keeper", " watched", " waves", ",", " and", " night", "."]
+
+
+class RegexEncoding:
+    """Offline stand-in for a tiktoken Encoding (cl100k-like pre-tokenization only)."""
+
+    _pattern = re.compile(r"""'s|'t|'re|'ve|'m|'ll|'d| ?\w+| ?\d+| ?[^\s\w]+|\s+""")
+
+    def encode(self, text):
+        return self._pattern.findall(text)
+
+
+def resolve_encoding():
+    try:
+        openai_patch.tiktoken.encoding_for_model(MODEL).encode("probe")
+        return None, "tiktoken"
+    except Exception:
+        return RegexEncoding(), "regex stand-in (tiktoken BPE files unavailable)"
+
+
+def make_chunks(n):
+    return [
+        SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=WORDS[i % len(WORDS)]))], usage=None)
+        for i in range(n)
+    ]
+
+
+def legacy_wrapper(stream, model, messages, get_tokenizer):
+    """The previous _wrap_streaming_response hot path and cancel-time estimation."""
+    accumulated_content = ""
+    output_tokens = input_tokens = 0
+    try:
+        for chunk in stream:
+            if hasattr(chunk, "choices") and len(chunk.choices) > 0:
+                delta = chunk.choices[0].delta
+                if hasattr(delta, "content") and delta.content:
+                    accumulated_content += delta.content
+            yield chunk
+    except GeneratorExit:
+        if accumulated_content:
+            output_tokens = len(get_tokenizer(model).encode(accumulated_content))
+        if messages:
+            encoding = get_tokenizer(model)
+            input_tokens = 3 + sum(3 + len(encoding.encode(m["role"])) + len(encoding.encode(m["content"]))
+                                   for m in messages)
+        raise
+
+
+def consume_and_cancel(stream):
+    """Returns (ms iterating, ms in close())."""
+    start = time.perf_counter()
+    for i, _ in enumerate(stream, 1):
+        if i == args.tokens:
+            break  # Stop reading at the last chunk: close() cancels the stream
+    iterated = time.perf_counter()
+    stream.close()
+    return (iterated - start) * 1000, (time.perf_counter() - iterated) * 1000
+
+
+def bare_iteration_ms(chunks):
+    start = time.perf_counter()
+    for _ in iter(chunks):
+        pass
+    return (time.perf_counter() - start) * 1000
+
+
+def report(label, iterate, close, bare, buffered=None):
+    overhead = statistics.median(iterate) - bare
+    print(f"{label:<26} {overhead:10.1f} ms {overhead * 1e6 / args.tokens:8.0f} ns "
+          f"{statistics.median(close):9.1f} ms "
+          + (f"{statistics.median(buffered):14.1f} ms" if buffered else f"{'-':>17}"))
+
+
+def main():
+    config.configure(collector_url="http://127.0.0.1:9", api_key="llmo_sk_benchmark")
+    buffer.stop_flush_timer()
+    openai_patch.TIKTOKEN_AVAILABLE = True
+    stand_in, tokenizer_name = resolve_encoding()
+    if stand_in is not None:
+        legacy_get_tokenizer = lambda model: stand_in  # noqa: E731
+        openai_patch._tokenizer_cache[MODEL] = stand_in
+    else:
+        legacy_get_tokenizer = openai_patch.tiktoken.encoding_for_model
+
+    print(f"{args.runs} streams x {args.tokens} chunks, cancelled at the last chunk (no usage) | "
+          f"tokenizer: {tokenizer_name}\n")
+
+    chunks = make_chunks(args.tokens)
+    bare = statistics.median(bare_iteration_ms(chunks) for _ in range(args.runs))
+
+    legacy_iterate, legacy_close = [], []
+    for _ in range(args.runs):
+        iterate, close = consume_and_cancel(legacy_wrapper(iter(chunks), MODEL, MESSAGES, legacy_get_tokenizer))
+        legacy_iterate.append(iterate)
+        legacy_close.append(close)
+
+    new_iterate, new_close, buffered = [], [], []
+    for _ in range(args.runs):
+        buffer.get_and_clear_buffer()
+        start = time.perf_counter()
+        iterate, close = consume_and_cancel(openai_patch._wrap_streaming_response(
+            iter(chunks), "chat.completions", MODEL, time.time(), messages=MESSAGES
+        ))
+        openai_patch._estimator.drain()
+        buffered.append((time.perf_counter() - start) * 1000 - iterate)
+        new_iterate.append(iterate)
+        new_close.append(close)
+        events = buffer.get_and_clear_buffer()
+        assert len(events) == 1 and events[0]["output_tokens"] > 0, events
+
+    print(f"{'':<26} {'iteration overhead':>22} {'close() p50':>12} {'event buffered':>17}")
+    report("before (str +=, inline)", legacy_iterate, legacy_close, bare)
+    report("after (list, background)", new_iterate, new_close, bare, buffered)
+    print(f"\nEstimated event: input {events[0]['input_tokens']}, output {events[0]['output_tokens']} tokens, "
+          f"metadata {events[0]['event_metadata']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Benchmark event pricing (llmobserve/pricing_engine.py).
+
+Prices a synthetic stream of events (1M by default) against the collector's
+pricing/registry.json. Model names are drawn from the registry with the
+variations seen in real traffic: dated snapshots (-20241022), upper case,
+provider aliases (meta-llama), longer family names, and unknown models.
+Compared against the previous collector compute_cost, reproduced below as
+the baseline:
+
+- before: per event, lowercase + up to ~20 uncompiled re.sub calls, four
+          composite-key lookups, a model-prefix walk, then a chain of
+          `"per_x" in pricing` checks
+- after:  registry compiled once, (provider, model) resolution memoized,
+          pricing-type enum dispatch; compute_costs() resolves each distinct
+          name once per batch
+
+Results are cross-checked. Expected differences: entries without token
+rates (per_image, per_1k_images), which the old chain priced at $0, and
+dated snapshots of listed models (gemini-2.0-flash-lite-YYYYMMDD), which
+the old normalization folded into a different model.
+
+Usage:
+    python scripts/benchmark_pricing.py
+    python scripts/benchmark_pricing.py --events 1000000 --seed 3
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+parser = argparse.ArgumentParser(description="Benchmark event cost computation")
+parser.add_argument("--events", type=int, default=1_000_000, help="Events to price (default: 1000000)")
+parser.add_argument("--seed", type=int, default=3, help="Random seed (default: 3)")
+args = parser.parse_args()
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+# Add SDK to path
+sys.path.insert(0, os.path.join(ROOT, "sdk", "python"))
+
+from llmobserve.pricing_engine import PricingEngine  # noqa: E402
+
+REGISTRY_FILE = os.path.join(ROOT, "collector", "pricing", "registry.json")
+
+
+def legacy_normalize_provider(provider: str) -> str:
+    """The previous collector normalize_provider."""
+    provider = provider.lower().strip()
+    
+    # Provider name mappings
+    mappings = {
+        "meta-llama": "meta",
+        "mistralai": "mistral",
+        "nousresearch": "nous",
+        "perplexity": "perplexity",
+        "togethercomputer": "together",
+        "01-ai": "yi",
+        "databricks": "databricks",
+        "amazon": "amazon",
+        "tiiuae": "tiiuae",
+        "cognitivecomputations": "cognitive",
+    }
+    
+    return mappings.get(provider, provider)
+
+
+def legacy_normalize_model(model: str) -> str:
+    """The previous collector normalize_model."""
+    import re
+    model = model.lower().strip()
+    
+    # Remove date suffixes (e.g., -20240307)
+    model = re.sub(r'-\d{8}$', '', model)
+    
+    # NOTE: Don't remove -v1/-v2 suffixes globally as some models like
+    # Amazon Nova use them as part of the actual model name (nova-pro-v1)
+    # These are handled by trying exact match first in compute_cost()
+    
+    # Normalize common model name patterns
+    normalizations = {
+        # Llama variants
+        r'llama-3\.1-(\d+)b-instruct': r'llama-3.1-\1b',
+        r'llama-3\.2-(\d+)b-instruct': r'llama-3.2-\1b',
+        r'llama-3-(\d+)b-instruct': r'llama-3-\1b',
+        # Mistral variants  
+        r'mistral-(\d+)b-instruct.*': r'mistral-\1b',
+        r'mixtral-8x(\d+)b-instruct.*': r'mixtral-8x\1b',
+        # DeepSeek
+        r'deepseek-chat.*': 'deepseek-chat',
+        r'deepseek-coder.*': 'deepseek-coder',
+        r'deepseek-r1.*': 'deepseek-r1',
+        # Qwen
+        r'qwen-2\.5-(\d+)b-instruct': r'qwen-2.5-\1b',
+        r'qwen-2-(\d+)b-instruct': r'qwen-2-\1b',
+        # Claude
+        r'claude-3\.5-sonnet.*': 'claude-3.5-sonnet',
+        r'claude-3-5-sonnet.*': 'claude-3.5-sonnet',
+        r'claude-3-haiku.*': 'claude-3-haiku',
+        r'claude-3-5-haiku.*': 'claude-3.5-haiku',
+        r'claude-3\.5-haiku.*': 'claude-3.5-haiku',
+        # Gemini
+        r'gemini-flash-1\.5.*': 'gemini-1.5-flash',
+        r'gemini-pro-1\.5.*': 'gemini-1.5-pro',
+        r'gemini-2\.0-flash.*': 'gemini-2.0-flash',
+    }
+    
+    for pattern, replacement in normalizations.items():
+        normalized = re.sub(pattern, replacement, model)
+        if normalized != model:
+            return normalized
+    
+    return model
+
+
+def legacy_compute_cost(provider, model, input_tokens, output_tokens, registry):
+    """The previous collector compute_cost."""
+    
+    # Store originals for fallback attempts
+    original_provider = provider.lower().strip()
+    original_model = model.lower().strip() if model else None
+    
+    # Normalize provider and model names
+    normalized_provider = legacy_normalize_provider(original_provider)
+    normalized_model = legacy_normalize_model(original_model) if original_model else None
+    
+    # Build key with fallback for model name variations
+    pricing = {}
+    if original_model:
+        # 1. Try exact match with original names first
+        key = f"{original_provider}:{original_model}"
+        pricing = registry.get(key, {})
+        
+        # 2. Try with normalized provider but original model
+        if not pricing:
+            key = f"{normalized_provider}:{original_model}"
+            pricing = registry.get(key, {})
+        
+        # 3. Try with original provider but normalized model
+        if not pricing:
+            key = f"{original_provider}:{normalized_model}"
+            pricing = registry.get(key, {})
+        
+        # 4. Try fully normalized
+        if not pricing:
+            key = f"{normalized_provider}:{normalized_model}"
+            pricing = registry.get(key, {})
+        
+        # 5. If still not found, try matching by model family (progressively shorter names)
+        if not pricing and original_model and "-" in original_model:
+            parts = original_model.split("-")
+            if len(parts) >= 3:
+                for i in range(len(parts) - 1, 2, -1):  # Start from full name minus 1, go down
+                    test_model = "-".join(parts[:i])
+                    # Try with both providers
+                    for prov in [original_provider, normalized_provider]:
+                        test_key = f"{prov}:{test_model}"
+                        if test_key in registry:
+                            pricing = registry[test_key]
+                            break
+                    if pricing:
+                        break
+    else:
+        # No model, try provider-level pricing
+        key = f"{original_provider}"
+        pricing = registry.get(key, {})
+        if not pricing:
+            key = f"{normalized_provider}"
+            pricing = registry.get(key, {})
+    
+    # Check for per_call pricing
+    if "per_call" in pricing:
+        return pricing["per_call"]
+    
+    # Check for per_million pricing (Pinecone read/write units)
+    if "per_million" in pricing:
+        # Use standard pricing by default (not enterprise)
+        return pricing["per_million"] / 1_000_000  # Convert to per-call cost
+    
+    # Check for per_million_tokens pricing (Pinecone embedding models)
+    if "per_million_tokens" in pricing:
+        total_tokens = input_tokens + output_tokens
+        return (pricing["per_million_tokens"] / 1_000_000) * total_tokens
+    
+    # Check for per_1k_requests pricing (Pinecone reranking)
+    if "per_1k_requests" in pricing:
+        return pricing["per_1k_requests"] / 1000  # Convert to per-request cost
+    
+    # Check for per_gb pricing (Pinecone storage operations)
+    if "per_gb" in pricing:
+        return pricing["per_gb"]
+    
+    # Check for per_gb_month pricing (Pinecone storage)
+    if "per_gb_month" in pricing:
+        return pricing["per_gb_month"]
+    
+    # Check for per_minute pricing (audio)
+    if "per_minute" in pricing:
+        return pricing["per_minute"]
+    
+    # Check for per_character pricing (TTS)
+    if "per_character" in pricing:
+        return pricing["per_character"]
+    
+    # Check for per_second pricing (Sora)
+    if "per_second" in pricing:
+        return pricing["per_second"]
+    
+    # Check for per_session pricing (Code Interpreter)
+    if "per_session" in pricing:
+        return pricing["per_session"]
+    
+    # Check for per_gb_day pricing (File Search Storage)
+    if "per_gb_day" in pricing:
+        return pricing["per_gb_day"]
+    
+    # Check for per_1k_calls pricing (Tools)
+    if "per_1k_calls" in pricing:
+        return pricing["per_1k_calls"] / 1000
+    
+    # Token-based pricing (default)
+    input_cost = pricing.get("input", 0.0) * input_tokens
+    output_cost = pricing.get("output", 0.0) * output_tokens
+    
+    return input_cost + output_cost
+
+
+
+def make_names(registry, rng):
+    """Distinct (provider, model) names in realistic proportions."""
+    keys = [key.split(":", 1) for key in registry if ":" in key]
+    names = []
+    for provider, model in keys:
+        names += [(provider, model)] * 6
+        names.append((provider, f"{model}-{rng.randint(20240101, 20251231)}"))
+        names.append((provider, model.upper()))
+        names.append((provider, f"{model}-preview-{rng.randint(1, 9)}"))
+        if provider == "meta":
+            names.append(("meta-llama", model))
+    names += [("openai", f"ft:gpt-custom-{i}") for i in range(200)]
+    names += [("unknown", None)] * 50
+    return names
+
+
+def make_events(n, names, rng):
+    events = []
+    for provider, model in rng.choices(names, k=n):
+        events.append({
+            "provider": provider,
+            "model": model,
+            "input_tokens": rng.randint(1, 8000),
+            "output_tokens": rng.randint(0, 2000),
+        })
+    return events
+
+
+def main():
+    rng = random.Random(args.seed)
+    with open(REGISTRY_FILE) as f:
+        registry = json.load(f)
+    names = make_names(registry, rng)
+    events = make_events(args.events, names, rng)
+    print(f"{len(events)} events, {len(set(names))} distinct names, {len(registry)} registry entries\n")
+
+    start = time.perf_counter()
+    legacy = [legacy_compute_cost(e["provider"], e["model"], e["input_tokens"], e["output_tokens"], registry)
+              for e in events]
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine = PricingEngine(registry)
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    per_event = [engine.cost(e["provider"], e["model"], e["input_tokens"], e["output_tokens"]) for e in events]
+    per_event_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = engine.compute_costs(events)
+    batch_s = time.perf_counter() - start
+
+    def line(label, seconds):
+        print(f"  {label:<34} {seconds:7.2f} s  {seconds * 1e9 / len(events):7.0f} ns/event  "
+              f"({legacy_s / seconds:.1f}x)")
+
+    print(f"  compile registry                   {compile_ms:7.1f} ms")
+    line("before (compute_cost per event)", legacy_s)
+    line("engine.cost per event", per_event_s)
+    line("engine.compute_costs(batch)", batch_s)
+    info = engine.cache_info()
+    print(f"  resolve cache: {info.currsize} names, hit rate {info.hits / max(1, info.hits + info.misses):.1%}")
+
+    assert per_event == batch
+    differences = {}
+    for event, before, after in zip(events, legacy, batch):
+        if abs(before - after) > 1e-12:
+            differences.setdefault((event["provider"], event["model"]), (before, after))
+    print(f"\nPriced differently: {len(differences)} names")
+    for (provider, model), (before, after) in sorted(differences.items(), key=str)[:10]:
+        price = engine.resolve(provider, model)
+        print(f"  {provider}:{model} ({price.unit_key}) ${before:.6f} -> ${after:.6f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Benchmark provider detection (llmobserve/provider_registry.py).
+
+Classifies a synthetic corpus of URLs (100k by default): provider API calls
+with varied hosts and paths (regional AWS endpoints, Azure resources,
+per-index Pinecone hosts), plus non-provider traffic that the old substring
+rules misclassified. Compared against the previous if/elif chain in
+http_interceptor.extract_provider_from_url (15 providers) and the proxy's
+detect_provider (45 providers), reproduced below as baselines:
+
+- before: lowercase the whole URL, then one substring scan per rule until
+          one matches (every rule for unknown URLs)
+- after:  host split once, suffix-trie walk, rules cached per host (LRU)
+
+Reports ns/URL for the old chains, the registry with a cold cache, and the
+registry warm, followed by the URLs the SDK's old chain and the registry
+disagree on.
+
+Usage:
+    python scripts/benchmark_provider_registry.py
+    python scripts/benchmark_provider_registry.py --urls 100000 --seed 7
+"""
+import argparse
+import collections
+import os
+import random
+import sys
+import time
+
+parser = argparse.ArgumentParser(description="Benchmark URL -> provider detection")
+parser.add_argument("--urls", type=int, default=100000, help="URLs in the corpus (default: 100000)")
+parser.add_argument("--seed", type=int, default=7, help="Random seed (default: 7)")
+args = parser.parse_args()
+
+# Add SDK to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sdk", "python"))
+
+from llmobserve.provider_registry import ProviderRegistry  # noqa: E402
+
+REGIONS = ["us-east-1", "us-west-2", "eu-west-1", "ap-south-1"]
+PROVIDER_URLS = [
+    lambda r: f"https://api.openai.com/v1/{r.choice(['chat/completions', 'embeddings', 'responses'])}",
+    lambda r: f"https://api.anthropic.com/v1/messages?beta={r.randint(0, 9)}",
+    lambda r: f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-pro:generateContent?key=k{r.randint(0, 99)}",
+    lambda r: f"https://res-{r.randint(0, 300)}.openai.azure.com/openai/deployments/gpt4/chat/completions",
+    lambda r: f"https://bedrock-runtime.{r.choice(REGIONS)}.amazonaws.com/model/anthropic.claude-v2/invoke",
+    lambda r: f"https://idx-{r.randint(0, 2000)}.svc.{r.choice(REGIONS)}.pinecone.io/query",
+    lambda r: "https://api.cohere.com/v1/embed",
+    lambda r: "https://api.together.xyz/v1/chat/completions",
+    lambda r: "https://api.groq.com/openai/v1/chat/completions",
+    lambda r: "https://api.mistral.ai/v1/chat/completions",
+    lambda r: "https://openrouter.ai/api/v1/chat/completions",
+    lambda r: "https://api.elevenlabs.io/v1/text-to-speech/voice",
+    lambda r: "https://api.deepgram.com/v1/listen",
+    lambda r: "https://api.voyageai.com/v1/embeddings",
+]
+# Traffic from the same process that is not a provider call
+OTHER_URLS = [
+    lambda r: f"https://api.github.com/repos/org/repo-{r.randint(0, 500)}/issues",
+    lambda r: f"https://docs.google.com/document/d/{r.randint(0, 10 ** 6)}",
+    lambda r: f"https://s3.{r.choice(REGIONS)}.amazonaws.com/bucket/key-{r.randint(0, 1000)}",
+    lambda r: f"https://together-events.io/rsvp/{r.randint(0, 100)}",
+    lambda r: "https://hooks.slack.com/services/T000/B000/XXXX",
+    lambda r: f"https://internal.example.com/search?q=openai+pricing&page={r.randint(0, 20)}",
+    lambda r: f"https://cdn.example.net/assets/mistral-{r.randint(0, 50)}.png",
+]
+
+
+def legacy_extract_provider_from_url(url):
+    """The previous http_interceptor.extract_provider_from_url."""
+    url_lower = url.lower()
+    if "api.openai.com" in url_lower or "openai" in url_lower:
+        return "openai"
+    elif "api.anthropic.com" in url_lower or "anthropic" in url_lower:
+        return "anthropic"
+    elif "generativelanguage.googleapis.com" in url_lower or "gemini" in url_lower or "google" in url_lower:
+        return "google"
+    elif "pinecone.io" in url_lower:
+        return "pinecone"
+    elif "api.cohere.ai" in url_lower or "cohere" in url_lower:
+        return "cohere"
+    elif "api.together.xyz" in url_lower or "together" in url_lower:
+        return "together"
+    elif "api.vapi.ai" in url_lower or "vapi.ai" in url_lower:
+        return "vapi"
+    elif "openrouter.ai" in url_lower or "openrouter" in url_lower:
+        return "openrouter"
+    elif "groq.com" in url_lower or "groq" in url_lower:
+        return "groq"
+    elif "mistral.ai" in url_lower or "mistral" in url_lower:
+        return "mistral"
+    elif "api.perplexity.ai" in url_lower or "perplexity" in url_lower:
+        return "perplexity"
+    elif "api.ai21.com" in url_lower or "ai21" in url_lower:
+        return "ai21"
+    elif "replicate.com" in url_lower or "replicate" in url_lower:
+        return "replicate"
+    elif "huggingface.co" in url_lower or "huggingface" in url_lower:
+        return "huggingface"
+    elif "voyageai.com" in url_lower or "voyage" in url_lower:
+        return "voyage"
+    return None
+
+
+def legacy_proxy_detect_provider(url):
+    """The previous proxy/providers.py detect_provider."""
+    url_lower = url.lower()
+    
+    # LLM Providers (13)
+    if "api.openai.com" in url_lower:
+        return "openai"
+    elif "api.anthropic.com" in url_lower:
+        return "anthropic"
+    elif "generativelanguage.googleapis.com" in url_lower or "aiplatform.googleapis.com" in url_lower:
+        return "google"
+    elif "api.cohere.ai" in url_lower or "api.cohere.com" in url_lower:
+        return "cohere"
+    elif "api.mistral.ai" in url_lower:
+        return "mistral"
+    elif "api.groq.com" in url_lower:
+        return "groq"
+    elif "api.ai21.com" in url_lower:
+        return "ai21"
+    elif "api-inference.huggingface.co" in url_lower:
+        return "huggingface"
+    elif "api.together.xyz" in url_lower or "together.ai" in url_lower:
+        return "together"
+    elif "api.replicate.com" in url_lower:
+        return "replicate"
+    elif "api.perplexity.ai" in url_lower:
+        return "perplexity"
+    elif "openai.azure.com" in url_lower:
+        return "azure_openai"
+    elif ("bedrock-runtime" in url_lower or "bedrock" in url_lower) and "amazonaws.com" in url_lower:
+        return "aws_bedrock"
+    elif "openrouter.ai" in url_lower:
+        return "openrouter"
+    
+    # Voice AI (7)
+    elif "api.elevenlabs.io" in url_lower:
+        return "elevenlabs"
+    elif "api.assemblyai.com" in url_lower:
+        return "assemblyai"
+    elif "api.deepgram.com" in url_lower:
+        return "deepgram"
+    elif "play.ht" in url_lower or "api.play.ai" in url_lower:
+        return "playht"
+    elif "speech.platform.bing.com" in url_lower or ("cognitiveservices.azure.com" in url_lower and "speech" in url_lower):
+        return "azure_speech"
+    elif "polly" in url_lower and "amazonaws.com" in url_lower:
+        return "aws_polly"
+    elif "transcribe" in url_lower and "amazonaws.com" in url_lower:
+        return "aws_transcribe"
+    
+    # Embeddings
+    elif "api.voyageai.com" in url_lower:
+        return "voyage"
+    
+    # Images/Video (4)
+    elif "api.stability.ai" in url_lower:
+        return "stability"
+    elif "api.runwayml.com" in url_lower:
+        return "runway"
+    elif "rekognition" in url_lower and "amazonaws.com" in url_lower:
+        return "aws_rekognition"
+    
+    # Vector Databases (8)
+    elif "pinecone.io" in url_lower:
+        return "pinecone"
+    elif "weaviate" in url_lower:
+        return "weaviate"
+    elif "qdrant" in url_lower:
+        return "qdrant"
+    elif "milvus" in url_lower or "zilliz" in url_lower:
+        return "milvus"
+    elif "trychroma.com" in url_lower or "chromadb" in url_lower:
+        return "chroma"
+    elif ("mongodb.com" in url_lower or "mongodb.net" in url_lower) and ("vector" in url_lower or "search" in url_lower):
+        return "mongodb"
+    elif "redis" in url_lower and "vector" in url_lower:
+        return "redis"
+    elif ("elastic" in url_lower or "elasticsearch" in url_lower) and "vector" in url_lower:
+        return "elasticsearch"
+    
+    # Search (1)
+    elif "algolia" in url_lower:
+        return "algolia"
+    
+    # Payment Processing (2)
+    elif "api.stripe.com" in url_lower:
+        return "stripe"
+    elif "api.paypal.com" in url_lower or ("paypal.com" in url_lower and "/v1/" in url_lower):
+        return "paypal"
+    
+    # Communication (2)
+    elif "api.twilio.com" in url_lower:
+        return "twilio"
+    elif "api.sendgrid.com" in url_lower:
+        return "sendgrid"
+    
+    # Database/Backend (1)
+    elif "supabase.co" in url_lower:
+        return "supabase"
+    
+    else:
+        return "unknown"
+
+
+def make_corpus(n, rng):
+    return [rng.choice(PROVIDER_URLS if rng.random() < 0.75 else OTHER_URLS)(rng) for _ in range(n)]
+
+
+def ns_per_url(detect, corpus):
+    start = time.perf_counter()
+    for url in corpus:
+        detect(url)
+    return (time.perf_counter() - start) * 1e9 / len(corpus)
+
+
+def main():
+    rng = random.Random(args.seed)
+    corpus = make_corpus(args.urls, rng)
+
+    legacy = ns_per_url(legacy_extract_provider_from_url, corpus)
+    legacy_proxy = ns_per_url(legacy_proxy_detect_provider, corpus)
+    registry = ProviderRegistry()
+    cold = ns_per_url(registry.detect, corpus)
+    warm = ns_per_url(registry.detect, corpus)
+    info = registry.cache_info()
+
+    print(f"{len(corpus)} URLs, {len({u.split('/')[2] for u in corpus})} distinct hosts\n")
+    print(f"  before, SDK chain (15 providers)    {legacy:7.0f} ns/URL")
+    print(f"  before, proxy chain (45 providers)  {legacy_proxy:7.0f} ns/URL")
+    print(f"  registry, cold host cache           {cold:7.0f} ns/URL")
+    print(f"  registry, warm host cache           {warm:7.0f} ns/URL")
+    print(f"  host cache: {info.currsize} hosts, hit rate {info.hits / max(1, info.hits + info.misses):.1%}")
+
+    disagreements = collections.Counter()
+    examples = {}
+    for url in corpus:
+        before, after = legacy_extract_provider_from_url(url), registry.detect(url)
+        if before != after:
+            key = (before, after)
+            disagreements[key] += 1
+            examples.setdefault(key, url)
+    print(f"\nClassified differently: {sum(disagreements.values())} URLs")
+    for (before, after), count in disagreements.most_common():
+        print(f"  {count:6d}  {str(before):>8} -> {str(after):<14} e.g. {examples[(before, after)]}")
+
+
+if __name__ == "__main__":
+    main()
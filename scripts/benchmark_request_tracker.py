@@ -0,0 +1,150 @@
+"""
+Benchmark retry dedupe in llmobserve/request_tracker.py.
+
+Every intercepted request computes a request ID and checks it against the
+tracked set. Compared against the previous implementation, reproduced below
+as the baseline:
+
+- before: body decoded to str and concatenated into one fingerprint string,
+          sha256; is_request_tracked() scanned the whole OrderedDict for
+          expired entries on every call
+- after:  blake2b fed the body bytes directly (no decode, no copy);
+          time-bucketed ExpiringSet, expiry amortized O(1), thread-safe
+
+Usage:
+    python scripts/benchmark_request_tracker.py
+    python scripts/benchmark_request_tracker.py --body-mb 1 --entries 10000 --lookups 20000
+"""
+import argparse
+import hashlib
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+parser = argparse.ArgumentParser(description="Benchmark request ID hashing and retry dedupe")
+parser.add_argument("--body-mb", type=float, default=1.0, help="Request body size in MB (default: 1)")
+parser.add_argument("--hashes", type=int, default=50, help="Bodies hashed per mode (default: 50)")
+parser.add_argument("--entries", type=int, default=10000, help="Tracked requests in the cache (default: 10000)")
+parser.add_argument("--lookups", type=int, default=20000, help="is_request_tracked calls per mode (default: 20000)")
+parser.add_argument("--threads", type=int, default=8, help="Threads for the concurrent check (default: 8)")
+args = parser.parse_args()
+
+# Add SDK to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sdk", "python"))
+
+from llmobserve import request_tracker  # noqa: E402
+
+URL = "https://api.openai.com/v1/chat/completions"
+
+
+class LegacyTracker:
+    """The previous module-level OrderedDict cache and helpers."""
+
+    def __init__(self, max_size=10000, ttl=3600):
+        self.tracked = OrderedDict()
+        self.max_size = max_size
+        self.ttl = ttl
+
+    @staticmethod
+    def generate_request_id(method, url, body=None):
+        fingerprint = f"{method}:{url}"
+        if body:
+            fingerprint += f":{body.decode('utf-8', errors='ignore')}"
+        return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+    def is_request_tracked(self, request_id):
+        now = time.time()
+        expired = [rid for rid, ts in self.tracked.items() if now - ts > self.ttl]
+        for rid in expired:
+            del self.tracked[rid]
+        return request_id in self.tracked
+
+    def mark_request_tracked(self, request_id):
+        self.tracked[request_id] = time.time()
+        if len(self.tracked) > self.max_size:
+            self.tracked.popitem(last=False)
+
+
+def make_body(size):
+    prefix = b'{"model":"gpt-4o","messages":[{"role":"user","content":"'
+    suffix = b'"}]}'
+    filler = b"The lighthouse keeper watched the waves roll in. "
+    fill = size - len(prefix) - len(suffix)
+    return prefix + (filler * (fill // len(filler) + 1))[:fill] + suffix
+
+
+def time_hashes(generate, body):
+    timings = []
+    for _ in range(args.hashes):
+        start = time.perf_counter()
+        generate("POST", URL, body)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def time_lookups(is_tracked, mark, ids):
+    for request_id in ids:
+        mark(request_id)
+    probes = [f"probe-{i}" for i in range(args.lookups)]
+    start = time.perf_counter()
+    for probe in probes:
+        is_tracked(probe)
+    return (time.perf_counter() - start) * 1e6 / args.lookups
+
+
+def concurrent_check():
+    """Mark from several threads at once; the set must stay bounded and consistent."""
+    request_tracker._tracked_requests.clear()
+    per_thread = request_tracker._max_cache_size
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(per_thread):
+                request_id = f"t{n}-{i}"
+                request_tracker.mark_request_tracked(request_id)
+                request_tracker.is_request_tracked(request_id)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    size = len(request_tracker._tracked_requests)
+    assert not errors and size == request_tracker._max_cache_size, (errors, size)
+    return args.threads * per_thread, elapsed, size
+
+
+def main():
+    body = make_body(int(args.body_mb * 1024 * 1024))
+    legacy = LegacyTracker(request_tracker._max_cache_size, request_tracker._cache_ttl_seconds)
+
+    print(f"generate_request_id, {len(body) / 1024 / 1024:.1f} MB body ({args.hashes} runs, p50):")
+    before = time_hashes(legacy.generate_request_id, body)
+    after = time_hashes(request_tracker.generate_request_id, body)
+    print(f"  before (decode + concat + sha256)  {before:8.3f} ms")
+    print(f"  after  (blake2b over bytes)        {after:8.3f} ms   ({before / after:.1f}x)")
+
+    ids = [f"req-{i}" for i in range(args.entries)]
+    request_tracker._tracked_requests.clear()
+    print(f"\nis_request_tracked with {args.entries} tracked requests ({args.lookups} lookups):")
+    before = time_lookups(legacy.is_request_tracked, legacy.mark_request_tracked, ids)
+    after = time_lookups(request_tracker.is_request_tracked, request_tracker.mark_request_tracked, ids)
+    print(f"  before (OrderedDict full scan)     {before:8.2f} us/call")
+    print(f"  after  (bucketed ExpiringSet)      {after:8.2f} us/call   ({before / after:.0f}x)")
+
+    marked, elapsed, size = concurrent_check()
+    print(f"\n{args.threads} threads marked {marked} IDs in {elapsed * 1000:.0f} ms; "
+          f"tracked set size {size} (bound {request_tracker._max_cache_size})")
+    request_tracker._tracked_requests.clear()
+
+
+if __name__ == "__main__":
+    main()
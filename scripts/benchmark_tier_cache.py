@@ -0,0 +1,121 @@
+"""
+Benchmark tenant tier lookups in the proxy's cost path (proxy/tier_cache.py).
+
+Starts a stub collector on localhost whose /provider-tiers/ endpoint takes
+--latency-ms to answer, then prices --requests concurrent requests spread
+over --tenants tenants on one event loop:
+
+- before: get_tenant_tier did a blocking httpx.get per priced request, so
+          every lookup stalled the whole event loop for the collector's
+          round trip
+- after:  TenantTierCache.get answers from memory; misses are fetched once
+          per tenant in the background
+
+Reports wall time for the batch and the longest event-loop stall (measured
+by a ticker task that should wake every millisecond).
+
+Usage:
+    python scripts/benchmark_tier_cache.py
+    python scripts/benchmark_tier_cache.py --requests 500 --tenants 20 --latency-ms 20
+"""
+import argparse
+import asyncio
+import http.server
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import urllib.parse
+
+parser = argparse.ArgumentParser(description="Benchmark proxy tenant tier lookups")
+parser.add_argument("--requests", type=int, default=500, help="Priced requests (default: 500)")
+parser.add_argument("--tenants", type=int, default=20, help="Distinct tenants (default: 20)")
+parser.add_argument("--latency-ms", type=float, default=20.0, help="Stub collector latency (default: 20)")
+args = parser.parse_args()
+
+# Proxy modules are flat (run from proxy/)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "proxy"))
+logging.getLogger("llmobserve.proxy").setLevel(logging.ERROR)
+
+import httpx  # noqa: E402
+from tier_cache import TenantTierCache  # noqa: E402
+from upstream import upstream_pool  # noqa: E402
+
+
+class StubCollector(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(args.latency_ms / 1000.0)
+        tenant = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query).get("tenant_id", [""])[0]
+        body = json.dumps([{"provider": "openai", "tier": f"tier-{len(tenant) % 5 + 1}", "is_active": True}])
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *_):
+        pass
+
+
+def legacy_get_tenant_tier(collector_url, tenant_id, provider):
+    """The previous proxy/pricing.py get_tenant_tier."""
+    response = httpx.get(f"{collector_url}/provider-tiers/?tenant_id={tenant_id}", timeout=2.0)
+    for tier_config in response.json():
+        if tier_config.get("provider") == provider and tier_config.get("is_active"):
+            return tier_config.get("tier")
+    return None
+
+
+async def priced_requests(lookup):
+    """Run the lookups as concurrent request handlers; return (seconds, max loop stall)."""
+    stall, done = [0.0], asyncio.Event()
+
+    async def ticker():
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stall[0] = max(stall[0], now - last - 0.001)
+            last = now
+
+    async def handler(i):
+        await asyncio.sleep(0)
+        lookup(f"tenant-{i % args.tenants}", "openai")
+
+    tick = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick
+    return elapsed, stall[0]
+
+
+async def main():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubCollector)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    collector_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    before, before_stall = await priced_requests(lambda t, p: legacy_get_tenant_tier(collector_url, t, p))
+
+    cache = TenantTierCache()
+    cache.start(collector_url)
+    cold, cold_stall = await priced_requests(cache.get)
+    while cache.stats()["refreshing"]:
+        await asyncio.sleep(0.01)
+    warm, warm_stall = await priced_requests(cache.get)
+    await cache.stop()
+    await upstream_pool.aclose()
+    server.shutdown()
+
+    print(f"{args.requests} priced requests, {args.tenants} tenants, collector latency {args.latency_ms:.0f} ms\n")
+    print(f"  before, blocking httpx.get     {before * 1000:9.1f} ms   max loop stall {before_stall * 1000:8.1f} ms")
+    print(f"  tier cache, cold               {cold * 1000:9.1f} ms   max loop stall {cold_stall * 1000:8.1f} ms")
+    print(f"  tier cache, warm               {warm * 1000:9.1f} ms   max loop stall {warm_stall * 1000:8.1f} ms")
+    print(f"\n  {cache.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
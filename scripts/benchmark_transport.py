@@ -0,0 +1,191 @@
+"""
+Benchmark SDK event flushes (llmobserve/transport.py).
+
+Sends batches of realistic trace events to a local stub of the collector's
+POST /events/ and reports bytes on the wire and flush latency for:
+
+- requests.post (before):  new connection per flush, stdlib json, no
+                           compression (the previous flush_events)
+- pooled, no compression:  keep-alive session + orjson (if installed)
+- pooled + gzip / zstd:    as above with Content-Encoding (zstd only if
+                           the zstandard package is installed)
+
+A final run points both implementations at a collector returning 503 and
+measures how long one flush call holds the flushing thread.
+
+Usage:
+    python scripts/benchmark_transport.py
+    python scripts/benchmark_transport.py --events 5000 --flushes 20 --latency-ms 5
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+parser = argparse.ArgumentParser(description="Benchmark SDK event flush transport")
+parser.add_argument("--events", type=int, default=5000, help="Events per batch (default: 5000)")
+parser.add_argument("--flushes", type=int, default=20, help="Flushes per mode (default: 20)")
+parser.add_argument("--latency-ms", type=float, default=5.0, help="Simulated collector latency (default: 5)")
+args = parser.parse_args()
+
+# Add SDK to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sdk", "python"))
+
+import requests  # noqa: E402
+
+from llmobserve import config, transport  # noqa: E402
+
+MODELS = [("openai", "gpt-4o"), ("openai", "gpt-4o-mini"), ("anthropic", "claude-3-5-sonnet"), ("pinecone", None)]
+SECTIONS = ["agent:researcher", "agent:researcher/tool:web_search", "agent:writer", "step:summarize"]
+
+connections = 0
+fail_with_503 = False
+
+
+class EventsStub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real collector
+
+    def setup(self):
+        global connections
+        connections += 1
+        super().setup()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        encoding = self.headers.get("Content-Encoding")
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "zstd":
+            body = transport.zstandard.ZstdDecompressor().decompressobj().decompress(body)
+        json.loads(body)  # The collector parses every batch
+        time.sleep(args.latency_ms / 1000.0)
+        status, payload = (503, b'{"detail":"unavailable"}') if fail_with_503 else (201, b'{"status":"success"}')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *_):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+def make_events(n):
+    run_id = str(uuid.uuid4())
+    events = []
+    for i in range(n):
+        provider, model = random.choice(MODELS)
+        events.append({
+            "id": str(uuid.uuid4()),
+            "run_id": run_id,
+            "span_id": str(uuid.uuid4()),
+            "parent_span_id": None,
+            "section": "main",
+            "section_path": random.choice(SECTIONS),
+            "span_type": "llm" if model else "vector_db",
+            "provider": provider,
+            "endpoint": "chat" if model else "query",
+            "model": model,
+            "tenant_id": "default_tenant",
+            "customer_id": f"customer_{random.randint(1, 50)}",
+            "input_tokens": random.randint(50, 4000),
+            "output_tokens": random.randint(10, 800),
+            "cached_tokens": 0,
+            "cost_usd": round(random.uniform(0.0001, 0.05), 6),
+            "latency_ms": round(random.uniform(200, 4000), 2),
+            "status": "ok",
+            "is_streaming": random.random() < 0.3,
+            "stream_cancelled": False,
+            "event_metadata": None,
+        })
+    return events
+
+
+def legacy_flush(url, events):
+    """The previous flush_events: requests.post per attempt, sleeping 1s, 2s between attempts."""
+    for attempt in range(3):
+        try:
+            response = requests.post(url, json=events, headers={"Content-Type": "application/json"}, timeout=30)
+            response.raise_for_status()
+            return len(json.dumps(events).encode())
+        except Exception:
+            if attempt < 2:
+                time.sleep(1.0 * (2 ** attempt))
+    return 0
+
+
+def pooled_flush(url, events):
+    raw = transport.serialize_events(events)
+    body, headers = transport.compress_body(raw)
+    transport._sender.post(url, body, headers)
+    return len(body)
+
+
+def measure(label, flush, url, events, encoding=None):
+    global connections
+    if encoding is not None:
+        os.environ["LLMOBSERVE_COMPRESSION"] = encoding
+    connections = 0
+    timings, wire = [], 0
+    for _ in range(args.flushes):
+        start = time.perf_counter()
+        wire = flush(url, events)
+        timings.append((time.perf_counter() - start) * 1000)
+    print(
+        f"{label:<24} {wire / 1024:8.0f} KiB | p50 {statistics.median(timings):7.1f} ms | "
+        f"max {max(timings):7.1f} ms | new connections {connections:3d}"
+    )
+
+
+def main():
+    global fail_with_503
+    logging.getLogger("llmobserve").setLevel(logging.CRITICAL)
+    server = StubServer(("127.0.0.1", 0), EventsStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    collector_url = f"http://127.0.0.1:{server.server_address[1]}"
+    url = f"{collector_url}/events/"
+    config.configure(collector_url=collector_url, api_key="llmo_sk_benchmark")
+
+    events = make_events(args.events)
+    print(
+        f"{args.flushes} flushes x {args.events} events | collector latency {args.latency_ms} ms | "
+        f"serializer {'orjson' if transport.orjson else 'json'}\n"
+    )
+    measure("requests.post (before)", legacy_flush, url, events)
+    measure("pooled, no compression", pooled_flush, url, events, encoding="none")
+    measure("pooled + gzip", pooled_flush, url, events, encoding="gzip")
+    if transport.zstandard is not None:
+        measure("pooled + zstd", pooled_flush, url, events, encoding="zstd")
+
+    print("\nCollector returning 503 - time one flush holds the flushing thread:")
+    fail_with_503 = True
+    start = time.perf_counter()
+    legacy_flush(url, events)
+    print(f"  requests.post (before)  {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    os.environ["LLMOBSERVE_COMPRESSION"] = "gzip"
+    transport.RETRY_BASE_DELAY = 60.0  # Keep the retry parked for the measurement
+    from llmobserve.buffer import add_event
+    for event in events:
+        add_event(event)
+    start = time.perf_counter()
+    transport.flush_events()
+    print(f"  flush_events (after)    {(time.perf_counter() - start) * 1000:8.1f} ms "
+          f"(batch queued for background retry: {transport.get_transport_stats()['pending_retries']})")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,7 +10,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'collector'))
 from sqlmodel import Session
 from db import engine, init_db
 from models import User, APIKey
-from auth import generate_api_key, hash_api_key, get_key_prefix
+from auth import generate_api_key, hash_api_key, compute_lookup_hash, get_key_prefix
 from datetime import datetime
 
 def create_test_user():
@@ -52,6 +52,7 @@ def create_test_user():
                 api_key_obj = APIKey(
                     user_id=existing.id,
                     key_hash=key_hash,
+                    lookup_hash=compute_lookup_hash(api_key_plain),
                     key_prefix=key_prefix,
                     name="Test API Key"
                 )
@@ -86,6 +87,7 @@ def create_test_user():
         api_key_obj = APIKey(
             user_id=user.id,
             key_hash=key_hash,
+            lookup_hash=compute_lookup_hash(api_key_plain),
             key_prefix=key_prefix,
             name="Test API Key"
         )
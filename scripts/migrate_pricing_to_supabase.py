@@ -16,6 +16,7 @@ sys.path.insert(0, str(collector_path))
 from db import get_session
 from sqlmodel import Session, select
 from models import Pricing  # We'll need to create this model
+from pricing import bump_pricing_version
 
 
 def load_json_pricing() -> Dict[str, Any]:
@@ -101,6 +102,8 @@ def migrate_pricing(session: Session):
             print(f"   ✅ Added {entry['provider']}:{entry['model'] or 'N/A'}")
             inserted += 1
     
+    if inserted:
+        bump_pricing_version(session)  # Running collectors and proxies reload
     session.commit()
     
     print(f"\n✅ Migration complete!")
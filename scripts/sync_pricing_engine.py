@@ -0,0 +1,47 @@
+"""
+Keep the collector's copy of the pricing engine identical to the SDK's.
+
+sdk/python/llmobserve/pricing_engine.py is the source. The collector ships
+collector/pricing_engine.py so deploys rooted at collector/ (railway.json,
+Procfile) can import it without the rest of the repo.
+
+Usage:
+    python scripts/sync_pricing_engine.py           # copy the SDK engine into collector/
+    python scripts/sync_pricing_engine.py --check   # exit 1 if the copies differ
+
+--check runs in the repo-root builds (railway.json, render.yaml), in
+`make install-api` / `make dev-api`, and as collector/tests/test_pricing_engine_sync.py.
+"""
+import argparse
+import shutil
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SOURCE = ROOT / "sdk" / "python" / "llmobserve" / "pricing_engine.py"
+VENDORED = ROOT / "collector" / "pricing_engine.py"
+
+
+def in_sync() -> bool:
+    return VENDORED.exists() and VENDORED.read_bytes() == SOURCE.read_bytes()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Sync collector/pricing_engine.py from the SDK")
+    parser.add_argument("--check", action="store_true", help="Only check; exit 1 if out of sync")
+    args = parser.parse_args()
+
+    if in_sync():
+        print(f"{VENDORED.relative_to(ROOT)} is in sync")
+        return 0
+    if args.check:
+        print(f"{VENDORED.relative_to(ROOT)} differs from {SOURCE.relative_to(ROOT)} - "
+              f"run python scripts/sync_pricing_engine.py")
+        return 1
+    shutil.copyfile(SOURCE, VENDORED)
+    print(f"Copied {SOURCE.relative_to(ROOT)} -> {VENDORED.relative_to(ROOT)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,8 +3,10 @@ LLM Observe SDK - Auto-instrumentation for LLM and API cost tracking.
 """
 
 # Configure logging first
+import importlib
 import logging
 import sys
+from typing import TYPE_CHECKING
 
 # Set up logger with sensible defaults
 _logger = logging.getLogger("llmobserve")
@@ -38,50 +40,132 @@ from llmobserve.context import (
     get_voice_platform,
     set_voice_platform,
 )
-from llmobserve.agent_wrapper import agent
-from llmobserve.tool_wrapper import tool, wrap_tool
-from llmobserve.framework_hooks import wrap_all_tools, try_patch_frameworks
-from llmobserve.distributed import export_context as export_distributed_context, import_context as import_distributed_context
-from llmobserve.llm_wrappers import wrap_openai_client, wrap_anthropic_client
-from llmobserve.instrumentation import auto_instrument, is_instrumented, is_initialized
-from llmobserve.decorators import trace
-from llmobserve.celery_support import (
-    observe_task,
-    get_current_context,
-    restore_context,
-    with_context,
-    patch_celery_task,
-    observe_rq_job
-)
-from llmobserve.retry_tracking import with_retry_tracking, get_retry_metadata
-from llmobserve.middleware import (
-    ObservabilityMiddleware,
-    flask_before_request,
-    django_middleware
-)
-from llmobserve.robustness import get_patch_state, validate_patch_integrity
-from llmobserve.caps import BudgetExceededError, CapCheckError
-from llmobserve.grpc_costs import configure_grpc_cost, clear_grpc_costs
-from llmobserve.static_analyzer import preview_agent_tree, analyze_code_file, analyze_code_string
-from llmobserve.multi_language_analyzer import (
-    preview_multi_language_tree,
-    analyze_multi_language_file,
-    analyze_multi_language_code,
-)
 
-# AI-powered instrumentation (uses LLMObserve backend)
-try:
+# Everything else is imported on first attribute access (PEP 562), so
+# `import llmobserve; llmobserve.observe()` only loads the runtime path.
+# Public name -> (module, attribute in that module)
+_LAZY_ATTRS = {
+    "agent": ("llmobserve.agent_wrapper", "agent"),
+    "tool": ("llmobserve.tool_wrapper", "tool"),
+    "wrap_tool": ("llmobserve.tool_wrapper", "wrap_tool"),
+    "wrap_all_tools": ("llmobserve.framework_hooks", "wrap_all_tools"),
+    "try_patch_frameworks": ("llmobserve.framework_hooks", "try_patch_frameworks"),
+    "export_distributed_context": ("llmobserve.distributed", "export_context"),
+    "import_distributed_context": ("llmobserve.distributed", "import_context"),
+    "wrap_openai_client": ("llmobserve.llm_wrappers", "wrap_openai_client"),
+    "wrap_anthropic_client": ("llmobserve.llm_wrappers", "wrap_anthropic_client"),
+    "auto_instrument": ("llmobserve.instrumentation", "auto_instrument"),
+    "is_instrumented": ("llmobserve.instrumentation", "is_instrumented"),
+    "is_initialized": ("llmobserve.instrumentation", "is_initialized"),
+    "trace": ("llmobserve.decorators", "trace"),
+    "observe_task": ("llmobserve.celery_support", "observe_task"),
+    "get_current_context": ("llmobserve.celery_support", "get_current_context"),
+    "restore_context": ("llmobserve.celery_support", "restore_context"),
+    "with_context": ("llmobserve.celery_support", "with_context"),
+    "patch_celery_task": ("llmobserve.celery_support", "patch_celery_task"),
+    "observe_rq_job": ("llmobserve.celery_support", "observe_rq_job"),
+    "with_retry_tracking": ("llmobserve.retry_tracking", "with_retry_tracking"),
+    "get_retry_metadata": ("llmobserve.retry_tracking", "get_retry_metadata"),
+    "ObservabilityMiddleware": ("llmobserve.middleware", "ObservabilityMiddleware"),
+    "flask_before_request": ("llmobserve.middleware", "flask_before_request"),
+    "django_middleware": ("llmobserve.middleware", "django_middleware"),
+    "get_patch_state": ("llmobserve.robustness", "get_patch_state"),
+    "validate_patch_integrity": ("llmobserve.robustness", "validate_patch_integrity"),
+    "BudgetExceededError": ("llmobserve.caps", "BudgetExceededError"),
+    "CapCheckError": ("llmobserve.caps", "CapCheckError"),
+    "register_provider": ("llmobserve.provider_registry", "register_provider"),
+    "configure_grpc_cost": ("llmobserve.grpc_costs", "configure_grpc_cost"),
+    "clear_grpc_costs": ("llmobserve.grpc_costs", "clear_grpc_costs"),
+    "preview_agent_tree": ("llmobserve.static_analyzer", "preview_agent_tree"),
+    "analyze_code_file": ("llmobserve.static_analyzer", "analyze_code_file"),
+    "analyze_code_string": ("llmobserve.static_analyzer", "analyze_code_string"),
+    "preview_multi_language_tree": ("llmobserve.multi_language_analyzer", "preview_multi_language_tree"),
+    "analyze_multi_language_file": ("llmobserve.multi_language_analyzer", "analyze_multi_language_file"),
+    "analyze_multi_language_code": ("llmobserve.multi_language_analyzer", "analyze_multi_language_code"),
+    # AI-powered instrumentation (uses LLMObserve backend; None if unavailable)
+    "AIInstrumenter": ("llmobserve.ai_instrument", "AIInstrumenter"),
+    "preview_instrumentation": ("llmobserve.ai_instrument", "preview_instrumentation"),
+    "ai_auto_instrument": ("llmobserve.ai_instrument", "auto_instrument"),
+}
+
+# Static view of the lazy names for type checkers and IDEs (never runs)
+if TYPE_CHECKING:
+    from llmobserve.agent_wrapper import agent
+    from llmobserve.tool_wrapper import tool, wrap_tool
+    from llmobserve.framework_hooks import wrap_all_tools, try_patch_frameworks
+    from llmobserve.distributed import (
+        export_context as export_distributed_context,
+        import_context as import_distributed_context,
+    )
+    from llmobserve.llm_wrappers import wrap_openai_client, wrap_anthropic_client
+    from llmobserve.instrumentation import auto_instrument, is_instrumented, is_initialized
+    from llmobserve.decorators import trace
+    from llmobserve.celery_support import (
+        observe_task,
+        get_current_context,
+        restore_context,
+        with_context,
+        patch_celery_task,
+        observe_rq_job,
+    )
+    from llmobserve.retry_tracking import with_retry_tracking, get_retry_metadata
+    from llmobserve.middleware import (
+        ObservabilityMiddleware,
+        flask_before_request,
+        django_middleware,
+    )
+    from llmobserve.robustness import get_patch_state, validate_patch_integrity
+    from llmobserve.caps import BudgetExceededError, CapCheckError
+    from llmobserve.provider_registry import register_provider
+    from llmobserve.grpc_costs import configure_grpc_cost, clear_grpc_costs
+    from llmobserve.static_analyzer import (
+        preview_agent_tree,
+        analyze_code_file,
+        analyze_code_string,
+    )
+    from llmobserve.multi_language_analyzer import (
+        preview_multi_language_tree,
+        analyze_multi_language_file,
+        analyze_multi_language_code,
+    )
     from llmobserve.ai_instrument import (
         AIInstrumenter,
         preview_instrumentation,
         auto_instrument as ai_auto_instrument,
     )
-    _AI_INSTRUMENT_AVAILABLE = True
-except ImportError:
-    _AI_INSTRUMENT_AVAILABLE = False
-    AIInstrumenter = None
-    preview_instrumentation = None
-    ai_auto_instrument = None
+
+_OPTIONAL_MODULES = {"llmobserve.ai_instrument"}
+
+
+def __getattr__(name: str):
+    if name == "_AI_INSTRUMENT_AVAILABLE":
+        try:
+            import llmobserve.ai_instrument  # noqa: F401
+            available = True
+        except ImportError:
+            available = False
+        globals()[name] = available
+        return available
+
+    target = _LAZY_ATTRS.get(name)
+    if target is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    module_name, attr = target
+    try:
+        module = importlib.import_module(module_name)
+        value = getattr(module, attr)
+    except ImportError:
+        if module_name not in _OPTIONAL_MODULES:
+            raise
+        value = None
+    globals()[name] = value  # Cache: later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
 
 __version__ = "0.3.7"  # Increase timeouts to 30s for Railway cold starts
 
@@ -133,6 +217,8 @@ __all__ = [
     # Spending caps
     "BudgetExceededError",
     "CapCheckError",
+    # Custom provider routing
+    "register_provider",
     # gRPC cost configuration
     "configure_grpc_cost",
     "clear_grpc_costs",
@@ -4,10 +4,12 @@ Automatic Agent Detection
 Automatically detects agents, tools, and workflows from call stack analysis.
 No manual tagging needed - works transparently!
 """
-import inspect
 import logging
+import os
 import re
-from typing import Optional, List, Tuple
+import sys
+import weakref
+from typing import NamedTuple, Optional, List, Tuple
 
 logger = logging.getLogger("llmobserve")
 
@@ -73,6 +75,23 @@ KNOWN_FRAMEWORKS = {
 }
 
 
+# Our own modules never name a section (interceptor/context/detector frames)
+_SKIP_FILES = frozenset(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{name}.py")
+    for name in ("agent_detector", "context", "http_interceptor")
+)
+
+
+def _compile(patterns: List[str]) -> "re.Pattern[str]":
+    """One alternation regex for a pattern list."""
+    return re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE)
+
+
+_AGENT_RE = _compile(AGENT_PATTERNS)
+_TOOL_RE = _compile(TOOL_PATTERNS)
+_STEP_RE = _compile(STEP_PATTERNS)
+
+
 def _matches_pattern(name: str, patterns: List[str]) -> bool:
     """Check if name matches any pattern."""
     name_lower = name.lower()
@@ -90,56 +109,159 @@ def _detect_framework(frame) -> Optional[str]:
     return None
 
 
-def _extract_agent_name(frame) -> Optional[str]:
-    """Extract agent name from frame."""
-    # Try function name
-    func_name = frame.f_code.co_name
-    if _matches_pattern(func_name, AGENT_PATTERNS):
+# =============================================================================
+# Per-code-object / per-class classification cache
+# =============================================================================
+
+class _CodeInfo(NamedTuple):
+    """Everything about a frame that depends only on its code object."""
+    skip: bool
+    agent: Optional[str]       # From the function name
+    tool: Optional[str]
+    step: Optional[str]
+    framework: Optional[str]   # "agent:<framework>" from the filename
+    has_self: bool             # Class name must be checked at runtime
+
+
+class _CodeProxy:
+    """Minimal frame stand-in so KNOWN_FRAMEWORKS detectors can run on a code object."""
+    __slots__ = ("f_code",)
+
+    def __init__(self, code):
+        self.f_code = code
+
+
+_code_cache: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_class_cache: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _classify_code(code) -> _CodeInfo:
+    info = _code_cache.get(code)
+    if info is not None:
+        return info
+
+    func_name = code.co_name
+    agent = tool = step = None
+    if _AGENT_RE.search(func_name.lower()):
         # Clean up name (remove common prefixes/suffixes)
-        name = func_name.replace("_agent", "").replace("agent_", "")
-        return f"agent:{name}"
-    
-    # Try class name
-    if 'self' in frame.f_locals:
-        self_obj = frame.f_locals['self']
-        class_name = self_obj.__class__.__name__
-        if _matches_pattern(class_name, AGENT_PATTERNS):
-            name = class_name.replace("Agent", "").lower()
-            return f"agent:{name}" if name else "agent:unknown"
-    
-    # Try framework detection
-    framework = _detect_framework(frame)
-    if framework:
-        return f"agent:{framework}"
-    
+        agent = f"agent:{func_name.replace('_agent', '').replace('agent_', '')}"
+    if _TOOL_RE.search(func_name.lower()):
+        tool = f"tool:{func_name.replace('_tool', '').replace('tool_', '')}"
+    if _STEP_RE.search(func_name.lower()):
+        step = f"step:{func_name.replace('_step', '').replace('step_', '')}"
+    framework = _detect_framework(_CodeProxy(code))
+
+    info = _CodeInfo(
+        skip=code.co_filename in _SKIP_FILES,
+        agent=agent,
+        tool=tool,
+        step=step,
+        framework=f"agent:{framework}" if framework else None,
+        has_self="self" in code.co_varnames or "self" in code.co_cellvars or "self" in code.co_freevars,
+    )
+    try:
+        _code_cache[code] = info
+    except TypeError:
+        pass  # Not weak-referenceable - classify again next time
+    return info
+
+
+def _classify_class(cls) -> Tuple[Optional[str], Optional[str]]:
+    """(agent label, tool label) from a class name."""
+    labels = _class_cache.get(cls)
+    if labels is not None:
+        return labels
+
+    class_name = cls.__name__
+    agent = tool = None
+    if _AGENT_RE.search(class_name.lower()):
+        name = class_name.replace("Agent", "").lower()
+        agent = f"agent:{name}" if name else "agent:unknown"
+    if _TOOL_RE.search(class_name.lower()):
+        name = class_name.replace("Tool", "").lower()
+        tool = f"tool:{name}" if name else "tool:unknown"
+
+    labels = (agent, tool)
+    try:
+        _class_cache[cls] = labels
+    except TypeError:
+        pass
+    return labels
+
+
+def _self_labels(frame, info: _CodeInfo) -> Tuple[Optional[str], Optional[str]]:
+    if not info.has_self:
+        return None, None
+    self_obj = frame.f_locals.get("self")
+    if self_obj is None:
+        return None, None
+    return _classify_class(type(self_obj))
+
+
+def _classify_frame(frame) -> Optional[Tuple[str, str]]:
+    """
+    ("agent" | "tool" | "step", label) for a frame, or None.
+
+    Precedence matches the original per-frame checks: agent (function name,
+    class name, framework), then tool (function name, class name), then step.
+    """
+    info = _classify_code(frame.f_code)
+    if info.skip:
+        return None
+    if info.agent:
+        return "agent", info.agent
+    self_agent, self_tool = _self_labels(frame, info)
+    if self_agent:
+        return "agent", self_agent
+    if info.framework:
+        return "agent", info.framework
+    if info.tool:
+        return "tool", info.tool
+    if self_tool:
+        return "tool", self_tool
+    if info.step:
+        return "step", info.step
     return None
 
 
+def _extract_agent_name(frame) -> Optional[str]:
+    """Extract agent name from frame."""
+    info = _classify_code(frame.f_code)
+    return info.agent or _self_labels(frame, info)[0] or info.framework
+
+
 def _extract_tool_name(frame) -> Optional[str]:
     """Extract tool name from frame."""
-    func_name = frame.f_code.co_name
-    if _matches_pattern(func_name, TOOL_PATTERNS):
-        name = func_name.replace("_tool", "").replace("tool_", "")
-        return f"tool:{name}"
-    
-    if 'self' in frame.f_locals:
-        self_obj = frame.f_locals['self']
-        class_name = self_obj.__class__.__name__
-        if _matches_pattern(class_name, TOOL_PATTERNS):
-            name = class_name.replace("Tool", "").lower()
-            return f"tool:{name}" if name else "tool:unknown"
-    
-    return None
+    info = _classify_code(frame.f_code)
+    return info.tool or _self_labels(frame, info)[1]
 
 
 def _extract_step_name(frame) -> Optional[str]:
     """Extract step name from frame."""
-    func_name = frame.f_code.co_name
-    if _matches_pattern(func_name, STEP_PATTERNS):
-        name = func_name.replace("_step", "").replace("step_", "")
-        return f"step:{name}"
-    
-    return None
+    return _classify_code(frame.f_code).step
+
+
+def clear_detection_cache() -> None:
+    """Recompile the pattern lists and forget cached frame classifications (call after changing them)."""
+    global _AGENT_RE, _TOOL_RE, _STEP_RE
+    _AGENT_RE = _compile(AGENT_PATTERNS)
+    _TOOL_RE = _compile(TOOL_PATTERNS)
+    _STEP_RE = _compile(STEP_PATTERNS)
+    _code_cache.clear()
+    _class_cache.clear()
+
+
+def _caller_frames(max_depth: int):
+    """Frames above our caller's caller, innermost first, without building FrameInfo."""
+    try:
+        frame = sys._getframe(3)  # Skip this generator, the detector and its caller
+    except ValueError:
+        return
+    for _ in range(max_depth):
+        if frame is None:
+            return
+        yield frame
+        frame = frame.f_back
 
 
 def detect_agent_from_stack(max_depth: int = 10) -> Optional[str]:
@@ -149,6 +271,10 @@ def detect_agent_from_stack(max_depth: int = 10) -> Optional[str]:
     Analyzes the call stack to find agent, tool, or step patterns.
     Works transparently - no manual tagging needed!
     
+    Walks frames lazily from the caller outwards and stops at the first
+    hit; classification is cached per code object, so repeat calls from the
+    same code path cost a dict lookup per frame.
+    
     Args:
         max_depth: Maximum stack frames to analyze
     
@@ -156,37 +282,11 @@ def detect_agent_from_stack(max_depth: int = 10) -> Optional[str]:
         Section label (e.g., "agent:research_assistant") or None
     """
     try:
-        stack = inspect.stack()
-        
-        # Skip our own frames (agent_detector, context, etc.)
-        skip_modules = ["llmobserve.agent_detector", "llmobserve.context", "llmobserve.http_interceptor"]
-        
-        for i, frame_info in enumerate(stack[2:max_depth+2], start=2):  # Skip current and caller
-            frame = frame_info.frame
-            
-            # Skip our own code
-            filename = frame.f_code.co_filename
-            if any(skip in filename for skip in skip_modules):
-                continue
-            
-            # Try to detect agent
-            agent_name = _extract_agent_name(frame)
-            if agent_name:
-                logger.debug(f"[llmobserve] Auto-detected agent from stack: {agent_name} (frame: {frame.f_code.co_name})")
-                return agent_name
-            
-            # Try to detect tool
-            tool_name = _extract_tool_name(frame)
-            if tool_name:
-                logger.debug(f"[llmobserve] Auto-detected tool from stack: {tool_name} (frame: {frame.f_code.co_name})")
-                return tool_name
-            
-            # Try to detect step
-            step_name = _extract_step_name(frame)
-            if step_name:
-                logger.debug(f"[llmobserve] Auto-detected step from stack: {step_name} (frame: {frame.f_code.co_name})")
-                return step_name
-        
+        for frame in _caller_frames(max_depth):
+            hit = _classify_frame(frame)
+            if hit:
+                logger.debug(f"[llmobserve] Auto-detected {hit[0]} from stack: {hit[1]} (frame: {frame.f_code.co_name})")
+                return hit[1]
         return None
     
     except Exception as e:
@@ -208,41 +308,29 @@ def detect_hierarchical_context(max_depth: int = 15) -> List[str]:
         List of section labels
     """
     try:
-        stack = inspect.stack()
         sections = []
         seen_agents = set()
         
-        skip_modules = ["llmobserve.agent_detector", "llmobserve.context", "llmobserve.http_interceptor"]
-        
-        for i, frame_info in enumerate(stack[2:max_depth+2], start=2):
-            frame = frame_info.frame
-            
-            # Skip our own code
-            filename = frame.f_code.co_filename
-            if any(skip in filename for skip in skip_modules):
+        for frame in _caller_frames(max_depth):
+            info = _classify_code(frame.f_code)
+            if info.skip:
                 continue
+            self_agent, self_tool = _self_labels(frame, info)
             
             # Detect agent (only one per hierarchy)
-            agent_name = _extract_agent_name(frame)
+            agent_name = info.agent or self_agent or info.framework
             if agent_name and agent_name not in seen_agents:
                 sections.insert(0, agent_name)  # Agents are outermost
                 seen_agents.add(agent_name)
                 continue
             
-            # Detect tool
-            tool_name = _extract_tool_name(frame)
-            if tool_name:
-                sections.append(tool_name)
-                continue
-            
-            # Detect step
-            step_name = _extract_step_name(frame)
-            if step_name:
-                sections.append(step_name)
+            # Detect tool, then step
+            label = info.tool or self_tool or info.step
+            if label:
+                sections.append(label)
         
         return sections
     
     except Exception as e:
         logger.debug(f"[llmobserve] Error detecting hierarchical context: {e}")
         return []
-
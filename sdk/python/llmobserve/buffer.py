@@ -1,132 +1,400 @@
 """
-In-memory event buffer with auto-flush and bounded queue.
+In-memory event buffer with size/age-triggered flush and an overflow policy.
 
-Uses a bounded queue (maxsize=10000) with drop-oldest policy when full.
+add_event() is a deque append (atomic under the GIL, no lock on the hot
+path). One long-lived daemon thread flushes when LLMOBSERVE_FLUSH_BATCH_SIZE
+events are waiting or the flush interval has elapsed, whichever comes
+first. Draining pops the whole backlog in one pass.
+
+When the buffer holds LLMOBSERVE_BUFFER_SIZE events, the overflow policy
+decides what happens (LLMOBSERVE_BUFFER_OVERFLOW):
+
+    drop_oldest   Evict the oldest buffered event (default)
+    drop_newest   Discard the new event
+    block         Wait up to LLMOBSERVE_BUFFER_BLOCK_TIMEOUT_MS for the
+                  flusher to make room, then discard the new event. Only
+                  plain threads wait: add_event() called on a running
+                  event loop (async interceptors) drops the new event
+                  instead; coroutines that want to wait use
+                  add_event_async()
+    spill         Append the new event to a JSONL file under
+                  LLMOBSERVE_BUFFER_SPILL_DIR; spilled events are fed back
+                  into later flushes once the buffer has drained
+
+get_buffer_stats() returns enqueue/flush/drop counters.
 """
 import atexit
-import threading
-import queue
+import json
 import logging
-from typing import List, Optional
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional
 from llmobserve.types import TraceEvent
 from llmobserve import config
 
 logger = logging.getLogger("llmobserve")
 
-# Bounded queue for events (maxsize=10000, drop oldest when full)
-_event_queue: queue.Queue = queue.Queue(maxsize=10000)
-_dropped_count = 0
-_dropped_lock = threading.Lock()
-_flush_timer: Optional[threading.Timer] = None
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block", "spill")
+DROP_WARNING_INTERVAL = 10.0  # seconds
+
+
+def _on_event_loop() -> bool:
+    """True if called from a thread that is running an asyncio event loop."""
+    asyncio = sys.modules.get("asyncio")
+    if asyncio is None:
+        return False
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class EventBuffer:
+    """Bounded event deque with a single flusher thread and overflow policy."""
+
+    def __init__(
+        self,
+        capacity: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        overflow: Optional[str] = None,
+        block_timeout_ms: Optional[int] = None,
+        spill_dir: Optional[str] = None,
+    ):
+        self.capacity = capacity or _env_int("LLMOBSERVE_BUFFER_SIZE", 10000)
+        self.batch_size = batch_size or _env_int("LLMOBSERVE_FLUSH_BATCH_SIZE", 500)
+        overflow = (overflow or os.getenv("LLMOBSERVE_BUFFER_OVERFLOW", "drop_oldest")).lower()
+        if overflow not in OVERFLOW_POLICIES:
+            logger.warning(f"[llmobserve] Unknown LLMOBSERVE_BUFFER_OVERFLOW={overflow!r}, using drop_oldest")
+            overflow = "drop_oldest"
+        self.overflow = overflow
+        self.block_timeout = (block_timeout_ms if block_timeout_ms is not None
+                              else _env_int("LLMOBSERVE_BUFFER_BLOCK_TIMEOUT_MS", 100)) / 1000.0
+        self.spill_dir = spill_dir or os.getenv(
+            "LLMOBSERVE_BUFFER_SPILL_DIR", os.path.join(tempfile.gettempdir(), "llmobserve-spill")
+        )
+
+        # drop_oldest: the deque's maxlen evicts atomically on append
+        self._events: deque = deque(maxlen=self.capacity if self.overflow == "drop_oldest" else None)
+        self._wake = threading.Event()
+        self._space = threading.Condition(threading.Lock())
+        self._spill_lock = threading.Lock()
+        self._spill_file = None
+        self._spill_path: Optional[str] = None
+        self._flusher: Optional[threading.Thread] = None
+        self._stopping = False
+
+        # "enqueued" is derived in stats() so the hot path never takes a lock
+        self._drained = 0
+        self.counters = {
+            "flushed": 0,
+            "flushes": 0,
+            "dropped_oldest": 0,
+            "dropped_newest": 0,
+            "blocked": 0,
+            "spilled": 0,
+            "unspilled": 0,
+        }
+        self._counter_lock = threading.Lock()
+        self._last_drop_warning = float("-inf")
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._counter_lock:
+            self.counters[name] += amount
+
+    # ------------------------------------------------------------------
+    # Producers
+    # ------------------------------------------------------------------
+
+    def add(self, event: TraceEvent) -> None:
+        """Buffer an event (thread-safe; lock-free unless the buffer is full)."""
+        events = self._events
+        if len(events) >= self.capacity and not self._make_room(event):
+            return
+        events.append(event)
+        if len(events) >= self.batch_size and not self._wake.is_set():
+            self._wake.set()
+
+    async def add_async(self, event: TraceEvent) -> None:
+        """add() for coroutines: the block policy awaits instead of blocking the loop."""
+        if self.overflow != "block" or len(self._events) < self.capacity:
+            self.add(event)
+            return
+        import asyncio  # Only coroutine callers get here; asyncio is already loaded for them
+        self._count("blocked")
+        self._wake.set()
+        deadline = time.monotonic() + self.block_timeout
+        while len(self._events) >= self.capacity and time.monotonic() < deadline:
+            await asyncio.sleep(0.005)
+        if len(self._events) >= self.capacity:
+            self._dropped("dropped_newest")
+            return
+        self.add(event)
+
+    def _make_room(self, event: TraceEvent) -> bool:
+        """Apply the overflow policy. True if the event should still be appended."""
+        if self.overflow == "drop_oldest":
+            self._dropped("dropped_oldest")
+            return True  # maxlen evicts the oldest
+        if self.overflow == "spill":
+            self._spill(event)
+            return False
+        if self.overflow == "block" and not _on_event_loop():
+            self._count("blocked")
+            self._wake.set()
+            with self._space:
+                if self._space.wait_for(lambda: len(self._events) < self.capacity, timeout=self.block_timeout):
+                    return True
+        self._dropped("dropped_newest")
+        return False
+
+    def _dropped(self, counter: str) -> None:
+        now = time.monotonic()
+        with self._counter_lock:
+            self.counters[counter] += 1
+            warn = now - self._last_drop_warning >= DROP_WARNING_INTERVAL
+            if warn:
+                self._last_drop_warning = now
+        if warn:  # At most one warning per interval, however fast events are dropped
+            logger.warning(
+                f"[llmobserve] Event buffer full ({self.capacity}, policy {self.overflow}) - "
+                f"{self.counters['dropped_oldest'] + self.counters['dropped_newest']} events dropped so far. "
+                "Consider increasing LLMOBSERVE_BUFFER_SIZE or flush frequency."
+            )
+
+    # ------------------------------------------------------------------
+    # Spill to disk
+    # ------------------------------------------------------------------
+
+    def _spill(self, event: TraceEvent) -> None:
+        try:
+            with self._spill_lock:
+                if self._spill_file is None:
+                    os.makedirs(self.spill_dir, exist_ok=True)
+                    name = f"spill-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.jsonl"
+                    self._spill_path = os.path.join(self.spill_dir, name + ".open")
+                    self._spill_file = open(self._spill_path, "a")
+                self._spill_file.write(json.dumps(event, default=str))
+                self._spill_file.write("\n")
+            self._count("spilled")
+        except Exception as e:
+            logger.debug(f"[llmobserve] Failed to spill event: {e}")
+            self._dropped("dropped_newest")
+
+    def _seal_spill_file(self) -> None:
+        """Close the file being written so the next drain can read it back."""
+        with self._spill_lock:
+            if self._spill_file is None:
+                return
+            spill_path = self._spill_path
+            self._spill_file.close()
+            if spill_path is not None:
+                os.replace(spill_path, spill_path[: -len(".open")])
+            self._spill_file = None
+            self._spill_path = None
+
+    def _unspill(self, room: int) -> List[TraceEvent]:
+        """
+        Read back sealed spill files, oldest first, up to `room` events.
+
+        Fully read files are deleted; the file where `room` runs out is
+        rewritten with just its unread lines, so it is picked up first next
+        time and one drain never exceeds the buffer's capacity.
+        """
+        if self.overflow != "spill" or room <= 0 or not os.path.isdir(self.spill_dir):
+            return []
+        self._seal_spill_file()
+        events: List[TraceEvent] = []
+        for name in sorted(os.listdir(self.spill_dir)):
+            if len(events) >= room:
+                break
+            if not name.endswith(".jsonl"):
+                continue
+            path = os.path.join(self.spill_dir, name)
+            try:
+                with open(path) as f:
+                    remaining: List[str] = []
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        if len(events) >= room:
+                            remaining.append(line)
+                            remaining.extend(f)
+                            break
+                        try:
+                            events.append(json.loads(line))
+                        except ValueError as e:
+                            logger.debug(f"[llmobserve] Skipping corrupt line in spill file {name}: {e}")
+                if remaining:
+                    tmp_path = path + ".tmp"
+                    with open(tmp_path, "w") as f:
+                        f.writelines(remaining)
+                    os.replace(tmp_path, path)
+                else:
+                    os.remove(path)
+            except OSError as e:
+                logger.debug(f"[llmobserve] Skipping unreadable spill file {name}: {e}")
+        self._count("unspilled", len(events))
+        return events
+
+    # ------------------------------------------------------------------
+    # Consumer
+    # ------------------------------------------------------------------
+
+    def drain(self) -> List[TraceEvent]:
+        """Pop everything currently buffered (plus spilled events if there is room)."""
+        events = self._events
+        popleft = events.popleft
+        batch = []
+        try:
+            for _ in range(len(events)):
+                batch.append(popleft())
+        except IndexError:
+            pass
+        if self.overflow == "block":
+            with self._space:
+                self._space.notify_all()
+        with self._counter_lock:
+            self._drained += len(batch)
+        if len(self._events) < self.capacity // 2:
+            batch.extend(self._unspill(self.capacity - len(batch)))
+        if batch:
+            self._count("flushed", len(batch))
+            self._count("flushes")
+        return batch
+
+    def start(self, flush, interval_sec: float) -> None:
+        """Start the flusher thread: flush() on batch_size events or every interval_sec."""
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        self._stopping = False
+
+        def _run():
+            while not self._stopping:
+                self._wake.wait(interval_sec)
+                self._wake.clear()
+                if self._stopping:
+                    break
+                try:
+                    flush()
+                except Exception as e:
+                    logger.debug(f"[llmobserve] Flush failed: {e}")
+
+        self._flusher = threading.Thread(target=_run, name="llmobserve-flusher", daemon=True)
+        self._flusher.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the flusher thread (buffered events stay for a final flush)."""
+        self._stopping = True
+        self._wake.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout)
+        self._flusher = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._counter_lock:
+            counters = dict(self.counters)
+            drained = self._drained
+        queued = len(self._events)
+        return {
+            "queued": queued,
+            "enqueued": drained + queued + counters["dropped_oldest"],
+            "capacity": self.capacity,
+            "batch_size": self.batch_size,
+            "overflow": self.overflow,
+            **counters,
+        }
+
+
+_buffer = EventBuffer()
 
 
 def add_event(event: TraceEvent) -> None:
     """
     Add an event to the buffer.
-    
-    Uses bounded queue with drop-oldest policy when full.
-    Logs warning when events are dropped.
-    
+
+    Never blocks unless the buffer is full and the overflow policy is
+    "block", and never on a running event loop (the event is dropped
+    instead). Wakes the flusher once a batch worth of events is waiting.
+
     Args:
         event: Trace event to buffer
     """
     if not config.is_enabled():
         return
-    
-    try:
-        # Try to add to queue (non-blocking)
-        _event_queue.put_nowait(event)
-    except queue.Full:
-        # Queue is full - drop oldest event
-        try:
-            _event_queue.get_nowait()  # Remove oldest
-            _event_queue.put_nowait(event)  # Add new one
-            
-            # Track dropped count
-            global _dropped_count
-            with _dropped_lock:
-                _dropped_count += 1
-                if _dropped_count % 100 == 0:  # Log every 100 drops
-                    logger.warning(
-                        f"[llmobserve] Event buffer full - dropped {_dropped_count} events. "
-                        "Consider increasing flush frequency or buffer size."
-                    )
-        except queue.Full:
-            # Still full after removing one - log error
-            logger.error("[llmobserve] Event buffer full - failed to add event")
+    _buffer.add(event)
+
+
+async def add_event_async(event: TraceEvent) -> None:
+    """add_event() for coroutines (the block policy never blocks the event loop)."""
+    if not config.is_enabled():
+        return
+    await _buffer.add_async(event)
 
 
 def get_and_clear_buffer() -> List[TraceEvent]:
     """
     Get all buffered events and clear the buffer.
-    
+
     Returns:
         List of buffered events
     """
-    events = []
-    
-    # Drain queue (non-blocking)
-    while True:
-        try:
-            event = _event_queue.get_nowait()
-            events.append(event)
-        except queue.Empty:
-            break
-    
-    # Log dropped count if any
-    global _dropped_count
-    with _dropped_lock:
-        if _dropped_count > 0:
-            logger.warning(f"[llmobserve] Dropped {_dropped_count} events due to buffer overflow")
-            _dropped_count = 0
-    
-    return events
+    return _buffer.drain()
+
+
+def get_buffer_stats() -> Dict[str, Any]:
+    """Buffer depth, overflow policy and enqueue/flush/drop counters."""
+    return _buffer.stats()
 
 
 def start_flush_timer() -> None:
-    """Start periodic flush timer."""
-    global _flush_timer
-    
+    """Start the background flusher (size- or interval-triggered)."""
     if not config.is_enabled():
         return
-    
+
     # Import here to avoid circular dependency
+    from llmobserve.transport import flush_events, start_spool_replay
+
+    _buffer.start(flush_events, config.get_flush_interval_ms() / 1000.0)
+    start_spool_replay()
+
+
+async def flush_async() -> None:
+    """Flush from a coroutine without blocking the event loop."""
+    import asyncio
     from llmobserve.transport import flush_events
-    
-    def _flush_and_reschedule():
-        """Flush events and reschedule the timer."""
-        global _flush_timer
-        
-        flush_events()
-        
-        # Reschedule
-        interval_sec = config.get_flush_interval_ms() / 1000.0
-        _flush_timer = threading.Timer(interval_sec, _flush_and_reschedule)
-        _flush_timer.daemon = True
-        _flush_timer.start()
-    
-    # Initial schedule
-    interval_sec = config.get_flush_interval_ms() / 1000.0
-    _flush_timer = threading.Timer(interval_sec, _flush_and_reschedule)
-    _flush_timer.daemon = True
-    _flush_timer.start()
+    await asyncio.get_running_loop().run_in_executor(None, flush_events)
 
 
 def stop_flush_timer() -> None:
-    """Stop the flush timer."""
-    global _flush_timer
-    if _flush_timer:
-        _flush_timer.cancel()
-        _flush_timer = None
+    """Stop the background flusher."""
+    _buffer.stop()
 
 
 # Register cleanup on exit
 def _cleanup():
     """Flush remaining events on exit."""
-    from llmobserve.transport import flush_events
+    from llmobserve import transport
     stop_flush_timer()
-    flush_events()
+    # Streams still waiting on a token estimate buffer their event only once
+    # it's in; only relevant if openai_patch was loaded at all.
+    openai_patch = sys.modules.get("llmobserve.openai_patch")
+    if openai_patch is not None:
+        openai_patch._estimator.drain(timeout=5.0)
+    transport.flush_events()
+    transport.shutdown()
 
 
 atexit.register(_cleanup)
-
@@ -3,12 +3,42 @@ Spending Cap Enforcement
 
 Checks hard spending caps before API calls and raises exceptions if exceeded.
 
-NOTE: This module uses urllib directly to bypass all SDK patching.
-Both httpx and requests are monkey-patched by the SDK, which can cause issues.
+Cap decisions are cached per (provider, model, customer, agent) for a short
+TTL and prefetched by a background thread before they expire, so most calls
+never wait on the collector. In budget-headroom mode a cached decision is
+only trusted while every applicable cap is more than N% below its limit;
+closer than that, the check goes synchronous again.
+
+Async callers (the httpx.AsyncClient and aiohttp interceptors) use
+check_spending_caps_async(), which shares the cache but runs a miss on a
+small worker pool (the same pooled request as the sync path) and coalesces
+concurrent checks for the same key, so the event loop is never blocked on
+the collector.
+
+Environment:
+    LLMOBSERVE_STRICT_CAPS        Raise CapCheckError instead of failing open
+    LLMOBSERVE_CAPS_CACHE_TTL     Seconds a decision is trusted (default 5, 0 disables)
+    LLMOBSERVE_CAPS_HEADROOM_PCT  Go synchronous within N% of a limit (default 10, 0 disables)
+    LLMOBSERVE_CAPS_TIMEOUT       Collector timeout in seconds (default 30)
+
+NOTE: This module uses http.client directly to bypass
+all SDK patching. httpx, requests and aiohttp are monkey-patched by the SDK,
+which can cause issues.
 """
+import asyncio
+import concurrent.futures
+import http.client
+import json
 import logging
 import os
-from typing import Optional, Dict, Any
+import queue
+import ssl
+import threading
+import time
+import urllib.parse
+import weakref
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
 
 from llmobserve import config
 
@@ -46,6 +76,421 @@ class CapCheckError(Exception):
         self.status_code = status_code
 
 
+CapKey = Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]
+# (CapKey, api_key, collector_url) - decisions never cross keys or collectors
+DecisionKey = Tuple[CapKey, str, str]
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_cache_ttl() -> float:
+    """Seconds a cached cap decision is trusted (0 disables caching)."""
+    return _env_float("LLMOBSERVE_CAPS_CACHE_TTL", 5.0)
+
+
+def get_headroom_pct() -> float:
+    """Go synchronous when cached spend is within this % of a limit (0 disables)."""
+    return _env_float("LLMOBSERVE_CAPS_HEADROOM_PCT", 10.0)
+
+
+def get_check_timeout() -> float:
+    """Collector timeout: 30s covers Railway cold starts (10-20s) plus normal requests."""
+    return _env_float("LLMOBSERVE_CAPS_TIMEOUT", 30.0)
+
+
+# ============================================================================
+# Connection reuse
+# ============================================================================
+
+_ssl_context: Optional[ssl.SSLContext] = None
+_ssl_lock = threading.Lock()
+_local = threading.local()
+
+
+def _get_ssl_context() -> ssl.SSLContext:
+    """SSL context with certifi certificates (if available), built once per process."""
+    global _ssl_context
+    if _ssl_context is None:
+        with _ssl_lock:
+            if _ssl_context is None:
+                context = ssl.create_default_context()
+                try:
+                    import certifi
+                    context.load_verify_locations(certifi.where())
+                except ImportError:
+                    pass  # Use system certificates
+                _ssl_context = context
+    return _ssl_context
+
+
+def _get_connection(scheme: str, netloc: str, timeout: float) -> http.client.HTTPConnection:
+    """Keep-alive connection to the collector, one per thread."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and getattr(_local, "conn_key", None) == (scheme, netloc):
+        conn.timeout = timeout
+        return conn
+
+    if conn is not None:
+        conn.close()
+    if scheme == "https":
+        conn = http.client.HTTPSConnection(netloc, timeout=timeout, context=_get_ssl_context())
+    else:
+        conn = http.client.HTTPConnection(netloc, timeout=timeout)
+    _local.conn = conn
+    _local.conn_key = (scheme, netloc)
+    return conn
+
+
+def _drop_connection() -> None:
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+    _local.conn = None
+    _local.conn_key = None
+
+
+def _build_check_path(collector_url: str, key: "CapKey") -> Tuple[urllib.parse.SplitResult, str]:
+    provider, model, customer_id, agent = key
+    params = {}
+    if provider:
+        params["provider"] = provider
+    if model:
+        params["model"] = model
+    if customer_id:
+        params["customer_id"] = customer_id
+    if agent:
+        params["agent"] = agent
+
+    parsed = urllib.parse.urlsplit(collector_url)
+    path = f"{parsed.path.rstrip('/')}/caps/check"
+    if params:
+        path = f"{path}?{urllib.parse.urlencode(params)}"
+    return parsed, path
+
+
+def _parse_body(body: bytes) -> Dict[str, Any]:
+    try:
+        return json.loads(body.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        return {"detail": body[:200].decode("utf-8", errors="replace")}
+
+
+def _request_cap_decision(key: CapKey, api_key: str, collector_url: str) -> Tuple[int, Dict[str, Any]]:
+    """GET /caps/check over this thread's keep-alive connection. Returns (status, json)."""
+    parsed, path = _build_check_path(collector_url, key)
+    headers = {"Authorization": f"Bearer {api_key}"}
+    timeout = get_check_timeout()
+
+    # The server may have closed an idle pooled connection - retry once on a fresh one
+    for attempt in range(2):
+        conn = _get_connection(parsed.scheme or "http", parsed.netloc, timeout)
+        try:
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            body = resp.read()
+            if resp.will_close:
+                _drop_connection()
+            return resp.status, _parse_body(body)
+        except (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                ConnectionResetError, BrokenPipeError):
+            _drop_connection()
+            if attempt == 1:
+                raise
+        except Exception:
+            _drop_connection()
+            raise
+    raise ConnectionError("Cap check failed after reconnect")  # pragma: no cover
+
+
+# ============================================================================
+# Async collector client (httpx.AsyncClient / aiohttp interceptors)
+# ============================================================================
+
+class _AsyncCapClient:
+    """
+    Per-event-loop front end for GET /caps/check.
+
+    Each request runs the sync _request_cap_decision() on a small shared
+    thread pool, so async callers reuse the same keep-alive connections and
+    request code as the sync path. Concurrent checks for the same key share
+    one in-flight request, and at most ASYNC_MAX_CONNECTIONS requests run at
+    once (one pooled connection per worker thread).
+    """
+
+    def __init__(self, executor: concurrent.futures.Executor):
+        self._executor = executor
+        self._inflight: Dict[DecisionKey, "asyncio.Future"] = {}
+        self.requests = 0
+        self.coalesced = 0
+
+    async def check(self, key: CapKey, api_key: str, collector_url: str) -> Tuple[int, Dict[str, Any]]:
+        inflight_key: DecisionKey = (key, api_key, collector_url)
+        future = self._inflight.get(inflight_key)
+        if future is None:
+            # Own future, so one caller being cancelled doesn't cancel the others
+            future = asyncio.get_running_loop().run_in_executor(
+                self._executor, _request_cap_decision, key, api_key, collector_url
+            )
+            self.requests += 1
+            self._inflight[inflight_key] = future
+            future.add_done_callback(lambda done: self._done(inflight_key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
+
+    def _done(self, inflight_key: DecisionKey, future: "asyncio.Future") -> None:
+        if self._inflight.get(inflight_key) is future:
+            del self._inflight[inflight_key]
+        if not future.cancelled():
+            future.exception()  # Mark retrieved if every waiter was cancelled
+
+
+ASYNC_MAX_CONNECTIONS = 20
+
+_async_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_async_executor_lock = threading.Lock()
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _AsyncCapClient]" = weakref.WeakKeyDictionary()
+
+
+def _get_async_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Worker threads for async cap checks, shared by every event loop."""
+    global _async_executor
+    if _async_executor is None:
+        with _async_executor_lock:
+            if _async_executor is None:
+                _async_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=ASYNC_MAX_CONNECTIONS, thread_name_prefix="llmobserve-caps"
+                )
+    return _async_executor
+
+
+def _async_client() -> _AsyncCapClient:
+    """The running loop's client (in-flight futures are bound to one loop)."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _AsyncCapClient(_get_async_executor())
+        _async_clients[loop] = client
+    return client
+
+
+# ============================================================================
+# Decision cache + background prefetch
+# ============================================================================
+
+class _CapDecisionCache:
+    """Bounded LRU of successful /caps/check responses: {DecisionKey: (response, fetched_at)}."""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[DecisionKey, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: DecisionKey) -> Optional[Tuple[Dict[str, Any], float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: DecisionKey, response: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (response, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class _CapPrefetcher:
+    """Single daemon thread that refreshes cache entries before they expire."""
+
+    def __init__(self, cache: _CapDecisionCache):
+        self._cache = cache
+        self._queue: "queue.Queue[DecisionKey]" = queue.Queue(maxsize=1024)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, decision_key: DecisionKey) -> None:
+        with self._lock:
+            if decision_key in self._pending:
+                return
+            self._pending.add(decision_key)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="llmobserve-caps-prefetch", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(decision_key)
+        except queue.Full:
+            with self._lock:
+                self._pending.discard(decision_key)
+
+    def _run(self) -> None:
+        while True:
+            decision_key = self._queue.get()
+            try:
+                status_code, response_json = _request_cap_decision(*decision_key)
+                if status_code == 200:
+                    self._cache.set(decision_key, response_json)
+            except Exception as e:
+                # Entry simply expires; the next call goes synchronous
+                logger.debug(f"[llmobserve] Cap prefetch failed: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(decision_key)
+
+
+_decision_cache = _CapDecisionCache()
+_prefetcher = _CapPrefetcher(_decision_cache)
+
+
+def clear_cap_cache() -> None:
+    """Forget all cached cap decisions (the next check goes to the collector)."""
+    _decision_cache.clear()
+
+
+def _near_limit(response_json: Dict[str, Any], headroom_pct: float) -> bool:
+    """True if any applicable cap is within headroom_pct of its limit."""
+    if headroom_pct <= 0:
+        return False
+    threshold = 1.0 - headroom_pct / 100.0
+    for cap in response_json.get("caps", []):
+        limit = cap.get("limit") or 0.0
+        if limit > 0 and (cap.get("current") or 0.0) >= limit * threshold:
+            return True
+    return False
+
+
+def _cached_decision(decision_key: DecisionKey) -> Optional[Dict[str, Any]]:
+    """Return a trustworthy cached decision, scheduling a refresh past half its TTL."""
+    ttl = get_cache_ttl()
+    if ttl <= 0:
+        return None
+    cached = _decision_cache.get(decision_key)
+    if cached is None:
+        return None
+    response_json, fetched_at = cached
+    age = time.monotonic() - fetched_at
+    if age >= ttl or _near_limit(response_json, get_headroom_pct()):
+        return None
+    if age >= ttl / 2:
+        _prefetcher.schedule(decision_key)
+    return response_json
+
+
+def _apply_decision(response_json: Dict[str, Any]) -> Dict[str, Any]:
+    """Raise BudgetExceededError for a blocking decision, else return it."""
+    if not response_json.get("allowed", True):
+        exceeded = response_json.get("exceeded_caps", [])
+        raise BudgetExceededError(
+            f"Spending cap exceeded: {response_json.get('message', 'Unknown')}",
+            exceeded
+        )
+    return response_json
+
+
+def _strict_mode(strict: Optional[bool]) -> bool:
+    if strict is None:
+        return os.getenv("LLMOBSERVE_STRICT_CAPS", "").lower() in ("true", "1", "yes")
+    return strict
+
+
+def _missing_api_key(strict: bool) -> Dict[str, Any]:
+    msg = "No LLMOBSERVE_API_KEY set - caps cannot be checked. Get your API key from https://app.llmobserve.com"
+    if strict:
+        logger.error(f"[llmobserve] {msg}")
+        raise CapCheckError(msg)
+    logger.warning(f"[llmobserve] {msg}")
+    return {
+        "allowed": True,
+        "exceeded_caps": [],
+        "message": "No API key - caps not checked"
+    }
+
+
+def _missing_collector_url(strict: bool) -> Dict[str, Any]:
+    msg = "No collector URL configured - caps cannot be checked. Set LLMOBSERVE_COLLECTOR_URL or pass collector_url to observe()"
+    if strict:
+        logger.error(f"[llmobserve] {msg}")
+        raise CapCheckError(msg)
+    logger.warning(f"[llmobserve] {msg}")
+    return {
+        "allowed": True,
+        "exceeded_caps": [],
+        "message": "No collector URL - caps not checked"
+    }
+
+
+def _handle_response(decision_key: DecisionKey, status_code: int, response_json: Dict[str, Any], strict: bool) -> Dict[str, Any]:
+    """Cache and apply a collector response, or fail open/strict on errors."""
+    if status_code == 200:
+        if get_cache_ttl() > 0:
+            _decision_cache.set(decision_key, response_json)
+        return _apply_decision(response_json)
+
+    elif status_code == 401:
+        detail = response_json.get("detail", "Invalid API key")
+        msg = f"Cap check auth failed: {detail}. Make sure LLMOBSERVE_API_KEY is a valid key from https://app.llmobserve.com"
+        
+        if strict:
+            logger.error(f"[llmobserve] {msg}")
+            raise CapCheckError(msg, status_code=401)
+        else:
+            logger.warning(f"[llmobserve] {msg} (failing open)")
+            return {
+                "allowed": True,
+                "exceeded_caps": [],
+                "message": "Auth failed - allowing request (set LLMOBSERVE_STRICT_CAPS=true to block)"
+            }
+    
+    else:
+        msg = f"Cap check failed with HTTP {status_code}"
+        if strict:
+            logger.error(f"[llmobserve] {msg}")
+            raise CapCheckError(msg, status_code=status_code)
+        else:
+            logger.warning(f"[llmobserve] {msg} (failing open)")
+            return {
+                "allowed": True,
+                "exceeded_caps": [],
+                "message": f"Check failed - allowing request"
+            }
+
+
+def _handle_error(e: Exception, strict: bool) -> Dict[str, Any]:
+    """Timeouts and connection errors: fail open, or raise CapCheckError in strict mode."""
+    error_type = type(e).__name__
+    if "Timeout" in error_type or "timeout" in str(e).lower() or "timed out" in str(e).lower():
+        msg = f"Cap check timed out: {e}"
+    elif "Connection" in error_type or "connection" in str(e).lower():
+        msg = f"Cap check connection error: {e}"
+    else:
+        msg = f"Cap check error: {error_type}: {e}"
+    
+    if strict:
+        logger.error(f"[llmobserve] {msg}")
+        raise CapCheckError(msg)
+    else:
+        logger.warning(f"[llmobserve] {msg} (failing open)")
+        return {
+            "allowed": True,
+            "exceeded_caps": [],
+            "message": f"Check error - allowing request"
+        }
+
+
 def check_spending_caps(
     provider: Optional[str] = None,
     model: Optional[str] = None,
@@ -55,7 +500,14 @@ def check_spending_caps(
 ) -> Dict[str, Any]:
     """
     Check if any hard spending caps would be exceeded.
-    
+
+    Served from the local decision cache when a fresh entry exists (and, in
+    headroom mode, no applicable cap is close to its limit); otherwise makes
+    a synchronous collector round trip and caches the result.
+
+    Blocks the calling thread on a cache miss - from a coroutine, use
+    check_spending_caps_async() instead.
+
     Args:
         provider: Provider name (e.g., 'openai')
         model: Model ID (e.g., 'gpt-4o')
@@ -64,152 +516,69 @@ def check_spending_caps(
         strict: If True, raise CapCheckError on auth/connection failures.
                 If False (default), fail open and allow requests.
                 Can also be set via LLMOBSERVE_STRICT_CAPS=true env var.
-    
+
     Returns:
         Dict with 'allowed', 'exceeded_caps', and 'message' fields
-    
+
     Raises:
         BudgetExceededError: If any hard cap is exceeded
         CapCheckError: If strict mode is enabled and cap check fails
     """
-    # Determine strict mode
-    if strict is None:
-        strict = os.getenv("LLMOBSERVE_STRICT_CAPS", "").lower() in ("true", "1", "yes")
-    
-    # If no API key, handle based on strict mode
+    strict = _strict_mode(strict)
     api_key = config.get_api_key()
     collector_url = config.get_collector_url()
-    
     if not api_key:
-        msg = "No LLMOBSERVE_API_KEY set - caps cannot be checked. Get your API key from https://app.llmobserve.com"
-        if strict:
-            logger.error(f"[llmobserve] {msg}")
-            raise CapCheckError(msg)
-        else:
-            logger.warning(f"[llmobserve] {msg}")
-            return {
-                "allowed": True,
-                "exceeded_caps": [],
-                "message": "No API key - caps not checked"
-            }
-    
-    # Build query params
-    params = {}
-    if provider:
-        params["provider"] = provider
-    if model:
-        params["model"] = model
-    if customer_id:
-        params["customer_id"] = customer_id
-    if agent:
-        params["agent"] = agent
-    
+        return _missing_api_key(strict)
+    if not collector_url:
+        return _missing_collector_url(strict)
+
+    key: CapKey = (provider, model, customer_id, agent)
+    decision_key: DecisionKey = (key, api_key, collector_url)
+    cached = _cached_decision(decision_key)
+    if cached is not None:
+        return _apply_decision(cached)
+
     try:
-        # Use urllib directly to bypass all SDK patching (requests and httpx are both patched)
-        import urllib.request
-        import urllib.parse
-        import urllib.error
-        import ssl
-        import json as json_module
-        
-        # Build URL with params
-        url = f"{collector_url}/caps/check"
-        if params:
-            url = f"{url}?{urllib.parse.urlencode(params)}"
-        
-        req = urllib.request.Request(
-            url,
-            headers={"Authorization": f"Bearer {api_key}"},
-            method="GET"
-        )
-        
-        # Create SSL context with certifi certificates (if available) or default
-        ssl_context = ssl.create_default_context()
-        try:
-            import certifi
-            ssl_context.load_verify_locations(certifi.where())
-        except ImportError:
-            pass  # Use system certificates
-        
-        try:
-            # 30 second timeout - handles Railway cold starts (can take 10-20s) + normal requests (~1-2s)
-            with urllib.request.urlopen(req, timeout=30.0, context=ssl_context) as resp:
-                response_data = resp.read().decode('utf-8')
-                response_json = json_module.loads(response_data)
-                status_code = resp.status
-        except urllib.error.HTTPError as http_err:
-            status_code = http_err.code
-            try:
-                response_json = json_module.loads(http_err.read().decode('utf-8'))
-            except:
-                response_json = {"detail": str(http_err)}
-        
-        if status_code == 200:
-            # If not allowed, raise exception
-            if not response_json.get("allowed", True):
-                exceeded = response_json.get("exceeded_caps", [])
-                raise BudgetExceededError(
-                    f"Spending cap exceeded: {response_json.get('message', 'Unknown')}",
-                    exceeded
-                )
-            return response_json
-        
-        elif status_code == 401:
-            detail = response_json.get("detail", "Invalid API key")
-            msg = f"Cap check auth failed: {detail}. Make sure LLMOBSERVE_API_KEY is a valid key from https://app.llmobserve.com"
-            
-            if strict:
-                logger.error(f"[llmobserve] {msg}")
-                raise CapCheckError(msg, status_code=401)
-            else:
-                logger.warning(f"[llmobserve] {msg} (failing open)")
-                return {
-                    "allowed": True,
-                    "exceeded_caps": [],
-                    "message": "Auth failed - allowing request (set LLMOBSERVE_STRICT_CAPS=true to block)"
-                }
-        
-        else:
-            msg = f"Cap check failed with HTTP {status_code}"
-            if strict:
-                logger.error(f"[llmobserve] {msg}")
-                raise CapCheckError(msg, status_code=status_code)
-            else:
-                logger.warning(f"[llmobserve] {msg} (failing open)")
-                return {
-                    "allowed": True,
-                    "exceeded_caps": [],
-                    "message": f"Check failed - allowing request"
-                }
-    
-    except BudgetExceededError:
-        # Always re-raise budget errors
-        raise
-    
-    except CapCheckError:
-        # Re-raise cap check errors in strict mode
-        raise
-    
+        status_code, response_json = _request_cap_decision(key, api_key, collector_url)
     except Exception as e:
-        # Handle timeout and connection errors
-        error_type = type(e).__name__
-        if "Timeout" in error_type or "timeout" in str(e).lower() or "timed out" in str(e).lower():
-            msg = f"Cap check timed out: {e}"
-        elif "Connection" in error_type or "connection" in str(e).lower():
-            msg = f"Cap check connection error: {e}"
-        else:
-            msg = f"Cap check error: {error_type}: {e}"
-        
-        if strict:
-            logger.error(f"[llmobserve] {msg}")
-            raise CapCheckError(msg)
-        else:
-            logger.warning(f"[llmobserve] {msg} (failing open)")
-            return {
-                "allowed": True,
-                "exceeded_caps": [],
-                "message": f"Check error - allowing request"
-            }
+        return _handle_error(e, strict)
+    return _handle_response(decision_key, status_code, response_json, strict)
+
+
+async def check_spending_caps_async(
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+    customer_id: Optional[str] = None,
+    agent: Optional[str] = None,
+    strict: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """
+    Awaitable check_spending_caps() for httpx.AsyncClient / aiohttp calls.
+
+    Same cache, decisions and error handling, but a cache miss awaits the
+    pooled collector request on a worker thread instead of blocking the
+    event loop, and concurrent misses for the same (provider, model, customer,
+    agent) share one in-flight request.
+    """
+    strict = _strict_mode(strict)
+    api_key = config.get_api_key()
+    collector_url = config.get_collector_url()
+    if not api_key:
+        return _missing_api_key(strict)
+    if not collector_url:
+        return _missing_collector_url(strict)
+
+    key: CapKey = (provider, model, customer_id, agent)
+    decision_key: DecisionKey = (key, api_key, collector_url)
+    cached = _cached_decision(decision_key)
+    if cached is not None:
+        return _apply_decision(cached)
+
+    try:
+        status_code, response_json = await _async_client().check(key, api_key, collector_url)
+    except Exception as e:
+        return _handle_error(e, strict)
+    return _handle_response(decision_key, status_code, response_json, strict)
 
 
 def should_check_caps() -> bool:
@@ -9,42 +9,14 @@ import logging
 from typing import Optional, Dict, Any
 from llmobserve import buffer, context, config
 from llmobserve.types import TraceEvent
+from llmobserve.provider_registry import detect_provider
 
 logger = logging.getLogger("llmobserve")
 
 
 def extract_provider_from_url(url: str) -> Optional[str]:
     """Extract provider from URL."""
-    url_lower = url.lower()
-    
-    if "openai.com" in url_lower or "api.openai.com" in url_lower:
-        return "openai"
-    elif "anthropic.com" in url_lower or "api.anthropic.com" in url_lower:
-        return "anthropic"
-    elif "cohere.ai" in url_lower or "api.cohere.ai" in url_lower:
-        return "cohere"
-    elif "googleapis.com" in url_lower:
-        if "generativelanguage" in url_lower:
-            return "google"
-        return "google-cloud"
-    elif "huggingface" in url_lower:
-        return "huggingface"
-    elif "pinecone.io" in url_lower:
-        return "pinecone"
-    elif "replicate.com" in url_lower:
-        return "replicate"
-    elif "together.xyz" in url_lower or "together.ai" in url_lower:
-        return "together"
-    elif "perplexity.ai" in url_lower:
-        return "perplexity"
-    elif "mistral.ai" in url_lower:
-        return "mistral"
-    elif "groq.com" in url_lower:
-        return "groq"
-    elif "openrouter.ai" in url_lower or "openrouter" in url_lower:
-        return "openrouter"
-    
-    return "unknown"
+    return detect_provider(url) or "unknown"
 
 
 def extract_model_from_request(request_body: Optional[Dict], provider: str) -> Optional[str]:
@@ -73,21 +45,22 @@ def extract_tokens_from_response(response_body: Optional[Dict], provider: str) -
     if not response_body or not isinstance(response_body, dict):
         return None, None, None
     
-    # OpenAI format
-    if "usage" in response_body:
+    # OpenAI format (Anthropic and the Responses API use input/output_tokens)
+    if isinstance(response_body.get("usage"), dict):
         usage = response_body["usage"]
         return (
-            usage.get("prompt_tokens"),
-            usage.get("completion_tokens"),
-            usage.get("total_tokens")
+            usage.get("prompt_tokens", usage.get("input_tokens")),
+            usage.get("completion_tokens", usage.get("output_tokens")),
+            usage.get("total_tokens")  # Anthropic doesn't provide total, we'll calculate it
         )
     
-    # Anthropic format
-    if provider == "anthropic":
+    # Gemini format
+    if isinstance(response_body.get("usageMetadata"), dict):
+        metadata = response_body["usageMetadata"]
         return (
-            response_body.get("usage", {}).get("input_tokens"),
-            response_body.get("usage", {}).get("output_tokens"),
-            None  # Anthropic doesn't provide total, we'll calculate it
+            metadata.get("promptTokenCount"),
+            metadata.get("candidatesTokenCount"),
+            metadata.get("totalTokenCount")
         )
     
     # Cohere format
@@ -110,7 +83,9 @@ def create_event_from_http_response(
     request_body: Optional[Dict],
     response_body: Optional[Dict],
     latency_ms: float,
-    request_id: Optional[str] = None
+    request_id: Optional[str] = None,
+    is_streaming: bool = False,
+    stream_cancelled: bool = False
 ) -> Optional[TraceEvent]:
     """
     Create a TraceEvent from HTTP request/response data.
@@ -123,6 +98,8 @@ def create_event_from_http_response(
         response_body: Parsed response JSON
         latency_ms: Request latency in milliseconds
         request_id: Optional request ID
+        is_streaming: Response was a server-sent event stream
+        stream_cancelled: Stream was closed before it finished
     
     Returns:
         TraceEvent or None if event should not be created
@@ -133,8 +110,10 @@ def create_event_from_http_response(
         logger.debug(f"[llmobserve] Unknown provider for URL: {url}")
         # Still track it, just mark as unknown
     
-    # Extract model
+    # Extract model (Gemini puts it in the URL; the response names it)
     model = extract_model_from_request(request_body, provider)
+    if not model and isinstance(response_body, dict) and isinstance(response_body.get("model"), str):
+        model = response_body["model"]
     
     # Extract tokens
     input_tokens, output_tokens, total_tokens = extract_tokens_from_response(response_body, provider)
@@ -176,8 +155,8 @@ def create_event_from_http_response(
         "cached_tokens": 0,
         "latency_ms": latency_ms,
         "status": "ok" if status_code < 400 else "error",
-        "is_streaming": False,
-        "stream_cancelled": False,
+        "is_streaming": is_streaming,
+        "stream_cancelled": stream_cancelled,
         "cost_usd": 0.0,  # Will be calculated below
         "event_metadata": {
             "status_code": status_code,
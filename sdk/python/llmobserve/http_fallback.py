@@ -3,16 +3,32 @@ HTTP Fallback Event Creation
 
 When no proxy is available, intercept HTTP responses and create events directly.
 This provides universal API coverage without per-SDK patching.
+
+Streamed responses are never buffered: the client's chunk iterators
+(requests iter_content, httpx iter_bytes/aiter_bytes, aiohttp's payload
+reader) are wrapped so chunks pass through untouched while
+StreamUsageParser watches SSE frames for the model and final usage
+(OpenAI chat/responses, Anthropic, Gemini). The event is created when the
+stream is exhausted, or closed early (stream_cancelled=True), in the
+context that was current when the request was sent.
 """
+import contextvars
 import time
 import json
 import logging
+import threading
+import weakref
 from typing import Optional, Dict, Any
 from llmobserve import buffer
 from llmobserve.event_creator import create_event_from_http_response, should_create_event
 
 logger = logging.getLogger("llmobserve")
 
+# SSE frames worth decoding (OpenAI sends "usage":null on every chunk)
+_USAGE_MARKERS = (b'"usage":{', b'"usage": {', b'"usageMetadata"')
+MAX_BUFFERED_JSON_BYTES = 1024 * 1024  # Non-SSE streams: parse at the end if no larger than this
+MAX_SSE_LINE_BYTES = 1024 * 1024  # A partial line longer than this is discarded
+
 
 def try_create_http_fallback_event(
     method: str,
@@ -21,11 +37,17 @@ def try_create_http_fallback_event(
     request_content: Optional[bytes],
     response_content: Optional[bytes],
     start_time: float,
-    request_id: Optional[str] = None
+    request_id: Optional[str] = None,
+    response_body: Optional[Dict[str, Any]] = None,
+    is_streaming: bool = False,
+    stream_cancelled: bool = False,
 ) -> bool:
     """
     Attempt to create an event from HTTP request/response.
-    
+
+    response_body, if given, is used instead of parsing response_content
+    (streamed responses pass the usage collected by StreamUsageParser).
+
     Returns True if event was created, False otherwise.
     Fails silently - never breaks the user's application.
     """
@@ -34,31 +56,30 @@ def try_create_http_fallback_event(
         if not should_create_event(url, status_code):
             logger.debug(f"[llmobserve] should_create_event returned False for {url}")
             return False
-        
+
         logger.debug(f"[llmobserve] should_create_event passed, creating event...")
-        
+
         # Calculate latency
         end_time = time.time()
         latency_ms = (end_time - start_time) * 1000
-        
+
         # Parse bodies
         request_body = None
-        response_body = None
-        
+
         try:
             if request_content:
                 request_body = json.loads(request_content.decode('utf-8'))
                 logger.debug(f"[llmobserve] Parsed request body")
         except Exception as ex:
             logger.debug(f"[llmobserve] Failed to parse request body: {ex}")
-        
+
         try:
-            if response_content:
+            if response_body is None and response_content:
                 response_body = json.loads(response_content.decode('utf-8'))
                 logger.debug(f"[llmobserve] Parsed response body")
         except Exception as ex:
             logger.debug(f"[llmobserve] Failed to parse response body: {ex}")
-        
+
         # Create event
         logger.debug(f"[llmobserve] Calling create_event_from_http_response...")
         event = create_event_from_http_response(
@@ -68,21 +89,372 @@ def try_create_http_fallback_event(
             request_body=request_body,
             response_body=response_body,
             latency_ms=latency_ms,
-            request_id=request_id
+            request_id=request_id,
+            is_streaming=is_streaming,
+            stream_cancelled=stream_cancelled,
         )
-        
+
         if event:
             buffer.add_event(event)
             logger.debug(f"[llmobserve] HTTP fallback: created event for {url}")
             return True
         else:
             logger.debug(f"[llmobserve] create_event_from_http_response returned None")
-        
+
         return False
-        
+
     except Exception as e:
         logger.warning(f"[llmobserve] HTTP fallback failed (non-critical): {e}")
         import traceback
         logger.debug(f"[llmobserve] Traceback: {traceback.format_exc()}")
         return False
 
+
+# ============================================================================
+# Streamed responses
+# ============================================================================
+
+def is_event_stream(headers) -> bool:
+    try:
+        return "text/event-stream" in (headers.get("content-type") or "").lower()
+    except Exception:
+        return False
+
+
+class StreamUsageParser:
+    """
+    Incremental parser that keeps only the model and token usage of a stream.
+
+    SSE mode splits chunks into lines and JSON-decodes only `data:` frames
+    that carry a usage object (plus the first frame, for the model), so
+    cost is independent of how much text is streamed. Non-SSE streams
+    (e.g. Gemini's JSON array) are kept up to MAX_BUFFERED_JSON_BYTES and
+    decoded once at the end.
+    """
+
+    def __init__(self, event_stream: bool = True):
+        self.event_stream = event_stream
+        self.model: Optional[str] = None
+        self.input_tokens: Optional[int] = None
+        self.output_tokens: Optional[int] = None
+        self.total_tokens: Optional[int] = None
+        self._partial = b""
+        self._json_parts = []
+        self._json_size = 0
+        self._seen_frame = False
+
+    def feed(self, chunk) -> None:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        elif not isinstance(chunk, bytes):
+            chunk = bytes(chunk)
+        if not chunk:
+            return
+        if not self.event_stream:
+            if self._json_size <= MAX_BUFFERED_JSON_BYTES:
+                self._json_parts.append(chunk)
+                self._json_size += len(chunk)
+            return
+        data = self._partial + chunk if self._partial else chunk
+        lines = data.split(b"\n")
+        self._partial = lines.pop()
+        if len(self._partial) > MAX_SSE_LINE_BYTES:
+            self._partial = b""
+        for line in lines:
+            self._line(line)
+
+    def close(self) -> None:
+        """Process whatever is left after the last chunk."""
+        if self.event_stream:
+            if self._partial:
+                self._line(self._partial)
+                self._partial = b""
+            return
+        if not self._json_parts or self._json_size > MAX_BUFFERED_JSON_BYTES:
+            return
+        try:
+            body = json.loads(b"".join(self._json_parts))
+        except ValueError:
+            return
+        finally:
+            self._json_parts = []
+        for item in body if isinstance(body, list) else [body]:
+            self._absorb(item)
+
+    def _line(self, line: bytes) -> None:
+        if not line.startswith(b"data:"):
+            return  # event:, id:, comments, blank separators
+        payload = line[5:].strip()
+        if not payload or payload == b"[DONE]":
+            return
+        if self._seen_frame and not any(marker in payload for marker in _USAGE_MARKERS):
+            return
+        self._seen_frame = True
+        try:
+            frame = json.loads(payload)
+        except ValueError:
+            return
+        self._absorb(frame)
+
+    def _absorb(self, frame: Any) -> None:
+        if not isinstance(frame, dict):
+            return
+        # Anthropic message_start wraps the message; OpenAI Responses API wraps the response
+        for nested in (frame.get("message"), frame.get("response")):
+            if isinstance(nested, dict):
+                self._absorb(nested)
+        if self.model is None:
+            model = frame.get("model") or frame.get("modelVersion")
+            if isinstance(model, str):
+                self.model = model
+        usage = frame.get("usage")
+        if isinstance(usage, dict):
+            # OpenAI: prompt/completion; Anthropic and Responses API: input/output
+            # (Anthropic's message_delta carries the cumulative output count)
+            self._update(
+                usage.get("prompt_tokens", usage.get("input_tokens")),
+                usage.get("completion_tokens", usage.get("output_tokens")),
+                usage.get("total_tokens"),
+            )
+        metadata = frame.get("usageMetadata")
+        if isinstance(metadata, dict):  # Gemini, cumulative per chunk
+            self._update(
+                metadata.get("promptTokenCount"),
+                metadata.get("candidatesTokenCount"),
+                metadata.get("totalTokenCount"),
+            )
+
+    def _update(self, input_tokens, output_tokens, total_tokens) -> None:
+        if input_tokens is not None:
+            self.input_tokens = input_tokens
+        if output_tokens is not None:
+            self.output_tokens = output_tokens
+        if total_tokens is not None:
+            self.total_tokens = total_tokens
+
+    def response_body(self) -> Optional[Dict[str, Any]]:
+        """What was found, shaped like an OpenAI response body (None if nothing)."""
+        if self.model is None and self.input_tokens is None and self.output_tokens is None:
+            return None
+        body: Dict[str, Any] = {}
+        if self.model is not None:
+            body["model"] = self.model
+        if self.input_tokens is not None or self.output_tokens is not None:
+            total = self.total_tokens
+            if total is None:
+                total = (self.input_tokens or 0) + (self.output_tokens or 0)
+            body["usage"] = {
+                "prompt_tokens": self.input_tokens,
+                "completion_tokens": self.output_tokens,
+                "total_tokens": total,
+            }
+        return body
+
+
+class StreamingFallback:
+    """Feeds a stream's chunks to a StreamUsageParser and creates the event once at the end."""
+
+    def __init__(
+        self,
+        method: str,
+        url: str,
+        status_code: int,
+        request_content: Optional[bytes],
+        start_time: float,
+        request_id: Optional[str],
+        event_stream: bool,
+    ):
+        self.method = method
+        self.url = url
+        self.status_code = status_code
+        self.request_content = request_content
+        self.start_time = start_time
+        self.request_id = request_id
+        self.event_stream = event_stream
+        self.parser = StreamUsageParser(event_stream)
+        # Run/section/customer as of the request, not of whoever closes the stream
+        self._context = contextvars.copy_context()
+        self._lock = threading.Lock()
+        self._finished = False
+        self.iterating = 0  # Passthrough generators in progress
+
+    def feed(self, chunk) -> None:
+        if self._finished:
+            return
+        try:
+            self.parser.feed(chunk)
+        except Exception as e:
+            logger.debug(f"[llmobserve] Stream usage parser failed: {e}")
+
+    def finish(self, cancelled: bool = False) -> None:
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+        try:
+            self.parser.close()
+        except Exception as e:
+            logger.debug(f"[llmobserve] Stream usage parser failed: {e}")
+        self._context.run(
+            try_create_http_fallback_event,
+            method=self.method,
+            url=self.url,
+            status_code=self.status_code,
+            request_content=self.request_content,
+            response_content=None,
+            start_time=self.start_time,
+            request_id=self.request_id,
+            response_body=self.parser.response_body(),
+            is_streaming=self.event_stream,
+            stream_cancelled=cancelled,
+        )
+
+
+def _passthrough(chunks, tracker: StreamingFallback):
+    completed = False
+    tracker.iterating += 1
+    try:
+        for chunk in chunks:
+            tracker.feed(chunk)
+            yield chunk
+        completed = True
+    finally:
+        tracker.iterating -= 1
+        tracker.finish(cancelled=not completed)
+
+
+async def _apassthrough(chunks, tracker: StreamingFallback):
+    completed = False
+    tracker.iterating += 1
+    try:
+        async for chunk in chunks:
+            tracker.feed(chunk)
+            yield chunk
+        completed = True
+    finally:
+        tracker.iterating -= 1
+        tracker.finish(cancelled=not completed)
+
+
+def _finish_on_close(response, name: str, tracker: StreamingFallback) -> None:
+    original = getattr(response, name)
+
+    def close(*args, **kwargs):
+        try:
+            return original(*args, **kwargs)
+        finally:
+            # Closed mid-iteration (httpx closes at end of stream, too): the
+            # passthrough's own finally knows whether the stream completed
+            if not tracker.iterating:
+                tracker.finish(cancelled=True)  # No-op if already finished
+
+    setattr(response, name, close)
+
+
+def track_requests_response(response, method: str, url: str, request_content, start_time: float,
+                            request_id: Optional[str] = None) -> None:
+    """Create the fallback event for a requests.Response, without reading a stream early."""
+    if getattr(response, "_content_consumed", True):
+        # stream=False: the body is already in memory
+        try_create_http_fallback_event(
+            method=method, url=url, status_code=response.status_code,
+            request_content=request_content, response_content=response.content,
+            start_time=start_time, request_id=request_id,
+        )
+        return
+    tracker = StreamingFallback(method, url, response.status_code, request_content, start_time,
+                                request_id, is_event_stream(response.headers))
+    original_iter_content = response.iter_content
+
+    def iter_content(chunk_size=1, decode_unicode=False):
+        # iter_lines() and .content both go through iter_content
+        return _passthrough(original_iter_content(chunk_size, decode_unicode), tracker)
+
+    response.iter_content = iter_content
+    _finish_on_close(response, "close", tracker)
+    weakref.finalize(response, tracker.finish, True)  # Dropped without being read or closed
+
+
+def track_httpx_response(response, method: str, url: str, request_content, start_time: float,
+                         request_id: Optional[str] = None, is_async: bool = False) -> None:
+    """Create the fallback event for an httpx.Response, without reading a stream early."""
+    if hasattr(response, "_content"):
+        # Already read (send(stream=False))
+        try_create_http_fallback_event(
+            method=method, url=url, status_code=response.status_code,
+            request_content=request_content, response_content=response.content,
+            start_time=start_time, request_id=request_id,
+        )
+        return
+    tracker = StreamingFallback(method, url, response.status_code, request_content, start_time,
+                                request_id, is_event_stream(response.headers))
+    # iter_text/iter_lines/read (and their async forms) all go through iter_bytes
+    if is_async:
+        original_aiter_bytes = response.aiter_bytes
+
+        def aiter_bytes(chunk_size=None):
+            return _apassthrough(original_aiter_bytes(chunk_size), tracker)
+
+        response.aiter_bytes = aiter_bytes
+        _finish_on_close(response, "aclose", tracker)
+    else:
+        original_iter_bytes = response.iter_bytes
+
+        def iter_bytes(chunk_size=None):
+            return _passthrough(original_iter_bytes(chunk_size), tracker)
+
+        response.iter_bytes = iter_bytes
+        _finish_on_close(response, "close", tracker)
+    weakref.finalize(response, tracker.finish, True)
+
+
+async def track_aiohttp_response(response, method: str, url: str, request_content, start_time: float,
+                                 request_id: Optional[str] = None) -> None:
+    """
+    Create the fallback event for an aiohttp.ClientResponse.
+
+    JSON responses are read (aiohttp caches the body for the caller). SSE
+    responses are observed as the connection feeds the payload reader, so
+    the caller's own reads are untouched.
+    """
+    if not is_event_stream(response.headers):
+        try:
+            response_content = await response.read()
+        except Exception:
+            response_content = None
+        try_create_http_fallback_event(
+            method=method, url=url, status_code=response.status,
+            request_content=request_content, response_content=response_content,
+            start_time=start_time, request_id=request_id,
+        )
+        return
+    tracker = StreamingFallback(method, url, response.status, request_content, start_time, request_id, True)
+    reader = response.content
+    try:
+        for chunk in list(getattr(reader, "_buffer", ())):  # Arrived with the headers
+            tracker.feed(chunk)
+        if reader.is_eof():
+            tracker.finish()
+            return
+        original_feed_data = reader.feed_data
+        original_feed_eof = reader.feed_eof
+
+        def feed_data(data, *args, **kwargs):
+            tracker.feed(data)
+            return original_feed_data(data, *args, **kwargs)
+
+        def feed_eof(*args, **kwargs):
+            try:
+                return original_feed_eof(*args, **kwargs)
+            finally:
+                tracker.finish()
+
+        reader.feed_data = feed_data
+        reader.feed_eof = feed_eof
+    except (AttributeError, TypeError) as e:
+        logger.debug(f"[llmobserve] Cannot observe aiohttp stream ({e}); usage will be missing")
+        tracker.finish()
+        return
+    _finish_on_close(response, "release", tracker)
+    _finish_on_close(response, "close", tracker)
+    weakref.finalize(response, tracker.finish, True)
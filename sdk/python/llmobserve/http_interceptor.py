@@ -22,45 +22,14 @@ logger = logging.getLogger("llmobserve")
 
 from llmobserve import context, config
 from llmobserve import request_tracker
-from llmobserve.caps import check_spending_caps, should_check_caps, BudgetExceededError
+from llmobserve.caps import check_spending_caps, check_spending_caps_async, should_check_caps, BudgetExceededError
 from llmobserve.event_creator import extract_model_from_request
+from llmobserve.provider_registry import detect_provider
 
 
 def extract_provider_from_url(url: str) -> Optional[str]:
-    """Extract provider name from API URL."""
-    url_lower = url.lower()
-    if "api.openai.com" in url_lower or "openai" in url_lower:
-        return "openai"
-    elif "api.anthropic.com" in url_lower or "anthropic" in url_lower:
-        return "anthropic"
-    elif "generativelanguage.googleapis.com" in url_lower or "gemini" in url_lower or "google" in url_lower:
-        return "google"
-    elif "pinecone.io" in url_lower:
-        return "pinecone"
-    elif "api.cohere.ai" in url_lower or "cohere" in url_lower:
-        return "cohere"
-    elif "api.together.xyz" in url_lower or "together" in url_lower:
-        return "together"
-    elif "api.vapi.ai" in url_lower or "vapi.ai" in url_lower:
-        return "vapi"
-    elif "openrouter.ai" in url_lower or "openrouter" in url_lower:
-        return "openrouter"
-    elif "groq.com" in url_lower or "groq" in url_lower:
-        return "groq"
-    elif "mistral.ai" in url_lower or "mistral" in url_lower:
-        return "mistral"
-    elif "api.perplexity.ai" in url_lower or "perplexity" in url_lower:
-        return "perplexity"
-    elif "api.ai21.com" in url_lower or "ai21" in url_lower:
-        return "ai21"
-    elif "replicate.com" in url_lower or "replicate" in url_lower:
-        return "replicate"
-    elif "huggingface.co" in url_lower or "huggingface" in url_lower:
-        return "huggingface"
-    elif "voyageai.com" in url_lower or "voyage" in url_lower:
-        return "voyage"
-    # Add more providers as needed
-    return None
+    """Extract provider name from API URL (None if unknown)."""
+    return detect_provider(url)
 
 
 def should_skip_http_fallback(url: str) -> bool:
@@ -71,8 +40,8 @@ def should_skip_http_fallback(url: str) -> bool:
     tracks calls (to avoid duplicate events).
     """
     provider = extract_provider_from_url(url)
-    # OpenAI SDK is patched separately, so skip HTTP fallback for OpenAI calls
-    if provider == "openai":
+    # OpenAI SDK (incl. its Azure client) is patched separately, so skip HTTP fallback for OpenAI calls
+    if provider in ("openai", "azure_openai"):
         logger.debug(f"[llmobserve] Skipping HTTP fallback for OpenAI (SDK already patched)")
         return True
     return False
@@ -303,13 +272,13 @@ def patch_httpx():
                                 # Skip if provider SDK is already patched (avoid duplicates)
                                 if not proxy_url and not should_skip_http_fallback(request_url_str):
                                     logger.debug(f"[llmobserve] Calling HTTP fallback for {request_url_str}")
-                                    from llmobserve.http_fallback import try_create_http_fallback_event
-                                    try_create_http_fallback_event(
+                                    from llmobserve.http_fallback import track_httpx_response
+                                    # Streams are observed as the caller reads them
+                                    track_httpx_response(
+                                        response,
                                         method=request.method,
                                         url=request_url_str,
-                                        status_code=response.status_code,
                                         request_content=getattr(request, 'content', None),
-                                        response_content=getattr(response, 'content', None),
                                         start_time=start_time,
                                         request_id=request_id
                                     )
@@ -435,8 +404,8 @@ def patch_httpx():
                             except Exception as e:
                                 logger.debug(f"[llmobserve] Failed to extract model for cap check: {e}")
                             
-                            # This will raise BudgetExceededError if cap exceeded
-                            check_spending_caps(
+                            # This will raise BudgetExceededError if cap exceeded (never blocks the loop)
+                            await check_spending_caps_async(
                                 provider=provider,
                                 model=model,  # Now includes model from request body
                                 customer_id=customer_id,
@@ -496,15 +465,16 @@ def patch_httpx():
                                 # Skip if provider SDK is already patched (avoid duplicates)
                                 if not proxy_url and not should_skip_http_fallback(request_url_str):
                                     logger.debug(f"[llmobserve] Calling HTTP fallback for {request_url_str}")
-                                    from llmobserve.http_fallback import try_create_http_fallback_event
-                                    try_create_http_fallback_event(
+                                    from llmobserve.http_fallback import track_httpx_response
+                                    # Streams are observed as the caller reads them
+                                    track_httpx_response(
+                                        response,
                                         method=request.method,
                                         url=request_url_str,
-                                        status_code=response.status_code,
                                         request_content=getattr(request, 'content', None),
-                                        response_content=getattr(response, 'content', None),
                                         start_time=start_time,
-                                        request_id=request_id
+                                        request_id=request_id,
+                                        is_async=True
                                     )
                         else:
                             logger.debug(
@@ -649,13 +619,13 @@ def patch_requests():
                             request_tracker.mark_request_tracked(request_id)
                             
                             if not proxy_url and not should_skip_http_fallback(url):
-                                from llmobserve.http_fallback import try_create_http_fallback_event
-                                try_create_http_fallback_event(
+                                from llmobserve.http_fallback import track_requests_response
+                                # stream=True responses are observed as the caller reads them
+                                track_requests_response(
+                                    response,
                                     method=method,
                                     url=url,
-                                    status_code=response.status_code,
                                     request_content=request_body_str,
-                                    response_content=response.content if hasattr(response, 'content') else None,
                                     start_time=start_time,
                                     request_id=request_id
                                 )
@@ -774,7 +744,7 @@ def patch_aiohttp():
                             except Exception as e:
                                 logger.debug(f"[llmobserve] Failed to extract model for cap check: {e}")
                             
-                            check_spending_caps(
+                            await check_spending_caps_async(
                                 provider=provider,
                                 model=model,
                                 customer_id=customer_id,
@@ -793,20 +763,13 @@ def patch_aiohttp():
                             request_tracker.mark_request_tracked(request_id)
                             
                             if not proxy_url and not should_skip_http_fallback(url_str):
-                                # Read response body
-                                response_body = None
-                                try:
-                                    response_body = await response.read()
-                                except:
-                                    pass
-                                
-                                from llmobserve.http_fallback import try_create_http_fallback_event
-                                try_create_http_fallback_event(
+                                from llmobserve.http_fallback import track_aiohttp_response
+                                # SSE bodies are observed as they arrive, not read here
+                                await track_aiohttp_response(
+                                    response,
                                     method=method,
                                     url=url_str,
-                                    status_code=response.status,
                                     request_content=request_body_str,
-                                    response_content=response_body,
                                     start_time=start_time,
                                     request_id=request_id
                                 )
@@ -6,13 +6,15 @@ Handles:
 - Streaming responses with cancellation tracking
 - Prompt caching (cached tokens)
 - Proper usage extraction and cost calculation
-- Token estimation for cancelled streams (using tiktoken)
+- Token estimation for streams without usage (using tiktoken, off the caller's thread)
 """
 import functools
 import time
 import uuid
 import logging
-from typing import Any, Callable, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
 from llmobserve import buffer, context, pricing, config
 from llmobserve.robustness import (
     check_openai_version,
@@ -32,16 +34,36 @@ except ImportError:
     # tiktoken not available - will log warning when needed
 
 
-def _get_tokenizer(model: str):
-    """Get tiktoken tokenizer for a model, with fallback."""
+# model -> tiktoken Encoding (or None if it could not be loaded)
+_tokenizer_cache: Dict[Optional[str], Any] = {}
+_TOKENIZER_CACHE_MAX = 256
+
+
+def _get_tokenizer(model: Optional[str]):
+    """Get tiktoken tokenizer for a model, with fallback. Cached per model."""
     if not TIKTOKEN_AVAILABLE:
         return None
     
     try:
-        return tiktoken.encoding_for_model(model)
+        return _tokenizer_cache[model]
     except KeyError:
-        # Fallback to cl100k_base (used by gpt-4, gpt-3.5-turbo)
-        return tiktoken.get_encoding("cl100k_base")
+        pass
+    
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+        except KeyError:
+            # Fallback to cl100k_base (used by gpt-4, gpt-3.5-turbo)
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # e.g. BPE file not cached and no network - don't retry on every estimate
+        logger.debug(f"[llmobserve] tiktoken unavailable for {model}: {e}")
+        encoding = None
+    
+    if len(_tokenizer_cache) >= _TOKENIZER_CACHE_MAX:
+        _tokenizer_cache.clear()
+    _tokenizer_cache[model] = encoding
+    return encoding
 
 
 def _estimate_tokens(text: str, model: Optional[str]) -> int:
@@ -137,13 +159,32 @@ def _track_openai_call(
     extra_params: Optional[dict] = None
 ):
     """Track a single OpenAI API call."""
-    from llmobserve.retry_tracking import enrich_event_with_retry_metadata, detect_retry_from_section
-    
-    latency_ms = (time.time() - start_time) * 1000
-    
     # Extract usage
     input_tokens, output_tokens, cached_tokens = _extract_usage(response, method_name)
     
+    buffer.add_event(_build_openai_event(
+        method_name, model, start_time, input_tokens, output_tokens, cached_tokens,
+        error, is_streaming, stream_cancelled, extra_params
+    ))
+
+
+def _build_openai_event(
+    method_name: str,
+    model: Optional[str],
+    start_time: float,
+    input_tokens: int,
+    output_tokens: int,
+    cached_tokens: int,
+    error: Optional[Exception] = None,
+    is_streaming: bool = False,
+    stream_cancelled: bool = False,
+    extra_params: Optional[dict] = None
+) -> dict:
+    """Build the event for an OpenAI API call (context is read from the calling thread)."""
+    from llmobserve.retry_tracking import enrich_event_with_retry_metadata
+    
+    latency_ms = (time.time() - start_time) * 1000
+    
     # Calculate cost with cached token support
     cost = pricing.compute_cost(
         provider="openai",
@@ -210,114 +251,188 @@ def _track_openai_call(
     if semantic_label:
         event["semantic_label"] = semantic_label
     
-    buffer.add_event(event)
+    return event
+
+
+class _StreamUsage:
+    """
+    Per-stream accumulator.
+
+    Usage comes from the final chunk when the caller asked for it
+    (stream_options={"include_usage": True}). Content deltas are appended
+    to a list - joined only if tokens have to be estimated - so per-chunk
+    cost stays O(1) regardless of response length.
+    """
+
+    __slots__ = ("chunks", "parts", "input_tokens", "output_tokens", "cached_tokens")
+
+    def __init__(self):
+        self.chunks = 0
+        self.parts: List[str] = []
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cached_tokens = 0
+
+    def add(self, chunk: Any) -> None:
+        self.chunks += 1
+        
+        # Keep content for potential estimation (chat: delta.content, completions: text)
+        choices = getattr(chunk, "choices", None)
+        if choices:
+            choice = choices[0]
+            delta = getattr(choice, "delta", None)
+            content = getattr(delta, "content", None) if delta is not None else getattr(choice, "text", None)
+            if content:
+                self.parts.append(content)
+        
+        # Try to extract usage from chunk (OpenAI sends it in the last chunk)
+        usage = getattr(chunk, "usage", None)
+        if usage:
+            self.input_tokens = getattr(usage, "prompt_tokens", 0) or 0
+            self.output_tokens = getattr(usage, "completion_tokens", 0) or 0
+            details = getattr(usage, "prompt_tokens_details", None)
+            if details:
+                self.cached_tokens = getattr(details, "cached_tokens", 0) or 0
+                self.input_tokens -= self.cached_tokens
+
+    def needs_estimate(self, messages) -> bool:
+        return (self.output_tokens == 0 and bool(self.parts)) or (self.input_tokens == 0 and bool(messages))
+
+
+def _apply_estimate(event: dict, parts: List[str], messages, model: Optional[str]) -> None:
+    """Fill in estimated tokens and cost, then buffer the event (runs on the estimator thread)."""
+    try:
+        estimated = False
+        if event["output_tokens"] == 0 and parts:
+            event["output_tokens"] = _estimate_tokens("".join(parts), model)
+            estimated = True
+        if event["input_tokens"] == 0 and messages:
+            event["input_tokens"] = _estimate_input_tokens_from_messages(messages, model)
+            estimated = True
+        if estimated:
+            event["cost_usd"] = pricing.compute_cost(
+                provider="openai",
+                model=model,
+                input_tokens=event["input_tokens"],
+                output_tokens=event["output_tokens"],
+                cached_tokens=event["cached_tokens"]
+            )
+            event["event_metadata"]["tokens_estimated"] = True
+    except Exception as e:
+        logger.debug(f"[llmobserve] Token estimation failed: {e}")
+    finally:
+        buffer.add_event(event)
+
+
+class _TokenEstimator:
+    """
+    One background thread that estimates tokens for streams without usage.
+
+    The event itself (run, section, span) is built on the caller's thread
+    when the stream ends; only tokenization is deferred, and the event is
+    buffered once its estimate is in. buffer's exit hook drains pending
+    estimates before the final flush.
+    """
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, event: dict, parts: List[str], messages, model: Optional[str]) -> None:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llmobserve-estimate")
+            future = self._executor.submit(_apply_estimate, event, parts, messages, model)
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+
+    def drain(self, timeout: Optional[float] = None) -> None:
+        """Wait for queued estimates to be buffered."""
+        with self._lock:
+            pending = list(self._pending)
+        if pending:
+            wait(pending, timeout=timeout)
+
+
+_estimator = _TokenEstimator()
+
+
+def _finish_stream(
+    state: _StreamUsage,
+    method_name: str,
+    model: Optional[str],
+    start_time: float,
+    messages,
+    cancelled: bool,
+    error: Optional[Exception] = None
+) -> None:
+    """Emit the single event for a finished, cancelled or failed stream."""
+    if state.chunks == 0 and error is None:
+        return
+    event = _build_openai_event(
+        method_name, model, start_time,
+        state.input_tokens, state.output_tokens, state.cached_tokens,
+        error=error, is_streaming=True, stream_cancelled=cancelled,
+    )
+    if TIKTOKEN_AVAILABLE and state.needs_estimate(messages):
+        _estimator.submit(event, state.parts, messages, model)
+    else:
+        buffer.add_event(event)
 
 
 def _wrap_streaming_response(stream, method_name: str, model: Optional[str], start_time: float, messages=None):
     """
     Wrap a streaming response to track usage and handle cancellation.
     
-    Accumulates chunks and emits a single event when stream completes or is cancelled.
-    For cancelled streams, estimates both input and output tokens using tiktoken.
+    Emits a single event when the stream completes, is cancelled or fails.
+    If the stream carried no usage, input and output tokens are estimated
+    with tiktoken on a background thread.
     
     Args:
         messages: Original messages/prompt for input token estimation
     """
-    accumulated_usage = {"input_tokens": 0, "output_tokens": 0, "cached_tokens": 0}
-    accumulated_content = ""  # For token estimation if cancelled
-    chunks_received = 0
+    state = _StreamUsage()
     cancelled = False
-    tokens_estimated = False
+    error = None
     
     try:
         for chunk in stream:
-            chunks_received += 1
-            
-            # Accumulate content for potential estimation
-            if hasattr(chunk, "choices") and len(chunk.choices) > 0:
-                delta = chunk.choices[0].delta
-                if hasattr(delta, "content") and delta.content:
-                    accumulated_content += delta.content
-            
-            # Try to extract usage from chunk (OpenAI sends it in the last chunk)
-            if hasattr(chunk, "usage") and chunk.usage:
-                usage = chunk.usage
-                accumulated_usage["input_tokens"] = getattr(usage, "prompt_tokens", 0)
-                accumulated_usage["output_tokens"] = getattr(usage, "completion_tokens", 0)
-                
-                # Extract cached tokens
-                if hasattr(usage, "prompt_tokens_details"):
-                    details = usage.prompt_tokens_details
-                    if details and hasattr(details, "cached_tokens"):
-                        cached_tokens = getattr(details, "cached_tokens", 0)
-                        accumulated_usage["cached_tokens"] = cached_tokens
-                        accumulated_usage["input_tokens"] -= cached_tokens
-            
+            state.add(chunk)
             yield chunk
     except GeneratorExit:
         # Stream was cancelled by consumer
         cancelled = True
-        
-        # Estimate tokens if we don't have usage data
-        if accumulated_usage["output_tokens"] == 0 and accumulated_content:
-            estimated_output = _estimate_tokens(accumulated_content, model)
-            accumulated_usage["output_tokens"] = estimated_output
-            tokens_estimated = True
-        
-        # Estimate input tokens if we don't have usage data and have messages
-        if accumulated_usage["input_tokens"] == 0 and messages:
-            estimated_input = _estimate_input_tokens_from_messages(messages, model)
-            accumulated_usage["input_tokens"] = estimated_input
-            tokens_estimated = True
-        
         raise
     except Exception as e:
-        # Stream error - try to estimate tokens
-        if accumulated_usage["output_tokens"] == 0 and accumulated_content:
-            estimated_output = _estimate_tokens(accumulated_content, model)
-            accumulated_usage["output_tokens"] = estimated_output
-            tokens_estimated = True
-        
-        if accumulated_usage["input_tokens"] == 0 and messages:
-            estimated_input = _estimate_input_tokens_from_messages(messages, model)
-            accumulated_usage["input_tokens"] = estimated_input
-            tokens_estimated = True
-        
-        _track_openai_call(
-            method_name=method_name,
-            model=model,
-            start_time=start_time,
-            response=type('obj', (object,), accumulated_usage)(),
-            error=e,
-            is_streaming=True,
-            stream_cancelled=False,
-            extra_params={"tokens_estimated": tokens_estimated}
-        )
+        error = e
         raise
     finally:
-        # Emit event after stream completes or is cancelled
-        if chunks_received > 0:
-            # Create a mock response object with accumulated usage
-            mock_response = type('obj', (object,), {
-                'usage': type('obj', (object,), {
-                    'prompt_tokens': accumulated_usage["input_tokens"] + accumulated_usage["cached_tokens"],
-                    'completion_tokens': accumulated_usage["output_tokens"],
-                    'prompt_tokens_details': type('obj', (object,), {
-                        'cached_tokens': accumulated_usage["cached_tokens"]
-                    })() if accumulated_usage["cached_tokens"] > 0 else None
-                })()
-            })()
-            
-            _track_openai_call(
-                method_name=method_name,
-                model=model,
-                start_time=start_time,
-                response=mock_response,
-                error=None,
-                is_streaming=True,
-                stream_cancelled=cancelled,
-                extra_params={"tokens_estimated": tokens_estimated} if tokens_estimated else None
-            )
+        _finish_stream(state, method_name, model, start_time, messages, cancelled, error)
+
+
+async def _wrap_async_streaming_response(stream, method_name: str, model: Optional[str], start_time: float, messages=None):
+    """Async counterpart of _wrap_streaming_response."""
+    state = _StreamUsage()
+    cancelled = False
+    error = None
+    
+    try:
+        async for chunk in stream:
+            state.add(chunk)
+            yield chunk
+    except GeneratorExit:
+        cancelled = True
+        raise
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        _finish_stream(state, method_name, model, start_time, messages, cancelled, error)
 
 
 def _patch_method(client_class: Any, resource_path: list[str], method_name: str, original_method: Callable):
@@ -437,78 +552,7 @@ def _patch_method(client_class: Any, resource_path: list[str], method_name: str,
             
             # Handle async streaming
             if is_streaming and hasattr(response, "__aiter__"):
-                # Wrap async stream
-                async def async_stream_wrapper():
-                    accumulated_usage = {"input_tokens": 0, "output_tokens": 0, "cached_tokens": 0}
-                    accumulated_content = ""
-                    chunks_received = 0
-                    cancelled = False
-                    tokens_estimated = False
-                    
-                    try:
-                        async for chunk in response:
-                            chunks_received += 1
-                            
-                            # Accumulate content for potential estimation
-                            if hasattr(chunk, "choices") and len(chunk.choices) > 0:
-                                delta = chunk.choices[0].delta
-                                if hasattr(delta, "content") and delta.content:
-                                    accumulated_content += delta.content
-                            
-                            # Extract usage from chunk
-                            if hasattr(chunk, "usage") and chunk.usage:
-                                usage = chunk.usage
-                                accumulated_usage["input_tokens"] = getattr(usage, "prompt_tokens", 0)
-                                accumulated_usage["output_tokens"] = getattr(usage, "completion_tokens", 0)
-                                
-                                if hasattr(usage, "prompt_tokens_details"):
-                                    details = usage.prompt_tokens_details
-                                    if details and hasattr(details, "cached_tokens"):
-                                        cached_tokens = getattr(details, "cached_tokens", 0)
-                                        accumulated_usage["cached_tokens"] = cached_tokens
-                                        accumulated_usage["input_tokens"] -= cached_tokens
-                            
-                            yield chunk
-                    except GeneratorExit:
-                        cancelled = True
-                        
-                        # Estimate tokens if we don't have usage data
-                        if accumulated_usage["output_tokens"] == 0 and accumulated_content:
-                            estimated_output = _estimate_tokens(accumulated_content, model)
-                            accumulated_usage["output_tokens"] = estimated_output
-                            tokens_estimated = True
-                        
-                        # Estimate input tokens
-                        if accumulated_usage["input_tokens"] == 0 and messages:
-                            estimated_input = _estimate_input_tokens_from_messages(messages, model)
-                            accumulated_usage["input_tokens"] = estimated_input
-                            tokens_estimated = True
-                        
-                        raise
-                    finally:
-                        if chunks_received > 0:
-                            mock_response = type('obj', (object,), {
-                                'usage': type('obj', (object,), {
-                                    'prompt_tokens': accumulated_usage["input_tokens"] + accumulated_usage["cached_tokens"],
-                                    'completion_tokens': accumulated_usage["output_tokens"],
-                                    'prompt_tokens_details': type('obj', (object,), {
-                                        'cached_tokens': accumulated_usage["cached_tokens"]
-                                    })() if accumulated_usage["cached_tokens"] > 0 else None
-                                })()
-                            })()
-                            
-                            _track_openai_call(
-                                method_name=endpoint,
-                                model=model,
-                                start_time=start_time,
-                                response=mock_response,
-                                error=None,
-                                is_streaming=True,
-                                stream_cancelled=cancelled,
-                                extra_params={"tokens_estimated": tokens_estimated} if tokens_estimated else None
-                            )
-                
-                return async_stream_wrapper()
+                return _wrap_async_streaming_response(response, endpoint, model, start_time, messages=messages)
             
             # Non-streaming async: track immediately
             _track_openai_call(
@@ -3,6 +3,7 @@ Pricing registry baked into SDK for client-side cost calculation.
 Synced with collector/pricing/registry.json
 """
 from typing import Dict, Any, Optional
+from llmobserve.pricing_engine import PricingEngine
 
 # Baked-in pricing registry (matches collector)
 # Sources:
@@ -1027,6 +1028,17 @@ PRICING_REGISTRY: Dict[str, Any] = {
 }
 
 
+_engine: Optional[PricingEngine] = None
+
+
+def _get_engine() -> PricingEngine:
+    """Compile PRICING_REGISTRY on first use (keeps import cheap)."""
+    global _engine
+    if _engine is None:
+        _engine = PricingEngine(PRICING_REGISTRY)
+    return _engine
+
+
 def compute_cost(
     provider: str,
     model: Optional[str],
@@ -1055,177 +1067,14 @@ def compute_cost(
     Returns:
         Cost in USD
     """
-    # Build key with fallback for model name variations
-    pricing = {}
-    if model:
-        # Try exact match first
-        key = f"{provider}:{model}"
-        pricing = PRICING_REGISTRY.get(key, {})
-        
-        # If not found and model has date suffix (e.g., "claude-3-haiku-20240307"),
-        # try without the date suffix (e.g., "claude-3-haiku")
-        if not pricing and "-" in model:
-            # Try stripping date suffix (format: model-YYYYMMDD)
-            import re
-            # Match pattern like -20240307 at the end
-            base_model = re.sub(r'-\d{8}$', '', model)
-            if base_model != model:
-                fallback_key = f"{provider}:{base_model}"
-                pricing = PRICING_REGISTRY.get(fallback_key, {})
-        
-        # If still not found, try matching by model family
-        if not pricing:
-            # Extract model family (e.g., "claude-3-haiku" from "claude-3-haiku-20240307")
-            parts = model.split("-")
-            if len(parts) >= 3:
-                # Try progressively shorter model names
-                for i in range(len(parts), 2, -1):  # Start from full name, go down to first 3 parts
-                    test_model = "-".join(parts[:i])
-                    test_key = f"{provider}:{test_model}"
-                    if test_key in PRICING_REGISTRY:
-                        pricing = PRICING_REGISTRY[test_key]
-                        break
-    else:
-        key = provider
-        pricing = PRICING_REGISTRY.get(key, {})
-    
-    # Check for per_call pricing
-    if "per_call" in pricing:
-        return pricing["per_call"]
-    
-    # Check for per_million pricing (Pinecone read/write units)
-    if "per_million" in pricing:
-        # Use standard pricing by default (not enterprise)
-        return pricing["per_million"] / 1_000_000  # Convert to per-call cost
-    
-    # Check for per_million_tokens pricing (Pinecone embedding models)
-    if "per_million_tokens" in pricing:
-        total_tokens = input_tokens + output_tokens
-        return (pricing["per_million_tokens"] / 1_000_000) * total_tokens
-    
-    # Check for per_1k_requests pricing (Pinecone reranking)
-    if "per_1k_requests" in pricing:
-        return pricing["per_1k_requests"] / 1000  # Convert to per-request cost
-    
-    # Check for per_gb pricing (Pinecone storage operations)
-    if "per_gb" in pricing:
-        return pricing["per_gb"]
-    
-    # Check for per_gb_month pricing (Pinecone storage)
-    if "per_gb_month" in pricing:
-        return pricing["per_gb_month"]
-    
-    # Check for per_minute pricing (audio)
-    if "per_minute" in pricing:
-        return pricing["per_minute"]
-    
-    # Check for per_character pricing (TTS)
-    if "per_character" in pricing:
-        return pricing["per_character"]
-    
-    # Check for per_second pricing (Sora)
-    if "per_second" in pricing:
-        return pricing["per_second"]
-    
-    # Check for per_session pricing (Code Interpreter)
-    if "per_session" in pricing:
-        return pricing["per_session"]
-    
-    # Check for per_gb_day pricing (File Search Storage)
-    if "per_gb_day" in pricing:
-        return pricing["per_gb_day"]
-    
-    # Check for per_1k_calls pricing (Tools)
-    if "per_1k_calls" in pricing:
-        return pricing["per_1k_calls"] / 1000
-    
-    # Check for per_1k_searches pricing (Cohere Rerank)
-    if "per_1k_searches" in pricing:
-        return pricing["per_1k_searches"] / 1000
-    
-    # Check for per_1k_sources pricing (xAI Live Search)
-    if "per_1k_sources" in pricing:
-        return pricing["per_1k_sources"] / 1000
-    
-    # Check for per_image pricing (xAI, Google Imagen)
-    if "per_image" in pricing:
-        return pricing["per_image"]
-    
-    # Check for per_request pricing (xAI violation fee)
-    if "per_request" in pricing:
-        return pricing["per_request"]
-    
-    # Check for per_1k_pages pricing (Mistral OCR)
-    if "per_1k_pages" in pricing:
-        return pricing["per_1k_pages"] / 1000
-    
-    # Check for per_1k_annotations pricing (Mistral OCR)
-    if "per_1k_annotations" in pricing:
-        return pricing["per_1k_annotations"] / 1000
-    
-    # Check for per_1k_images pricing (Mistral Image Gen)
-    if "per_1k_images" in pricing:
-        return pricing["per_1k_images"] / 1000
-    
-    # Check for input_audio_per_minute pricing (Mistral, Google)
-    if "input_audio_per_minute" in pricing:
-        return pricing["input_audio_per_minute"]
-    
-    # Check for per_million_dims pricing (Weaviate vector dimensions)
-    if "per_million_dims" in pricing:
-        return pricing["per_million_dims"] / 1_000_000
-    
-    # Check for per_gib_month pricing (Weaviate, Chroma storage)
-    if "per_gib_month" in pricing:
-        return pricing["per_gib_month"]
-    
-    # Check for per_gib pricing (Weaviate backups, Chroma writes)
-    if "per_gib" in pricing:
-        return pricing["per_gib"]
-    
-    # Check for per_tib pricing (Chroma query scans)
-    if "per_tib" in pricing:
-        return pricing["per_tib"]
-    
-    # Check for per_million_vectors_month pricing (Zilliz clusters)
-    if "per_million_vectors_month" in pricing:
-        return pricing["per_million_vectors_month"] / 1_000_000
-    
-    # Check for per_month pricing (MongoDB Atlas)
-    if "per_month" in pricing:
-        return pricing["per_month"] / (30 * 24)  # Convert to hourly equivalent
-    
-    # Check for per_hour pricing (Qdrant, Redis, Elasticsearch, MongoDB)
-    if "per_hour" in pricing:
-        return pricing["per_hour"]
-    
-    # Token-based pricing (default)
-    total_cost = 0.0
-    
-    # Handle cached tokens separately - they cost 10% of regular input (or explicit cached_input rate)
-    regular_input_cost = pricing.get("input", 0.0) * input_tokens
-    cached_input_cost = pricing.get("cached_input", pricing.get("input", 0.0) * 0.1) * cached_tokens
-    output_cost = pricing.get("output", 0.0) * output_tokens
-    
-    total_cost += regular_input_cost + cached_input_cost + output_cost
-    
-    # Handle Perplexity-specific pricing
-    # 1. Citation tokens (Deep Research)
-    if citation_tokens > 0 and "citation" in pricing:
-        total_cost += pricing["citation"] * citation_tokens
-    
-    # 2. Reasoning tokens (Deep Research)
-    if reasoning_tokens > 0 and "reasoning" in pricing:
-        total_cost += pricing["reasoning"] * reasoning_tokens
-    
-    # 3. Search queries (Deep Research)
-    if search_queries > 0 and "search_queries_per_1k" in pricing:
-        total_cost += (pricing["search_queries_per_1k"] / 1000) * search_queries
-    
-    # 4. Request-based fees (Sonar models with context size)
-    if context_size and provider == "perplexity":
-        context_key = f"request_{context_size}_per_1k"
-        if context_key in pricing:
-            total_cost += pricing[context_key] / 1000  # Convert to per-request cost
-    
-    return total_cost
+    return _get_engine().cost(
+        provider,
+        model,
+        input_tokens,
+        output_tokens,
+        cached_tokens,
+        context_size=context_size,
+        citation_tokens=citation_tokens,
+        reasoning_tokens=reasoning_tokens,
+        search_queries=search_queries,
+    )
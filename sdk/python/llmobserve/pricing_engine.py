@@ -0,0 +1,304 @@
+"""
+Pricing engine: resolves (provider, model) to a registry entry and prices usage.
+
+Shared by the SDK (baked-in PRICING_REGISTRY), the collector (authoritative
+server-side cost, ingest and recalculation) and the proxy. Like
+provider_registry, it has no llmobserve imports: the proxy loads it by file
+path, and the collector ships an identical copy (collector/pricing_engine.py)
+so it deploys from its own directory. Edit this file, then run
+scripts/sync_pricing_engine.py to update the collector's copy.
+
+When an engine is built, every registry entry is compiled once. Its pricing
+type is classified into PricingType and its rates are copied into slots, so
+pricing an event is an enum dispatch instead of a chain of
+`"per_x" in pricing` checks. Name resolution is memoized per
+(provider, model) in a bounded LRU. It covers lowercasing, provider aliases,
+model normalization with precompiled patterns, date-suffix stripping and
+model-family prefixes.
+
+Usage:
+    engine = PricingEngine(registry)
+    engine.cost("anthropic", "claude-3-5-sonnet-20241022", 1200, 300)
+    engine.compute_costs([{"provider": "openai", "model": "gpt-4o",
+                           "input_tokens": 10, "output_tokens": 5}])
+"""
+import re
+from enum import IntEnum
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+RESOLVE_CACHE_SIZE = 8192
+
+PROVIDER_ALIASES = {
+    "meta-llama": "meta",
+    "mistralai": "mistral",
+    "nousresearch": "nous",
+    "togethercomputer": "together",
+    "01-ai": "yi",
+    "cognitivecomputations": "cognitive",
+}
+
+_DATE_SUFFIX = re.compile(r"-\d{8}$")
+
+# First pattern that changes the name wins (order matters)
+_MODEL_NORMALIZATIONS = [(re.compile(pattern), replacement) for pattern, replacement in [
+    # Llama variants
+    (r"llama-3\.1-(\d+)b-instruct", r"llama-3.1-\1b"),
+    (r"llama-3\.2-(\d+)b-instruct", r"llama-3.2-\1b"),
+    (r"llama-3-(\d+)b-instruct", r"llama-3-\1b"),
+    # Mistral variants
+    (r"mistral-(\d+)b-instruct.*", r"mistral-\1b"),
+    (r"mixtral-8x(\d+)b-instruct.*", r"mixtral-8x\1b"),
+    # DeepSeek
+    (r"deepseek-chat.*", "deepseek-chat"),
+    (r"deepseek-coder.*", "deepseek-coder"),
+    (r"deepseek-r1.*", "deepseek-r1"),
+    # Qwen
+    (r"qwen-2\.5-(\d+)b-instruct", r"qwen-2.5-\1b"),
+    (r"qwen-2-(\d+)b-instruct", r"qwen-2-\1b"),
+    # Claude
+    (r"claude-3\.5-sonnet.*", "claude-3.5-sonnet"),
+    (r"claude-3-5-sonnet.*", "claude-3.5-sonnet"),
+    (r"claude-3-haiku.*", "claude-3-haiku"),
+    (r"claude-3-5-haiku.*", "claude-3.5-haiku"),
+    (r"claude-3\.5-haiku.*", "claude-3.5-haiku"),
+    # Gemini
+    (r"gemini-flash-1\.5.*", "gemini-1.5-flash"),
+    (r"gemini-pro-1\.5.*", "gemini-1.5-pro"),
+    (r"gemini-2\.0-flash.*", "gemini-2.0-flash"),
+]]
+
+
+class PricingType(IntEnum):
+    TOKENS = 0              # input/output/cached_input rates per token (default)
+    FLAT = 1                # fixed cost per call, derived from one unit price
+    PER_MILLION_TOKENS = 2  # one rate for input + output tokens
+
+
+# Unit-price keys in precedence order: (key, divisor). For entries without
+# input/output rates, the first key present decides the type; all other
+# entries are token-priced.
+_FLAT_KEYS: List[Tuple[str, Optional[float]]] = [
+    ("per_call", 1),
+    ("per_million", 1_000_000),      # Pinecone read/write units
+    ("per_million_tokens", None),    # -> PER_MILLION_TOKENS
+    ("per_1k_requests", 1000),       # Pinecone reranking
+    ("per_gb", 1),
+    ("per_gb_month", 1),
+    ("per_minute", 1),
+    ("per_character", 1),
+    ("per_second", 1),
+    ("per_session", 1),
+    ("per_gb_day", 1),
+    ("per_1k_calls", 1000),
+    ("per_1k_searches", 1000),
+    ("per_1k_sources", 1000),
+    ("per_image", 1),
+    ("per_request", 1),
+    ("per_1k_pages", 1000),
+    ("per_1k_annotations", 1000),
+    ("per_1k_images", 1000),
+    ("input_audio_per_minute", 1),
+    ("per_million_dims", 1_000_000),
+    ("per_gib_month", 1),
+    ("per_gib", 1),
+    ("per_tib", 1),
+    ("per_million_vectors_month", 1_000_000),
+    ("per_month", 30 * 24),          # Hourly equivalent
+    ("per_hour", 1),
+]
+
+
+def normalize_provider(provider: str) -> str:
+    """Normalize provider name for pricing lookup."""
+    provider = provider.lower().strip()
+    return PROVIDER_ALIASES.get(provider, provider)
+
+
+def normalize_model(model: str) -> str:
+    """Normalize model name for pricing lookup."""
+    model = _DATE_SUFFIX.sub("", model.lower().strip())
+    # NOTE: -v1/-v2 suffixes are kept: Amazon Nova uses them in the model name
+    for pattern, replacement in _MODEL_NORMALIZATIONS:
+        normalized = pattern.sub(replacement, model)
+        if normalized != model:
+            return normalized
+    return model
+
+
+class CompiledPrice:
+    """One registry entry, classified and with its rates pulled out."""
+
+    __slots__ = ("key", "entry", "type", "unit_key", "unit_cost", "input", "output",
+                 "cached_input", "citation", "reasoning", "per_search_query", "request_fees")
+
+    def __init__(self, key: str, entry: Mapping[str, Any]):
+        self.key = key
+        self.entry = entry
+        self.type = PricingType.TOKENS
+        self.unit_key: Optional[str] = None
+        self.unit_cost = 0.0
+        # Entries with token rates are token-priced; unit keys on them
+        # (e.g. Perplexity's per_request) are not used as a flat price
+        flat_keys = () if "input" in entry or "output" in entry else _FLAT_KEYS
+        for unit_key, divisor in flat_keys:
+            if unit_key in entry:
+                self.unit_key = unit_key
+                if divisor is None:
+                    self.type = PricingType.PER_MILLION_TOKENS
+                    self.unit_cost = entry[unit_key] / 1_000_000
+                else:
+                    self.type = PricingType.FLAT
+                    self.unit_cost = entry[unit_key] / divisor
+                break
+        self.input = entry.get("input", 0.0)
+        self.output = entry.get("output", 0.0)
+        self.cached_input = entry.get("cached_input", self.input * 0.1)
+        # Perplexity extras
+        self.citation = entry.get("citation", 0.0)
+        self.reasoning = entry.get("reasoning", 0.0)
+        self.per_search_query = entry.get("search_queries_per_1k", 0.0) / 1000
+        self.request_fees = {
+            k[len("request_"):-len("_per_1k")]: v / 1000
+            for k, v in entry.items()
+            if k.startswith("request_") and k.endswith("_per_1k")
+        } if key.split(":", 1)[0] == "perplexity" else {}
+
+    def cost(self, input_tokens: int = 0, output_tokens: int = 0, cached_tokens: int = 0,
+             context_size: Optional[str] = None, citation_tokens: int = 0,
+             reasoning_tokens: int = 0, search_queries: int = 0) -> float:
+        kind = self.type
+        if kind is PricingType.FLAT:
+            return self.unit_cost
+        if kind is PricingType.PER_MILLION_TOKENS:
+            return self.unit_cost * (input_tokens + output_tokens)
+        total = self.input * input_tokens + self.cached_input * cached_tokens + self.output * output_tokens
+        if citation_tokens > 0:
+            total += self.citation * citation_tokens
+        if reasoning_tokens > 0:
+            total += self.reasoning * reasoning_tokens
+        if search_queries > 0:
+            total += self.per_search_query * search_queries
+        if context_size and self.request_fees:
+            total += self.request_fees.get(context_size, 0.0)
+        return total
+
+
+class PricingEngine:
+    """A registry compiled for lookup. Build a new engine when the registry changes."""
+
+    def __init__(self, registry: Mapping[str, Any], cache_size: int = RESOLVE_CACHE_SIZE):
+        self.registry = registry
+        # Empty or non-dict entries never match, as with `if not pricing` before
+        self._table: Dict[str, CompiledPrice] = {
+            key.lower(): CompiledPrice(key, entry)
+            for key, entry in registry.items()
+            if isinstance(entry, dict) and entry
+        }
+        self._resolve = lru_cache(maxsize=cache_size)(self._resolve_uncached)
+        self._lookup = lru_cache(maxsize=cache_size)(self._lookup_uncached)
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def entry(self, key: str) -> Optional[CompiledPrice]:
+        """Exact registry key lookup ("provider:model", "provider:endpoint:tier", ...)."""
+        return self._table.get(key.lower())
+
+    def _resolve_uncached(self, provider: str, model: str) -> Optional[CompiledPrice]:
+        table = self._table
+        original_provider = provider.lower().strip()
+        normalized_provider = normalize_provider(original_provider)
+        if not model:
+            return table.get(original_provider) or table.get(normalized_provider)
+
+        original_model = model.lower().strip()
+        undated_model = _DATE_SUFFIX.sub("", original_model)
+        normalized_model = normalize_model(original_model)
+        for key in (
+            f"{original_provider}:{original_model}",
+            f"{normalized_provider}:{original_model}",
+            # Snapshot of a listed model before pattern normalization, so
+            # gemini-2.0-flash-lite-YYYYMMDD is not priced as gemini-2.0-flash
+            f"{original_provider}:{undated_model}",
+            f"{normalized_provider}:{undated_model}",
+            f"{original_provider}:{normalized_model}",
+            f"{normalized_provider}:{normalized_model}",
+        ):
+            hit = table.get(key)
+            if hit:
+                return hit
+
+        # Model family: progressively shorter names, down to three parts
+        parts = original_model.split("-")
+        for i in range(len(parts) - 1, 2, -1):
+            family = "-".join(parts[:i])
+            hit = table.get(f"{original_provider}:{family}") or table.get(f"{normalized_provider}:{family}")
+            if hit:
+                return hit
+        return None
+
+    def resolve(self, provider: Optional[str], model: Optional[str]) -> Optional[CompiledPrice]:
+        """Registry entry for a provider/model (memoized), or None if unpriced."""
+        return self._resolve(provider or "", model or "")
+
+    def _lookup_uncached(self, provider: str, model: str, endpoint: str, tier: str) -> Optional[CompiledPrice]:
+        entry = self._table.get
+        if tier:
+            hit = ((model and entry(f"{provider}:{model}:{tier}"))
+                   or (endpoint and entry(f"{provider}:{endpoint}:{tier}"))
+                   or entry(f"{provider}:{tier}"))
+            if hit:
+                return hit
+        return ((model and self._resolve(provider, model))
+                or (endpoint and entry(f"{provider}:{endpoint}"))
+                or self._resolve(provider, ""))
+
+    def lookup(self, provider: str, model: Optional[str] = None, endpoint: Optional[str] = None,
+               tier: Optional[str] = None) -> Optional[CompiledPrice]:
+        """
+        Resolve with endpoint and tenant-tier keys (the proxy's order).
+
+        Tries provider:model:tier, provider:endpoint:tier, provider:tier, then
+        the model (as resolve()), provider:endpoint and the provider entry.
+        """
+        return self._lookup(provider.lower(), (model or "").lower(), (endpoint or "").lower(), (tier or "").lower())
+
+    def cost(self, provider: Optional[str], model: Optional[str], input_tokens: int = 0,
+             output_tokens: int = 0, cached_tokens: int = 0, **extras) -> float:
+        """Cost in USD of one operation (0.0 if the model is not priced)."""
+        price = self._resolve(provider or "", model or "")
+        if price is None:
+            return 0.0
+        return price.cost(input_tokens, output_tokens, cached_tokens, **extras)
+
+    def compute_costs(self, batch: Iterable[Mapping[str, Any]]) -> List[float]:
+        """
+        Costs for a batch of usage records, in order.
+
+        Each record needs provider and model, plus optional input_tokens,
+        output_tokens and cached_tokens. Names are resolved once per distinct
+        (provider, model) in the batch.
+        """
+        resolved: Dict[Tuple[Any, Any], Optional[CompiledPrice]] = {}
+        resolve = self._resolve
+        costs: List[float] = []
+        append = costs.append
+        for record in batch:
+            name = (record.get("provider"), record.get("model"))
+            if name in resolved:
+                price = resolved[name]
+            else:
+                price = resolved[name] = resolve(name[0] or "", name[1] or "")
+            if price is None:
+                append(0.0)
+                continue
+            append(price.cost(
+                record.get("input_tokens") or 0,
+                record.get("output_tokens") or 0,
+                record.get("cached_tokens") or 0,
+            ))
+        return costs
+
+    def cache_info(self):
+        return self._resolve.cache_info()
@@ -0,0 +1,223 @@
+"""
+Provider routing table: which API provider a URL belongs to.
+
+PROVIDER_RULES is the single declarative table used by the HTTP
+interceptors, the HTTP fallback event creator and the proxy. Rules match on
+hostname suffixes (label-aligned, so "notopenai.com" is not OpenAI) and are
+compiled into a trie keyed on reversed host labels; the rules for a URL's
+authority (host[:port]) are cached in an LRU, so detection is usually one
+string slice and one dict lookup.
+
+A rule may narrow a suffix further:
+- label_prefix:  the host's first label must start with this
+                 (bedrock-runtime.us-east-1.amazonaws.com)
+- path_contains: the lowercased path/query must contain one of these
+
+The most specific (longest) matching suffix wins; at the same suffix, rules
+registered later win over earlier ones, so custom providers can override
+built-ins.
+
+This module has no llmobserve imports: the proxy loads it by file path.
+
+Usage:
+    from llmobserve import register_provider
+    register_provider("my-gateway", hosts=["llm.internal.example.com"])
+"""
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+HOST_CACHE_SIZE = 4096
+
+PROVIDER_RULES: List[Dict] = [
+    # LLM providers
+    {"provider": "openai", "hosts": ["openai.com"]},
+    {"provider": "azure_openai", "hosts": ["openai.azure.com"]},
+    {"provider": "anthropic", "hosts": ["anthropic.com"]},
+    {"provider": "google", "hosts": ["generativelanguage.googleapis.com", "aiplatform.googleapis.com"]},
+    {"provider": "google-cloud", "hosts": ["googleapis.com"]},
+    {"provider": "cohere", "hosts": ["cohere.ai", "cohere.com"]},
+    {"provider": "mistral", "hosts": ["mistral.ai"]},
+    {"provider": "groq", "hosts": ["groq.com"]},
+    {"provider": "ai21", "hosts": ["ai21.com"]},
+    {"provider": "huggingface", "hosts": ["huggingface.co"]},
+    {"provider": "together", "hosts": ["together.xyz", "together.ai"]},
+    {"provider": "replicate", "hosts": ["replicate.com"]},
+    {"provider": "perplexity", "hosts": ["perplexity.ai"]},
+    {"provider": "aws_bedrock", "hosts": ["amazonaws.com"], "label_prefix": "bedrock"},
+    {"provider": "openrouter", "hosts": ["openrouter.ai"]},
+    {"provider": "vapi", "hosts": ["vapi.ai"]},
+    # Voice AI
+    {"provider": "elevenlabs", "hosts": ["elevenlabs.io"]},
+    {"provider": "assemblyai", "hosts": ["assemblyai.com"]},
+    {"provider": "deepgram", "hosts": ["deepgram.com"]},
+    {"provider": "playht", "hosts": ["play.ht", "play.ai"]},
+    {"provider": "azure_speech", "hosts": ["speech.platform.bing.com", "speech.microsoft.com"]},
+    {"provider": "azure_speech", "hosts": ["cognitiveservices.azure.com"], "path_contains": ["speech"]},
+    {"provider": "aws_polly", "hosts": ["amazonaws.com"], "label_prefix": "polly"},
+    {"provider": "aws_transcribe", "hosts": ["amazonaws.com"], "label_prefix": "transcribe"},
+    # Embeddings
+    {"provider": "voyage", "hosts": ["voyageai.com"]},
+    # Images/Video
+    {"provider": "stability", "hosts": ["stability.ai"]},
+    {"provider": "runway", "hosts": ["runwayml.com"]},
+    {"provider": "aws_rekognition", "hosts": ["amazonaws.com"], "label_prefix": "rekognition"},
+    # Vector databases
+    {"provider": "pinecone", "hosts": ["pinecone.io"]},
+    {"provider": "weaviate", "hosts": ["weaviate.network", "weaviate.cloud", "weaviate.io"]},
+    {"provider": "qdrant", "hosts": ["qdrant.io", "qdrant.tech"]},
+    {"provider": "milvus", "hosts": ["zillizcloud.com", "zilliz.com"]},
+    {"provider": "chroma", "hosts": ["trychroma.com"]},
+    {"provider": "mongodb", "hosts": ["mongodb.com", "mongodb.net"], "path_contains": ["vector", "search"]},
+    {"provider": "redis", "hosts": ["redis.cloud", "redislabs.com", "redis.io"], "path_contains": ["vector"]},
+    {"provider": "elasticsearch", "hosts": ["elastic-cloud.com", "elastic.co", "es.io"], "path_contains": ["vector"]},
+    # Search
+    {"provider": "algolia", "hosts": ["algolia.net", "algolianet.com", "algolia.io"]},
+    # Payment processing
+    {"provider": "stripe", "hosts": ["api.stripe.com"]},
+    {"provider": "paypal", "hosts": ["api.paypal.com", "api-m.paypal.com"]},
+    {"provider": "paypal", "hosts": ["paypal.com"], "path_contains": ["/v1/"]},
+    # Communication
+    {"provider": "twilio", "hosts": ["twilio.com"]},
+    {"provider": "sendgrid", "hosts": ["sendgrid.com"]},
+    # Database/Backend
+    {"provider": "supabase", "hosts": ["supabase.co"]},
+]
+
+
+class ProviderRule:
+    __slots__ = ("provider", "label_prefix", "path_contains")
+
+    def __init__(self, provider: str, label_prefix: Optional[str] = None,
+                 path_contains: Optional[Iterable[str]] = None):
+        self.provider = provider
+        self.label_prefix = label_prefix.lower() if label_prefix else None
+        self.path_contains = tuple(s.lower() for s in path_contains) if path_contains else ()
+
+
+def split_url(url: str) -> Tuple[str, str]:
+    """Return (authority, rest) of a URL as-is: "user@Host:443" and "/path?query"."""
+    scheme_end = url.find("://")
+    start = scheme_end + 3 if scheme_end >= 0 else 0
+    end = url.find("/", start)
+    if end < 0:
+        end = len(url)
+    authority = url[start:end]
+    if "?" in authority or "#" in authority:  # No path: "https://host?query"
+        cut = min(i for i in (authority.find("?"), authority.find("#")) if i >= 0)
+        authority, end = authority[:cut], start + cut
+    return authority, url[end:]
+
+
+def normalize_host(authority: str) -> str:
+    """Lowercased hostname without userinfo, port or trailing dot."""
+    host = authority.lower()
+    if "@" in host:
+        host = host.rsplit("@", 1)[1]
+    if host.startswith("["):  # IPv6 literal
+        host = host[:host.find("]") + 1]
+    elif ":" in host:
+        host = host.split(":", 1)[0]
+    return host.rstrip(".")
+
+
+class ProviderRegistry:
+    """Compiled PROVIDER_RULES plus any custom rules; safe to share between threads."""
+
+    def __init__(self, rules: Iterable[Dict] = PROVIDER_RULES, cache_size: int = HOST_CACHE_SIZE):
+        self._rules: List[Dict] = list(rules)
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self._compile()
+
+    def _compile(self) -> None:
+        # Trie over reversed labels: {"com": {"openai": {None: [rules]}}}
+        root: Dict = {}
+        for spec in self._rules:
+            rule = ProviderRule(spec["provider"], spec.get("label_prefix"), spec.get("path_contains"))
+            for host in spec["hosts"]:
+                node = root
+                for label in reversed(host.lower().strip(".").split(".")):
+                    node = node.setdefault(label, {})
+                node.setdefault(None, []).insert(0, rule)  # Later rules take precedence
+        # Swap in a new trie and cache together; readers see one or the other
+        self._rules_for_authority = lru_cache(maxsize=self._cache_size)(self._make_lookup(root))
+
+    @staticmethod
+    def _make_lookup(root: Dict):
+        def rules_for_authority(authority: str) -> Tuple[ProviderRule, ...]:
+            """Candidate rules for a URL authority, most specific suffix first."""
+            labels = normalize_host(authority).split(".")
+            first_label = labels[0]
+            matches: List[ProviderRule] = []
+            node = root
+            for label in reversed(labels):
+                node = node.get(label)
+                if node is None:
+                    break
+                rules = node.get(None)
+                if rules:
+                    matches[:0] = [r for r in rules
+                                   if r.label_prefix is None or first_label.startswith(r.label_prefix)]
+            return tuple(matches)
+        return rules_for_authority
+
+    def detect(self, url: str) -> Optional[str]:
+        """Provider name for a URL, or None if no rule matches."""
+        if not url:
+            return None
+        _, scheme, rest = url.partition("://")
+        authority, slash, rest = (rest if scheme else url).partition("/")
+        if "?" in authority or "#" in authority:
+            authority, rest = split_url(url)
+        else:
+            rest = slash + rest
+        path = None
+        for rule in self._rules_for_authority(authority):
+            if not rule.path_contains:
+                return rule.provider
+            if path is None:
+                path = rest.lower()
+            if any(s in path for s in rule.path_contains):
+                return rule.provider
+        return None
+
+    def register(self, provider: str, hosts: Iterable[str], label_prefix: Optional[str] = None,
+                 path_contains: Optional[Iterable[str]] = None) -> None:
+        """Add a rule. It overrides existing rules for the same host suffix."""
+        hosts = [hosts] if isinstance(hosts, str) else list(hosts)
+        if not provider or not hosts:
+            raise ValueError("provider and at least one host are required")
+        spec = {"provider": provider, "hosts": hosts}
+        if label_prefix:
+            spec["label_prefix"] = label_prefix
+        if path_contains:
+            spec["path_contains"] = [path_contains] if isinstance(path_contains, str) else list(path_contains)
+        with self._lock:
+            self._rules.append(spec)
+            self._compile()
+
+    def cache_info(self):
+        return self._rules_for_authority.cache_info()
+
+
+_registry = ProviderRegistry()
+
+
+def detect_provider(url: str) -> Optional[str]:
+    """Provider name for a URL using the shared registry, or None if unknown."""
+    return _registry.detect(url)
+
+
+def register_provider(provider: str, hosts: Iterable[str], label_prefix: Optional[str] = None,
+                      path_contains: Optional[Iterable[str]] = None) -> None:
+    """
+    Teach llmobserve a custom provider (e.g. an internal LLM gateway).
+
+    Args:
+        provider: Name reported on events and used for caps and pricing
+        hosts: Hostname suffixes, e.g. ["llm.internal.example.com"]
+        label_prefix: Optional prefix the host's first label must have
+        path_contains: Optional substrings, one of which the path must contain
+    """
+    _registry.register(provider, hosts, label_prefix, path_contains)
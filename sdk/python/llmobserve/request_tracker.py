@@ -2,37 +2,125 @@
 Request tracking utilities for retry detection and deduplication.
 """
 import hashlib
+import threading
 import time
-from typing import Set, Dict, Optional
+from typing import Dict, Hashable, Optional, Union
 from collections import OrderedDict
 import logging
 
 logger = logging.getLogger("llmobserve")
 
-# Global cache for tracking request IDs (bounded LRU)
-_tracked_requests: OrderedDict[str, float] = OrderedDict()
 _max_cache_size = 10000  # Keep last 10k requests
 _cache_ttl_seconds = 3600  # 1 hour TTL
+_STR_HASH_SLICE = 64 * 1024  # str bodies are encoded this many characters at a time
 
 
-def generate_request_id(method: str, url: str, body: Optional[bytes] = None) -> str:
+class ExpiringSet:
+    """
+    Thread-safe set whose members expire after ttl_seconds, bounded to max_size.
+
+    Members are grouped into time buckets of ttl_seconds / buckets. Expiry
+    drops whole buckets from the old end, so each member is expired at most
+    once (amortized O(1) per operation) instead of scanning every entry.
+    Expiry granularity is one bucket; over max_size, members of the oldest
+    bucket are evicted first.
+    """
+
+    def __init__(self, ttl_seconds: float, max_size: int, buckets: int = 60):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._bucket_width = max(ttl_seconds / buckets, 1e-3)
+        self._buckets: "OrderedDict[int, set]" = OrderedDict()  # bucket number -> members
+        self._member_bucket: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def _bucket_now(self) -> int:
+        return int(time.monotonic() // self._bucket_width)
+
+    def _expire(self, current: int) -> None:
+        oldest_live = current - int(self.ttl_seconds // self._bucket_width)
+        buckets = self._buckets
+        while buckets:
+            number = next(iter(buckets))
+            if number >= oldest_live:
+                break
+            for key in buckets.pop(number):
+                del self._member_bucket[key]
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            self._expire(self._bucket_now())
+            return key in self._member_bucket
+
+    def add(self, key: Hashable) -> None:
+        with self._lock:
+            current = self._bucket_now()
+            self._expire(current)
+            previous = self._member_bucket.get(key)
+            if previous == current:
+                return
+            if previous is not None:
+                previous_bucket = self._buckets[previous]
+                previous_bucket.discard(key)
+                if not previous_bucket:
+                    del self._buckets[previous]
+            bucket = self._buckets.get(current)
+            if bucket is None:
+                bucket = self._buckets[current] = set()
+            bucket.add(key)
+            self._member_bucket[key] = current
+            while len(self._member_bucket) > self.max_size:
+                number, oldest = next(iter(self._buckets.items()))
+                if oldest:
+                    del self._member_bucket[oldest.pop()]
+                if not oldest:
+                    del self._buckets[number]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+            self._member_bucket.clear()
+
+    def __len__(self) -> int:
+        return len(self._member_bucket)
+
+
+# Global cache for tracking request IDs (bounded, expiring)
+_tracked_requests = ExpiringSet(_cache_ttl_seconds, _max_cache_size)
+
+
+def generate_request_id(
+    method: str,
+    url: str,
+    body: Optional[Union[bytes, bytearray, memoryview, str]] = None
+) -> str:
     """
     Generate deterministic request ID for retry detection.
     
+    The body is fed to the hash as-is (str bodies are encoded in slices),
+    so multi-MB prompts are never decoded or copied into one fingerprint.
+    
     Args:
         method: HTTP method (GET, POST, etc.)
         url: Full URL
         body: Request body (optional)
     
     Returns:
-        SHA256 hash as hex string
+        BLAKE2b-64 hash as hex string (16 chars)
     """
-    # Create deterministic fingerprint
-    fingerprint = f"{method}:{url}"
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(method.encode())
+    digest.update(b":")
+    digest.update(url.encode())
     if body:
-        fingerprint += f":{body.decode('utf-8', errors='ignore')}"
+        digest.update(b":")
+        if isinstance(body, str):
+            for start in range(0, len(body), _STR_HASH_SLICE):
+                digest.update(body[start:start + _STR_HASH_SLICE].encode("utf-8", errors="ignore"))
+        else:
+            digest.update(body)
     
-    return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+    return digest.hexdigest()
 
 
 def is_request_tracked(request_id: str) -> bool:
@@ -45,17 +133,6 @@ def is_request_tracked(request_id: str) -> bool:
     Returns:
         True if already tracked (don't track again), False otherwise
     """
-    current_time = time.time()
-    
-    # Clean up expired entries
-    expired_keys = [
-        rid for rid, timestamp in _tracked_requests.items()
-        if current_time - timestamp > _cache_ttl_seconds
-    ]
-    for key in expired_keys:
-        _tracked_requests.pop(key, None)
-    
-    # Check if already tracked
     if request_id in _tracked_requests:
         logger.debug(f"[llmobserve] Request {request_id} already tracked (retry detected)")
         return True
@@ -70,15 +147,7 @@ def mark_request_tracked(request_id: str):
     Args:
         request_id: Request ID from generate_request_id()
     """
-    current_time = time.time()
-    
-    # Add to cache with timestamp
-    _tracked_requests[request_id] = current_time
-    
-    # Enforce size limit (LRU eviction)
-    if len(_tracked_requests) > _max_cache_size:
-        # Remove oldest entry
-        _tracked_requests.popitem(last=False)
+    _tracked_requests.add(request_id)
 
 
 def should_track_response(status_code: int) -> bool:
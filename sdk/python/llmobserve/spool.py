@@ -0,0 +1,368 @@
+"""
+Durable on-disk spool for event batches the collector could not accept.
+
+Opt-in: set LLMOBSERVE_SPOOL=true (directory .llmobserve/spool under the
+working directory) or LLMOBSERVE_SPOOL_DIR=<path>.
+
+Layout: append-only JSONL segments, one serialized batch per line,
+
+    seg-<time_ns>-<pid>-<rand>.jsonl.open     being written by <pid>
+    seg-<time_ns>-<pid>-<rand>.jsonl          sealed, waiting for replay
+    seg-<time_ns>-<pid>-<rand>.jsonl.replay   claimed by a replay worker
+
+Segments rotate by size or age. Appends are flushed to the OS on every
+write and fsync'd at most every LLMOBSERVE_SPOOL_FSYNC_MS, so a crashed
+process loses nothing and a power loss at most that window.
+
+The replay worker sends sealed segments oldest first and deletes each one
+once every batch in it is accepted. A segment that fails part-way is
+retried from the start later; the collector skips span_ids it already
+has, so re-sent events are not double counted. Several processes may
+share one spool: a segment is claimed by renaming it, and segments left
+by a dead process (.open or .replay) are picked up after STALE_SECONDS.
+
+Environment:
+    LLMOBSERVE_SPOOL_SEGMENT_BYTES   Rotate after this many bytes (4 MB)
+    LLMOBSERVE_SPOOL_SEGMENT_AGE_S   Rotate after this many seconds (60)
+    LLMOBSERVE_SPOOL_FSYNC_MS        fsync interval (1000)
+    LLMOBSERVE_SPOOL_MAX_BYTES       Delete oldest segments beyond this (256 MB)
+    LLMOBSERVE_SPOOL_MAX_AGE_HOURS   Delete segments older than this (72)
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("llmobserve")
+
+SEGMENT_SUFFIX = ".jsonl"
+OPEN_SUFFIX = ".open"
+REPLAY_SUFFIX = ".replay"
+STALE_SECONDS = 600  # Orphaned .open/.replay segments from other processes
+REPLAY_INTERVAL = 5.0  # seconds between replay passes
+REPLAY_MAX_BACKOFF = 60.0  # seconds
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def spool_enabled() -> bool:
+    if os.getenv("LLMOBSERVE_SPOOL_DIR"):
+        return True
+    return os.getenv("LLMOBSERVE_SPOOL", "false").lower() in ("1", "true", "yes")
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":  # os.kill(pid, 0) is not a probe on Windows; rely on STALE_SECONDS
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Exists but owned by someone else
+    return True
+
+
+class Spool:
+    """Append-only, segment-rotated batch store with size/age retention."""
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        segment_bytes: Optional[int] = None,
+        segment_age: Optional[float] = None,
+        fsync_interval: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        max_age: Optional[float] = None,
+    ):
+        self.directory = directory or os.getenv(
+            "LLMOBSERVE_SPOOL_DIR", os.path.join(os.getcwd(), ".llmobserve", "spool")
+        )
+        self.segment_bytes = segment_bytes or int(_env_number("LLMOBSERVE_SPOOL_SEGMENT_BYTES", 4 * 1024 * 1024))
+        self.segment_age = segment_age or _env_number("LLMOBSERVE_SPOOL_SEGMENT_AGE_S", 60)
+        self.fsync_interval = (fsync_interval if fsync_interval is not None
+                               else _env_number("LLMOBSERVE_SPOOL_FSYNC_MS", 1000) / 1000.0)
+        self.max_bytes = max_bytes or int(_env_number("LLMOBSERVE_SPOOL_MAX_BYTES", 256 * 1024 * 1024))
+        self.max_age = max_age or _env_number("LLMOBSERVE_SPOOL_MAX_AGE_HOURS", 72) * 3600
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._path: Optional[str] = None
+        self._opened_at = 0.0
+        self._written = 0
+        self._last_fsync = 0.0
+        self.counters = {
+            "batches_spooled": 0,
+            "bytes_spooled": 0,
+            "batches_replayed": 0,
+            "batches_rejected": 0,
+            "segments_expired": 0,
+            "bytes_expired": 0,
+        }
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(self, raw_batch: bytes) -> bool:
+        """Durably queue one serialized batch (a JSON array). False if the disk write failed."""
+        line = raw_batch.replace(b"\n", b" ") + b"\n"
+        try:
+            with self._lock:
+                now = time.monotonic()
+                if self._file is not None and (
+                    self._written >= self.segment_bytes or now - self._opened_at >= self.segment_age
+                ):
+                    self._seal_locked()
+                if self._file is None:
+                    os.makedirs(self.directory, exist_ok=True)
+                    name = f"seg-{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:6]}{SEGMENT_SUFFIX}"
+                    self._path = os.path.join(self.directory, name + OPEN_SUFFIX)
+                    self._file = open(self._path, "ab")
+                    self._opened_at = now
+                    self._written = 0
+                self._file.write(line)
+                self._file.flush()  # Survives a process crash from here on
+                self._written += len(line)
+                if now - self._last_fsync >= self.fsync_interval:
+                    os.fsync(self._file.fileno())
+                    self._last_fsync = now
+                self.counters["batches_spooled"] += 1
+                self.counters["bytes_spooled"] += len(line)
+            return True
+        except OSError as e:
+            logger.error(f"[llmobserve] Failed to spool batch to {self.directory}: {e}")
+            return False
+
+    def _seal_locked(self) -> None:
+        if self._file is None:
+            return
+        path = self._path
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            if path is not None:
+                os.replace(path, path[: -len(OPEN_SUFFIX)])
+        except OSError as e:
+            logger.error(f"[llmobserve] Failed to seal spool segment {path}: {e}")
+        self._file = None
+        self._path = None
+
+    def seal(self) -> None:
+        """Close the segment being written so it becomes eligible for replay."""
+        with self._lock:
+            self._seal_locked()
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def _recover_orphans(self, names: List[str]) -> None:
+        """Make segments abandoned by dead processes replayable again."""
+        now = time.time()
+        for name in names:
+            if name.endswith(OPEN_SUFFIX):
+                suffix = OPEN_SUFFIX
+                path = os.path.join(self.directory, name)
+                if path == self._path:
+                    continue
+                try:
+                    pid = int(name.split("-")[2])
+                except (IndexError, ValueError):
+                    pid = 0
+                try:
+                    stale = (pid > 0 and not _pid_alive(pid)) or now - os.path.getmtime(path) > STALE_SECONDS
+                except OSError:
+                    continue
+            elif name.endswith(REPLAY_SUFFIX):
+                suffix = REPLAY_SUFFIX
+                path = os.path.join(self.directory, name)
+                try:
+                    stale = now - os.path.getmtime(path) > STALE_SECONDS
+                except OSError:
+                    continue
+            else:
+                continue
+            if stale:
+                try:
+                    os.replace(path, path[: -len(suffix)])
+                except OSError:
+                    pass  # Another process got there first
+
+    def sealed_segments(self) -> List[str]:
+        """Sealed segment paths, oldest first."""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        self._recover_orphans(names)
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return [os.path.join(self.directory, n) for n in sorted(names) if n.endswith(SEGMENT_SUFFIX)]
+
+    @staticmethod
+    def claim(path: str) -> Optional[str]:
+        """Atomically take a sealed segment for replay. None if another process has it."""
+        claimed = path + REPLAY_SUFFIX
+        try:
+            os.rename(path, claimed)
+            os.utime(claimed)  # Claim age is measured from now
+        except OSError:
+            return None
+        return claimed
+
+    @staticmethod
+    def read_batches(path: str) -> Iterator[Tuple[bytes, int]]:
+        """(serialized batch, event count) per line (a torn final line is skipped)."""
+        with open(path, "rb") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    count = len(json.loads(line))
+                except (ValueError, TypeError):
+                    logger.warning(f"[llmobserve] Skipping corrupt batch in spool segment {os.path.basename(path)}")
+                    continue
+                yield line, count
+
+    # ------------------------------------------------------------------
+    # Retention
+    # ------------------------------------------------------------------
+
+    def enforce_retention(self) -> None:
+        """Delete segments older than max_age, then oldest first until under max_bytes."""
+        segments = []
+        for path in self.sealed_segments():
+            try:
+                segments.append((path, os.path.getsize(path), int(os.path.basename(path).split("-")[1]) / 1e9))
+            except (OSError, IndexError, ValueError):
+                continue
+        total = sum(size for _, size, _ in segments)
+        cutoff = time.time() - self.max_age
+        for path, size, created in segments:
+            if created >= cutoff and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self._count("segments_expired")
+            self._count("bytes_expired", size)
+            logger.warning(
+                f"[llmobserve] Spool retention: deleted {os.path.basename(path)} ({size} bytes of unsent events)"
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        segments = self.sealed_segments()
+        pending = 0
+        for path in segments:
+            try:
+                pending += os.path.getsize(path)
+            except OSError:
+                pass
+        with self._lock:
+            counters = dict(self.counters)
+        return {"directory": self.directory, "segments": len(segments), "pending_bytes": pending, **counters}
+
+
+class SpoolReplayer:
+    """
+    Daemon thread that drains a Spool through `send`.
+
+    send(raw_batch, event_count) returns None on success, or raises an exception with a
+    boolean `retryable` attribute. A non-retryable rejection drops that
+    batch; a retryable failure leaves the segment for the next pass, with
+    jittered exponential backoff between failing passes.
+    """
+
+    def __init__(self, spool: Spool, send: Callable[[bytes, int], None]):
+        self.spool = spool
+        self.send = send
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._failures = 0
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="llmobserve-spool-replay", daemon=True)
+        self._thread.start()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            if self._failures:
+                delay = random.uniform(0, min(REPLAY_MAX_BACKOFF, REPLAY_INTERVAL * (2 ** self._failures)))
+            else:
+                delay = REPLAY_INTERVAL
+            self._wake.wait(delay)
+            self._wake.clear()
+            try:
+                ok = self.replay_once()
+            except Exception as e:
+                logger.debug(f"[llmobserve] Spool replay pass failed: {e}")
+                ok = False
+            self._failures = 0 if ok else min(self._failures + 1, 10)
+
+    def replay_once(self) -> bool:
+        """One pass over the spool. True if it is now empty (or only held by others)."""
+        self.spool.seal()
+        self.spool.enforce_retention()
+        for path in self.spool.sealed_segments():
+            claimed = self.spool.claim(path)
+            if claimed is None:
+                continue
+            if not self._replay_segment(claimed):
+                try:
+                    os.replace(claimed, path)  # Back in line for the next pass
+                except OSError:
+                    pass
+                return False
+            try:
+                os.remove(claimed)
+            except OSError:
+                pass
+        return True
+
+    def _replay_segment(self, path: str) -> bool:
+        replayed = 0
+        try:
+            for batch, event_count in self.spool.read_batches(path):
+                try:
+                    self.send(batch, event_count)
+                except Exception as e:
+                    if getattr(e, "retryable", True):
+                        logger.debug(f"[llmobserve] Spool replay paused ({os.path.basename(path)}): {e}")
+                        return False
+                    self.spool._count("batches_rejected")
+                    logger.error(f"[llmobserve] Collector rejected a spooled batch, dropping it: {e}")
+                    continue
+                replayed += 1
+        except OSError as e:
+            logger.warning(f"[llmobserve] Cannot read spool segment {os.path.basename(path)}: {e}")
+            return False
+        finally:
+            self.spool._count("batches_replayed", replayed)
+        if replayed:
+            logger.info(f"[llmobserve] Replayed {replayed} spooled batch(es) from {os.path.basename(path)}")
+        return True
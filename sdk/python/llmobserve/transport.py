@@ -1,21 +1,95 @@
 """
 Transport layer for sending events to collector.
 
-Includes exponential-backoff retry and signal handling.
+Events go out over one keep-alive connection pool (requests.Session when
+requests is installed, urllib otherwise). Batches are serialized with
+orjson when available and compressed above a size threshold:
+
+    LLMOBSERVE_COMPRESSION            gzip (default) | zstd | none
+                                      (zstd needs the `zstandard` package on
+                                      both ends; falls back to gzip)
+    LLMOBSERVE_COMPRESSION_MIN_BYTES  Smallest body worth compressing (1024)
+
+Collectors older than compressed ingest reject an encoded body with
+400/415/422. The batch is then re-sent uncompressed once, and that
+collector URL gets uncompressed bodies for the rest of the process.
+
+A failed batch is handed to a background retry worker (exponential
+backoff with full jitter), so the flusher thread never sleeps and the
+next flush is not held up. Client errors other than 408/429 are not
+retried. With the durable spool enabled (see spool.py) failed batches go
+to disk instead and are replayed once the collector is reachable, across
+process restarts. Includes signal handling to flush before shutdown.
 """
+import gzip
+import heapq
+import itertools
 import json
+import os
+import random
 import time
 import signal
 import logging
-from typing import List
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 from llmobserve.types import TraceEvent
 from llmobserve import config
+from llmobserve.spool import Spool, SpoolReplayer, spool_enabled
 
 logger = logging.getLogger("llmobserve")
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional
+    zstandard = None
+
+REQUEST_TIMEOUT = 30.0  # seconds - handles Railway cold starts
+MAX_ATTEMPTS = 4  # First send + 3 retries
+RETRY_BASE_DELAY = 1.0  # seconds
+RETRY_MAX_DELAY = 30.0  # seconds
+MAX_PENDING_RETRIES = 50  # Batches waiting for a retry before the oldest is dropped
+GZIP_LEVEL = 5
+# An older collector answers a Content-Encoding it can't decode with 415, or
+# with 400/422 whose detail shows the body itself failed to decode (other
+# 400/422s are ordinary validation errors and keep compression on)
+COMPRESSION_UNSUPPORTED_STATUS = 415
+BODY_DECODE_ERROR_STATUSES = (400, 422)
+BODY_DECODE_ERROR_MARKERS = (
+    "json decode error",
+    "json_invalid",
+    "error parsing the body",
+    "invalid gzip body",
+    "invalid zstd body",
+)
+
 # Track if shutdown signal received
 _shutdown_requested = False
 
+_stats_lock = threading.Lock()
+_stats = {
+    "batches_sent": 0,
+    "events_sent": 0,
+    "bytes_raw": 0,
+    "bytes_sent": 0,
+    "send_failures": 0,
+    "retries_scheduled": 0,
+    "batches_dropped": 0,
+}
+
+
+# Collector URLs that rejected a compressed body; sent uncompressed from then on
+_uncompressed_collectors: set = set()
+
+
+def _count(name: str, amount: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += amount
+
 
 def _handle_signal(signum, frame):
     """Handle SIGTERM/SIGINT to flush events before shutdown."""
@@ -25,97 +99,373 @@ def _handle_signal(signum, frame):
     flush_events()
 
 
+# ============================================================================
+# Encoding
+# ============================================================================
+
+def _compression() -> str:
+    value = os.getenv("LLMOBSERVE_COMPRESSION", "gzip").lower()
+    if value == "zstd" and zstandard is None:
+        return "gzip"
+    return value if value in ("gzip", "zstd") else "none"
+
+
+def _compression_min_bytes() -> int:
+    try:
+        return int(os.getenv("LLMOBSERVE_COMPRESSION_MIN_BYTES", "1024"))
+    except ValueError:
+        return 1024
+
+
+def serialize_events(events: List[TraceEvent]) -> bytes:
+    """JSON-encode a batch (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(events, default=str)
+    return json.dumps(events, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def compress_body(body: bytes, collector_url: Optional[str] = None) -> Tuple[bytes, Dict[str, str]]:
+    """Compress a serialized batch if it is above the threshold. Returns (body, headers)."""
+    headers = {"Content-Type": "application/json"}
+    encoding = "none" if collector_url in _uncompressed_collectors else _compression()
+    if encoding != "none" and len(body) >= _compression_min_bytes():
+        if encoding == "zstd":
+            assert zstandard is not None  # _compression() only picks zstd when it is installed
+            body = zstandard.ZstdCompressor(level=3).compress(body)
+        else:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        headers["Content-Encoding"] = encoding
+    return body, headers
+
+
+def _decompress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        assert zstandard is not None  # Only bodies we compressed with zstd get here
+        return zstandard.ZstdDecompressor().decompress(body)
+    return gzip.decompress(body)
+
+
+# ============================================================================
+# HTTP
+# ============================================================================
+
+class _SendError(Exception):
+    def __init__(self, message: str, retryable: bool = True, status: Optional[int] = None, detail: str = ""):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status = status
+        self.detail = detail
+
+
+def _retryable_status(status: int) -> bool:
+    return status >= 500 or status in (408, 429)
+
+
+class _Sender:
+    """Posts encoded batches over a keep-alive connection pool."""
+
+    def __init__(self):
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    # Retries are ours (in the background), not urllib3's
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+    def post(self, url: str, body: bytes, headers: Dict[str, str]) -> None:
+        """Send one batch. Raises _SendError on failure."""
+        try:
+            session = self._get_session()
+        except ImportError:
+            return self._post_urllib(url, body, headers)
+        try:
+            response = session.post(url, data=body, headers=headers, timeout=REQUEST_TIMEOUT)
+        except Exception as e:
+            raise _SendError(str(e))
+        if response.status_code >= 400:
+            detail = response.text[:200]
+            raise _SendError(
+                f"HTTP {response.status_code}: {detail}",
+                retryable=_retryable_status(response.status_code),
+                status=response.status_code,
+                detail=detail,
+            )
+
+    @staticmethod
+    def _post_urllib(url: str, body: bytes, headers: Dict[str, str]) -> None:
+        # Fallback when requests is not installed (no connection reuse)
+        import urllib.request
+        import urllib.error
+
+        req = urllib.request.Request(url, data=body, headers=headers)
+        try:
+            urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT).close()
+        except urllib.error.HTTPError as e:
+            try:
+                detail = e.read()[:200].decode("utf-8", "replace")
+            except Exception:
+                detail = ""
+            raise _SendError(
+                f"HTTP {e.code}: {e.reason}", retryable=_retryable_status(e.code), status=e.code, detail=detail
+            )
+        except (urllib.error.URLError, OSError) as e:
+            raise _SendError(str(e))
+
+
+_sender = _Sender()
+
+
+def _compression_rejected(error: _SendError) -> bool:
+    """True if the collector failed on the Content-Encoding rather than on the events."""
+    if error.status == COMPRESSION_UNSUPPORTED_STATUS:
+        return True
+    if error.status in BODY_DECODE_ERROR_STATUSES:
+        detail = error.detail.lower()
+        return any(marker in detail for marker in BODY_DECODE_ERROR_MARKERS)
+    return False
+
+
+def _send_batch(event_count: int, body: bytes, headers: Dict[str, str], raw_size: int) -> None:
+    collector_url = config.get_collector_url()
+    headers = dict(headers)
+    if config.get_api_key():
+        headers["Authorization"] = f"Bearer {config.get_api_key()}"
+    encoding = headers.get("Content-Encoding")
+    if encoding and collector_url in _uncompressed_collectors:
+        # Encoded before this collector was found not to accept it (e.g. a queued retry)
+        body = _decompress_body(body, headers.pop("Content-Encoding"))
+        encoding = None
+    try:
+        _sender.post(f"{collector_url}/events/", body, headers)  # Note: trailing slash required
+    except _SendError as e:
+        if not encoding or not _compression_rejected(e):
+            raise
+        logger.warning(
+            f"[llmobserve] Collector rejected a {encoding} body ({e}) - sending uncompressed from now on"
+        )
+        _uncompressed_collectors.add(collector_url)
+        body = _decompress_body(body, headers.pop("Content-Encoding"))
+        _sender.post(f"{collector_url}/events/", body, headers)
+    with _stats_lock:
+        _stats["batches_sent"] += 1
+        _stats["events_sent"] += event_count
+        _stats["bytes_raw"] += raw_size
+        _stats["bytes_sent"] += len(body)
+
+
+def _log_give_up(attempts: int, error: Exception) -> None:
+    logger.error(f"[llmobserve] ❌ Failed to send events after {attempts} attempt(s): {error}")
+    logger.error(f"[llmobserve] Collector URL: {config.get_collector_url()}")
+    logger.error(f"[llmobserve] Check: 1) URL is correct, 2) Server is running, 3) Network is accessible")
+
+
+# ============================================================================
+# Background retries
+# ============================================================================
+
+class _RetryWorker:
+    """
+    Re-sends failed batches on a daemon thread.
+
+    Pending batches sit in a heap ordered by due time. Delay before retry n
+    is uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**n)) ("full
+    jitter"), so SDK instances that failed together do not retry together.
+    """
+
+    def __init__(self):
+        self._pending: List[Tuple[float, int, int, List[TraceEvent], bytes, Dict[str, str], int]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, events, body, headers, raw_size, attempt: int) -> None:
+        delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+        with self._cond:
+            if len(self._pending) >= MAX_PENDING_RETRIES:
+                oldest = min(self._pending, key=lambda item: item[1])
+                self._pending.remove(oldest)
+                heapq.heapify(self._pending)
+                _count("batches_dropped")
+                logger.warning(
+                    f"[llmobserve] Retry queue full - dropping a batch of {len(oldest[3])} events"
+                )
+            heapq.heappush(
+                self._pending, (time.monotonic() + delay, next(self._seq), attempt, events, body, headers, raw_size)
+            )
+            _count("retries_scheduled")
+            self._ensure_thread()
+            self._cond.notify()
+        logger.warning(
+            f"[llmobserve] ⚠️  Failed to send {len(events)} events, retrying in {delay:.1f}s "
+            f"(attempt {attempt + 1}/{MAX_ATTEMPTS})"
+        )
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="llmobserve-retry", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending or self._pending[0][0] > time.monotonic():
+                    timeout = self._pending[0][0] - time.monotonic() if self._pending else None
+                    self._cond.wait(timeout)
+                _, _, attempt, events, body, headers, raw_size = heapq.heappop(self._pending)
+            self._attempt(events, body, headers, raw_size, attempt)
+
+    def _attempt(self, events, body, headers, raw_size, attempt: int) -> None:
+        try:
+            _send_batch(len(events), body, headers, raw_size)
+        except _SendError as e:
+            _count("send_failures")
+            if e.retryable and attempt + 1 < MAX_ATTEMPTS:
+                self.submit(events, body, headers, raw_size, attempt + 1)
+            else:
+                _count("batches_dropped")
+                _log_give_up(attempt + 1, e)
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def flush_now(self) -> None:
+        """One immediate attempt for every pending batch (used at shutdown)."""
+        with self._cond:
+            pending, self._pending = self._pending, []
+        for _, _, attempt, events, body, headers, raw_size in sorted(pending, key=lambda item: item[1]):
+            try:
+                _send_batch(len(events), body, headers, raw_size)
+            except _SendError as e:
+                _count("batches_dropped")
+                _log_give_up(attempt + 1, e)
+
+
+_retries = _RetryWorker()
+
+
+# ============================================================================
+# Durable spool
+# ============================================================================
+
+_spool: Optional[Spool] = None
+_replayer: Optional[SpoolReplayer] = None
+_spool_lock = threading.Lock()
+
+
+def _replay_send(raw: bytes, event_count: int) -> None:
+    body, headers = compress_body(raw, config.get_collector_url())
+    _send_batch(event_count, body, headers, len(raw))
+
+
+def _get_replayer() -> Optional[SpoolReplayer]:
+    """The spool and its replayer, created on first use (None if spooling is off)."""
+    global _spool, _replayer
+    if _replayer is None and spool_enabled():
+        with _spool_lock:
+            if _replayer is None:
+                _replayer = SpoolReplayer(Spool(), _replay_send)
+                _spool = _replayer.spool
+    return _replayer
+
+
+def _spool_batch(raw: bytes, event_count: int) -> bool:
+    """Write a failed batch to the spool (if enabled). True if it is now durable."""
+    replayer = _get_replayer()
+    if replayer is None or not replayer.spool.append(raw):
+        return False
+    logger.warning(
+        f"[llmobserve] ⚠️  Collector unavailable - spooled {event_count} events to {replayer.spool.directory}"
+    )
+    if not _shutdown_requested:
+        replayer.start()
+    return True
+
+
+def start_spool_replay() -> None:
+    """Start replaying batches left in the spool (including by earlier processes)."""
+    replayer = _get_replayer()
+    if replayer is not None:
+        replayer.start()
+        replayer.wake()
+
+
+# ============================================================================
+# Public API
+# ============================================================================
+
 def flush_events() -> None:
     """
-    Flush buffered events to the collector with exponential-backoff retry.
-    
-    Sends a batch POST request to /events endpoint.
-    Retries up to 3 times with exponential backoff (1s, 2s, 4s).
+    Flush buffered events to the collector.
+
+    Sends a batch POST request to /events endpoint. Never sleeps: if the
+    send fails with a retryable error the batch is handed to the
+    background retry worker (up to MAX_ATTEMPTS attempts in total).
     """
     if not config.is_enabled():
         return
-    
+
     # Import here to avoid circular dependency
     from llmobserve.buffer import get_and_clear_buffer
-    
+
     events = get_and_clear_buffer()
-    
+
     if not events:
         return
-    
-    collector_url = config.get_collector_url()
-    if not collector_url:
+
+    if not config.get_collector_url():
+        return
+
+    try:
+        raw = serialize_events(events)
+        body, headers = compress_body(raw, config.get_collector_url())
+    except Exception as e:
+        logger.error(f"[llmobserve] ❌ Failed to serialize {len(events)} events: {e}")
         return
-    
-    # Exponential backoff retry (max 3 attempts)
-    max_retries = 3
-    base_delay = 1.0  # 1 second
-    
-    for attempt in range(max_retries):
-        try:
-            # Try to import requests
-            try:
-                import requests
-            except ImportError:
-                # Fallback to urllib if requests not available
-                import urllib.request
-                import urllib.error
-                
-                url = f"{collector_url}/events/"  # Note: trailing slash required
-                data = json.dumps(events).encode("utf-8")
-                req = urllib.request.Request(
-                    url,
-                    data=data,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                if config.get_api_key():
-                    req.add_header("Authorization", f"Bearer {config.get_api_key()}")
-                
-                try:
-                    # 30 second timeout - handles Railway cold starts
-                    urllib.request.urlopen(req, timeout=30.0)
-                    return  # Success
-                except urllib.error.URLError as e:
-                    if attempt < max_retries - 1:
-                        delay = base_delay * (2 ** attempt)
-                        logger.warning(f"[llmobserve] ⚠️  Failed to send events, retrying in {delay}s: {e}")
-                        time.sleep(delay)
-                        continue
-                    else:
-                        logger.error(f"[llmobserve] ❌ Failed to send events after {max_retries} attempts: {e}")
-                        logger.error(f"[llmobserve] Collector URL: {collector_url}")
-                        logger.error(f"[llmobserve] Check: 1) URL is correct, 2) Server is running, 3) Network is accessible")
-                        return
-                return
-            
-            # Use requests if available
-            url = f"{collector_url}/events/"  # Note: trailing slash required
-            headers = {"Content-Type": "application/json"}
-            
-            if config.get_api_key():
-                headers["Authorization"] = f"Bearer {config.get_api_key()}"
-            
-            response = requests.post(
-                url,
-                json=events,
-                headers=headers,
-                timeout=30  # 30 seconds - handles Railway cold starts
-            )
-            response.raise_for_status()  # Raise on HTTP error
-            return  # Success
-            
-        except Exception as e:
-            if attempt < max_retries - 1:
-                delay = base_delay * (2 ** attempt)
-                logger.warning(f"[llmobserve] ⚠️  Failed to send events, retrying in {delay}s: {e}")
-                time.sleep(delay)
-            else:
-                logger.error(f"[llmobserve] ❌ Failed to send events after {max_retries} attempts: {e}")
-                logger.error(f"[llmobserve] Collector URL: {collector_url}")
-                logger.error(f"[llmobserve] Check: 1) URL is correct, 2) Server is running, 3) Network is accessible")
-                # Fail-open: don't break user's application
-                return
+
+    try:
+        _send_batch(len(events), body, headers, len(raw))
+    except _SendError as e:
+        _count("send_failures")
+        if e.retryable and _spool_batch(raw, len(events)):
+            return
+        if e.retryable and not _shutdown_requested:
+            _retries.submit(events, body, headers, len(raw), attempt=0)
+        else:
+            # Fail-open: don't break user's application
+            _count("batches_dropped")
+            _log_give_up(1, e)
+
+
+def shutdown() -> None:
+    """Last attempt for batches waiting to be retried; seal the spool segment."""
+    _retries.flush_now()
+    if _spool is not None:
+        _spool.seal()
+
+
+def get_transport_stats() -> Dict[str, Any]:
+    """Bytes on the wire, batches sent and retry/drop counters."""
+    with _stats_lock:
+        stats: Dict[str, Any] = dict(_stats)
+    stats["pending_retries"] = _retries.pending()
+    stats["compression"] = _compression()
+    stats["uncompressed_collectors"] = sorted(_uncompressed_collectors)
+    stats["serializer"] = "orjson" if orjson is not None else "json"
+    if _spool is not None:
+        stats["spool"] = _spool.stats()
+    return stats
 
 
 # Register signal handlers for graceful shutdown
@@ -125,4 +475,3 @@ try:
 except (ValueError, OSError):
     # Signals not available (e.g., Windows)
     pass
-
@@ -0,0 +1,74 @@
+"""
+ExpiringSet: re-adding moves a member to the current bucket, eviction over
+max_size drops the oldest members first, and expiry is bucket-granular.
+"""
+import time
+from types import SimpleNamespace
+
+from llmobserve import request_tracker
+from llmobserve.request_tracker import ExpiringSet
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _expiring_set(monkeypatch, ttl_seconds, max_size, buckets=60):
+    clock = _Clock()
+    monkeypatch.setattr(request_tracker, "time", SimpleNamespace(monotonic=clock))
+    return ExpiringSet(ttl_seconds, max_size, buckets=buckets), clock
+
+
+def test_readd_in_later_bucket_then_evict(monkeypatch):
+    tracked, clock = _expiring_set(monkeypatch, ttl_seconds=6, max_size=3, buckets=60)
+
+    tracked.add("a")
+    clock.now += 0.15  # Next bucket: "a" moves and its old bucket empties
+    tracked.add("a")
+    for key in ("b", "c", "d"):
+        tracked.add(key)
+
+    # All four share the current bucket, so any one of them may be evicted
+    assert len(tracked) == 3
+    assert sum(key in tracked for key in ("a", "b", "c", "d")) == 3
+
+
+def test_eviction_drops_oldest_bucket_first(monkeypatch):
+    tracked, clock = _expiring_set(monkeypatch, ttl_seconds=60, max_size=2)
+
+    tracked.add("old")
+    clock.now += 2
+    tracked.add("mid")
+    clock.now += 2
+    tracked.add("new")
+
+    assert "old" not in tracked
+    assert "mid" in tracked and "new" in tracked
+
+
+def test_readd_refreshes_expiry(monkeypatch):
+    tracked, clock = _expiring_set(monkeypatch, ttl_seconds=10, max_size=100, buckets=10)
+
+    tracked.add("a")
+    tracked.add("b")
+    clock.now += 6
+    tracked.add("a")
+    clock.now += 6
+
+    assert "a" in tracked
+    assert "b" not in tracked
+    assert len(tracked) == 1
+
+
+def test_real_clock_smoke():
+    tracked = ExpiringSet(6, 3)
+    tracked.add("a")
+    time.sleep(0.15)
+    tracked.add("a")
+    for key in ("b", "c", "d"):
+        tracked.add(key)
+    assert len(tracked) == 3
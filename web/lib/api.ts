@@ -18,6 +18,7 @@ export interface Run {
   call_count: number;
   sections: string[];
   top_section: string;
+  cursor?: string;
 }
 
 export interface RunDetail {
@@ -242,12 +243,16 @@ async function getAuthHeaders(): Promise<HeadersInit> {
 }
 
 // API Functions
-export async function fetchRuns(limit: number = 50, tenantId?: string | null, token?: string): Promise<Run[]> {
+export async function fetchRuns(limit: number = 50, tenantId?: string | null, token?: string, before?: string): Promise<Run[]> {
   const headers = await getDashboardAuthHeaders(token);
   let url = `${COLLECTOR_URL}/runs/latest?limit=${limit}`;
   if (tenantId) {
     url += `&tenant_id=${encodeURIComponent(tenantId)}`;
   }
+  if (before) {
+    // Keyset pagination: pass the `cursor` of the last run on the previous page
+    url += `&before=${encodeURIComponent(before)}`;
+  }
   const response = await fetch(url, {
     headers,
   });